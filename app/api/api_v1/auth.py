@@ -9,7 +9,7 @@ from app.schemas.token import AccessToken, Token
 from app.schemas.security import ExtendedOAuth2PasswordRequestForm
 
 from app.db.repositories.users import UsersRepository
-from app.services import auth_service
+from app.services import auth_service, session_token_cache
 from app.api.dependencies.database import get_repository
 
 router = APIRouter()
@@ -53,7 +53,7 @@ async def user_login_with_email_and_password(
 
     for token in tokens:
         if (device_remove and device_remove == token.device) or (token.device == get_user_agent):
-            await token_redis_repo.remove_token_by_key(token.id)
+            await session_token_cache.revoke_token(token=token, token_redis_repo=token_redis_repo)
             tokens.remove(token)
 
     if len(tokens) >= MAXIMUN_ACTIVE_TOKENS:
@@ -80,7 +80,7 @@ async def user_logout(
     user_token: Token = Depends(get_auth_token),
     token_redis_repo: TokenRedisRepository = Depends(get_redis_repository(TokenRedisRepository)),
 ):
-    await token_redis_repo.remove_tokens_by_user_id(user_id=user_token.user_id)
+    await session_token_cache.revoke_user(user_id=user_token.user_id, token_redis_repo=token_redis_repo)
 
 
 @router.post(
@@ -97,7 +97,7 @@ async def force_user_logout_by_id(
     user = await users_repo.get_user_by_id(tenant_id=user_token.tenant_id, id=user_id)
 
     if user:
-        await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+        await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
 
 @router.post(
@@ -114,7 +114,7 @@ async def force_user_logout_by_username(
     user = await users_repo.get_user_by_tenant_and_username(tenant_id=user_token.tenant_id, username=username)
 
     if user:
-        await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+        await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
 
 @router.post(
@@ -131,4 +131,4 @@ async def force_user_logout_by_email(
     user = await users_repo.get_user_by_tenant_id_and_email(tenant_id=user_token.tenant_id, email=email)
 
     if user:
-        await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+        await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
@@ -1,35 +1,38 @@
 import httpx
 from starlette.responses import StreamingResponse
 from datetime import date
-from typing import Any, Optional
-from pydantic import condecimal, conint, constr
+from typing import Any, List, Optional
+from pydantic import UUID4, condecimal, conint, constr
 from app.api.dependencies.boletos_bb import get_boleto_bb_by_id_from_path, get_boleto_bb_by_seu_numero_from_path
 from app.api.dependencies.database import get_repository
-from fastapi import BackgroundTasks, Body, Depends, HTTPException, status
+from fastapi import BackgroundTasks, Body, Depends, HTTPException, Path, status
 from app.api.dependencies.redis_database import get_redis_repository
 from app.db.repositories.boletos_bb import BoletosBBRepository
 from app.db.repositories.convenios_bancarios import ConveniosBancariosRepository
-from app.db.repositories.contas_bancarias import ContasBancariasRepository
 from app.db.repositories.token_bb_redis import TokenBBRedisRepository
 from app.schemas.bancos.boleto import BoletoCreate
 from app.schemas.bancos.boleto_bb import (
     AlteracaoData,
     BoletoBBAlteracao,
     BoletoBBBaixar,
+    BoletoBBBatchResult,
     BoletoBBFull,
     BoletoBBInDB,
     BoletoBBNewVencimento,
+    BoletoBBRegistroStatus,
     BoletoBBResponseDetails,
     BoletoBBResponseDetailsSnake,
 )
 from app.schemas.bancos.boleto_pdf import BeneficiarioBoleto, DadosBoletoBB, PagadorBoleto
-from app.schemas.enums import PersonType
+from app.schemas.enums import CountStrategy, PaginationMode, PersonType, RegistroStatus
 from app.schemas.filter import FilterModel
 from app.schemas.page import PageModel
 
 from app.schemas.tenant import TenantInDB
 from fastapi.routing import APIRouter
 from app.api.dependencies.auth import get_tenant_by_api_key
+from app.core.config import BB_BATCH_MAX_ITEMS
+from app.services.banking_profile_cache import banking_profile_cache
 from app.services.boleto_bb_pdf import create_boleto_bb_pdf
 from app.util.validators import validate_cpf_cnpj
 
@@ -42,41 +45,90 @@ client = httpx.AsyncClient()
 async def register_new_boleto_bb(
     new_boleto: BoletoCreate = Body(..., embed=False),
     convenios_bancarios_repo: ConveniosBancariosRepository = Depends(get_repository(ConveniosBancariosRepository)),
-    contas_bancarias_repo: ContasBancariasRepository = Depends(get_repository(ContasBancariasRepository)),
     token_bb_redis_repo: TokenBBRedisRepository = Depends(get_redis_repository(TokenBBRedisRepository)),
     boletos_bb_repo: BoletosBBRepository = Depends(get_repository(BoletosBBRepository)),
     tenant_origin: TenantInDB = Depends(get_tenant_by_api_key),
 ) -> Any:
-    convenio_bancario = await convenios_bancarios_repo.get_convenio_bancario_by_id(
-        tenant_id=tenant_origin.id, id=new_boleto.convenio_bancario_id
+    banking_profile = await banking_profile_cache.get_banking_profile(
+        tenant_id=tenant_origin.id,
+        convenio_bancario_id=new_boleto.convenio_bancario_id,
+        convenios_bancarios_repo=convenios_bancarios_repo,
     )
-    if not convenio_bancario:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="That convenio_bancario_id is not found. Please try another one.",
-        )
 
-    conta_bancaria = await contas_bancarias_repo.get_conta_bancaria_by_id(
+    bobelo_bb_in_db = await boletos_bb_repo.register_new_boleto_bb(
+        tenant_in_db=tenant_origin,
+        convenio_bancario_in_db=banking_profile.convenio,
+        conta_bancaria_in_db=banking_profile.conta,
+        new_boleto=new_boleto,
+        token_bb_redis_repo=token_bb_redis_repo,
+    )
+
+    return bobelo_bb_in_db
+
+
+@router.post(
+    "/async",
+    response_model=BoletoBBRegistroStatus,
+    name="boletos-bb:register-new-boleto-bb-async",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def register_new_boleto_bb_async(
+    new_boleto: BoletoCreate = Body(..., embed=False),
+    convenios_bancarios_repo: ConveniosBancariosRepository = Depends(get_repository(ConveniosBancariosRepository)),
+    boletos_bb_repo: BoletosBBRepository = Depends(get_repository(BoletosBBRepository)),
+    tenant_origin: TenantInDB = Depends(get_tenant_by_api_key),
+) -> BoletoBBRegistroStatus:
+    # the registration in BB is done by the outbox workers, poll GET /{id}/status to follow it
+    banking_profile = await banking_profile_cache.get_banking_profile(
         tenant_id=tenant_origin.id,
-        id=convenio_bancario.conta_bancaria_id,
+        convenio_bancario_id=new_boleto.convenio_bancario_id,
+        convenios_bancarios_repo=convenios_bancarios_repo,
+    )
+
+    return await boletos_bb_repo.register_new_boleto_bb_async(
+        tenant_in_db=tenant_origin,
+        convenio_bancario_in_db=banking_profile.convenio,
+        new_boleto=new_boleto,
     )
 
-    if not conta_bancaria:
+
+@router.post(
+    "/batch",
+    response_model=BoletoBBBatchResult,
+    name="boletos-bb:register-new-boletos-bb-batch",
+    status_code=status.HTTP_200_OK,
+)
+async def register_new_boletos_bb_batch(
+    new_boletos: List[BoletoCreate] = Body(..., embed=False),
+    convenios_bancarios_repo: ConveniosBancariosRepository = Depends(get_repository(ConveniosBancariosRepository)),
+    token_bb_redis_repo: TokenBBRedisRepository = Depends(get_redis_repository(TokenBBRedisRepository)),
+    boletos_bb_repo: BoletosBBRepository = Depends(get_repository(BoletosBBRepository)),
+    tenant_origin: TenantInDB = Depends(get_tenant_by_api_key),
+) -> BoletoBBBatchResult:
+    if not new_boletos or len(new_boletos) > BB_BATCH_MAX_ITEMS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="That conta_bancaria_id is not found. Please try another one.",
+            detail=f"The batch must have between 1 and {BB_BATCH_MAX_ITEMS} boletos.",
         )
 
-    bobelo_bb_in_db = await boletos_bb_repo.register_new_boleto_bb(
+    # convenio and conta are resolved once for each convenio_bancario_id of the batch
+    convenios_contas = {}
+    for convenio_bancario_id in {new_boleto.convenio_bancario_id for new_boleto in new_boletos}:
+        banking_profile = await banking_profile_cache.get_banking_profile(
+            tenant_id=tenant_origin.id,
+            convenio_bancario_id=convenio_bancario_id,
+            convenios_bancarios_repo=convenios_bancarios_repo,
+        )
+
+        convenios_contas[convenio_bancario_id] = (banking_profile.convenio, banking_profile.conta)
+
+    return await boletos_bb_repo.register_new_boletos_bb_batch(
         tenant_in_db=tenant_origin,
-        convenio_bancario_in_db=convenio_bancario,
-        conta_bancaria_in_db=conta_bancaria,
-        new_boleto=new_boleto,
+        convenios_contas=convenios_contas,
+        new_boletos=new_boletos,
         token_bb_redis_repo=token_bb_redis_repo,
     )
 
-    return bobelo_bb_in_db
-
 
 @router.get(
     "",
@@ -100,6 +152,9 @@ async def get_all_boletos_bb(
     cpf_cnpj: Optional[constr(min_length=11, max_length=19)] = None,
     nome: Optional[constr()] = None,
     sorts: Optional[str] = None,
+    pagination: PaginationMode = PaginationMode.offset,
+    cursor: Optional[str] = None,
+    count_strategy: CountStrategy = CountStrategy.exact,
 ) -> PageModel:
     filters = []
     if data_emissao_gte:
@@ -166,7 +221,7 @@ async def get_all_boletos_bb(
         filters.append(
             FilterModel(
                 table="boletos_bb",
-                field="numero_inscricao",
+                field="numero",
                 alias_field="nosso_numero",
                 operator="eq",
                 value=nosso_numero,
@@ -196,7 +251,7 @@ async def get_all_boletos_bb(
         filters.append(
             FilterModel(
                 table="pagadores_bb",
-                field="numero_inscricao",
+                field="cpf_cnpj",
                 alias_field="cpf_cnpj",
                 operator="eq",
                 value=validate_cpf_cnpj(cpf_cnpj),
@@ -214,7 +269,14 @@ async def get_all_boletos_bb(
         )
 
     return await boletos_bb_repo.get_all_boletos_bb(
-        tenant_id=tenant_origin.id, current_page=current_page, per_page=per_page, filters=filters, sorts=sorts
+        tenant_id=tenant_origin.id,
+        current_page=current_page,
+        per_page=per_page,
+        filters=filters,
+        sorts=sorts,
+        pagination=pagination,
+        cursor=cursor,
+        count_strategy=count_strategy,
     )
 
 
@@ -229,6 +291,26 @@ async def get_boleto_bb_by_id(
     return boleto_bb
 
 
+@router.get(
+    "/{id}/status",
+    response_model=BoletoBBRegistroStatus,
+    name="boletos-bb:get-boleto-bb-registro-status-by-id",
+)
+async def get_boleto_bb_registro_status_by_id(
+    id: UUID4 = Path(..., title="The ID of the boleto bb to get."),
+    tenant_origin: TenantInDB = Depends(get_tenant_by_api_key),
+    boletos_bb_repo: BoletosBBRepository = Depends(get_repository(BoletosBBRepository)),
+) -> BoletoBBRegistroStatus:
+    registro_status = await boletos_bb_repo.get_registro_status_boleto_bb(tenant_id=tenant_origin.id, id=id)
+    if not registro_status:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No boleto bb found with that id.",
+        )
+
+    return registro_status
+
+
 @router.get(
     "/{id}/consulta",
     response_model=BoletoBBResponseDetailsSnake,
@@ -236,12 +318,20 @@ async def get_boleto_bb_by_id(
 )
 async def get_boleto_bb_by_id_consulta(
     boleto_bb: BoletoBBFull = Depends(get_boleto_bb_by_id_from_path),
+    tenant_origin: TenantInDB = Depends(get_tenant_by_api_key),
+    convenios_bancarios_repo: ConveniosBancariosRepository = Depends(get_repository(ConveniosBancariosRepository)),
     token_bb_redis_repo: TokenBBRedisRepository = Depends(get_redis_repository(TokenBBRedisRepository)),
     boletos_bb_repo: BoletosBBRepository = Depends(get_repository(BoletosBBRepository)),
 ) -> BoletoBBResponseDetails:
     boleto_bb_full = BoletoBBFull(**boleto_bb)
+    banking_profile = await banking_profile_cache.get_banking_profile(
+        tenant_id=tenant_origin.id,
+        convenio_bancario_id=boleto_bb_full.convenio_bancario_id,
+        convenios_bancarios_repo=convenios_bancarios_repo,
+    )
     boleto_bb_response = await boletos_bb_repo.consultar_situacao_boleto_bb(
-        id=boleto_bb_full.id, token_bb_redis_repo=token_bb_redis_repo
+        boleto_bb_req=banking_profile.get_request_details(id=boleto_bb_full.id, numero=boleto_bb_full.numero),
+        token_bb_redis_repo=token_bb_redis_repo,
     )
 
     boleto_response = BoletoBBResponseDetailsSnake(**boleto_bb_response)
@@ -256,12 +346,20 @@ async def get_boleto_bb_by_id_consulta(
 )
 async def get_boleto_bb_consulta_by_seu_numero(
     boleto_bb: BoletoBBFull = Depends(get_boleto_bb_by_seu_numero_from_path),
+    tenant_origin: TenantInDB = Depends(get_tenant_by_api_key),
+    convenios_bancarios_repo: ConveniosBancariosRepository = Depends(get_repository(ConveniosBancariosRepository)),
     token_bb_redis_repo: TokenBBRedisRepository = Depends(get_redis_repository(TokenBBRedisRepository)),
     boletos_bb_repo: BoletosBBRepository = Depends(get_repository(BoletosBBRepository)),
 ) -> BoletoBBResponseDetails:
     boleto_bb_full = BoletoBBFull(**boleto_bb)
+    banking_profile = await banking_profile_cache.get_banking_profile(
+        tenant_id=tenant_origin.id,
+        convenio_bancario_id=boleto_bb_full.convenio_bancario_id,
+        convenios_bancarios_repo=convenios_bancarios_repo,
+    )
     boleto_bb_response = await boletos_bb_repo.consultar_situacao_boleto_bb(
-        id=boleto_bb_full.id, token_bb_redis_repo=token_bb_redis_repo
+        boleto_bb_req=banking_profile.get_request_details(id=boleto_bb_full.id, numero=boleto_bb_full.numero),
+        token_bb_redis_repo=token_bb_redis_repo,
     )
     return BoletoBBResponseDetailsSnake(**boleto_bb_response)
 
@@ -274,6 +372,17 @@ async def download_pdf_order(
     cpf_cnpj_senha: bool = False,
 ):
     boleto_bb = BoletoBBFull(**boleto_bb)
+    # pending or failed registration (async mode): BB didn't give the linha digitável and the barcode yet
+    if (
+        boleto_bb.registro_status in (RegistroStatus.pending, RegistroStatus.failed)
+        or not boleto_bb.linha_digitavel
+        or not boleto_bb.codigo_barra_numerico
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The boleto bb is not registered.",
+        )
+
     boleto = DadosBoletoBB(
         carteira=boleto_bb.convenio.numero_carteira,
         data_documento=boleto_bb.data_emissao,
@@ -285,7 +394,7 @@ async def download_pdf_order(
         valor_desconto=boleto_bb.valor_desconto,
         linha_digitavel=boleto_bb.linha_digitavel,
         codigo_barras=boleto_bb.codigo_barra_numerico,
-        qr_code=boleto_bb.qr_code.emv,
+        qr_code=boleto_bb.qr_code.emv if boleto_bb.qr_code else None,
         especie_documento=boleto_bb.descricao_tipo_titulo,
         numero_dias_limite_recebimento=boleto_bb.convenio.numero_dias_limite_recebimento,
         taxa_juros_mes=boleto_bb.convenio.percentual_juros,
@@ -331,12 +440,14 @@ async def update_vencimento_boleto_bb_by_id(
     token_bb_redis_repo: TokenBBRedisRepository = Depends(get_redis_repository(TokenBBRedisRepository)),
 ) -> Any:
     boleto_bb = BoletoBBInDB(**boleto_bb)
-    convenio_bancario = await convenios_bancarios_repo.get_convenio_bancario_by_id(
-        tenant_id=boleto_bb.tenant_id, id=boleto_bb.convenio_bancario_id
+    banking_profile = await banking_profile_cache.get_banking_profile(
+        tenant_id=boleto_bb.tenant_id,
+        convenio_bancario_id=boleto_bb.convenio_bancario_id,
+        convenios_bancarios_repo=convenios_bancarios_repo,
     )
 
     boleto_bb_alteracao = BoletoBBAlteracao(
-        numeroConvenio=convenio_bancario.numero_convenio,
+        numeroConvenio=banking_profile.convenio.numero_convenio,
         indicadorNovaDataVencimento="S",
         alteracaoData=AlteracaoData(
             novaDataVencimento=new_vencimento.data_vencimento_format,
@@ -344,7 +455,8 @@ async def update_vencimento_boleto_bb_by_id(
     )
 
     boleto_bb = await boletos_bb_repo.update_vencimento_boleto_bb(
-        id=boleto_bb.id,
+        boleto_bb=boleto_bb,
+        banking_profile=banking_profile,
         new_vencimento=new_vencimento,
         boleto_bb_alteracao=boleto_bb_alteracao,
         token_bb_redis_repo=token_bb_redis_repo,
@@ -368,14 +480,17 @@ async def baixar_boleto_bb_by_id(
 ) -> Any:
     print("OOOOppppaaaaa!!!")
     boleto_bb = BoletoBBInDB(**boleto_bb)
-    convenio_bancario = await convenios_bancarios_repo.get_convenio_bancario_by_id(
-        tenant_id=boleto_bb.tenant_id, id=boleto_bb.convenio_bancario_id
+    banking_profile = await banking_profile_cache.get_banking_profile(
+        tenant_id=boleto_bb.tenant_id,
+        convenio_bancario_id=boleto_bb.convenio_bancario_id,
+        convenios_bancarios_repo=convenios_bancarios_repo,
     )
 
-    boleto_bb_baixar = BoletoBBBaixar(numeroConvenio=convenio_bancario.numero_convenio)
+    boleto_bb_baixar = BoletoBBBaixar(numeroConvenio=banking_profile.convenio.numero_convenio)
 
     boleto_bb = await boletos_bb_repo.baixar_boleto_bb(
-        id=boleto_bb.id,
+        boleto_bb=boleto_bb,
+        banking_profile=banking_profile,
         boleto_bb_baixar=boleto_bb_baixar,
         token_bb_redis_repo=token_bb_redis_repo,
     )
@@ -14,6 +14,7 @@ from app.schemas.bancos.conta_bancaria import (
     ContaBancariaUpdate,
 )
 from app.schemas.filter import FilterModel
+from app.schemas.enums import CountStrategy, PaginationMode
 from app.schemas.page import PageModel
 from app.schemas.token import Token
 
@@ -50,6 +51,9 @@ async def get_all_contas_bancarias(
     numero_conta: Optional[int] = None,
     is_active: Optional[bool] = None,
     sorts: Optional[str] = None,
+    pagination: PaginationMode = PaginationMode.offset,
+    cursor: Optional[str] = None,
+    count_strategy: CountStrategy = CountStrategy.exact,
 ) -> PageModel:
     filters = []
     if nome:
@@ -62,7 +66,14 @@ async def get_all_contas_bancarias(
         filters.append(FilterModel(field="is_active", operator="eq", value=is_active))
 
     return await contas_bancarias_repo.get_all_contas_bancarias(
-        tenant_id=user_token.tenant_id, current_page=current_page, per_page=per_page, filters=filters, sorts=sorts
+        tenant_id=user_token.tenant_id,
+        current_page=current_page,
+        per_page=per_page,
+        filters=filters,
+        sorts=sorts,
+        pagination=pagination,
+        cursor=cursor,
+        count_strategy=count_strategy,
     )
 
 
@@ -14,6 +14,7 @@ from app.schemas.bancos.convenio_bancario import (
     ConvenioBancarioUpdate,
 )
 from app.schemas.filter import FilterModel
+from app.schemas.enums import CountStrategy, PaginationMode
 from app.schemas.page import PageModel
 from app.schemas.token import Token
 
@@ -52,6 +53,9 @@ async def get_all_convenios_bancarios(
     numero_conta: Optional[int] = None,
     is_active: Optional[bool] = None,
     sorts: Optional[str] = None,
+    pagination: PaginationMode = PaginationMode.offset,
+    cursor: Optional[str] = None,
+    count_strategy: CountStrategy = CountStrategy.exact,
 ) -> PageModel:
     filters = []
     if numero_convenio:
@@ -87,7 +91,14 @@ async def get_all_convenios_bancarios(
         filters.append(FilterModel(table="convenios_bancarios", field="is_active", operator="eq", value=is_active))
 
     return await convenios_bancarios_repo.get_all_convenios_bancarios(
-        tenant_id=user_token.tenant_id, current_page=current_page, per_page=per_page, filters=filters, sorts=sorts
+        tenant_id=user_token.tenant_id,
+        current_page=current_page,
+        per_page=per_page,
+        filters=filters,
+        sorts=sorts,
+        pagination=pagination,
+        cursor=cursor,
+        count_strategy=count_strategy,
     )
 
 
@@ -17,7 +17,7 @@ from app.api.dependencies.profile import (
 from app.api.dependencies.database import get_repository
 from app.db.repositories.users import UsersRepository
 from app.db.repositories.tenants import TenantsRepository
-from app.services import auth_service
+from app.services import auth_service, session_token_cache
 
 from fastapi import Depends, APIRouter, Form, Body
 from app.schemas.user import UserFull, UserInDB, UserPublic, UserResetPassword
@@ -50,7 +50,7 @@ async def forgot_password(
         url_forgot_password_token = await auth_service.get_url_to_forgot_password(tenants_repo=tenantes_repo, user=user)
 
         # remove all tokens from user
-        await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+        await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
         if url_forgot_password_token:
             send_email_in_background_with_template(
@@ -12,10 +12,11 @@ from app.db.repositories.tenants import TenantsRepository
 from app.db.repositories.users import UsersRepository
 from app.db.repositories.roles import RolesRepository
 from app.api.dependencies.database import get_repository
+from app.api.dependencies.redis_database import get_redis_repository
 from app.schemas.token import Token
 from app.schemas.user import UserFullCreate
 
-from app.services import auth_service
+from app.services import auth_service, tenant_cache
 from app.services.send_email import send_email_in_background_with_template
 
 
@@ -108,9 +109,11 @@ async def create_new_tenant(
 async def confirm_email(
     tenant: TenantInDB = Depends(get_tenant_by_email_confirm_token_from_path),
     tenants_repo: TenantsRepository = Depends(get_repository(TenantsRepository)),
+    tenants_redis_repo: TenantsRedisRepository = Depends(get_redis_repository(TenantsRedisRepository)),
 ) -> Any:
-
     tenant = await tenants_repo.update_email_verified_by_id(id=tenant.id)
+    if tenant:
+        await tenant_cache.invalidate(id=tenant.id, api_key=tenant.api_key, tenants_redis_repo=tenants_redis_repo)
     return tenant
 
 
@@ -142,7 +145,7 @@ async def update_tenant_by_id(
     id: UUID4 = Path(..., title="The ID of the tenant to update."),
     tenant_update: TenantUpdate = Body(..., embed=False),
     tenants_repo: TenantsRepository = Depends(get_repository(TenantsRepository)),
-    tenants_redis_repo: TenantsRedisRepository = Depends(get_repository(TenantsRedisRepository)),
+    tenants_redis_repo: TenantsRedisRepository = Depends(get_redis_repository(TenantsRedisRepository)),
 ) -> TenantInDB:
     await tenants_redis_repo.remove_tenant_by_subdomain_and_domain(
         subdomain=tenant_update.subdomain, domain=tenant_update.domain
@@ -150,6 +153,10 @@ async def update_tenant_by_id(
     updated_tenant = await tenants_repo.update_tenant(id=id, tenant_update=tenant_update)
     if not updated_tenant:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No tenant found with that id.")
+
+    await tenant_cache.invalidate(
+        id=updated_tenant.id, api_key=updated_tenant.api_key, tenants_redis_repo=tenants_redis_repo
+    )
     return updated_tenant
 
 
@@ -162,7 +169,7 @@ async def update_tenant_by_id(
 async def delete_tenant_by_id(
     id: UUID4 = Path(..., title="The ID of the tenant to delete."),
     tenants_repo: TenantsRepository = Depends(get_repository(TenantsRepository)),
-    tenants_redis_repo: TenantsRedisRepository = Depends(get_repository(TenantsRedisRepository)),
+    tenants_redis_repo: TenantsRedisRepository = Depends(get_redis_repository(TenantsRedisRepository)),
 ) -> UUID4:
     tenant = await tenants_repo.get_tenant_by_id(id=id)
 
@@ -172,6 +179,7 @@ async def delete_tenant_by_id(
             await tenants_redis_repo.remove_tenant_by_subdomain_and_domain(
                 subdomain=tenant.subdomain, domain=tenant.domain
             )
+            await tenant_cache.invalidate(id=tenant.id, api_key=tenant.api_key, tenants_redis_repo=tenants_redis_repo)
 
         return deleted_id
 
@@ -5,6 +5,7 @@ from typing import Optional, List
 from pydantic import UUID4, EmailStr
 from fastapi import Path, Depends, APIRouter, Body, HTTPException, status, BackgroundTasks
 
+from app.schemas.enums import CountStrategy, PaginationMode
 from app.schemas.page import PageModel
 from app.db.repositories.tenants import TenantsRepository
 from app.schemas.permission import PermissionsAddToUser, PermissionsDeleteOfUser
@@ -18,7 +19,7 @@ from app.api.dependencies.auth import has_permission
 from app.api.dependencies.database import get_repository
 
 from app.services.send_email import send_email_in_background_with_template
-from app.services import auth_service
+from app.services import auth_service, session_token_cache
 
 router = APIRouter()
 
@@ -67,6 +68,9 @@ async def get_all_user(
     username: Optional[str] = None,
     cell_phone: Optional[str] = None,
     sorts: Optional[str] = None,
+    pagination: PaginationMode = PaginationMode.offset,
+    cursor: Optional[str] = None,
+    count_strategy: CountStrategy = CountStrategy.exact,
 ) -> PageModel:
     filters = []
     if full_name:
@@ -79,7 +83,14 @@ async def get_all_user(
         filters.append(FilterModel(field="cell_phone", operator="eq", value=cell_phone))
 
     return await users_repo.get_all_users(
-        tenant_id=user_token.tenant_id, current_page=current_page, per_page=per_page, filters=filters, sorts=sorts
+        tenant_id=user_token.tenant_id,
+        current_page=current_page,
+        per_page=per_page,
+        filters=filters,
+        sorts=sorts,
+        pagination=pagination,
+        cursor=cursor,
+        count_strategy=count_strategy,
     )
 
 
@@ -111,7 +122,7 @@ async def update_user_by_id(
     user = await users_repo.update_user(user=user, user_update=user_update)
 
     # remove all tokens from user
-    await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+    await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
     return user
 
@@ -130,7 +141,7 @@ async def delete_user_by_id(
     user_id = await users_repo.delete_user(tenant_id=user.tenant_id, user=user)
 
     # remove all tokens from user
-    await token_redis_repo.remove_tokens_by_user_id(user_id=user_id)
+    await session_token_cache.revoke_user(user_id=user_id, token_redis_repo=token_redis_repo)
 
     return user_id
 
@@ -150,7 +161,7 @@ async def add_roles_to_user_by_id(
     await users_repo.register_roles_user(user=user, roles=roles_add_to_user.roles)
 
     # remove all tokens from user
-    await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+    await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
     return await users_repo.get_full_user_by_user(user=user)
 
@@ -170,7 +181,7 @@ async def delete_roles_of_user_by_id(
     await users_repo.delete_roles_user(user=user, roles=roles_delete_of_user.roles)
 
     # remove all tokens from user
-    await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+    await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
     return await users_repo.get_full_user_by_user(user=user)
 
@@ -190,7 +201,7 @@ async def delete_role_of_user_by_id_and_role_id(
     await users_repo.delete_roles_user(user=user, roles=[role_id])
 
     # remove all tokens from user
-    await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+    await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
     return await users_repo.get_full_user_by_user(user=user)
 
@@ -210,7 +221,7 @@ async def add_permissions_to_user_by_id(
     await users_repo.register_permissions_user(user=user, permissions=permissions_add_to_user.permissions)
 
     # remove all tokens from user
-    await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+    await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
     return await users_repo.get_full_user_by_user(user=user)
 
@@ -230,7 +241,7 @@ async def delete_permissions_of_user_by_id(
     await users_repo.delete_permissions_user(user=user, permissions=permissions_delete_of_user.permissions)
 
     # remove all tokens from user
-    await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+    await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
     return await users_repo.get_full_user_by_user(user=user)
 
@@ -250,7 +261,7 @@ async def delete_permissions_of_user_by_id_and_permission_id(
     await users_repo.delete_permissions_user(user=user, permissions=[permission_id])
 
     # remove all tokens from user
-    await token_redis_repo.remove_tokens_by_user_id(user_id=user.id)
+    await session_token_cache.revoke_user(user_id=user.id, token_redis_repo=token_redis_repo)
 
     return await users_repo.get_full_user_by_user(user=user)
 
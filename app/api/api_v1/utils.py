@@ -4,7 +4,8 @@ from io import BytesIO
 from fastapi import BackgroundTasks, Depends, File, HTTPException, Response, UploadFile, status
 
 from fastapi.routing import APIRouter
-from app.api.dependencies.auth import get_auth_token
+from app.api.dependencies.auth import get_auth_token, has_roles
+from app.core.metrics import metrics
 from app.services.pdf_utils import add_password_and_restrict_printing
 
 
@@ -40,3 +41,13 @@ async def pdf_encrypt(
     print(tmp_path)
     # os.unlink(tmp_path)  # Remove o arquivo temporário após a leitura
     return Response(content=content, media_type="application/pdf")
+
+
+@router.get(
+    "/metrics",
+    name="utils:metrics",
+    dependencies=[Depends(has_roles(["master"]))],
+)
+async def get_metrics() -> dict:
+    # numbers of the worker that answered the request
+    return metrics.snapshot()
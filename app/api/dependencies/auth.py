@@ -8,14 +8,15 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.api.dependencies.redis_database import get_redis_repository
 from app.core.config import JWT_AUDIENCE_AUTH, JWT_AUDIENCE_CONFIRM_EMAIL, SECRET_KEY, API_PREFIX_V1
+from app.db.repositories.tenant_redis import TenantsRedisRepository
 from app.db.repositories.token_redis import TokenRedisRepository
 from app.schemas.tenant import TenantInDB
-from app.schemas.token import JWTPayloadAuth, Token
+from app.schemas.token import JWTPayloadAuth, SessionToken
 from app.schemas.user import UserInDB
 from app.api.dependencies.database import get_repository
 from app.db.repositories.users import UsersRepository
 from app.db.repositories.tenants import TenantsRepository
-from app.services import auth_service
+from app.services import auth_service, session_token_cache, tenant_cache
 
 logger = logging.getLogger("app")
 
@@ -42,6 +43,7 @@ async def get_tenant_by_api_key(
     *,
     request: Request,
     tenants_repo: TenantsRepository = Depends(get_repository(TenantsRepository)),
+    tenants_redis_repo: TenantsRedisRepository = Depends(get_redis_repository(TenantsRedisRepository)),
 ) -> Optional[TenantInDB]:
     # api_key = None
     # for key, value in request.headers.items():
@@ -51,7 +53,10 @@ async def get_tenant_by_api_key(
     #         break
     api_key = request.headers.get("X-API-Key")
     if api_key:
-        tenant = await tenants_repo.get_tenant_by_api_key(api_key=api_key)
+        # the DB connection of the request is only acquired on a miss of both cache levels
+        tenant = await tenant_cache.get_tenant_by_api_key(
+            api_key=api_key, tenants_repo=tenants_repo, tenants_redis_repo=tenants_redis_repo
+        )
         if tenant and tenant.is_active:
             return tenant
 
@@ -65,15 +70,18 @@ async def get_tenant_by_api_key(
 async def get_auth_token(
     token: str = Depends(oauth2_scheme),
     token_redis_repo: TokenRedisRepository = Depends(get_redis_repository(TokenRedisRepository)),
-) -> Optional[Token]:
+) -> Optional[SessionToken]:
     token_data = auth_service.get_token_data_from_token(
         token=token, secret_key=str(SECRET_KEY), audience=str(JWT_AUDIENCE_AUTH)
     )
     try:
-        redis_token = await token_redis_repo.get_all(token_data.sub)
-        user_token = Token(**redis_token)
+        # worker memory first, revoked on logout (app/services/session_token_cache.py)
+        user_token = await session_token_cache.get_token(token_id=token_data.sub, token_redis_repo=token_redis_repo)
 
     except Exception:
+        user_token = None
+
+    if not user_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="No authenticated user.",
@@ -84,7 +92,7 @@ async def get_auth_token(
 
 
 async def get_tenant_by_token(
-    token: Token = Depends(get_auth_token),
+    token: SessionToken = Depends(get_auth_token),
     tenants_repo: TenantsRepository = Depends(get_repository(TenantsRepository)),
 ) -> Optional[TenantInDB]:
     tenant = await tenants_repo.get_tenant_by_id(id=token.tenant_id)
@@ -99,12 +107,11 @@ async def get_tenant_by_token(
     return tenant
 
 
-def has_roles(slugs: List[str]) -> Optional[Token]:
+def has_roles(slugs: List[str]) -> Optional[SessionToken]:
     async def can_roles(
-        token: Token = Depends(get_auth_token),
+        token: SessionToken = Depends(get_auth_token),
     ) -> Optional[UserInDB]:
-        roles = token.roles.split(",")
-        has_roles = [s for s in slugs if s in roles]
+        has_roles = [s for s in slugs if s in token.role_slugs]
 
         if not has_roles:
             raise HTTPException(
@@ -117,10 +124,9 @@ def has_roles(slugs: List[str]) -> Optional[Token]:
     return can_roles
 
 
-def has_permission(slugs: List[str]) -> Optional[Token]:
-    async def can_permission(token: Token = Depends(get_auth_token)) -> Optional[Token]:
-        permissions = token.permissions.split(",")
-        has_permissions = [s for s in slugs if s in permissions]
+def has_permission(slugs: List[str]) -> Optional[SessionToken]:
+    async def can_permission(token: SessionToken = Depends(get_auth_token)) -> Optional[SessionToken]:
+        has_permissions = [s for s in slugs if s in token.permission_slugs]
 
         if not has_permissions:
             raise HTTPException(
@@ -1,17 +1,51 @@
-from typing import Callable, Type
+import hashlib
+from typing import AsyncGenerator, Callable, Optional, Type
 from databases import Database
 from fastapi import Depends
 from starlette.requests import Request
 
+from app.db.replica import DatabaseSession
 from app.db.repositories.base import BaseRepository
+from app.db.unit_of_work import UnitOfWork
 
 
 def get_database(request: Request) -> Database:
     return request.app.state._db
 
 
+def get_session_key(request: Request) -> Optional[str]:
+    """
+    Identifies the client for the read-your-writes pin of the replica, without keeping its credentials in memory.
+    """
+    credentials = request.headers.get("X-API-Key") or request.headers.get("Authorization")
+    if not credentials:
+        return None
+
+    return hashlib.sha256(credentials.encode()).hexdigest()
+
+
+async def get_database_session(
+    request: Request, db: Database = Depends(get_database)
+) -> AsyncGenerator[DatabaseSession, None]:
+    # cached by FastAPI for the request, so every repository of the request shares the session and its connection
+    session = DatabaseSession(
+        primary=db, router=getattr(request.app.state, "_db_router", None), key=get_session_key(request)
+    )
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+def get_unit_of_work(session: DatabaseSession = Depends(get_database_session)) -> UnitOfWork:
+    """
+    Explicit transaction of an endpoint across repositories: async with uow.transaction(): ...
+    """
+    return session.uow
+
+
 def get_repository(Repo_type: Type[BaseRepository]) -> Callable:
-    def get_repo(db: Database = Depends(get_database)) -> Type[BaseRepository]:
-        return Repo_type(db)
+    def get_repo(session: DatabaseSession = Depends(get_database_session)) -> Type[BaseRepository]:
+        return Repo_type(session.primary)
 
     return get_repo
@@ -58,6 +58,24 @@ DATABASE_URL = config(
     default=f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}",
 )
 
+# pool of each gunicorn worker (app/db/database.py), sized by the db_pool_* metrics
+DATABASE_POOL_MIN_SIZE: int = config("DATABASE_POOL_MIN_SIZE", cast=int, default=2)
+DATABASE_POOL_MAX_SIZE: int = config("DATABASE_POOL_MAX_SIZE", cast=int, default=10)
+DATABASE_POOL_WARM_SIZE: int = config("DATABASE_POOL_WARM_SIZE", cast=int, default=10)  # opened at startup
+DATABASE_POOL_ACQUIRE_TIMEOUT: float = config("DATABASE_POOL_ACQUIRE_TIMEOUT", cast=float, default=10.0)  # seconds
+DATABASE_POOL_MAX_QUERIES: int = config("DATABASE_POOL_MAX_QUERIES", cast=int, default=50000)  # then reconnected
+DATABASE_POOL_MAX_INACTIVE_LIFETIME: float = config(
+    "DATABASE_POOL_MAX_INACTIVE_LIFETIME", cast=float, default=300.0
+)  # seconds idle before closed, 0 keeps them open
+DATABASE_STATEMENT_TIMEOUT: float = config("DATABASE_STATEMENT_TIMEOUT", cast=float, default=30.0)  # seconds, 0 off
+
+# read replica of the list and lookup methods of the repositories (app/db/replica.py), disabled when empty
+DATABASE_REPLICA_URL: str = config("DATABASE_REPLICA_URL", cast=str, default="")
+DATABASE_REPLICA_MAX_LAG: float = config("DATABASE_REPLICA_MAX_LAG", cast=float, default=1.0)  # seconds, else primary
+DATABASE_REPLICA_CHECK_INTERVAL: float = config("DATABASE_REPLICA_CHECK_INTERVAL", cast=float, default=1.0)  # seconds
+DATABASE_REPLICA_PIN_SECONDS: float = config("DATABASE_REPLICA_PIN_SECONDS", cast=float, default=5.0)  # after a write
+DATABASE_REPLICA_PIN_MAXSIZE: int = config("DATABASE_REPLICA_PIN_MAXSIZE", cast=int, default=10000)  # per worker
+
 MAIL_USERNAME: str = config("MAIL_USERNAME")
 MAIL_PASSWORD: str = config("MAIL_PASSWORD")
 MAIL_FROM: str = config("MAIL_FROM", default="noreplay@domain.com")
@@ -70,8 +88,105 @@ REDIS_PORT: int = config("REDIS_PORT", default=6379)
 REDIS_DB: int = config("REDIS_DB", default=3)
 REDIS_PREFIX: str = config("REDIS_PREFIX", default="pay_api")
 
+# pool of each gunicorn worker (app/db/redis_database.py), sized by the redis_pool_* metrics
+REDIS_POOL_MAX_CONNECTIONS: int = config("REDIS_POOL_MAX_CONNECTIONS", cast=int, default=10)
+REDIS_POOL_WARM_SIZE: int = config("REDIS_POOL_WARM_SIZE", cast=int, default=5)  # opened at startup
+REDIS_POOL_TIMEOUT: float = config("REDIS_POOL_TIMEOUT", cast=float, default=5.0)  # seconds waiting a free connection
+REDIS_SOCKET_CONNECT_TIMEOUT: float = config("REDIS_SOCKET_CONNECT_TIMEOUT", cast=float, default=2.0)  # seconds
+REDIS_SOCKET_TIMEOUT: float = config("REDIS_SOCKET_TIMEOUT", cast=float, default=5.0)  # seconds per command
+REDIS_HEALTH_CHECK_INTERVAL: int = config("REDIS_HEALTH_CHECK_INTERVAL", cast=int, default=30)  # seconds idle, PING
+
+# api-key -> tenant of the X-API-Key authentication (app/services/tenant_cache.py): worker memory, then Redis
+TENANT_CACHE_TTL: int = config("TENANT_CACHE_TTL", cast=int, default=300)  # seconds in Redis
+TENANT_CACHE_L1_TTL: float = config("TENANT_CACHE_L1_TTL", cast=float, default=30.0)  # seconds in worker memory
+TENANT_CACHE_L1_MAXSIZE: int = config("TENANT_CACHE_L1_MAXSIZE", cast=int, default=1024)  # api keys per worker
+TENANT_CACHE_NEGATIVE_TTL: int = config("TENANT_CACHE_NEGATIVE_TTL", cast=int, default=30)  # seconds, unknown keys
+
+# convenio + conta of the boleto calls (app/services/banking_profile_cache.py), kept in worker memory only
+BANKING_PROFILE_CACHE_TTL: float = config("BANKING_PROFILE_CACHE_TTL", cast=float, default=300.0)  # seconds
+BANKING_PROFILE_CACHE_MAXSIZE: int = config("BANKING_PROFILE_CACHE_MAXSIZE", cast=int, default=1024)  # per worker
+
+# validated session tokens of the Bearer authentication (app/services/session_token_cache.py), worker memory
+SESSION_TOKEN_CACHE_TTL: float = config("SESSION_TOKEN_CACHE_TTL", cast=float, default=60.0)  # seconds
+SESSION_TOKEN_CACHE_MAXSIZE: int = config("SESSION_TOKEN_CACHE_MAXSIZE", cast=int, default=4096)  # tokens per worker
+
+# invalidation of the caches in worker memory across the gunicorn workers (app/db/invalidation.py), Redis pub/sub
+INVALIDATION_BUS_ENABLED: bool = config("INVALIDATION_BUS_ENABLED", cast=bool, default=True)
+INVALIDATION_BUS_RETRY_INTERVAL: float = config(
+    "INVALIDATION_BUS_RETRY_INTERVAL", cast=float, default=1.0
+)  # seconds before subscribing again
+
 S3_BUCKET: str = config("S3_BUCKET", default="hy-tests")
 S3_EXPIRES_IN: str = config("S3_EXPIRES_IN", default=60)
 
 BB_OAUTH_URL: str = config("BB_OAUTH_URL", default="https://oauth.sandbox.bb.com.br/oauth")
 BB_API_URL: str = config("BB_API_URL", default="https://api.sandbox.bb.com.br/cobrancas/v2")
+
+# SQL compiled once from the pypika queries (app/db/statements.py)
+STATEMENTS_MAXSIZE: int = config("STATEMENTS_MAXSIZE", cast=int, default=2048)  # statements kept per worker
+
+# totals of the paginated listings (CountStrategy)
+PAGINATION_ESTIMATE_THRESHOLD: int = config("PAGINATION_ESTIMATE_THRESHOLD", cast=int, default=10000)  # exact below
+PAGINATION_COUNT_CACHE_TTL: float = config("PAGINATION_COUNT_CACHE_TTL", cast=float, default=30.0)  # seconds
+PAGINATION_COUNT_CACHE_MAXSIZE: int = config("PAGINATION_COUNT_CACHE_MAXSIZE", cast=int, default=4096)  # per worker
+
+# shared HTTP client (per worker) used by every Banco do Brasil call
+BB_HTTP_POOL_SIZE: int = config("BB_HTTP_POOL_SIZE", cast=int, default=100)  # total open connections
+BB_HTTP_POOL_SIZE_PER_HOST: int = config("BB_HTTP_POOL_SIZE_PER_HOST", cast=int, default=20)
+BB_HTTP_KEEPALIVE_TIMEOUT: float = config("BB_HTTP_KEEPALIVE_TIMEOUT", cast=float, default=30.0)  # seconds
+BB_HTTP_DNS_CACHE_TTL: int = config("BB_HTTP_DNS_CACHE_TTL", cast=int, default=300)  # seconds
+BB_HTTP_CONNECT_TIMEOUT: float = config("BB_HTTP_CONNECT_TIMEOUT", cast=float, default=5.0)  # seconds
+BB_HTTP_READ_TIMEOUT: float = config("BB_HTTP_READ_TIMEOUT", cast=float, default=30.0)  # seconds
+BB_HTTP_TOTAL_TIMEOUT: float = config("BB_HTTP_TOTAL_TIMEOUT", cast=float, default=60.0)  # seconds
+
+# circuit breaker (per BB endpoint and worker) and retries of idempotent calls
+BB_CIRCUIT_FAILURE_RATE: float = config("BB_CIRCUIT_FAILURE_RATE", cast=float, default=0.5)  # failed calls to open
+BB_CIRCUIT_WINDOW_SIZE: int = config("BB_CIRCUIT_WINDOW_SIZE", cast=int, default=20)  # last calls considered
+BB_CIRCUIT_MINIMUM_CALLS: int = config("BB_CIRCUIT_MINIMUM_CALLS", cast=int, default=10)  # calls before opening
+BB_CIRCUIT_OPEN_SECONDS: float = config("BB_CIRCUIT_OPEN_SECONDS", cast=float, default=30.0)  # until half-open
+BB_CIRCUIT_HALF_OPEN_CALLS: int = config("BB_CIRCUIT_HALF_OPEN_CALLS", cast=int, default=3)  # probes to close
+BB_RETRY_ATTEMPTS: int = config("BB_RETRY_ATTEMPTS", cast=int, default=3)  # consulta and OAuth only
+BB_RETRY_BACKOFF_BASE: float = config("BB_RETRY_BACKOFF_BASE", cast=float, default=0.2)  # seconds
+BB_RETRY_BACKOFF_MAX: float = config("BB_RETRY_BACKOFF_MAX", cast=float, default=2.0)  # seconds
+
+# quota of BB calls per gw-dev-app-key, shared by all workers through Redis
+BB_RATE_LIMIT_ENABLED: bool = config("BB_RATE_LIMIT_ENABLED", cast=bool, default=True)
+BB_RATE_LIMIT_RATE: float = config("BB_RATE_LIMIT_RATE", cast=float, default=10.0)  # calls per second
+BB_RATE_LIMIT_BURST: float = config("BB_RATE_LIMIT_BURST", cast=float, default=20.0)  # bucket size
+BB_RATE_LIMIT_BULK_RESERVE: float = config("BB_RATE_LIMIT_BULK_RESERVE", cast=float, default=0.5)  # burst share
+BB_RATE_LIMIT_MAX_WAIT: float = config("BB_RATE_LIMIT_MAX_WAIT", cast=float, default=5.0)  # seconds, interactive
+BB_RATE_LIMIT_BULK_MAX_WAIT: float = config("BB_RATE_LIMIT_BULK_MAX_WAIT", cast=float, default=60.0)  # seconds
+
+# reconciliation of open boletos (payment data from the BB consulta)
+BB_RECONCILIATION_ENABLED: bool = config("BB_RECONCILIATION_ENABLED", cast=bool, default=True)
+BB_RECONCILIATION_INTERVAL: float = config("BB_RECONCILIATION_INTERVAL", cast=float, default=300.0)  # seconds
+BB_RECONCILIATION_MIN_AGE: float = config("BB_RECONCILIATION_MIN_AGE", cast=float, default=3600.0)  # since last sync
+BB_RECONCILIATION_BATCH_SIZE: int = config("BB_RECONCILIATION_BATCH_SIZE", cast=int, default=200)  # per convenio
+BB_RECONCILIATION_CONCURRENCY: int = config("BB_RECONCILIATION_CONCURRENCY", cast=int, default=5)  # BB calls
+BB_RECONCILIATION_GRACE_DAYS: int = config(
+    "BB_RECONCILIATION_GRACE_DAYS", cast=int, default=5
+)  # after baixa automatico
+
+# OAuth tokens: single-flight lock across workers and background refresh before they expire
+BB_TOKEN_LOCK_TIMEOUT: int = config("BB_TOKEN_LOCK_TIMEOUT", cast=int, default=15)  # seconds
+BB_TOKEN_REFRESH_INTERVAL: int = config("BB_TOKEN_REFRESH_INTERVAL", cast=int, default=30)  # seconds
+BB_TOKEN_REFRESH_MARGIN: int = config("BB_TOKEN_REFRESH_MARGIN", cast=int, default=120)  # seconds left to renew
+BB_TOKEN_ACTIVE_WINDOW: int = config("BB_TOKEN_ACTIVE_WINDOW", cast=int, default=60 * 60)  # seconds since last use
+BB_TOKEN_L1_MAXSIZE: int = config("BB_TOKEN_L1_MAXSIZE", cast=int, default=1024)  # tokens kept in worker memory
+
+# batch registration of boletos
+BB_BATCH_MAX_ITEMS: int = config("BB_BATCH_MAX_ITEMS", cast=int, default=1000)
+BB_BATCH_CONCURRENCY: int = config("BB_BATCH_CONCURRENCY", cast=int, default=10)  # BB calls in flight per batch
+BB_BATCH_INSERT_CHUNK: int = config("BB_BATCH_INSERT_CHUNK", cast=int, default=500)  # rows per INSERT statement
+
+# asynchronous registration (boletos_bb_outbox)
+BB_OUTBOX_ENABLED: bool = config("BB_OUTBOX_ENABLED", cast=bool, default=True)  # run the workers in this process
+BB_OUTBOX_WORKERS: int = config("BB_OUTBOX_WORKERS", cast=int, default=2)  # tasks per gunicorn worker
+BB_OUTBOX_BATCH_SIZE: int = config("BB_OUTBOX_BATCH_SIZE", cast=int, default=10)  # entries claimed at once
+BB_OUTBOX_POLL_INTERVAL: float = config("BB_OUTBOX_POLL_INTERVAL", cast=float, default=1.0)  # seconds
+BB_OUTBOX_MAX_ATTEMPTS: int = config("BB_OUTBOX_MAX_ATTEMPTS", cast=int, default=8)
+BB_OUTBOX_BACKOFF_BASE: float = config("BB_OUTBOX_BACKOFF_BASE", cast=float, default=5.0)  # seconds
+BB_OUTBOX_BACKOFF_MAX: float = config("BB_OUTBOX_BACKOFF_MAX", cast=float, default=600.0)  # seconds
+BB_OUTBOX_STALE_AFTER: float = config("BB_OUTBOX_STALE_AFTER", cast=float, default=300.0)  # seconds in processing
+# seconds the entry written with a synchronous registration waits for it before a worker checks BB
+BB_OUTBOX_SYNC_DELAY: float = config("BB_OUTBOX_SYNC_DELAY", cast=float, default=120.0)
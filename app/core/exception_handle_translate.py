@@ -8,7 +8,13 @@ from starlette.responses import JSONResponse
 from asyncpg.exceptions import ForeignKeyViolationError, InvalidTextRepresentationError, UniqueViolationError
 
 from app.core.config import DEFAULT_LOCALE, DEV_MODE
-from app.core.exceptions.exceptions_customs import HttpExceptionBB, KeyHttpException, LoginHttpException
+from app.core.exceptions.exceptions_customs import (
+    CircuitOpenExceptionBB,
+    HttpExceptionBB,
+    KeyHttpException,
+    LoginHttpException,
+    RateLimitExceptionBB,
+)
 
 from pydantic_i18n import PydanticI18n, JsonLoader
 
@@ -66,6 +72,26 @@ async def httpException_bb_error_handler(request: Request, exc: HttpExceptionBB)
     )
 
 
+async def circuit_open_bb_error_handler(request: Request, exc: CircuitOpenExceptionBB) -> JSONResponse:
+    logger.warn(f"circuit_open_bb_error_handler: {exc.endpoint}")
+
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=exc.content,
+        headers=exc.headers,
+    )
+
+
+async def rate_limit_bb_error_handler(request: Request, exc: RateLimitExceptionBB) -> JSONResponse:
+    logger.warn(f"rate_limit_bb_error_handler: retry after {exc.retry_after:.1f}s")
+
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content=exc.content,
+        headers=exc.headers,
+    )
+
+
 async def httpException_error_handler(request: Request, exc: HTTPException) -> JSONResponse:
     logging_message("METHOD: httpException_error_handler", exc)
 
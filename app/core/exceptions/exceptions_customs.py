@@ -1,4 +1,5 @@
 import http
+import math
 
 from typing import Any, List, Optional
 from pydantic import BaseModel
@@ -37,6 +38,37 @@ class HttpExceptionBB(Exception):
         return f"{class_name}(status_code={self.status_code!r}, detail={self.detail!r})"
 
 
+class CircuitOpenExceptionBB(HttpExceptionBB):
+    """
+    The call was not sent, the circuit of this BB endpoint is open.
+    """
+
+    def __init__(self, endpoint: str, retry_after: float) -> None:
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=http.HTTPStatus.SERVICE_UNAVAILABLE.value,
+            detail=f"BB {endpoint} temporarily unavailable.",
+            content={"erros": [{"mensagem": f"BB {endpoint} temporarily unavailable, try again later."}]},
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+        )
+
+
+class RateLimitExceptionBB(HttpExceptionBB):
+    """
+    The call was not sent, the quota of the gw-dev-app-key would be exceeded.
+    """
+
+    def __init__(self, retry_after: float) -> None:
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=http.HTTPStatus.TOO_MANY_REQUESTS.value,
+            detail="BB request quota exceeded.",
+            content={"erros": [{"mensagem": "BB request quota exceeded, try again later."}]},
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+        )
+
+
 class KeyHttpException(Exception):
     def __init__(
         self,
@@ -0,0 +1,94 @@
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Tuple
+
+LabelsKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: Dict[str, Any]) -> LabelsKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_name(name: str, labels: LabelsKey) -> str:
+    if not labels:
+        return name
+
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+class MetricsRegistry:
+    """
+    Per-worker counters, gauges and latency samples.
+    Values are kept in memory and exposed by the utils router, each gunicorn worker reports its own numbers.
+    """
+
+    def __init__(self, *, samples: int = 1024) -> None:
+        self._lock = threading.Lock()
+        self._samples = samples
+        self._counters: Dict[Tuple[str, LabelsKey], float] = defaultdict(float)
+        self._gauges: Dict[Tuple[str, LabelsKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelsKey], Deque[float]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        with self._lock:
+            self._counters[(name, _labels_key(labels))] += value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._gauges[(name, _labels_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = (name, _labels_key(labels))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = deque(maxlen=self._samples)
+            self._histograms[key].append(value)
+
+    def register_collector(self, name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Collectors are called on snapshot, used by components that already keep their own stats (caches, pools).
+        """
+        self._collectors[name] = collector
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {_format_name(n, l): v for (n, l), v in self._counters.items()}
+            gauges = {_format_name(n, l): v for (n, l), v in self._gauges.items()}
+            histograms = {_format_name(n, l): self.__summary(list(v)) for (n, l), v in self._histograms.items()}
+
+        collectors = {}
+        for name, collector in self._collectors.items():
+            try:
+                collectors[name] = collector()
+            except Exception as e:
+                collectors[name] = {"error": repr(e)}
+
+        return {"counters": counters, "gauges": gauges, "histograms": histograms, "collectors": collectors}
+
+    def __summary(self, values: list) -> Dict[str, float]:
+        if not values:
+            return {"count": 0}
+
+        values.sort()
+
+        def percentile(p: float) -> float:
+            return values[min(int(p * len(values)), len(values) - 1)]
+
+        return {
+            "count": len(values),
+            "min": values[0],
+            "max": values[-1],
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+metrics = MetricsRegistry()
@@ -2,18 +2,46 @@ from app.db.redis_database import close_redis_db_connection, connect_to_redis_db
 from typing import Callable
 from fastapi import FastAPI
 from app.db.database import connect_to_db, close_db_connection
+from app.db.invalidation import start_invalidation_bus, stop_invalidation_bus
+from app.services.bb_http_client import close_bb_http_client, connect_to_bb_http_client
+from app.services.bb_rate_limiter import start_bb_rate_limiter, stop_bb_rate_limiter
+from app.services.bb_token_manager import start_bb_token_refresher, stop_bb_token_refresher
+from app.services.boleto_bb_outbox_worker import start_boleto_bb_outbox_worker, stop_boleto_bb_outbox_worker
+from app.services.boleto_bb_reconciliation_worker import (
+    start_boleto_bb_reconciliation_worker,
+    stop_boleto_bb_reconciliation_worker,
+)
+from app.services.session_token_cache import start_session_token_indexer, stop_session_token_indexer
+from app.core.config import BB_OUTBOX_ENABLED, BB_RECONCILIATION_ENABLED, INVALIDATION_BUS_ENABLED
 
 
 def create_start_app_handler(app: FastAPI) -> Callable:
     async def start_app() -> None:
         await connect_to_db(app)
         await connect_to_redis_db(app)
+        if INVALIDATION_BUS_ENABLED:
+            await start_invalidation_bus(app)
+        await start_session_token_indexer(app)
+        await connect_to_bb_http_client(app)
+        await start_bb_rate_limiter(app)
+        await start_bb_token_refresher(app)
+        if BB_OUTBOX_ENABLED:
+            await start_boleto_bb_outbox_worker(app)
+        if BB_RECONCILIATION_ENABLED:
+            await start_boleto_bb_reconciliation_worker(app)
 
     return start_app
 
 
 def create_stop_app_handler(app: FastAPI) -> Callable:
     async def stop_app() -> None:
+        await stop_boleto_bb_reconciliation_worker(app)
+        await stop_boleto_bb_outbox_worker(app)
+        await stop_bb_token_refresher(app)
+        await stop_bb_rate_limiter(app)
+        await stop_session_token_indexer(app)
+        await close_bb_http_client(app)
+        await stop_invalidation_bus(app)
         await close_db_connection(app)
         await close_redis_db_connection(app)
 
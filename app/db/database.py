@@ -1,26 +1,134 @@
+import asyncio
 import os
 from fastapi import FastAPI
 from databases import Database
-from app.core.config import DATABASE_URL
+from app.core.config import (
+    DATABASE_POOL_MAX_INACTIVE_LIFETIME,
+    DATABASE_POOL_MAX_QUERIES,
+    DATABASE_POOL_MAX_SIZE,
+    DATABASE_POOL_MIN_SIZE,
+    DATABASE_POOL_WARM_SIZE,
+    DATABASE_REPLICA_CHECK_INTERVAL,
+    DATABASE_REPLICA_MAX_LAG,
+    DATABASE_REPLICA_PIN_MAXSIZE,
+    DATABASE_REPLICA_PIN_SECONDS,
+    DATABASE_REPLICA_URL,
+    DATABASE_STATEMENT_TIMEOUT,
+    DATABASE_URL,
+)
+from app.core.metrics import metrics
+from app.db.replica import ReplicaRouter
+from app.db.unit_of_work import UnitOfWork
 import logging
 
 logger = logging.getLogger("__name__")
 
 
+def get_pool_options() -> dict:
+    # passed by the databases package to asyncpg.create_pool, which opens min_size connections
+    options = {
+        "min_size": DATABASE_POOL_MIN_SIZE,
+        "max_size": DATABASE_POOL_MAX_SIZE,
+        "max_queries": DATABASE_POOL_MAX_QUERIES,
+        "max_inactive_connection_lifetime": DATABASE_POOL_MAX_INACTIVE_LIFETIME,
+    }
+    if DATABASE_STATEMENT_TIMEOUT:
+        options["server_settings"] = {"statement_timeout": str(int(DATABASE_STATEMENT_TIMEOUT * 1000))}
+
+    return options
+
+
+def get_pool_stats(database: Database) -> dict:
+    # asyncpg pool behind the databases package, with the db_pool_acquire_seconds of UnitOfWork
+    pool = getattr(database._backend, "_pool", None)
+    if pool is None:
+        return {}
+
+    return {
+        "min_size": pool.get_min_size(),
+        "max_size": pool.get_max_size(),
+        "size": pool.get_size(),
+        "idle": pool.get_idle_size(),
+        "in_use": pool.get_size() - pool.get_idle_size(),
+    }
+
+
+async def warm_pool(database: Database, size: int) -> None:
+    """
+    Open up to size connections at startup, so the first requests after a deploy don't pay the connection setup.
+    Connections above min_size are closed after DATABASE_POOL_MAX_INACTIVE_LIFETIME without use.
+    """
+    pool = database._backend._pool
+    connections = await asyncio.gather(
+        *[pool.acquire() for _ in range(min(size, pool.get_max_size()))], return_exceptions=True
+    )
+    for connection in connections:
+        if isinstance(connection, BaseException):
+            logger.warn(f"DB pool warm up error: {connection!r}")
+            continue
+
+        await pool.release(connection)
+
+
 async def connect_to_db(app: FastAPI) -> None:
     DB_URL = f"{DATABASE_URL}_test" if os.environ.get("TESTING") else DATABASE_URL
-    database = Database(DB_URL, min_size=2, max_size=10)
+    database = Database(DB_URL, **get_pool_options())
+    app.state._db_router = None
 
     try:
         await database.connect()
+        await warm_pool(database, DATABASE_POOL_WARM_SIZE)
         app.state._db = database
+        metrics.register_collector("db_pool", lambda: {**get_pool_stats(database), "waiting": UnitOfWork.waiting})
     except Exception as e:
         logger.warn("--- DB CONNECTION ERROR ---")
         logger.warn(e)
         logger.warn("--- DB CONNECTION ERROR ---")
 
+    if DATABASE_REPLICA_URL:
+        await connect_to_db_replica(app)
+
+
+async def connect_to_db_replica(app: FastAPI) -> None:
+    REPLICA_URL = f"{DATABASE_REPLICA_URL}_test" if os.environ.get("TESTING") else DATABASE_REPLICA_URL
+    replica = Database(REPLICA_URL, **get_pool_options())
+
+    try:
+        await replica.connect()
+        await warm_pool(replica, DATABASE_POOL_WARM_SIZE)
+    except Exception as e:
+        # the reads stay on the primary
+        logger.warn("--- DB REPLICA CONNECTION ERROR ---")
+        logger.warn(e)
+        logger.warn("--- DB REPLICA CONNECTION ERROR ---")
+        return
+
+    router = ReplicaRouter(
+        primary=app.state._db,
+        replica=replica,
+        max_lag=DATABASE_REPLICA_MAX_LAG,
+        check_interval=DATABASE_REPLICA_CHECK_INTERVAL,
+        pin_seconds=DATABASE_REPLICA_PIN_SECONDS,
+        pin_maxsize=DATABASE_REPLICA_PIN_MAXSIZE,
+    )
+    await router.check_lag()
+    router.start()
+    metrics.register_collector("db_replica", router.stats)
+    metrics.register_collector("db_replica_pool", lambda: get_pool_stats(replica))
+    app.state._db_router = router
+
 
 async def close_db_connection(app: FastAPI) -> None:
+    router = getattr(app.state, "_db_router", None)
+    if router:
+        try:
+            await router.stop()
+            await router.replica.disconnect()
+        except Exception as e:
+            logger.warn("--- DB REPLICA DISCONNECT ERROR ---")
+            logger.warn(e)
+            logger.warn("--- DB REPLICA DISCONNECT ERROR ---")
+
     try:
         await app.state._db.disconnect()
     except Exception as e:
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from fastapi import FastAPI
+from pydantic.types import UUID4
+from redis.asyncio import Redis
+
+from app.core.config import INVALIDATION_BUS_RETRY_INTERVAL
+from app.core.metrics import metrics
+from app.db.repositories.invalidation_redis import InvalidationRedisRepository
+from app.schemas.enums import CacheEntity
+from app.schemas.invalidation import InvalidationEvent
+
+logger = logging.getLogger("app")
+
+EventHandler = Callable[[InvalidationEvent], None]
+FlushHandler = Callable[[], None]
+
+
+class InvalidationBus:
+    """
+    Keeps the caches in worker memory of the gunicorn workers in sync: the repositories publish an InvalidationEvent
+    after a write (BaseRepository.publish_invalidation) and every worker evicts the entries of that row.
+    The caches register their handlers with subscribe(). Every message has a sequence of the cluster, a worker that
+    skips a number (lost message) or loses the subscription flushes all its caches, so it is never left with stale
+    entries. Without Redis the events only reach the caches of this worker.
+    """
+
+    def __init__(self) -> None:
+        # tells the messages of this worker, already applied when published
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[CacheEntity, List[EventHandler]] = defaultdict(list)
+        self._flush_handlers: List[FlushHandler] = []
+        self._repository: Optional[InvalidationRedisRepository] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_seq = 0
+        self.subscribed = False
+        self.published = 0
+        self.received = 0
+        self.gaps = 0
+        self.flushes = 0
+        metrics.register_collector("invalidation_bus", self.stats)
+
+    def subscribe(self, entity: CacheEntity, on_event: EventHandler, on_flush: FlushHandler) -> None:
+        """
+        Register a cache: on_event evicts the entries of one row, on_flush clears the cache.
+        The handlers run in the event loop, they must be quick and not await.
+        """
+        self._handlers[entity].append(on_event)
+        if on_flush not in self._flush_handlers:
+            self._flush_handlers.append(on_flush)
+
+    def start(self, redis: Redis) -> None:
+        if self._task:
+            return
+
+        self._repository = InvalidationRedisRepository(redis)
+        self._task = asyncio.ensure_future(self.__run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._repository = None
+        self.subscribed = False
+
+    async def publish(self, entity: CacheEntity, id: UUID4, tenant_id: Optional[UUID4] = None) -> None:
+        """
+        Evict the row from the caches of this worker and of the others.
+        A failure is only logged: the write is already done and the entries in memory expire by their TTL.
+        """
+        event = InvalidationEvent(entity=entity, id=id, tenant_id=tenant_id)
+        self.dispatch(event)
+
+        if not self._repository:
+            return
+
+        try:
+            await self._repository.publish(data=f"{self.origin}|{event.json()}")
+            self.published += 1
+        except Exception as e:
+            logger.warn(f"Invalidation publish error: {e!r}")
+            metrics.inc("invalidation_publish_errors", entity=entity.value)
+
+    def dispatch(self, event: InvalidationEvent) -> None:
+        for handler in self._handlers.get(event.entity, []):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.warn(f"Invalidation handler error: {e!r}")
+
+    def flush(self, reason: str) -> None:
+        self.flushes += 1
+        metrics.inc("invalidation_flushes", reason=reason)
+        for handler in self._flush_handlers:
+            try:
+                handler()
+            except Exception as e:
+                logger.warn(f"Invalidation flush error: {e!r}")
+
+    def handle_message(self, data: str) -> None:
+        """
+        Apply a message of the channel: "<seq>|<origin>|<event json>".
+        """
+        seq, origin, payload = data.split("|", 2)
+        seq = int(seq)
+        self.received += 1
+
+        if seq > self._last_seq + 1:
+            # the messages between them never arrived, the evictions they carried are unknown
+            self.gaps += 1
+            self.flush("gap")
+        self._last_seq = max(self._last_seq, seq)
+
+        if origin != self.origin:
+            self.dispatch(InvalidationEvent.parse_raw(payload))
+
+    async def __run(self) -> None:
+        while True:
+            pubsub = None
+            try:
+                pubsub = await self._repository.subscribe()
+                # messages published before the subscription were missed, the sequence starts from here
+                self._last_seq = await self._repository.get_sequence()
+                self.subscribed = True
+                self.flush("subscribe")
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message["type"] == "message":
+                        self.handle_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warn(f"Invalidation subscription error: {e!r}")
+                self.subscribed = False
+                # no invalidation arrives until subscribed again, the next subscription flushes the caches
+                self.flush("disconnect")
+            finally:
+                if pubsub is not None:
+                    await asyncio.gather(pubsub.close(), return_exceptions=True)
+
+            await asyncio.sleep(INVALIDATION_BUS_RETRY_INTERVAL)
+
+    def stats(self) -> dict:
+        return {
+            "subscribed": self.subscribed,
+            "last_seq": self._last_seq,
+            "published": self.published,
+            "received": self.received,
+            "gaps": self.gaps,
+            "flushes": self.flushes,
+        }
+
+
+invalidation_bus = InvalidationBus()
+
+
+async def start_invalidation_bus(app: FastAPI) -> None:
+    try:
+        invalidation_bus.start(app.state._redis)
+    except Exception as e:
+        logger.warn("--- INVALIDATION BUS START ERROR ---")
+        logger.warn(e)
+        logger.warn("--- INVALIDATION BUS START ERROR ---")
+
+
+async def stop_invalidation_bus(app: FastAPI) -> None:
+    try:
+        await invalidation_bus.stop()
+    except Exception as e:
+        logger.warn("--- INVALIDATION BUS STOP ERROR ---")
+        logger.warn(e)
+        logger.warn("--- INVALIDATION BUS STOP ERROR ---")
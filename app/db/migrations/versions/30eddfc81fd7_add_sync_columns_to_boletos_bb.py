@@ -0,0 +1,38 @@
+"""add_sync_columns_to_boletos_bb
+
+Revision ID: 30eddfc81fd7
+Revises: 6ce415e878e0
+Create Date: 2026-10-18 14:03:52.417391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "30eddfc81fd7"
+down_revision = "6ce415e878e0"
+branch_labels = None
+depends_on = None
+table = "boletos_bb"
+
+
+def upgrade():
+    # codigoEstadoTituloCobranca of the last consulta (1: normal, 6: liquidado, 7: baixado...)
+    op.add_column(table, sa.Column("codigo_estado_titulo", sa.Integer, nullable=True))
+    op.add_column(table, sa.Column("data_hora_sincronizacao", sa.TIMESTAMP(timezone=True), nullable=True))
+    # the reconciliation only looks at open boletos, by convenio and due date
+    op.create_index(
+        op.f(f"{table}_open_convenio_bancario_id_and_data_vencimento_index"),
+        f"{table}",
+        ["convenio_bancario_id", "data_vencimento"],
+        postgresql_where=sa.text(
+            "registro_status = 'registered' AND data_recebimento IS NULL AND data_hora_baixa IS NULL"
+        ),
+    )
+
+
+def downgrade():
+    op.drop_index(op.f(f"{table}_open_convenio_bancario_id_and_data_vencimento_index"), table_name=table)
+    op.drop_column(table, "data_hora_sincronizacao")
+    op.drop_column(table, "codigo_estado_titulo")
@@ -0,0 +1,91 @@
+"""create_tenant_access_path_indexes
+
+Revision ID: 5b33b4ea2475
+Revises: 7668e959db1c
+Create Date: 2026-10-18 18:02:44.173920
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "5b33b4ea2475"
+down_revision = "7668e959db1c"
+branch_labels = None
+depends_on = None
+
+# (tenant_id, data_vencimento/data_emissao/created_at, id) of boletos_bb come from 7668e959db1c
+ACCESS_PATH_INDEXES = {
+    # full boleto (GET_FULL_BOLETO_BB_QUERY): LEFT JOIN qr_codes_bb ON boleto_bb_id
+    "qr_codes_bb": [["boleto_bb_id"]],
+    # GET /boletos-bb?seu_numero, GET /boletos-bb/seu-numero/{seu_numero} and ?nosso_numero
+    # boletos_bb by pagador, after the filters on pagadores_bb (cpf_cnpj, nome)
+    "boletos_bb": [["tenant_id", "numero_titulo_beneficiario"], ["tenant_id", "numero"], ["pagador_bb_id"]],
+}
+
+
+# boletos_bb and pagadores_bb are written all the time: the indexes are built and dropped CONCURRENTLY, outside
+# of the migration transaction, so writes are not blocked while they are built. A build that fails leaves an
+# INVALID index, to be dropped before running the migration again.
+def upgrade():
+    with op.get_context().autocommit_block():
+        for table, indexes in ACCESS_PATH_INDEXES.items():
+            for fields in indexes:
+                op.create_index(
+                    op.f(f"{table}_{'_and_'.join(fields)}_index"), table, fields, postgresql_concurrently=True
+                )
+
+        # the dedupe lookup of the pagadores filters on tenant_id first, the unique key now starts with it.
+        # The new key is built before the old one is dropped, the pagadores are never without one
+        op.create_index(
+            op.f("pagadores_bb_tenant_id_cpf_cnpj_cep_endereco_telefone_ukey"),
+            "pagadores_bb",
+            ["tenant_id", "cpf_cnpj", "cep", "endereco", "telefone"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            op.f("pagadores_bb_cpf_cnpj_cep_endereco_telefone_ukey"),
+            table_name="pagadores_bb",
+            postgresql_concurrently=True,
+        )
+
+        # GET /boletos-bb?nome (ILIKE '%nome%')
+        op.execute(
+            """
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            """
+        )
+        op.create_index(
+            op.f("pagadores_bb_nome_trgm_index"),
+            "pagadores_bb",
+            ["nome"],
+            postgresql_using="gin",
+            postgresql_ops={"nome": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        # pg_trgm stays: it may have been installed before this revision or be used by other objects
+        op.drop_index(op.f("pagadores_bb_nome_trgm_index"), table_name="pagadores_bb", postgresql_concurrently=True)
+
+        op.create_index(
+            op.f("pagadores_bb_cpf_cnpj_cep_endereco_telefone_ukey"),
+            "pagadores_bb",
+            ["cpf_cnpj", "cep", "endereco", "telefone"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            op.f("pagadores_bb_tenant_id_cpf_cnpj_cep_endereco_telefone_ukey"),
+            table_name="pagadores_bb",
+            postgresql_concurrently=True,
+        )
+
+        for table, indexes in ACCESS_PATH_INDEXES.items():
+            for fields in indexes:
+                op.drop_index(
+                    op.f(f"{table}_{'_and_'.join(fields)}_index"), table_name=table, postgresql_concurrently=True
+                )
@@ -0,0 +1,80 @@
+"""create_boletos_bb_outbox_table
+
+Revision ID: 6ce415e878e0
+Revises: 9f9c53000651
+Create Date: 2026-10-18 09:12:31.184203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.migrations.base import timestamps
+
+
+# revision identifiers, used by Alembic.
+revision = "6ce415e878e0"
+down_revision = "9f9c53000651"
+branch_labels = None
+depends_on = None
+table = "boletos_bb_outbox"
+
+
+def add_registro_status_to_boletos_bb() -> None:
+    # boletos created before this revision were registered synchronously
+    op.add_column(
+        "boletos_bb",
+        sa.Column("registro_status", sa.String(20), nullable=False, server_default="registered"),
+    )
+
+
+def create_boletos_bb_outbox_table() -> None:
+    op.create_table(
+        table,
+        sa.Column(
+            "id",
+            UUID(as_uuid=True),
+            primary_key=True,
+            server_default=sa.text("uuid_generate_v4()"),
+            nullable=False,
+        ),
+        sa.Column("tenant_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("boleto_bb_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("operation", sa.String(20), nullable=False, server_default="registrar"),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("locked_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("last_error", sa.Text, nullable=True),
+        sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"], ondelete="RESTRICT", onupdate="RESTRICT"),
+        sa.ForeignKeyConstraint(["boleto_bb_id"], ["boletos_bb.id"], ondelete="CASCADE", onupdate="CASCADE"),
+        *timestamps(),
+    )
+    # workers only look at entries waiting to be processed
+    op.create_index(
+        op.f(f"{table}_status_and_next_attempt_at_index"),
+        f"{table}",
+        ["status", "next_attempt_at"],
+        postgresql_where=sa.text("status IN ('pending', 'processing')"),
+    )
+    op.create_index(op.f(f"{table}_boleto_bb_id_index"), f"{table}", ["boleto_bb_id"])
+    op.execute(
+        f"""
+        CREATE TRIGGER update_{table}_modtime
+            BEFORE UPDATE
+            ON {table}
+            FOR EACH ROW
+        EXECUTE PROCEDURE update_updated_at_column();
+        """
+    )
+
+
+def upgrade():
+    add_registro_status_to_boletos_bb()
+    create_boletos_bb_outbox_table()
+
+
+def downgrade():
+    op.drop_table(table)
+    op.drop_column("boletos_bb", "registro_status")
@@ -0,0 +1,35 @@
+"""create_keyset_pagination_indexes
+
+Revision ID: 7668e959db1c
+Revises: 30eddfc81fd7
+Create Date: 2026-10-18 16:41:07.529318
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "7668e959db1c"
+down_revision = "30eddfc81fd7"
+branch_labels = None
+depends_on = None
+
+# one index per sort allowed in cursor pagination (*_CURSOR_FIELDS of the repositories)
+KEYSET_INDEXES = {
+    "boletos_bb": ["created_at", "data_vencimento", "data_emissao"],
+    "users": ["created_at"],
+    "contas_bancarias": ["created_at"],
+    "convenios_bancarios": ["created_at"],
+}
+
+
+def upgrade():
+    for table, fields in KEYSET_INDEXES.items():
+        for field in fields:
+            op.create_index(op.f(f"{table}_tenant_id_and_{field}_and_id_index"), table, ["tenant_id", field, "id"])
+
+
+def downgrade():
+    for table, fields in KEYSET_INDEXES.items():
+        for field in fields:
+            op.drop_index(op.f(f"{table}_tenant_id_and_{field}_and_id_index"), table_name=table)
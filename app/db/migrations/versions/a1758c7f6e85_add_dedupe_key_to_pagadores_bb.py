@@ -0,0 +1,108 @@
+"""add_dedupe_key_to_pagadores_bb
+
+Revision ID: a1758c7f6e85
+Revises: 5b33b4ea2475
+Create Date: 2026-10-18 19:12:30.648217
+
+"""
+import hashlib
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a1758c7f6e85"
+down_revision = "5b33b4ea2475"
+branch_labels = None
+depends_on = None
+table = "pagadores_bb"
+
+# the pagadores with the same (tenant_id, dedupe_key) are merged into the oldest one
+DUPLICATED_PAGADORES_CTE = f"""
+    WITH ranked AS (
+        SELECT
+            id,
+            first_value(id) OVER (PARTITION BY tenant_id, dedupe_key ORDER BY created_at, id) AS kept_id
+        FROM {table}
+    )
+"""
+
+
+def get_pagador_dedupe_key(*, cpf_cnpj, cep, endereco, telefone) -> str:
+    # copy of app.util.utils_bb.get_pagador_dedupe_key at this revision, a later change of the app must not change
+    # the keys written by this migration
+    normalized = [
+        re.sub(r"\D", "", cpf_cnpj or ""),
+        re.sub(r"\D", "", cep or ""),
+        " ".join((endereco or "").split()).upper(),
+        re.sub(r"\D", "", telefone or ""),
+    ]
+
+    return hashlib.sha256("|".join(normalized).encode()).hexdigest()
+
+
+def backfill_dedupe_key() -> None:
+    # same normalization as the API at this revision, so the keys of the existing rows match the new ones
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(f"SELECT id, cpf_cnpj, cep, endereco, telefone FROM {table}")).fetchall()
+    if not rows:
+        return
+
+    op.execute(f"ALTER TABLE {table} DISABLE TRIGGER update_{table}_modtime")
+    conn.execute(
+        sa.text(f"UPDATE {table} SET dedupe_key = :dedupe_key WHERE id = :id"),
+        [
+            {
+                "id": row.id,
+                "dedupe_key": get_pagador_dedupe_key(
+                    cpf_cnpj=row.cpf_cnpj, cep=row.cep, endereco=row.endereco, telefone=row.telefone
+                ),
+            }
+            for row in rows
+        ],
+    )
+    op.execute(f"ALTER TABLE {table} ENABLE TRIGGER update_{table}_modtime")
+
+    op.execute(
+        f"""
+        {DUPLICATED_PAGADORES_CTE}
+        UPDATE boletos_bb
+        SET pagador_bb_id = ranked.kept_id
+        FROM ranked
+        WHERE boletos_bb.pagador_bb_id = ranked.id AND ranked.id <> ranked.kept_id;
+        """
+    )
+    op.execute(
+        f"""
+        {DUPLICATED_PAGADORES_CTE}
+        DELETE FROM {table}
+        USING ranked
+        WHERE {table}.id = ranked.id AND ranked.id <> ranked.kept_id;
+        """
+    )
+
+
+def upgrade():
+    op.add_column(table, sa.Column("dedupe_key", sa.String(64), nullable=True))
+    backfill_dedupe_key()
+    op.alter_column(table, "dedupe_key", nullable=False)
+
+    # the upsert of the pagadores conflicts on this key, it replaces the unique key on the raw fields
+    op.create_index(op.f(f"{table}_tenant_id_and_dedupe_key_ukey"), table, ["tenant_id", "dedupe_key"], unique=True)
+    op.drop_index(op.f(f"{table}_tenant_id_cpf_cnpj_cep_endereco_telefone_ukey"), table_name=table)
+    # GET /boletos-bb?cpf_cnpj
+    op.create_index(op.f(f"{table}_tenant_id_and_cpf_cnpj_index"), table, ["tenant_id", "cpf_cnpj"])
+
+
+def downgrade():
+    op.drop_index(op.f(f"{table}_tenant_id_and_cpf_cnpj_index"), table_name=table)
+    op.create_index(
+        op.f(f"{table}_tenant_id_cpf_cnpj_cep_endereco_telefone_ukey"),
+        table,
+        ["tenant_id", "cpf_cnpj", "cep", "endereco", "telefone"],
+        unique=True,
+    )
+    op.drop_index(op.f(f"{table}_tenant_id_and_dedupe_key_ukey"), table_name=table)
+    op.drop_column(table, "dedupe_key")
@@ -0,0 +1,44 @@
+"""include_unconfirmed_baixas_in_open_boletos_bb_index
+
+Revision ID: c3e81f0b72d4
+Revises: a1758c7f6e85
+Create Date: 2026-10-18 21:40:17.205836
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c3e81f0b72d4"
+down_revision = "a1758c7f6e85"
+branch_labels = None
+depends_on = None
+table = "boletos_bb"
+index = f"{table}_open_convenio_bancario_id_and_data_vencimento_index"
+
+
+def upgrade():
+    # a baixa BB did not confirm (data_hora_sincronizacao NULL) stays open until the next consulta
+    op.drop_index(op.f(index), table_name=table)
+    op.create_index(
+        op.f(index),
+        f"{table}",
+        ["convenio_bancario_id", "data_vencimento"],
+        postgresql_where=sa.text(
+            "registro_status = 'registered' AND data_recebimento IS NULL "
+            "AND (data_hora_baixa IS NULL OR data_hora_sincronizacao IS NULL)"
+        ),
+    )
+
+
+def downgrade():
+    op.drop_index(op.f(index), table_name=table)
+    op.create_index(
+        op.f(index),
+        f"{table}",
+        ["convenio_bancario_id", "data_vencimento"],
+        postgresql_where=sa.text(
+            "registro_status = 'registered' AND data_recebimento IS NULL AND data_hora_baixa IS NULL"
+        ),
+    )
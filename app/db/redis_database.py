@@ -1,20 +1,94 @@
+import asyncio
 import logging
-import redis.asyncio as asyncio
+import time
+import redis.asyncio as aioredis
+from redis.asyncio.connection import BlockingConnectionPool, Connection
 from fastapi import FastAPI
-from app.core.config import REDIS_HOST, REDIS_DB, REDIS_PORT
+from app.core.config import (
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_HOST,
+    REDIS_DB,
+    REDIS_POOL_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT,
+    REDIS_POOL_WARM_SIZE,
+    REDIS_PORT,
+    REDIS_SOCKET_CONNECT_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT,
+)
+from app.core.metrics import metrics
 
 logger = logging.getLogger("__name__")
 
 
-async def connect_to_redis_db(app: FastAPI) -> None:
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    Pool of the API: a command waits up to REDIS_POOL_TIMEOUT for a free connection instead of failing at
+    max_connections, and the acquire latency, waiters and connections in use are reported.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._in_use = set()
+        self.waiting = 0
+
+    async def get_connection(self, command_name, *keys, **options) -> Connection:
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except Exception:
+            metrics.inc("redis_pool_acquire_errors")
+            raise
+        finally:
+            self.waiting -= 1
 
+        metrics.observe("redis_pool_acquire_seconds", time.perf_counter() - started)
+        self._in_use.add(connection)
+        return connection
+
+    async def release(self, connection: Connection) -> None:
+        self._in_use.discard(connection)
+        await super().release(connection)
+
+    async def warm(self, size: int) -> None:
+        """
+        Open up to size connections at startup, so the first requests after a deploy don't pay the connection setup.
+        """
+        connections = await asyncio.gather(
+            *[self.get_connection("PING") for _ in range(min(size, self.max_connections))], return_exceptions=True
+        )
+        for connection in connections:
+            if isinstance(connection, BaseException):
+                logger.warn(f"Redis pool warm up error: {connection!r}")
+                continue
+
+            await self.release(connection)
+
+    def stats(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "size": len(self._connections),
+            "idle": len(self._connections) - len(self._in_use),
+            "in_use": len(self._in_use),
+            "waiting": self.waiting,
+        }
+
+
+async def connect_to_redis_db(app: FastAPI) -> None:
     try:
-        redis = await asyncio.from_url(
+        pool = InstrumentedConnectionPool.from_url(
             f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}",
             encoding="utf-8",
             decode_responses=True,
-            max_connections=10,
+            max_connections=REDIS_POOL_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
         )
+        redis = aioredis.Redis(connection_pool=pool)
+        await pool.warm(REDIS_POOL_WARM_SIZE)
+        metrics.register_collector("redis_pool", pool.stats)
         # await redis.flushdb()  # remove DB
         app.state._redis = redis
 
@@ -28,6 +102,7 @@ async def close_redis_db_connection(app: FastAPI) -> None:
     try:
         # await app.state._redis.flushdb()  # remove DB
         await app.state._redis.close()
+        await app.state._redis.connection_pool.disconnect()
     except Exception as e:
         logger.warn("--- REDIS DB DISCONNECT ERROR ---")
         logger.warn(e)
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncContextManager, List, Optional, Union
+
+from databases import Database
+from sqlalchemy.sql import ClauseElement
+
+from app.core.metrics import metrics
+from app.db.unit_of_work import UnitOfWork
+from app.util.cache import TTLCache
+
+logger = logging.getLogger("app")
+
+Query = Union[ClauseElement, str]
+
+# seconds the replica is behind the primary, 0 when it replayed all the WAL received (idle primary) or when it is
+# not a standby (two independent instances, local tests)
+REPLICA_LAG_QUERY = """
+    SELECT
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END AS lag;
+"""
+
+
+def is_read_only(query: Query) -> bool:
+    """
+    Conservative check of the statements sent to the primary: only a plain SELECT (or its estimate) does not pin
+    the session, data-modifying CTEs (WITH ... INSERT) and row locks do.
+    """
+    if not isinstance(query, str):
+        return False
+
+    statement = query.lstrip().upper()
+    return (
+        statement.startswith(("SELECT", "EXPLAIN (FORMAT JSON) SELECT"))
+        and " FOR UPDATE" not in statement
+        and " FOR SHARE" not in statement
+    )
+
+
+class ReplicaRouter:
+    """
+    Chooses the database of the reads of the repositories: the replica while its lag is under max_lag and the client
+    did not write in the last pin_seconds, else the primary.
+    The lag is measured every check_interval by a background task, a failed or stale measure routes to the primary.
+    Pins are kept per worker, keyed by the session key of the client (hash of its credentials).
+    """
+
+    def __init__(
+        self,
+        *,
+        primary: Database,
+        replica: Database,
+        max_lag: float,
+        check_interval: float,
+        pin_seconds: float,
+        pin_maxsize: int,
+    ) -> None:
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # a pin outlives the largest lag accepted, so the replica has the write when the pin expires
+        self.pin_seconds = max(pin_seconds, max_lag + check_interval)
+        self.lag: Optional[float] = None
+        self._checked_at = 0.0
+        self._pins: TTLCache[bool] = TTLCache(maxsize=pin_maxsize, default_ttl=self.pin_seconds)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def healthy(self) -> bool:
+        if self.lag is None:
+            return False
+
+        # the monitor stopped measuring (replica unreachable, loop blocked), the last lag is not trusted
+        if time.monotonic() - self._checked_at > 3 * self.check_interval:
+            return False
+
+        return self.lag <= self.max_lag
+
+    def start(self) -> None:
+        if self._task:
+            return
+
+        self._task = asyncio.ensure_future(self.__run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def __run(self) -> None:
+        while True:
+            await self.check_lag()
+            await asyncio.sleep(self.check_interval)
+
+    async def check_lag(self) -> Optional[float]:
+        try:
+            lag = await self.replica.fetch_val(query=REPLICA_LAG_QUERY)
+            self.lag = float(lag)
+            self._checked_at = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.lag = None
+            logger.warn(f"Replica lag check error: {e!r}")
+
+        metrics.set_gauge("db_replica_lag", -1 if self.lag is None else self.lag)
+        return self.lag
+
+    def pin(self, key: Optional[str]) -> None:
+        if key:
+            self._pins.set(key, True)
+
+    def is_pinned(self, key: Optional[str]) -> bool:
+        return bool(key) and self._pins.get(key) is not None
+
+    def get_replica(self, *, key: Optional[str], written: bool) -> Optional[Database]:
+        """
+        The replica when the reads of the session can go to it, None for the primary.
+        """
+        if written:
+            reason = "request_write"
+        elif self.is_pinned(key):
+            reason = "session_write"
+        elif not self.healthy:
+            reason = "replica_unavailable" if self.lag is None else "replica_lag"
+        else:
+            metrics.inc("db_reads", target="replica")
+            return self.replica
+
+        metrics.inc("db_reads", target="primary", reason=reason)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "lag": self.lag,
+            "healthy": self.healthy,
+            "max_lag": self.max_lag,
+            "pin_seconds": self.pin_seconds,
+            "pins": len(self._pins),
+        }
+
+
+class DatabaseSession:
+    """
+    Databases of one request, shared by all its repositories (get_repository).
+    Writes go to the primary, through the connection of the unit of work of the request, and pin the session (and,
+    through the router, the client) to it, so the reads after a write see it; reads of the methods using
+    BaseRepository.db_read go to the replica otherwise.
+    """
+
+    def __init__(self, *, primary: Database, router: Optional[ReplicaRouter] = None, key: Optional[str] = None):
+        self.uow = UnitOfWork(primary)
+        self.primary = PrimaryDatabase(primary, session=self)
+        self.written = False
+        self._router = router
+        self._key = key
+
+    def pin(self) -> None:
+        if self.written:
+            return
+
+        self.written = True
+        if self._router:
+            self._router.pin(self._key)
+
+    def get_read_database(self) -> Database:
+        if not self._router:
+            return self.primary
+
+        return self._router.get_replica(key=self._key, written=self.written) or self.primary
+
+    async def close(self) -> None:
+        await self.uow.close()
+
+
+class PrimaryDatabase:
+    """
+    Primary Database of a DatabaseSession, its statements run on the connection of the unit of work.
+    A statement other than a plain SELECT (or a transaction) pins the session.
+    """
+
+    def __init__(self, database: Database, *, session: DatabaseSession) -> None:
+        self._database = database
+        self.session = session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._database, name)
+
+    async def fetch_all(self, query: Query, values: Optional[dict] = None) -> List[Any]:
+        self.__check(query)
+        connection = await self.session.uow.get_connection()
+        return await connection.fetch_all(query=query, values=values)
+
+    async def fetch_one(self, query: Query, values: Optional[dict] = None) -> Optional[Any]:
+        self.__check(query)
+        connection = await self.session.uow.get_connection()
+        return await connection.fetch_one(query=query, values=values)
+
+    async def fetch_val(self, query: Query, values: Optional[dict] = None, column: Any = 0) -> Any:
+        self.__check(query)
+        connection = await self.session.uow.get_connection()
+        return await connection.fetch_val(query=query, values=values, column=column)
+
+    async def execute(self, query: Query, values: Optional[dict] = None) -> Any:
+        self.session.pin()
+        connection = await self.session.uow.get_connection()
+        return await connection.execute(query=query, values=values)
+
+    async def execute_many(self, query: Query, values: list) -> None:
+        self.session.pin()
+        connection = await self.session.uow.get_connection()
+        return await connection.execute_many(query=query, values=values)
+
+    def transaction(self, **kwargs: Any) -> AsyncContextManager:
+        self.session.pin()
+        return self.session.uow.transaction(**kwargs)
+
+    def __check(self, query: Query) -> None:
+        if not is_read_only(query):
+            self.session.pin()
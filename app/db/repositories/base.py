@@ -1,23 +1,76 @@
+import hashlib
 import logging
 import json
 from databases import Database
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from fastapi import HTTPException, status
 from pydantic import UUID4, BaseModel
-from app.core.config import DEV_MODE
+from app.core.config import (
+    DEV_MODE,
+    PAGINATION_COUNT_CACHE_MAXSIZE,
+    PAGINATION_COUNT_CACHE_TTL,
+    PAGINATION_ESTIMATE_THRESHOLD,
+)
+from app.db.invalidation import invalidation_bus
+from app.db.statements import statements
+from app.schemas.enums import CacheEntity, CountStrategy, PaginationMode
 from app.schemas.page import Page, PageModel
 from app.schemas.sort import SortModel
 from app.schemas.filter import FilterModel
-from pypika import PostgreSQLQuery as Query, Table, Field, Parameter, Order, functions as fn
+from app.util.cache import TTLCache
+from app.util.cursor import decode_cursor, encode_cursor
+from pypika import (
+    PostgreSQLQuery as Query,
+    Table,
+    Field,
+    Parameter,
+    Order,
+    Tuple as Row,
+    analytics as an,
+    functions as fn,
+)
+from pypika.terms import Criterion, Star, Term
 
 logger = logging.getLogger("app")
 
+# totals of CountStrategy.cached, per worker
+COUNT_CACHE: TTLCache[int] = TTLCache(maxsize=PAGINATION_COUNT_CACHE_MAXSIZE, default_ttl=PAGINATION_COUNT_CACHE_TTL)
+
 
 class BaseRepository:
     def __init__(self, db: Database) -> None:
         self.db = db
         self.logger = logger
 
+    @property
+    def db_read(self) -> Database:
+        """
+        Database of the list and lookup methods: the replica when the request is routed to it (app/db/replica.py),
+        else self.db. Methods reading rows they are about to update keep self.db.
+        """
+        session = getattr(self.db, "session", None)
+        return session.get_read_database() if session else self.db
+
+    async def release_connection(self) -> None:
+        """
+        Give the connection of the request back to the pool before a slow external call (BB), see UnitOfWork.
+        """
+        session = getattr(self.db, "session", None)
+        if session:
+            await session.uow.release()
+
+    async def publish_invalidation(self, entity: CacheEntity, id: UUID4, tenant_id: Optional[UUID4] = None) -> None:
+        """
+        Evict a changed row from the caches in memory of every worker (app/db/invalidation.py).
+        Inside a transaction it is published when the transaction commits, so no worker reloads the old row.
+        """
+        session = getattr(self.db, "session", None)
+        if session and session.uow.in_transaction:
+            session.uow.after_commit(lambda: invalidation_bus.publish(entity, id, tenant_id))
+            return
+
+        await invalidation_bus.publish(entity, id, tenant_id)
+
     async def get_page_by_params(
         self,
         *,
@@ -30,7 +83,25 @@ class BaseRepository:
         current_page: int = 1,
         per_page: int = 20,
         type_schema: type,
+        pagination: PaginationMode = PaginationMode.offset,
+        cursor: Optional[str] = None,
+        cursor_fields: Optional[Dict[str, Field]] = None,
+        count_strategy: CountStrategy = CountStrategy.exact,
+        statement_key: Optional[str] = None,
     ) -> PageModel:
+        """
+        pagination=offset: LIMIT/OFFSET, pages by current_page, with the total from the count_strategy:
+        - exact: COUNT in its own query;
+        - windowed: COUNT(*) OVER() in the query of the rows (one round trip);
+        - estimate: rows estimated by the planner, exact below PAGINATION_ESTIMATE_THRESHOLD;
+        - cached: exact COUNT kept PAGINATION_COUNT_CACHE_TTL seconds per query, tenant and filters;
+        - none: no total, has_next_page by one extra row.
+        pagination=cursor (or any cursor given): keyset pagination without COUNT, pages by the next_cursor and
+        prev_cursor of the Page; sorts are limited to cursor_fields (name in the rows -> qualified field), which
+        must be backed by an index (tenant_id, field, id).
+        statement_key names the listing, so its SQL is compiled once per filter combination and sorts (the queries
+        given must then be the same on every call).
+        """
         values = {"tenant_id": tenant_id}
 
         if per_page > 500:
@@ -39,98 +110,353 @@ class BaseRepository:
                 detail="per_page must be less than 500.",
             )
 
-        if filters and isinstance(filters, list):
-            """filter_condition: Its a list, ie: [(key,operator,value)] operator list:
-            eq for ==
-            lt for <
-            lte for <=
-            gt for >
-            gte for >=
-            in for in_
-            like for like
-            """
-
-            for clause in filters:
-                param_str = clause.alias_field if clause.alias_field else clause.field
-                if clause.operator != "is":
-                    values[param_str] = clause.value
-
-                if clause.table:
-                    table = Table(clause.table)
-                    field = Field(name=clause.field, table=table)
-                else:
-                    field = Field(clause.field)
+        filters = filters if filters and isinstance(filters, list) else []
+        for clause in filters:
+            if clause.operator != "is":
+                values[clause.alias_field if clause.alias_field else clause.field] = clause.value
+
+        # the SQL only depends on the listing, on which filters are present (not their values) and on the sorts
+        signature = None
+        if statement_key:
+            signature = (
+                statement_key,
+                tuple((c.table, c.field, c.alias_field, c.operator, isinstance(c.value, list)) for c in filters),
+            )
 
-                param = Parameter(f":{param_str}")
-                operator = clause.operator
+        if pagination == PaginationMode.cursor or cursor:
+            return await self.__get_cursor_page(
+                table=table,
+                select_query=select_query,
+                signature=signature,
+                values=values,
+                filters=filters,
+                sorts=sorts,
+                cursor=cursor,
+                cursor_fields=cursor_fields,
+                per_page=per_page,
+                type_schema=type_schema,
+            )
 
-                if operator == "like":
-                    count_query = count_query.where(field.like(param))
-                    select_query = select_query.where(field.like(param))
+        def get_select_query() -> Query:
+            query = self.__get_filtered_query(query=select_query, filters=filters)
+            if sorts:
+                for row in self.__get_sorts_array(sorts):
+                    query = query.orderby(Field(row.field), order=Order(row.order))
+            return query
+
+        if count_strategy == CountStrategy.windowed:
+            select_sql = self.__get_sql(
+                key=(signature, "windowed", sorts),
+                build=lambda: get_select_query().select(an.Count(Star()).over().as_("total_count")),
+            )
+            return await self.__get_windowed_page(
+                select_sql=select_sql,
+                values=values,
+                current_page=current_page,
+                per_page=per_page,
+                type_schema=type_schema,
+            )
 
-                if operator == "ilike":
-                    count_query = count_query.where(field.ilike(param))
-                    select_query = select_query.where(field.ilike(param))
+        total = None
+        if count_strategy != CountStrategy.none:
+            count_sql = self.__get_sql(
+                key=(signature, "count"),
+                build=lambda: self.__get_filtered_query(query=count_query, filters=filters).select(
+                    fn.Count(table.id).as_("total")
+                ),
+            )
+            estimate_sql = None
+            if count_strategy == CountStrategy.estimate:
+                estimate_sql = self.__get_sql(
+                    key=(signature, "estimate"),
+                    build=lambda: "EXPLAIN (FORMAT JSON) "
+                    + self.__get_filtered_query(query=count_query, filters=filters).select(table.id).get_sql(),
+                )
+            total, count_strategy = await self.__get_total(
+                count_sql=count_sql, estimate_sql=estimate_sql, values=values, count_strategy=count_strategy
+            )
+            if total == 0:
+                return PageModel(page=Page(count_strategy=count_strategy))
 
-                elif operator == "eq":
-                    count_query = count_query.where(field.eq(param))
-                    select_query = select_query.where(field.eq(param))
+        off_set = (current_page - 1) * per_page
+        if total is not None and off_set > total and count_strategy != CountStrategy.estimate:
+            off_set = 0
+            current_page = 1
 
-                elif operator == "gt":
-                    count_query = count_query.where(field.gt(param))
-                    select_query = select_query.where(field.gt(param))
+        # without an exact total, one extra row tells if there is a next page
+        is_exact = count_strategy in [CountStrategy.exact, CountStrategy.cached]
+        select_sql = self.__get_sql(key=(signature, "select", sorts), build=get_select_query)
+        select_sql = self.__get_limited_sql(select_sql, limit=per_page if is_exact else per_page + 1, offset=off_set)
 
-                elif operator == "gte":
-                    count_query = count_query.where(field.gte(param))
-                    select_query = select_query.where(field.gte(param))
+        # self.logger.warn(select_sql)
+        rows = await self.db_read.fetch_all(query=select_sql, values=values)
+        has_next_page = len(rows) > per_page
+        rows = [type_schema(**u) for u in rows[:per_page]]
 
-                elif operator == "lt":
-                    count_query = count_query.where(field.lt(param))
-                    select_query = select_query.where(field.lt(param))
+        if total is None:
+            page = Page.init_without_total(
+                current_page=current_page, per_page=per_page, size=len(rows), has_next_page=has_next_page
+            )
+        else:
+            page = Page.init(total=total, per_page=per_page, current_page=current_page, count_strategy=count_strategy)
+            if not is_exact:
+                page.has_next_page = has_next_page
+
+        return PageModel(rows=rows, page=page)
 
-                elif operator == "lte":
-                    count_query = count_query.where(field.lte(param))
-                    select_query = select_query.where(field.lte(param))
+    def __get_filtered_query(self, *, query: Query, filters: List[FilterModel]) -> Query:
+        """filter_condition: Its a list, ie: [(key,operator,value)] operator list:
+        eq for ==
+        lt for <
+        lte for <=
+        gt for >
+        gte for >=
+        in for in_
+        like for like
+        """
+        for clause in filters:
+            param_str = clause.alias_field if clause.alias_field else clause.field
 
-                elif operator == "in":  # not tested
-                    if isinstance(clause.value, list):
-                        count_query = count_query.where(field.in_(param))
-                        select_query = select_query.where(field.in_(param))
-                    else:
-                        count_query = count_query.where(field.in_(param.split(",")))
-                        select_query = select_query.where(field.in_(param).split(","))
+            if clause.table:
+                field = Field(name=clause.field, table=Table(clause.table))
+            else:
+                field = Field(clause.field)
 
-        count_query = count_query.select(fn.Count(table.id).as_("total"))
+            param = Parameter(f":{param_str}")
+            operator = clause.operator
 
-        # self.logger.warn(count_query)
-        count_reg = await self.db.fetch_one(query=count_query.get_sql(), values=values)
+            if operator == "like":
+                query = query.where(field.like(param))
+
+            if operator == "ilike":
+                query = query.where(field.ilike(param))
+
+            elif operator == "eq":
+                query = query.where(field.eq(param))
+
+            elif operator == "gt":
+                query = query.where(field.gt(param))
+
+            elif operator == "gte":
+                query = query.where(field.gte(param))
+
+            elif operator == "lt":
+                query = query.where(field.lt(param))
+
+            elif operator == "lte":
+                query = query.where(field.lte(param))
+
+            elif operator == "in":  # not tested
+                if isinstance(clause.value, list):
+                    query = query.where(field.in_(param))
+                else:
+                    query = query.where(field.in_(param.split(",")))
+
+        return query
+
+    def __get_sql(self, *, key: Tuple, build: Callable[[], Union[Query, str]]) -> str:
+        # listings without a statement_key are compiled on every call
+        if key[0] is None:
+            query = build()
+            return query if isinstance(query, str) else query.get_sql()
+
+        return statements.get(key, build)
+
+    def __get_limited_sql(self, sql: str, *, limit: int, offset: int = 0) -> str:
+        # LIMIT and OFFSET are the only parts that change by page, so they stay out of the compiled statement
+        return f"{sql} LIMIT {int(limit)} OFFSET {int(offset)}"
+
+    async def __get_total(
+        self, *, count_sql: str, estimate_sql: Optional[str], values: Dict, count_strategy: CountStrategy
+    ) -> Tuple[int, CountStrategy]:
+        if count_strategy == CountStrategy.estimate:
+            # the planner estimate is only good for large results, below the threshold the exact count is cheap
+            plan = await self.db_read.fetch_one(query=estimate_sql, values=values)
+            plan = plan["QUERY PLAN"]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            estimate = int(plan[0]["Plan"]["Plan Rows"])
+            if estimate >= PAGINATION_ESTIMATE_THRESHOLD:
+                return estimate, count_strategy
+            count_strategy = CountStrategy.exact
+
+        cache_key = None
+        if count_strategy == CountStrategy.cached:
+            # the tenant and the filters are in the values, the listing in the query
+            cache_key = hashlib.sha1(
+                f"{count_sql}:{json.dumps(values, sort_keys=True, default=str)}".encode()
+            ).hexdigest()
+            total = COUNT_CACHE.get(cache_key)
+            if total is not None:
+                return total, count_strategy
+
+        # self.logger.warn(count_sql)
+        count_reg = await self.db_read.fetch_one(query=count_sql, values=values)
         total = dict(count_reg)["total"]
 
-        if total == 0:
-            return PageModel()
+        if cache_key:
+            COUNT_CACHE.set(cache_key, total)
 
-        off_set = (current_page - 1) * per_page
-        if off_set > total:
-            off_set = 0
+        return total, count_strategy
+
+    async def __get_windowed_page(
+        self, *, select_sql: str, values: Dict, current_page: int, per_page: int, type_schema: type
+    ) -> PageModel:
+        # the total comes in every row, so an empty page past the end is retried as the first one
+        rows = await self.db_read.fetch_all(
+            query=self.__get_limited_sql(select_sql, limit=per_page, offset=(current_page - 1) * per_page),
+            values=values,
+        )
+        if not rows and current_page > 1:
             current_page = 1
+            rows = await self.db_read.fetch_all(query=self.__get_limited_sql(select_sql, limit=per_page), values=values)
+
+        if not rows:
+            return PageModel(page=Page(count_strategy=CountStrategy.windowed))
 
-        if sorts:
-            sorts_array = [SortModel(**dict(zip(["field", "order"], r.split(":")))) for r in sorts.split(",")]
-            for row in sorts_array:
-                select_query = select_query.orderby(Field(row.field), order=Order(row.order))
+        total = rows[0]["total_count"]
+        page = Page.init(
+            total=total, per_page=per_page, current_page=current_page, count_strategy=CountStrategy.windowed
+        )
+        return PageModel(rows=[type_schema(**u) for u in rows], page=page)
 
-        select_query = select_query.limit(per_page).offset(off_set)
+    async def __get_cursor_page(
+        self,
+        *,
+        table: Table,
+        select_query: Query,
+        signature: Optional[Tuple],
+        values: Dict,
+        filters: List[FilterModel],
+        sorts: Optional[str],
+        cursor: Optional[str],
+        cursor_fields: Optional[Dict[str, Field]],
+        per_page: int,
+        type_schema: type,
+    ) -> PageModel:
+        if not cursor_fields:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="cursor pagination is not available for this listing.",
+            )
 
-        # self.logger.warn(select_query)
-        rows = await self.db.fetch_all(query=select_query.get_sql(), values=values)
-        rows = [type_schema(**u) for u in rows]
+        direction = "next"
+        cursor_values = None
+        if cursor:
+            decoded = decode_cursor(cursor)
+            sorts_array = [SortModel(field=field, order=order) for field, order in decoded["sorts"]]
+            if sorts and [[row.field, row.order] for row in self.__get_sorts_array(sorts)] != decoded["sorts"]:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="sorts can not change while paginating with a cursor.",
+                )
+            cursor_values = decoded["values"]
+            direction = decoded["direction"]
+        elif sorts:
+            sorts_array = self.__get_sorts_array(sorts)
+        else:
+            sorts_array = [SortModel(field=next(iter(cursor_fields)), order="DESC")]
+
+        for row in sorts_array:
+            if row.field not in cursor_fields:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"sorts by {row.field} is not allowed with cursor pagination, use: {', '.join(cursor_fields)}.",
+                )
+
+        # id breaks the ties in the order of the last sort, so one index (tenant_id, field, id) serves both directions
+        keys = [(cursor_fields[row.field], row.order) for row in sorts_array] + [(table.id, sorts_array[-1].order)]
+        backward = direction == "prev"
+
+        if cursor_values is not None:
+            if len(cursor_values) != len(keys):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="cursor is not valid.",
+                )
+            for i, value in enumerate(cursor_values):
+                values[f"cursor_{i}"] = value
+
+        def get_select_query() -> Query:
+            query = self.__get_filtered_query(query=select_query, filters=filters)
+            if cursor_values is not None:
+                query = query.where(self.__get_keyset_criterion(keys=keys, backward=backward))
+
+            for field, order in keys:
+                if backward:
+                    order = "ASC" if order == "DESC" else "DESC"
+                query = query.orderby(field, order=Order(order))
+            return query
+
+        select_sql = self.__get_sql(
+            key=(
+                signature,
+                "cursor",
+                tuple((row.field, row.order) for row in sorts_array),
+                backward,
+                cursor_values is not None,
+            ),
+            build=get_select_query,
+        )
 
-        page = Page.init(total=total, per_page=per_page, current_page=current_page)
-        return PageModel(rows=rows, page=page)
+        # one extra row tells if there is another page in this direction
+        rows = await self.db_read.fetch_all(query=self.__get_limited_sql(select_sql, limit=per_page + 1), values=values)
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backward:
+            rows.reverse()
+
+        cursor_sorts = [[row.field, row.order] for row in sorts_array]
+        next_cursor, prev_cursor = None, None
+        if rows:
+            if has_more or backward:
+                next_cursor = encode_cursor(
+                    sorts=cursor_sorts,
+                    values=[rows[-1][row.field] for row in sorts_array] + [rows[-1]["id"]],
+                    direction="next",
+                )
+            if (has_more and backward) or (cursor_values is not None and not backward):
+                prev_cursor = encode_cursor(
+                    sorts=cursor_sorts,
+                    values=[rows[0][row.field] for row in sorts_array] + [rows[0]["id"]],
+                    direction="prev",
+                )
+
+        page = Page.init_cursor(per_page=per_page, size=len(rows), next_cursor=next_cursor, prev_cursor=prev_cursor)
+        return PageModel(rows=[type_schema(**u) for u in rows], page=page)
+
+    def __get_keyset_criterion(self, *, keys: List[Tuple[Term, str]], backward: bool) -> Criterion:
+        params = [Parameter(f":cursor_{i}") for i in range(len(keys))]
+
+        def after(term: Term, param: Term, order: str) -> Criterion:
+            return term > param if (order == "ASC") != backward else term < param
+
+        if len({order for _, order in keys}) == 1:
+            # row comparison, so Postgres seeks the composite index instead of filtering
+            return after(Row(*[field for field, _ in keys]), Row(*params), keys[0][1])
+
+        # mixed orders: (a > :a) OR (a = :a AND b < :b) OR ...
+        criterion = None
+        for i, (field, order) in enumerate(keys):
+            term = after(field, params[i], order)
+            for previous, param in zip([field for field, _ in keys[:i]], params[:i]):
+                term = term & (previous == param)
+            criterion = term if criterion is None else criterion | term
+
+        return criterion
+
+    def __get_sorts_array(self, sorts: str) -> List[SortModel]:
+        return [SortModel(**dict(zip(["field", "order"], r.split(":")))) for r in sorts.split(",")]
+
+    # the get_*_query helpers build each statement once per (table, statement, schema or shape) through the
+    # registry; the returned pypika queries are shared, their builder methods return copies
 
     def get_insert_query(self, *, table_name: str, obj: BaseModel) -> Query:
-        obj: Dict = obj.dict()
-        fields = obj.keys()
+        return statements.get_query(
+            (table_name, "insert", type(obj)), lambda: self.__build_insert_query(table_name=table_name, obj=obj)
+        )
+
+    def __build_insert_query(self, *, table_name: str, obj: BaseModel) -> Query:
+        fields = type(obj).__fields__.keys()
         parameters = []
 
         for field in fields:
@@ -144,79 +470,99 @@ class BaseRepository:
         return insert_query
 
     def get_base_select_count_query(self, *, table_name: str) -> Query:
-        table = Table(table_name)
-        return Query.from_(table).select(fn.Count(table.id).as_("total"))
+        def build() -> Query:
+            table = Table(table_name)
+            return Query.from_(table).select(fn.Count(table.id).as_("total"))
+
+        return statements.get_query((table_name, "count"), build)
 
     def get_base_select_query(self, *, table_name: str, type_schema: BaseModel) -> Query:
-        json_schema = json.loads(type_schema.schema_json())
-        properties = json_schema["properties"]
+        def build() -> Query:
+            json_schema = json.loads(type_schema.schema_json())
+            properties = json_schema["properties"]
+
+            select_query = Query.from_(Table(table_name))
+            for key in properties.keys():
+                select_query = select_query.select(f"{key}")
 
-        select_query = Query.from_(Table(table_name))
-        for key in properties.keys():
-            select_query = select_query.select(f"{key}")
+            return select_query
 
-        return select_query
+        return statements.get_query((table_name, "select", type_schema), build)
 
     def get_select_query_by_id(self, *, table_name: str) -> Query:
-        select_query = Query.from_(Table(table_name)).select("*").where(Field("id").eq(Parameter(f":{'id'}")))
+        def build() -> Query:
+            select_query = Query.from_(Table(table_name)).select("*").where(Field("id").eq(Parameter(f":{'id'}")))
 
-        if DEV_MODE:
-            self.logger.warn(select_query)
+            if DEV_MODE:
+                self.logger.warn(select_query)
+
+            return select_query
 
-        return select_query
+        return statements.get_query((table_name, "select_by_id"), build)
 
     def get_select_query_by_empresa_id_and_id(self, *, table_name: str) -> Query:
-        select_query = (
-            Query.from_(Table(table_name))
-            .select("*")
-            .where(Field("empresa_id").eq(Parameter(f":{'empresa_id'}")))
-            .where(Field("id").eq(Parameter(f":{'id'}")))
-        )
+        def build() -> Query:
+            select_query = (
+                Query.from_(Table(table_name))
+                .select("*")
+                .where(Field("empresa_id").eq(Parameter(f":{'empresa_id'}")))
+                .where(Field("id").eq(Parameter(f":{'id'}")))
+            )
 
-        if DEV_MODE:
-            self.logger.warn(select_query)
+            if DEV_MODE:
+                self.logger.warn(select_query)
 
-        return select_query
+            return select_query
+
+        return statements.get_query((table_name, "select_by_empresa_id_and_id"), build)
 
     def get_update_query_by_id(self, *, table_name: str, obj: BaseModel) -> Query:
-        table = Table(table_name)
-        obj: Dict = obj.dict()
-        keys = obj.keys()
+        def build() -> Query:
+            table = Table(table_name)
+            keys = type(obj).__fields__.keys()
 
-        update_query = Query.update(table)
-        for key in keys:
-            if key not in ["id", "created_at", "updated_at"]:
-                update_query = update_query.set(Field(key), Parameter(f":{key}"))
+            update_query = Query.update(table)
+            for key in keys:
+                if key not in ["id", "created_at", "updated_at"]:
+                    update_query = update_query.set(Field(key), Parameter(f":{key}"))
 
-        update_query = update_query.where(Field("id").eq(Parameter(f":{'id'}")))
-        update_query = update_query.returning("*")
+            update_query = update_query.where(Field("id").eq(Parameter(f":{'id'}")))
+            update_query = update_query.returning("*")
 
-        if DEV_MODE:
-            self.logger.warn(update_query)
+            if DEV_MODE:
+                self.logger.warn(update_query)
 
-        return update_query
+            return update_query
+
+        return statements.get_query((table_name, "update_by_id", type(obj)), build)
 
     def get_delete_query_by_id(self, *, table_name: str) -> Query:
-        table = Table(table_name)
+        def build() -> Query:
+            table = Table(table_name)
 
-        delete_query = Query.from_(table).delete().where(Field("id").eq(Parameter(f":{'id'}"))).returning("id")
+            delete_query = Query.from_(table).delete().where(Field("id").eq(Parameter(f":{'id'}"))).returning("id")
 
-        if DEV_MODE:
-            self.logger.warn(delete_query)
+            if DEV_MODE:
+                self.logger.warn(delete_query)
 
-        return delete_query
+            return delete_query
+
+        return statements.get_query((table_name, "delete_by_id"), build)
 
     def get_delete_query_by_fields_without_return(
         self, *, table_name: str, fields_by_filter: Optional[List] = None
     ) -> Query:
-        table = Table(table_name)
+        def build() -> Query:
+            table = Table(table_name)
 
-        delete_query = Query.from_(table).delete()
+            delete_query = Query.from_(table).delete()
 
-        for field in fields_by_filter:
-            delete_query = delete_query.where(Field(field).eq(Parameter(f":{field}")))
+            for field in fields_by_filter:
+                delete_query = delete_query.where(Field(field).eq(Parameter(f":{field}")))
 
-        if DEV_MODE:
-            self.logger.warn(delete_query)
+            if DEV_MODE:
+                self.logger.warn(delete_query)
+
+            return delete_query
 
-        return delete_query
+        return statements.get_query((table_name, "delete_by_fields", tuple(fields_by_filter)), build)
@@ -0,0 +1,48 @@
+from redis.asyncio import Redis
+
+from app.core.config import REDIS_PREFIX
+from app.db.repositories.base_redis import BaseRedisRepository
+
+# token bucket refilled by elapsed time, the Redis clock is shared by every worker
+# returns "0" when a token was taken, or the seconds to wait for one
+TAKE_TOKEN_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated_at, 0) * rate)
+
+local wait = 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+else
+    wait = (reserve + 1 - tokens) / rate
+end
+
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class BBRateLimitRedisRepository(BaseRedisRepository):
+    def __init__(self, redis: Redis) -> None:
+        super().__init__(redis)
+        self._take_token = redis.register_script(TAKE_TOKEN_SCRIPT)
+
+    async def take_token(self, *, id: str, rate: float, capacity: float, reserve: float = 0) -> float:
+        """
+        Take one token of the bucket of a gw-dev-app-key.
+        :param rate: tokens added per second
+        :param capacity: max tokens kept in the bucket (burst)
+        :param reserve: tokens that must stay in the bucket after this one, left to higher priority calls
+        :return: float: 0 when the token was taken, otherwise seconds to wait before trying again
+        """
+        wait = await self._take_token(keys=[f"{REDIS_PREFIX}:bb_rate_limit:{id}"], args=[rate, capacity, reserve])
+        return float(wait)
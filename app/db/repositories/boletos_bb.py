@@ -1,59 +1,72 @@
+import asyncio
 import datetime
-import ssl
-from typing import Any, List, Optional
-import aiohttp
+from typing import Any, Dict, List, Optional, Tuple
+from asyncpg.exceptions import NotNullViolationError
 from fastapi import HTTPException, status
 from pydantic import UUID4
 from pypika import Table, Tables, PostgreSQLQuery as Query, Parameter, Field
-from app.core.config import BB_API_URL
-from app.core.exceptions.exceptions_customs import HttpExceptionBB
+from app.core.config import (
+    BB_BATCH_CONCURRENCY,
+    BB_BATCH_INSERT_CHUNK,
+    BB_OUTBOX_BACKOFF_BASE,
+    BB_OUTBOX_SYNC_DELAY,
+)
+from app.core.exceptions.exceptions_customs import CircuitOpenExceptionBB, HttpExceptionBB, RateLimitExceptionBB
 from app.db.repositories.token_bb_redis import TokenBBRedisRepository
 from app.schemas.bancos.beneficiario_bb import (
     BeneficiarioInDB,
     # BeneficiarioWithTenantCreate,
 )
+from app.schemas.bancos.banking_profile import BankingProfile
 from app.schemas.bancos.boleto import BoletoCreate
 from app.schemas.bancos.boleto_bb import (
     BoletoBBAlteracao,
     BoletoBBBaixar,
+    BoletoBBBatchItem,
+    BoletoBBBatchResult,
     BoletoBBForList,
     BoletoBBFull,
     BoletoBBInDB,
     BoletoBBNewVencimento,
+    BoletoBBRegistroStatus,
     BoletoBBRequestDetails,
     BoletoBBResponseDetails,
+    BoletoBBSync,
     BoletoBBWithTenantCreate,
+    RegistroBoletoBB,
 )
 
 from databases.core import Database
 from app.db.repositories.base import BaseRepository
+from app.db.statements import statements
 from app.schemas.bancos.conta_bancaria import ContaBancariaInDB
 from app.schemas.bancos.convenio_bancario import ConvenioBancarioInDB
 from app.schemas.bancos.pagador_bb import Pagador, PagadorInDB, PagadorWithTenantCreate
 from app.schemas.bancos.qr_code_bb import QrCodeInDB, QrCodeWithTenantCreate
+from app.schemas.enums import BBCallPriority, BatchItemStatus, CountStrategy, PaginationMode, RegistroStatus
 from app.schemas.filter import FilterModel
 from app.schemas.tenant import TenantInDB
 
 from app.services import auth_service
 from app.services import boleto_bb_service
 
-from app.util.utils_bb import get_numero_titulo_cliente
+from app.util.utils_bb import get_numero_titulo_cliente, get_pagador_dedupe_key
 
 
-CREATE_QR_CODE_BB_QUERY = """
-    INSERT INTO qr_codes_bb (tenant_id, boleto_bb_id, url, tx_id, emv)
-    VALUES(:tenant_id, :boleto_bb_id, :url, :tx_id, :emv)
-    RETURNING
-        id, tenant_id, boleto_bb_id, url, tx_id, emv, created_at, updated_at;
-"""
-
+# sorts allowed in cursor pagination, each one backed by an index (tenant_id, field, id)
+BOLETOS_BB_CURSOR_FIELDS = {
+    "created_at": Table("boletos_bb").created_at,
+    "data_vencimento": Table("boletos_bb").data_vencimento,
+    "data_emissao": Table("boletos_bb").data_emissao,
+}
 
 GET_BOLETO_BB_BY_ID_QUERY = """
     SELECT id, tenant_id, convenio_bancario_id, pagador_bb_id, numero_titulo_beneficiario, data_emissao, \
         data_vencimento, data_recebimento, data_credito, data_baixa_automatico, valor_original, \
         valor_desconto, valor_pago_sacado, valor_credito_cedente, valor_desconto_utilizado, \
         valor_multa_recebido, valor_juros_recebido, descricao_tipo_titulo, numero, mensagem_beneficiario, \
-        codigo_cliente, linha_digitavel, codigo_barra_numerico, numero_contrato_cobranca, created_at, updated_at
+        codigo_cliente, linha_digitavel, codigo_barra_numerico, numero_contrato_cobranca, registro_status, \
+        created_at, updated_at
     FROM
         boletos_bb
     WHERE
@@ -62,34 +75,136 @@ GET_BOLETO_BB_BY_ID_QUERY = """
 """
 
 
-GET_BOLETO_BB_REQUEST_DETAIL_BY_ID_QUERY = """
-    SELECT b.id, numero, numero_convenio, client_id, client_secret, developer_application_key
+GET_REGISTRO_STATUS_BOLETO_BB_BY_ID_QUERY = """
+    SELECT b.id, b.registro_status, o.attempts, o.next_attempt_at, o.last_error, b.codigo_estado_titulo, \
+        b.data_recebimento, b.data_credito, b.valor_pago_sacado, b.data_hora_sincronizacao
+    FROM
+        boletos_bb b
+        LEFT JOIN boletos_bb_outbox o ON o.boleto_bb_id = b.id AND o.operation = 'registrar'
+    WHERE
+        b.tenant_id = :tenant_id
+        AND b.id = :id
+    ORDER BY o.created_at DESC
+    LIMIT 1;
+"""
+
+
+UPDATE_REGISTRO_STATUS_BOLETO_BB_QUERY = """
+    UPDATE boletos_bb
+    SET registro_status = :registro_status
+    WHERE
+        tenant_id = :tenant_id
+        AND id = :id;
+"""
+
+
+CREATE_BOLETO_BB_OUTBOX_QUERY = """
+    INSERT INTO boletos_bb_outbox (tenant_id, boleto_bb_id, operation, attempts, next_attempt_at)
+    VALUES(:tenant_id, :boleto_bb_id, 'registrar', :attempts, now() + make_interval(secs => :delay))
+    RETURNING
+        id, tenant_id, boleto_bb_id, operation, status, attempts, next_attempt_at, created_at, updated_at;
+"""
+
+
+# an unconfirmed registration: its entry, written with the boleto, is taken sooner
+SCHEDULE_BOLETO_BB_OUTBOX_QUERY = """
+    UPDATE boletos_bb_outbox
+    SET next_attempt_at = now() + make_interval(secs => :delay)
+    WHERE
+        tenant_id = :tenant_id
+        AND boleto_bb_id = :boleto_bb_id
+        AND operation = 'registrar'
+        AND status = 'pending';
+"""
+
+
+MARK_DONE_BOLETO_BB_OUTBOX_BY_BOLETO_QUERY = """
+    UPDATE boletos_bb_outbox
+    SET status = 'done', locked_at = NULL, last_error = NULL
+    WHERE
+        tenant_id = :tenant_id
+        AND boleto_bb_id = :boleto_bb_id
+        AND operation = 'registrar'
+        AND status IN ('pending', 'processing');
+"""
+
+
+# open: registered in BB, not paid nor baixado (codigoEstadoTituloCobranca 6, 7, 10, 11 and 12 are final)
+# and still inside the period BB accepts payments; a baixa BB did not confirm is consulted once more
+OPEN_BOLETOS_BB_CONDITION = """
+    b.registro_status = 'registered'
+    AND b.data_recebimento IS NULL
+    AND (b.data_hora_baixa IS NULL OR b.data_hora_sincronizacao IS NULL)
+    AND COALESCE(b.codigo_estado_titulo, 1) NOT IN (6, 7, 10, 11, 12)
+    AND b.data_baixa_automatico >= CURRENT_DATE - CAST(:grace_days AS integer)
+"""
+
+
+GET_CONVENIOS_WITH_OPEN_BOLETOS_BB_QUERY = f"""
+    SELECT DISTINCT b.convenio_bancario_id
+    FROM
+        boletos_bb b
+    WHERE
+        {OPEN_BOLETOS_BB_CONDITION};
+"""
+
+
+GET_OPEN_BOLETOS_BB_TO_SYNC_QUERY = f"""
+    SELECT b.id, numero, numero_convenio, client_id, client_secret, developer_application_key, \
+        b.data_vencimento, b.data_hora_baixa
     FROM
         boletos_bb b
         INNER JOIN convenios_bancarios cv ON b.convenio_bancario_id = cv.id
         INNER JOIN contas_bancarias cc ON cv.conta_bancaria_id = cc.id
     WHERE
-        b.id = :id;
+        b.convenio_bancario_id = :convenio_bancario_id
+        AND {OPEN_BOLETOS_BB_CONDITION}
+        AND (b.data_hora_sincronizacao IS NULL OR b.data_hora_sincronizacao < now() - make_interval(secs => :min_age))
+    ORDER BY b.data_vencimento, b.data_hora_sincronizacao NULLS FIRST
+    LIMIT :limit;
 """
 
 
-GET_CONVENIO_BANCARIO_BB_BY_ID_QUERY = """
-    SELECT id, tenant_id, conta_bancaria_id, numero_convenio, numero_carteira, numero_variacao_carteira, \
-        numero_dias_limite_recebimento, descricao_tipo_titulo, percentual_multa, percentual_juros, \
-            is_active, created_at, updated_at
-    FROM
-        convenios_bancarios
+# columns of boletos_bb filled by the reconciliation, with their types for the VALUES list
+SYNC_BOLETOS_BB_COLUMNS = {
+    "codigo_estado_titulo": "integer",
+    "data_recebimento": "date",
+    "data_credito": "date",
+    "valor_pago_sacado": "numeric",
+    "valor_credito_cedente": "numeric",
+    "valor_desconto_utilizado": "numeric",
+    "valor_multa_recebido": "numeric",
+    "valor_juros_recebido": "numeric",
+}
+
+
+# an alteração or baixa without an answer from BB is marked (data_hora_sincronizacao NULL) and its outcome is taken
+# from the next consulta: the vencimento of BB, and no baixa while the boleto is still normal (1) there
+SYNC_BOLETOS_BB_UNCONFIRMED_SETS = """
+    data_vencimento = CASE
+        WHEN b.data_hora_sincronizacao IS NULL THEN COALESCE(v.data_vencimento, b.data_vencimento)
+        ELSE b.data_vencimento
+    END,
+    data_hora_baixa = CASE
+        WHEN b.data_hora_sincronizacao IS NULL AND v.codigo_estado_titulo = 1 THEN NULL
+        ELSE b.data_hora_baixa
+    END
+"""
+
+
+MARK_BOLETO_BB_TO_SYNC_QUERY = """
+    UPDATE boletos_bb
+    SET data_hora_sincronizacao = NULL
     WHERE
         tenant_id = :tenant_id
         AND id = :id;
 """
 
 
-GET_CONTA_BANCARIA_BB_BY_ID_QUERY = """
-    SELECT id, nome, tenant_id, banco_id, tipo, agencia, agencia_dv, numero_conta, numero_conta_dv, \
-        client_id, client_secret, developer_application_key, is_active, created_at, updated_at
-    FROM
-        contas_bancarias
+# values restored when BB refuses an alteração or a baixa, the convenio and conta come from the BankingProfile
+GET_BOLETO_BB_DATAS_BY_ID_QUERY = """
+    SELECT data_vencimento, data_hora_baixa
+    FROM boletos_bb
     WHERE
         tenant_id = :tenant_id
         AND id = :id;
@@ -107,13 +222,238 @@ GET_PAGADOR_BB_BY_BOLETO_BB_ID_QUERY = """
 """
 
 
-GET_QR_CODE_BB_BY_BOLETO_BB_ID_QUERY = """
-    SELECT id, tenant_id, boleto_bb_id, url, tx_id, emv, created_at, updated_at
+# columns of each part of the full boleto, the joined ones are prefixed ("convenio__id") and split by the mapper
+FULL_BOLETO_BB_COLUMNS = {
+    "b": [
+        "id",
+        "tenant_id",
+        "convenio_bancario_id",
+        "pagador_bb_id",
+        "numero_titulo_beneficiario",
+        "data_emissao",
+        "data_vencimento",
+        "data_recebimento",
+        "data_credito",
+        "data_baixa_automatico",
+        "valor_original",
+        "valor_desconto",
+        "valor_pago_sacado",
+        "valor_credito_cedente",
+        "valor_desconto_utilizado",
+        "valor_multa_recebido",
+        "valor_juros_recebido",
+        "descricao_tipo_titulo",
+        "numero",
+        "mensagem_beneficiario",
+        "codigo_cliente",
+        "linha_digitavel",
+        "codigo_barra_numerico",
+        "numero_contrato_cobranca",
+        "registro_status",
+        "created_at",
+        "updated_at",
+    ],
+    "convenio": [
+        "id",
+        "tenant_id",
+        "conta_bancaria_id",
+        "numero_convenio",
+        "numero_carteira",
+        "numero_variacao_carteira",
+        "numero_dias_limite_recebimento",
+        "descricao_tipo_titulo",
+        "percentual_multa",
+        "percentual_juros",
+        "is_active",
+        "created_at",
+        "updated_at",
+    ],
+    "conta": [
+        "id",
+        "nome",
+        "tenant_id",
+        "banco_id",
+        "tipo",
+        "agencia",
+        "agencia_dv",
+        "numero_conta",
+        "numero_conta_dv",
+        "created_at",
+        "updated_at",
+    ],
+    "pagador": [
+        "id",
+        "tenant_id",
+        "tipo_inscricao",
+        "cpf_cnpj",
+        "nome",
+        "endereco",
+        "cep",
+        "cidade",
+        "bairro",
+        "uf",
+        "telefone",
+        "created_at",
+        "updated_at",
+    ],
+    "qr_code": ["id", "tenant_id", "boleto_bb_id", "url", "tx_id", "emv", "created_at", "updated_at"],
+}
+FULL_BOLETO_BB_ALIASES = {"b": "b", "convenio": "cv", "conta": "cc", "pagador": "p", "qr_code": "q"}
+
+
+def _get_full_boleto_bb_select() -> str:
+    columns = [f"b.{column}" for column in FULL_BOLETO_BB_COLUMNS["b"]]
+    for part, part_columns in FULL_BOLETO_BB_COLUMNS.items():
+        if part != "b":
+            alias = FULL_BOLETO_BB_ALIASES[part]
+            columns += [f"{alias}.{column} AS {part}__{column}" for column in part_columns]
+
+    return ", ".join(columns)
+
+
+# boleto, convenio, conta, pagador and qr code in one round trip
+GET_FULL_BOLETO_BB_QUERY = f"""
+    SELECT {_get_full_boleto_bb_select()}
     FROM
-        qr_codes_bb
+        boletos_bb b
+        INNER JOIN convenios_bancarios cv ON cv.id = b.convenio_bancario_id AND cv.tenant_id = b.tenant_id
+        INNER JOIN contas_bancarias cc ON cc.id = cv.conta_bancaria_id AND cc.tenant_id = b.tenant_id
+        LEFT JOIN pagadores_bb p ON p.id = b.pagador_bb_id AND p.tenant_id = b.tenant_id
+        LEFT JOIN qr_codes_bb q ON q.boleto_bb_id = b.id AND q.tenant_id = b.tenant_id
     WHERE
-        tenant_id = :tenant_id
-        AND boleto_bb_id = :boleto_bb_id;
+        b.tenant_id = :tenant_id
+"""
+
+
+GET_FULL_BOLETO_BB_BY_ID_QUERY = f"""
+    {GET_FULL_BOLETO_BB_QUERY}
+        AND b.id = :id
+    LIMIT 1;
+"""
+
+
+GET_FULL_BOLETO_BB_BY_SEU_NUMERO_QUERY = f"""
+    {GET_FULL_BOLETO_BB_QUERY}
+        AND b.numero_titulo_beneficiario = :numero_titulo_beneficiario
+    LIMIT 1;
+"""
+
+
+# local write of a registration: the pagador upsert, the boleto insert and its outbox entry, then the BB answer
+# and the QR code, each one a single statement that returns the row of GET_FULL_BOLETO_BB_QUERY
+PAGADOR_BB_UPSERT_COLUMNS = [
+    "tenant_id",
+    "tipo_inscricao",
+    "cpf_cnpj",
+    "nome",
+    "endereco",
+    "cep",
+    "cidade",
+    "bairro",
+    "uf",
+    "telefone",
+    "dedupe_key",
+]
+BOLETO_BB_INSERT_COLUMNS = [
+    "tenant_id",
+    "convenio_bancario_id",
+    "numero_titulo_beneficiario",
+    "data_emissao",
+    "data_vencimento",
+    "data_baixa_automatico",
+    "valor_original",
+    "valor_desconto",
+    "descricao_tipo_titulo",
+    "numero",
+    "mensagem_beneficiario",
+    "codigo_cliente",
+    "linha_digitavel",
+    "codigo_barra_numerico",
+    "numero_contrato_cobranca",
+    "registro_status",
+]
+
+
+CREATE_BOLETO_BB_WITH_PAGADOR_QUERY = f"""
+    WITH new_p AS (
+        INSERT INTO pagadores_bb ({", ".join(PAGADOR_BB_UPSERT_COLUMNS)})
+        VALUES ({", ".join(f":pagador_{column}" for column in PAGADOR_BB_UPSERT_COLUMNS)})
+        ON CONFLICT (tenant_id, dedupe_key) DO NOTHING
+        RETURNING *
+    ),
+    -- the existing pagador is read, not rewritten: the SELECT sees the table as it was before the INSERT, so it
+    -- returns a row only when the INSERT did not
+    p AS (
+        SELECT * FROM new_p
+        UNION ALL
+        SELECT *
+        FROM pagadores_bb
+        WHERE
+            tenant_id = :pagador_tenant_id
+            AND dedupe_key = :pagador_dedupe_key
+    ),
+    b AS (
+        INSERT INTO boletos_bb (pagador_bb_id, {", ".join(BOLETO_BB_INSERT_COLUMNS)})
+        VALUES ((SELECT id FROM p), {", ".join(f":{column}" for column in BOLETO_BB_INSERT_COLUMNS)})
+        RETURNING *
+    ),
+    -- a registration that never ends here (cancelled request, process gone) is still taken by the outbox
+    o AS (
+        INSERT INTO boletos_bb_outbox (tenant_id, boleto_bb_id, operation, attempts, next_attempt_at)
+        SELECT b.tenant_id, b.id, 'registrar', CAST(:outbox_attempts AS integer), \
+            now() + make_interval(secs => :outbox_delay)
+        FROM b
+        RETURNING *
+    )
+    SELECT {_get_full_boleto_bb_select()}, o.attempts AS outbox__attempts, o.next_attempt_at AS outbox__next_attempt_at
+    FROM
+        b
+        INNER JOIN convenios_bancarios cv ON cv.id = b.convenio_bancario_id AND cv.tenant_id = b.tenant_id
+        INNER JOIN contas_bancarias cc ON cc.id = cv.conta_bancaria_id AND cc.tenant_id = b.tenant_id
+        INNER JOIN p ON p.id = b.pagador_bb_id
+        INNER JOIN o ON o.boleto_bb_id = b.id
+        -- the QR code only exists after the registration in BB
+        LEFT JOIN qr_codes_bb q ON FALSE;
+"""
+
+
+COMPLETE_BOLETO_BB_REGISTRATION_QUERY = f"""
+    WITH b AS (
+        UPDATE boletos_bb
+        SET
+            codigo_cliente = :codigo_cliente,
+            linha_digitavel = :linha_digitavel,
+            codigo_barra_numerico = :codigo_barra_numerico,
+            numero_contrato_cobranca = :numero_contrato_cobranca,
+            registro_status = :registro_status
+        WHERE
+            tenant_id = :tenant_id
+            AND id = :id
+        RETURNING *
+    ),
+    q AS (
+        INSERT INTO qr_codes_bb (tenant_id, boleto_bb_id, url, tx_id, emv)
+        SELECT b.tenant_id, b.id, CAST(:url AS varchar), CAST(:tx_id AS varchar), CAST(:emv AS varchar)
+        FROM b
+        RETURNING *
+    ),
+    -- the outbox entry written with the boleto has nothing left to do
+    o AS (
+        UPDATE boletos_bb_outbox
+        SET status = 'done', locked_at = NULL, last_error = NULL
+        WHERE
+            tenant_id = :tenant_id
+            AND boleto_bb_id = :id
+            AND operation = 'registrar'
+            AND status IN ('pending', 'processing')
+    )
+    SELECT {_get_full_boleto_bb_select()}
+    FROM
+        b
+        INNER JOIN convenios_bancarios cv ON cv.id = b.convenio_bancario_id AND cv.tenant_id = b.tenant_id
+        INNER JOIN contas_bancarias cc ON cc.id = cv.conta_bancaria_id AND cc.tenant_id = b.tenant_id
+        LEFT JOIN pagadores_bb p ON p.id = b.pagador_bb_id AND p.tenant_id = b.tenant_id
+        LEFT JOIN q ON q.boleto_bb_id = b.id;
 """
 
 
@@ -149,60 +489,23 @@ class BoletosBBRepository(BaseRepository):
         new_boleto: BoletoCreate,
         token_bb_redis_repo: TokenBBRedisRepository,
     ) -> BoletoBBInDB:
-        async with self.db.transaction():
-            create_pagador = Pagador(
-                **new_boleto.pagador.dict(),
-            )
-
-            # busca pagador com "cpf_cnpj", "cep", "endereco", "telefone" iguais
-            pagador_bb_created = await self.db.fetch_one(
-                query=self.__get_select_pagadores_bb_query().get_sql(),
-                values={
-                    "tenant_id": tenant_in_db.id,
-                    "cpf_cnpj": create_pagador.cpf_cnpj,
-                    "cep": create_pagador.cep,
-                    "endereco": create_pagador.endereco,
-                    "telefone": create_pagador.telefone,
-                },
-            )
-
-            # Se não existe pagador, cria um.
-            if not pagador_bb_created:
-                create_pagador = PagadorWithTenantCreate(
-                    **create_pagador.dict(),
-                    tenant_id=tenant_in_db.id,
-                    # boleto_bb_id=boleto_in_bd.id,
-                )
-
-                pagador_bb_created = await self.db.fetch_one(
-                    query=self.__get_create_pagador_bb_query().get_sql(), values=create_pagador.dict()
-                )
-
-            pagador_bb_in_db = PagadorInDB(**pagador_bb_created)
-
-            create_boleto = BoletoBBWithTenantCreate(
-                tenant_id=convenio_bancario_in_db.tenant_id,
-                pagador_bb_id=pagador_bb_in_db.id,
-                **new_boleto.dict(
-                    exclude={"pagador"},
-                ),
-                numero=get_numero_titulo_cliente(
-                    numero_convenio=convenio_bancario_in_db.numero_convenio,
-                    numero_titulo_beneficiario=new_boleto.numero_titulo_beneficiario,
-                ),
-                data_baixa_automatico=new_boleto.data_vencimento
-                + datetime.timedelta(days=convenio_bancario_in_db.numero_dias_limite_recebimento),
-            )
-
-            boleto_bb_created = await self.db.fetch_one(
-                query=self.__get_create_boleto_bb_query().get_sql(), values=create_boleto.dict()
-            )
-            boleto_in_bd = BoletoBBInDB(**boleto_bb_created)
+        # one statement each for the local writes, no transaction block is needed around them.
+        # The outbox entry written with the boleto waits BB_OUTBOX_SYNC_DELAY, and starts at attempts 1 so the
+        # worker looks the boleto up in BB first: the outcome of a registration cut short is never lost.
+        boleto_in_bd, pagador_bb_in_db, _ = await self.__create_local_boleto_bb(
+            tenant_in_db=tenant_in_db,
+            convenio_bancario_in_db=convenio_bancario_in_db,
+            new_boleto=new_boleto,
+            outbox_attempts=1,
+            outbox_delay=BB_OUTBOX_SYNC_DELAY,
+        )
 
         if not boleto_in_bd:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro indeterminado")
 
-        async with self.db.transaction():
+        # BB is called outside of any transaction, no pooled connection waits on BB latency
+        await self.release_connection()
+        try:
             registeredBoletoBB = await self.boleto_bb_service.registra_boleto_bb(
                 conta_bancaria_in_db=conta_bancaria_in_db,
                 convenio_bancario_in_db=convenio_bancario_in_db,
@@ -211,34 +514,480 @@ class BoletosBBRepository(BaseRepository):
                 tenant_in_db=tenant_in_db,
                 token_bb_redis_repo=token_bb_redis_repo,
             )
+        except Exception as e:
+            await self.__compensate_failed_registration(boleto_in_bd=boleto_in_bd, error=e)
+            raise
 
-            boleto_in_bd.codigo_cliente = registeredBoletoBB.codigoCliente
-            boleto_in_bd.linha_digitavel = registeredBoletoBB.linhaDigitavel
-            boleto_in_bd.codigo_barra_numerico = registeredBoletoBB.codigoBarraNumerico
-            boleto_in_bd.numero_contrato_cobranca = registeredBoletoBB.numeroContratoCobranca
+        boleto_bb_full = await self.complete_boleto_bb_registration(
+            tenant_in_db=tenant_in_db, boleto_in_bd=boleto_in_bd, registered_boleto_bb=registeredBoletoBB
+        )
 
-            boleto_bb_updated = await self.db.fetch_one(
-                query=self.__get_update_boleto_bb_query().get_sql(),
-                values=boleto_in_bd.dict(exclude={"pagador", "beneficiario", "qr_code", "created_at", "updated_at"}),
+        return BoletoBBFull(**boleto_bb_full)
+
+    async def __compensate_failed_registration(self, *, boleto_in_bd: BoletoBBInDB, error: Exception) -> None:
+        """
+        Undo the local boleto (and its outbox entry) when BB refused it. When the outcome is unknown (timeout,
+        BB 5xx) the boleto is kept pending and its outbox entry taken sooner, the worker checks BB before
+        registering it again.
+        """
+        if self.__is_bb_rejection(error):
+            await self.db.execute(
+                query=DELETE_BOLETO_BB_BY_ID_QUERY, values={"tenant_id": boleto_in_bd.tenant_id, "id": boleto_in_bd.id}
             )
+            return
+
+        self.logger.warn(f"Boleto BB {boleto_in_bd.id} registration not confirmed: {error!r}")
+        await self.db.execute(
+            query=SCHEDULE_BOLETO_BB_OUTBOX_QUERY,
+            values=self.__get_unconfirmed_outbox_values(boleto_in_bd.tenant_id, boleto_in_bd.id),
+        )
 
-            create_qr_code = QrCodeWithTenantCreate(
-                **registeredBoletoBB.qrCode.dict(),
-                tenant_id=boleto_in_bd.tenant_id,
-                boleto_bb_id=boleto_in_bd.id,
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "detail": "BB did not confirm the registration, it will be retried in background.",
+                "id": str(boleto_in_bd.id),
+                "registro_status": RegistroStatus.pending,
+            },
+        )
+
+    def __get_outbox_values(self, tenant_id: UUID4, boleto_bb_id: UUID4) -> dict:
+        # attempts starts at 1 so the worker looks the boleto up in BB before registering it again
+        return {"tenant_id": tenant_id, "boleto_bb_id": boleto_bb_id, "attempts": 1, "delay": BB_OUTBOX_SYNC_DELAY}
+
+    def __get_unconfirmed_outbox_values(self, tenant_id: UUID4, boleto_bb_id: UUID4) -> dict:
+        return {"tenant_id": tenant_id, "boleto_bb_id": boleto_bb_id, "delay": BB_OUTBOX_BACKOFF_BASE}
+
+    def __is_bb_rejection(self, error: Exception) -> bool:
+        """
+        BB answered and refused the request (4xx), so nothing was changed there.
+        Timeouts and quota answers (408, 429) are not a refusal, the request can be sent again later.
+        """
+        return (
+            isinstance(error, HttpExceptionBB)
+            and 400 <= error.status_code < 500
+            and error.status_code not in [status.HTTP_408_REQUEST_TIMEOUT, status.HTTP_429_TOO_MANY_REQUESTS]
+        )
+
+    async def __undo_or_mark_to_sync(
+        self, *, error: Exception, tenant_id: UUID4, id: UUID4, query_update: str, values: dict
+    ) -> None:
+        """
+        Restore the local value when BB refused the change or it was never sent (circuit open, quota).
+        Otherwise (timeout, 5xx) BB may have applied it: the boleto is marked for the next consulta of the
+        reconciliation, which brings the value of BB (SYNC_BOLETOS_BB_UNCONFIRMED_SETS).
+        """
+        if self.__is_bb_rejection(error) or isinstance(error, (CircuitOpenExceptionBB, RateLimitExceptionBB)):
+            await self.db.execute(query=query_update, values=values)
+        else:
+            await self.db.execute(query=MARK_BOLETO_BB_TO_SYNC_QUERY, values={"tenant_id": tenant_id, "id": id})
+
+    async def register_new_boleto_bb_async(
+        self,
+        *,
+        tenant_in_db: TenantInDB,
+        convenio_bancario_in_db: ConvenioBancarioInDB,
+        new_boleto: BoletoCreate,
+    ) -> BoletoBBRegistroStatus:
+        """
+        Save the boleto with registro_status "pending" and its outbox entry in the same statement.
+        The registration in BB is done later by the outbox workers (see boleto_bb_outbox_worker).
+        """
+        _, _, registro_status = await self.__create_local_boleto_bb(
+            tenant_in_db=tenant_in_db,
+            convenio_bancario_in_db=convenio_bancario_in_db,
+            new_boleto=new_boleto,
+            outbox_attempts=0,
+            outbox_delay=0,
+        )
+
+        return registro_status
+
+    async def complete_boleto_bb_registration(
+        self,
+        *,
+        tenant_in_db: TenantInDB,
+        boleto_in_bd: BoletoBBInDB,
+        registered_boleto_bb: RegistroBoletoBB,
+    ) -> dict:
+        """
+        Save the data returned by BB on registration, mark the boleto as registered and save its QR code,
+        in one statement (COMPLETE_BOLETO_BB_REGISTRATION_QUERY).
+        :return: dict: the full boleto, as get_boleto_bb_by_id
+        """
+        self.__apply_registro_boleto_bb(boleto_in_bd=boleto_in_bd, registered_boleto_bb=registered_boleto_bb)
+
+        create_qr_code = QrCodeWithTenantCreate(
+            **registered_boleto_bb.qrCode.dict(),
+            tenant_id=boleto_in_bd.tenant_id,
+            boleto_bb_id=boleto_in_bd.id,
+        )
+        boleto_bb_full = await self.db.fetch_one(
+            query=COMPLETE_BOLETO_BB_REGISTRATION_QUERY,
+            values={
+                "tenant_id": boleto_in_bd.tenant_id,
+                "id": boleto_in_bd.id,
+                "codigo_cliente": boleto_in_bd.codigo_cliente,
+                "linha_digitavel": boleto_in_bd.linha_digitavel,
+                "codigo_barra_numerico": boleto_in_bd.codigo_barra_numerico,
+                "numero_contrato_cobranca": boleto_in_bd.numero_contrato_cobranca,
+                "registro_status": boleto_in_bd.registro_status,
+                "url": create_qr_code.url,
+                "tx_id": create_qr_code.tx_id,
+                "emv": create_qr_code.emv,
+            },
+        )
+
+        return self.__map_full_boleto_bb(tenant=tenant_in_db, row=boleto_bb_full)
+
+    async def get_boleto_bb_with_pagador_by_id(
+        self, *, tenant_id: UUID4, id: UUID4
+    ) -> Tuple[Optional[BoletoBBInDB], Optional[PagadorInDB]]:
+        boleto_bb = await self.db.fetch_one(query=GET_BOLETO_BB_BY_ID_QUERY, values={"tenant_id": tenant_id, "id": id})
+        if not boleto_bb:
+            return None, None
+
+        boleto_in_bd = BoletoBBInDB(**boleto_bb)
+        pagador_bb = await self.db.fetch_one(
+            query=GET_PAGADOR_BB_BY_BOLETO_BB_ID_QUERY,
+            values={"tenant_id": tenant_id, "id": boleto_in_bd.pagador_bb_id},
+        )
+
+        return boleto_in_bd, PagadorInDB(**pagador_bb) if pagador_bb else None
+
+    async def update_registro_status(self, *, tenant_id: UUID4, id: UUID4, registro_status: RegistroStatus) -> None:
+        await self.db.execute(
+            query=UPDATE_REGISTRO_STATUS_BOLETO_BB_QUERY,
+            values={"tenant_id": tenant_id, "id": id, "registro_status": registro_status},
+        )
+
+    async def get_registro_status_boleto_bb(self, *, tenant_id: UUID4, id: UUID4) -> Optional[BoletoBBRegistroStatus]:
+        registro_status = await self.db_read.fetch_one(
+            query=GET_REGISTRO_STATUS_BOLETO_BB_BY_ID_QUERY, values={"tenant_id": tenant_id, "id": id}
+        )
+
+        if not registro_status:
+            return None
+
+        return BoletoBBRegistroStatus(**registro_status)
+
+    async def __create_local_boleto_bb(
+        self,
+        *,
+        tenant_in_db: TenantInDB,
+        convenio_bancario_in_db: ConvenioBancarioInDB,
+        new_boleto: BoletoCreate,
+        outbox_attempts: int,
+        outbox_delay: float,
+    ) -> Tuple[BoletoBBInDB, PagadorInDB, BoletoBBRegistroStatus]:
+        """
+        Insert the pagador (when new, the one of the tenant with the same dedupe_key is reused), the boleto
+        and its outbox entry in one statement (CREATE_BOLETO_BB_WITH_PAGADOR_QUERY).
+        :param outbox_delay: seconds before the outbox entry can be taken by a worker
+        """
+        create_pagador = PagadorWithTenantCreate(
+            **new_boleto.pagador.dict(),
+            tenant_id=tenant_in_db.id,
+        )
+
+        create_boleto = BoletoBBWithTenantCreate(
+            tenant_id=convenio_bancario_in_db.tenant_id,
+            **new_boleto.dict(
+                exclude={"pagador"},
+            ),
+            numero=get_numero_titulo_cliente(
+                numero_convenio=convenio_bancario_in_db.numero_convenio,
+                numero_titulo_beneficiario=new_boleto.numero_titulo_beneficiario,
+            ),
+            data_baixa_automatico=new_boleto.data_vencimento
+            + datetime.timedelta(days=convenio_bancario_in_db.numero_dias_limite_recebimento),
+        )
+
+        values = {
+            **create_boleto.dict(exclude={"pagador_bb_id"}),
+            **{f"pagador_{k}": v for k, v in create_pagador.dict().items()},
+            "outbox_attempts": outbox_attempts,
+            "outbox_delay": outbox_delay,
+        }
+        try:
+            boleto_bb_created = await self.db.fetch_one(query=CREATE_BOLETO_BB_WITH_PAGADOR_QUERY, values=values)
+        except NotNullViolationError:
+            # the pagador was committed by a concurrent request after this statement started: its INSERT
+            # conflicted and its SELECT could not see it. The next statement does.
+            boleto_bb_created = await self.db.fetch_one(query=CREATE_BOLETO_BB_WITH_PAGADOR_QUERY, values=values)
+
+        boleto_in_bd = BoletoBBInDB(**{column: boleto_bb_created[column] for column in FULL_BOLETO_BB_COLUMNS["b"]})
+        return (
+            boleto_in_bd,
+            PagadorInDB(
+                **{column: boleto_bb_created[f"pagador__{column}"] for column in FULL_BOLETO_BB_COLUMNS["pagador"]}
+            ),
+            BoletoBBRegistroStatus(
+                id=boleto_in_bd.id,
+                registro_status=boleto_in_bd.registro_status,
+                attempts=boleto_bb_created["outbox__attempts"],
+                next_attempt_at=boleto_bb_created["outbox__next_attempt_at"],
+            ),
+        )
+
+    def __apply_registro_boleto_bb(self, *, boleto_in_bd: BoletoBBInDB, registered_boleto_bb: RegistroBoletoBB) -> None:
+        boleto_in_bd.codigo_cliente = registered_boleto_bb.codigoCliente
+        boleto_in_bd.linha_digitavel = registered_boleto_bb.linhaDigitavel
+        boleto_in_bd.codigo_barra_numerico = registered_boleto_bb.codigoBarraNumerico
+        boleto_in_bd.numero_contrato_cobranca = registered_boleto_bb.numeroContratoCobranca
+        boleto_in_bd.registro_status = RegistroStatus.registered
+
+    async def register_new_boletos_bb_batch(
+        self,
+        *,
+        tenant_in_db: TenantInDB,
+        convenios_contas: Dict[UUID4, Tuple[ConvenioBancarioInDB, ContaBancariaInDB]],
+        new_boletos: List[BoletoCreate],
+        token_bb_redis_repo: TokenBBRedisRepository,
+    ) -> BoletoBBBatchResult:
+        """
+        Register a list of boletos: local rows are written in multi-row statements and the BB registration
+        runs under BB_BATCH_CONCURRENCY. A failed boleto does not fail the batch, its local row is removed.
+        :param convenios_contas: convenio and conta of each convenio_bancario_id of the batch, resolved once
+        """
+        items: Dict[int, BoletoBBBatchItem] = {}
+        pending: List[Tuple[int, BoletoBBWithTenantCreate]] = []
+        seen = set()
+
+        pagadores = [Pagador(**new_boleto.pagador.dict()) for new_boleto in new_boletos]
+        pagadores_in_db = await self.__upsert_pagadores_bb(tenant_in_db=tenant_in_db, pagadores=pagadores)
+
+        for index, (new_boleto, pagador) in enumerate(zip(new_boletos, pagadores)):
+            key = (new_boleto.convenio_bancario_id, new_boleto.numero_titulo_beneficiario)
+            pagador_bb_in_db = pagadores_in_db.get(self.__get_pagador_key(pagador))
+
+            if key in seen or not pagador_bb_in_db:
+                items[index] = BoletoBBBatchItem(
+                    index=index,
+                    numero_titulo_beneficiario=new_boleto.numero_titulo_beneficiario,
+                    status=BatchItemStatus.failed,
+                    error={"detail": "Duplicated numero_titulo_beneficiario." if key in seen else "Invalid pagador."},
+                )
+                continue
+
+            seen.add(key)
+            convenio_bancario_in_db, _ = convenios_contas[new_boleto.convenio_bancario_id]
+            pending.append(
+                (
+                    index,
+                    BoletoBBWithTenantCreate(
+                        tenant_id=tenant_in_db.id,
+                        pagador_bb_id=pagador_bb_in_db.id,
+                        **new_boleto.dict(exclude={"pagador"}),
+                        numero=get_numero_titulo_cliente(
+                            numero_convenio=convenio_bancario_in_db.numero_convenio,
+                            numero_titulo_beneficiario=new_boleto.numero_titulo_beneficiario,
+                        ),
+                        data_baixa_automatico=new_boleto.data_vencimento
+                        + datetime.timedelta(days=convenio_bancario_in_db.numero_dias_limite_recebimento),
+                    ),
+                )
+            )
+
+        # boletos already registered (same convenio and numero_titulo_beneficiario) are skipped by ON CONFLICT
+        boletos_in_db: Dict[int, BoletoBBInDB] = {}
+        async with self.db.transaction():
+            for chunk in self.__chunks(pending, BB_BATCH_INSERT_CHUNK):
+                values = {}
+                for i, (_, create_boleto) in enumerate(chunk):
+                    values.update({f"{k}_{i}": v for k, v in create_boleto.dict().items()})
+
+                rows = await self.db.fetch_all(
+                    query=statements.get(
+                        ("boletos_bb", "create_bulk", len(chunk)),
+                        lambda: self.__get_create_boletos_bb_bulk_query(size=len(chunk)),
+                    ),
+                    values=values,
+                )
+                created = {(row["convenio_bancario_id"], row["numero_titulo_beneficiario"]): row for row in rows}
+
+                for index, create_boleto in chunk:
+                    row = created.get((create_boleto.convenio_bancario_id, create_boleto.numero_titulo_beneficiario))
+                    if row:
+                        boletos_in_db[index] = BoletoBBInDB(**row)
+                    else:
+                        items[index] = BoletoBBBatchItem(
+                            index=index,
+                            numero_titulo_beneficiario=create_boleto.numero_titulo_beneficiario,
+                            status=BatchItemStatus.failed,
+                            error={"detail": "Boleto already exists."},
+                        )
+
+                # as in register_new_boleto_bb, a boleto whose registration never ends here is taken by the outbox
+                if rows:
+                    await self.db.execute_many(
+                        query=CREATE_BOLETO_BB_OUTBOX_QUERY,
+                        values=[self.__get_outbox_values(tenant_in_db.id, row["id"]) for row in rows],
+                    )
+
+        semaphore = asyncio.Semaphore(BB_BATCH_CONCURRENCY)
+
+        async def registra(index: int, boleto_in_bd: BoletoBBInDB) -> Tuple[int, Any, Any]:
+            convenio_bancario_in_db, conta_bancaria_in_db = convenios_contas[boleto_in_bd.convenio_bancario_id]
+            async with semaphore:
+                try:
+                    registered = await self.boleto_bb_service.registra_boleto_bb(
+                        conta_bancaria_in_db=conta_bancaria_in_db,
+                        convenio_bancario_in_db=convenio_bancario_in_db,
+                        boleto_in_bd=boleto_in_bd,
+                        pagador_bb_in_db=pagadores_in_db[self.__get_pagador_key(pagadores[index])],
+                        tenant_in_db=tenant_in_db,
+                        token_bb_redis_repo=token_bb_redis_repo,
+                        priority=BBCallPriority.bulk,
+                    )
+                    return index, registered, None
+                except Exception as e:
+                    if not isinstance(e, HttpExceptionBB):
+                        self.logger.warn(f"Batch boleto {boleto_in_bd.id} registration error: {e!r}")
+                    return index, None, e
+
+        # only the BB calls run concurrently, the database work below stays on this task
+        await self.release_connection()
+        results = await asyncio.gather(*[registra(index, boleto) for index, boleto in boletos_in_db.items()])
+
+        registered_boletos = [(index, registered) for index, registered, _ in results if registered]
+        failed_ids = []
+        unconfirmed_ids = []
+        for index, _, error in results:
+            if error is None:
+                continue
+
+            if self.__is_bb_rejection(error):
+                failed_ids.append(boletos_in_db[index].id)
+                item_error = error.content or {"detail": error.detail}
+            else:
+                unconfirmed_ids.append(boletos_in_db[index].id)
+                item_error = {
+                    "detail": "BB did not confirm the registration, it will be retried in background.",
+                    "id": str(boletos_in_db[index].id),
+                    "registro_status": RegistroStatus.pending,
+                }
+
+            items[index] = BoletoBBBatchItem(
+                index=index,
+                numero_titulo_beneficiario=boletos_in_db[index].numero_titulo_beneficiario,
+                status=BatchItemStatus.failed,
+                error=item_error,
             )
-            qr_code_bb_created = await self.db.fetch_one(query=CREATE_QR_CODE_BB_QUERY, values=create_qr_code.dict())
-            qr_code_bb_in_db = QrCodeInDB(**qr_code_bb_created)
-
-            boleto_bb_full = BoletoBBFull(
-                **boleto_bb_updated,
-                convenio=convenio_bancario_in_db.dict(),
-                pagador=pagador_bb_in_db.dict(),
-                # beneficiario=beneficiario_bb_in_db.dict(),
-                qr_code=qr_code_bb_in_db.dict(),
+
+        async with self.db.transaction():
+            for chunk in self.__chunks(registered_boletos, BB_BATCH_INSERT_CHUNK):
+                update_values = []
+                qr_code_values = {}
+                for i, (index, registered) in enumerate(chunk):
+                    boleto_in_bd = boletos_in_db[index]
+                    self.__apply_registro_boleto_bb(boleto_in_bd=boleto_in_bd, registered_boleto_bb=registered)
+                    update_values.append(
+                        boleto_in_bd.dict(exclude={"pagador", "beneficiario", "qr_code", "created_at", "updated_at"})
+                    )
+
+                    create_qr_code = QrCodeWithTenantCreate(
+                        **registered.qrCode.dict(),
+                        tenant_id=boleto_in_bd.tenant_id,
+                        boleto_bb_id=boleto_in_bd.id,
+                    )
+                    qr_code_values.update({f"{k}_{i}": v for k, v in create_qr_code.dict().items()})
+
+                await self.db.execute_many(
+                    query=statements.get(("boletos_bb", "update"), self.__get_update_boleto_bb_query),
+                    values=update_values,
+                )
+                qr_codes_rows = await self.db.fetch_all(
+                    query=statements.get(
+                        ("qr_codes_bb", "create_bulk", len(chunk)),
+                        lambda: self.__get_create_qr_codes_bb_bulk_query(size=len(chunk)),
+                    ),
+                    values=qr_code_values,
+                )
+                qr_codes = {row["boleto_bb_id"]: QrCodeInDB(**row) for row in qr_codes_rows}
+                await self.db.execute_many(
+                    query=MARK_DONE_BOLETO_BB_OUTBOX_BY_BOLETO_QUERY,
+                    values=[
+                        {"tenant_id": tenant_in_db.id, "boleto_bb_id": boletos_in_db[index].id} for index, _ in chunk
+                    ],
+                )
+
+                for index, _ in chunk:
+                    boleto_in_bd = boletos_in_db[index]
+                    qr_code_bb_in_db = qr_codes.get(boleto_in_bd.id)
+                    convenio_bancario_in_db, _ = convenios_contas[boleto_in_bd.convenio_bancario_id]
+                    items[index] = BoletoBBBatchItem(
+                        index=index,
+                        numero_titulo_beneficiario=boleto_in_bd.numero_titulo_beneficiario,
+                        status=BatchItemStatus.created,
+                        boleto=BoletoBBFull(
+                            **boleto_in_bd.dict(exclude={"pagador", "beneficiario", "qr_code"}),
+                            convenio=convenio_bancario_in_db.dict(),
+                            pagador=pagadores_in_db[self.__get_pagador_key(pagadores[index])].dict(),
+                            qr_code=qr_code_bb_in_db.dict() if qr_code_bb_in_db else None,
+                        ),
+                    )
+
+            # the numero_titulo_beneficiario of a boleto refused by BB can be sent again
+            for chunk in self.__chunks(failed_ids, BB_BATCH_INSERT_CHUNK):
+                await self.db.execute(
+                    query=statements.get(
+                        ("boletos_bb", "delete_by_ids", len(chunk)),
+                        lambda: self.__get_delete_boletos_bb_by_ids_query(size=len(chunk)),
+                    ),
+                    values={"tenant_id": tenant_in_db.id, **{f"id_{i}": id for i, id in enumerate(chunk)}},
+                )
+
+            if unconfirmed_ids:
+                await self.db.execute_many(
+                    query=SCHEDULE_BOLETO_BB_OUTBOX_QUERY,
+                    values=[self.__get_unconfirmed_outbox_values(tenant_in_db.id, id) for id in unconfirmed_ids],
+                )
+
+        result_items = [items[index] for index in sorted(items)]
+        created = len([item for item in result_items if item.status == BatchItemStatus.created])
+
+        return BoletoBBBatchResult(
+            total=len(result_items), created=created, failed=len(result_items) - created, items=result_items
+        )
+
+    async def __upsert_pagadores_bb(
+        self, *, tenant_in_db: TenantInDB, pagadores: List[Pagador]
+    ) -> Dict[str, PagadorInDB]:
+        """
+        Pagadores of the tenant by dedupe_key, the missing ones are created by the same multi-row upsert
+        that returns the existing ones.
+        """
+        unique_pagadores = {self.__get_pagador_key(pagador): pagador for pagador in pagadores}
+        pagadores_in_db = {}
+
+        # the same order in every batch, so concurrent batches lock the conflicting rows in the same order
+        keys = sorted(unique_pagadores)
+        for chunk in self.__chunks(keys, BB_BATCH_INSERT_CHUNK):
+            values = {}
+            for i, key in enumerate(chunk):
+                create_pagador = PagadorWithTenantCreate(**unique_pagadores[key].dict(), tenant_id=tenant_in_db.id)
+                values.update({f"{k}_{i}": v for k, v in create_pagador.dict().items()})
+
+            rows = await self.db.fetch_all(
+                query=statements.get(
+                    ("pagadores_bb", "upsert_bulk", len(chunk)),
+                    lambda: self.__get_upsert_pagadores_bb_bulk_query(size=len(chunk)),
+                ),
+                values=values,
             )
+            for row in rows:
+                pagadores_in_db[row["dedupe_key"]] = PagadorInDB(**row)
 
-            return boleto_bb_full
+        return pagadores_in_db
+
+    def __get_pagador_key(self, pagador: Pagador) -> str:
+        return get_pagador_dedupe_key(
+            cpf_cnpj=pagador.cpf_cnpj, cep=pagador.cep, endereco=pagador.endereco, telefone=pagador.telefone
+        )
+
+    def __chunks(self, items: List[Any], size: int) -> List[List[Any]]:
+        return [items[i : i + size] for i in range(0, len(items), size)]
 
     async def get_all_boletos_bb(
         self,
@@ -248,9 +997,12 @@ class BoletosBBRepository(BaseRepository):
         per_page: int = 10,
         filters: List[FilterModel],
         sorts: Optional[str] = None,
+        pagination: PaginationMode = PaginationMode.offset,
+        cursor: Optional[str] = None,
+        count_strategy: CountStrategy = CountStrategy.exact,
     ) -> BoletoBBInDB:
-        select_query = await self.__get_boletos_bb_select_query()
-        count_query = await self.__get_boletos_bb_count_query()
+        select_query = statements.get_query(("boletos_bb", "list_select"), self.__get_boletos_bb_select_query)
+        count_query = statements.get_query(("boletos_bb", "list_count"), self.__get_boletos_bb_count_query)
 
         boletos_bb = Table("boletos_bb")
 
@@ -264,9 +1016,14 @@ class BoletosBBRepository(BaseRepository):
             current_page=current_page,
             per_page=per_page,
             type_schema=BoletoBBForList,
+            pagination=pagination,
+            cursor=cursor,
+            cursor_fields=BOLETOS_BB_CURSOR_FIELDS,
+            count_strategy=count_strategy,
+            statement_key="boletos_bb:list",
         )
 
-    async def __get_boletos_bb_count_query(self) -> Query:
+    def __get_boletos_bb_count_query(self) -> Query:
         boletos_bb, pagadores_bb = Tables(
             "boletos_bb",
             "pagadores_bb",
@@ -275,22 +1032,23 @@ class BoletosBBRepository(BaseRepository):
         count_query = (
             Query.from_(boletos_bb)
             .left_join(pagadores_bb)
-            .on(pagadores_bb.id == boletos_bb.pagador_bb_id)
+            .on((pagadores_bb.id == boletos_bb.pagador_bb_id) & (pagadores_bb.tenant_id == boletos_bb.tenant_id))
             .where(boletos_bb.tenant_id == Parameter(":tenant_id"))
         )
 
         return count_query
 
-    async def __get_boletos_bb_select_query(self) -> Query:
+    def __get_boletos_bb_select_query(self) -> Query:
         boletos_bb, pagadores_bb = Tables(
             "boletos_bb",
             "pagadores_bb",
         )
 
+        # tenant_id in the join lets the cpf_cnpj filter seek the (tenant_id, cpf_cnpj, ...) key of pagadores_bb
         select_query = (
             Query.from_(boletos_bb)
             .left_join(pagadores_bb)
-            .on(pagadores_bb.id == boletos_bb.pagador_bb_id)
+            .on((pagadores_bb.id == boletos_bb.pagador_bb_id) & (pagadores_bb.tenant_id == boletos_bb.tenant_id))
             .select(
                 boletos_bb.id,
                 boletos_bb.tenant_id,
@@ -319,120 +1077,76 @@ class BoletosBBRepository(BaseRepository):
         return select_query
 
     async def get_boleto_bb_by_id(self, *, tenant: TenantInDB, id: UUID4) -> BoletoBBFull:
-        boleto_bb = await self.db.fetch_one(query=GET_BOLETO_BB_BY_ID_QUERY, values={"tenant_id": tenant.id, "id": id})
+        boleto_bb = await self.db_read.fetch_one(
+            query=GET_FULL_BOLETO_BB_BY_ID_QUERY, values={"tenant_id": tenant.id, "id": id}
+        )
 
         if not boleto_bb:
             return None
 
-        return await self.__get_full_boleto_bb_by_tenant_in_db_and_boleto_bb_in_db(
-            tenant=tenant, boleto_bb_in_db=boleto_bb
-        )
+        return self.__map_full_boleto_bb(tenant=tenant, row=boleto_bb)
 
     async def get_boleto_bb_by_seu_numero(self, *, tenant: TenantInDB, seu_numero: int) -> BoletoBBFull:
-        print(self.__get_boleto_bb_by_seu_numero_query().get_sql())
-        boleto_bb = await self.db.fetch_one(
-            query=self.__get_boleto_bb_by_seu_numero_query().get_sql(),
+        boleto_bb = await self.db_read.fetch_one(
+            query=GET_FULL_BOLETO_BB_BY_SEU_NUMERO_QUERY,
             values={"tenant_id": tenant.id, "numero_titulo_beneficiario": seu_numero},
         )
 
         if not boleto_bb:
             return None
 
-        return await self.__get_full_boleto_bb_by_tenant_in_db_and_boleto_bb_in_db(
-            tenant=tenant, boleto_bb_in_db=boleto_bb
-        )
-
-    async def __get_full_boleto_bb_by_tenant_in_db_and_boleto_bb_in_db(
-        self,
-        *,
-        tenant: TenantInDB,
-        boleto_bb_in_db: BoletoBBInDB,
-    ) -> BoletoBBFull:
-        boleto_bb_in_db = BoletoBBInDB(**boleto_bb_in_db)
-
-        convenio_bancario_bb = await self.db.fetch_one(
-            query=GET_CONVENIO_BANCARIO_BB_BY_ID_QUERY,
-            values={"tenant_id": tenant.id, "id": boleto_bb_in_db.convenio_bancario_id},
-        )
-        convenio_bancario_bb_in_db = ConvenioBancarioInDB(**convenio_bancario_bb)
-
-        conta_bancaria_bb = await self.db.fetch_one(
-            query=GET_CONTA_BANCARIA_BB_BY_ID_QUERY,
-            values={"tenant_id": tenant.id, "id": convenio_bancario_bb_in_db.conta_bancaria_id},
-        )
-        conta_bancaria_bb_in_db = ContaBancariaInDB(**conta_bancaria_bb)
-
-        pagador_bb = await self.db.fetch_one(
-            query=GET_PAGADOR_BB_BY_BOLETO_BB_ID_QUERY,
-            values={"tenant_id": tenant.id, "id": boleto_bb_in_db.pagador_bb_id},
-        )
-        if pagador_bb:
-            pagador_bb_in_db = PagadorInDB(**pagador_bb)
-
-        # beneficiario_bb = await self.db.fetch_one(
-        #     query=GET_BENEFICIARIO_BB_BY_BOLETO_BB_ID_QUERY,
-        #     values={"tenant_id": tenant.id, "boleto_bb_id": boleto_bb_in_db.id},
-        # )
-        # if beneficiario_bb:
-        #     beneficiario_bb_in_db = BeneficiarioInDB(**beneficiario_bb)
-        beneficiario_bb_in_db = BeneficiarioInDB(
-            id=tenant.id,
-            nome=tenant.name,
-            cpf_cnpj=tenant.cpf_cnpj,
-            agencia=f"{conta_bancaria_bb_in_db.agencia}-{conta_bancaria_bb_in_db.agencia_dv}",
-            conta_corrente=f"{conta_bancaria_bb_in_db.numero_conta}-{conta_bancaria_bb_in_db.numero_conta_dv}",
-            tipo_endereco=tenant.type,
-            logradouro=f"{tenant.street}{f', {tenant.number}' if tenant.number else ''}",
-            bairro=tenant.neighborhood,
-            cidade=tenant.city,
-            uf=tenant.state,
-            cep=tenant.cep,
-        )
-
-        qr_code_bb = await self.db.fetch_one(
-            query=GET_QR_CODE_BB_BY_BOLETO_BB_ID_QUERY,
-            values={"tenant_id": tenant.id, "boleto_bb_id": boleto_bb_in_db.id},
-        )
-        if qr_code_bb:
-            qr_code_bb_in_db = QrCodeInDB(**qr_code_bb)
-
-        if not boleto_bb_in_db:
-            return None
+        return self.__map_full_boleto_bb(tenant=tenant, row=boleto_bb)
+
+    def __map_full_boleto_bb(self, *, tenant: TenantInDB, row: Any) -> dict:
+        """
+        Split the row of GET_FULL_BOLETO_BB_QUERY in its parts, each one validated once by its schema.
+        :return: dict: BoletoBBInDB fields with convenio (and its conta_bancaria), pagador, beneficiario and qr_code
+        """
+        parts = {
+            part: {column: row[f"{part}__{column}"] for column in columns}
+            for part, columns in FULL_BOLETO_BB_COLUMNS.items()
+            if part != "b"
+        }
 
+        conta_bancaria_bb_in_db = ContaBancariaInDB(**parts["conta"])
         boleto_bb_json = {
-            **boleto_bb_in_db.dict(),
+            **BoletoBBInDB(**{column: row[column] for column in FULL_BOLETO_BB_COLUMNS["b"]}).dict(),
             "convenio": {
-                **convenio_bancario_bb_in_db.dict(),
+                **ConvenioBancarioInDB(**parts["convenio"]).dict(),
                 "conta_bancaria": conta_bancaria_bb_in_db.dict(
                     exclude={"client_id", "client_secret", "developer_application_key", "is_active"}
                 ),
             },
+            "beneficiario": BeneficiarioInDB(
+                id=tenant.id,
+                nome=tenant.name,
+                cpf_cnpj=tenant.cpf_cnpj,
+                agencia=f"{conta_bancaria_bb_in_db.agencia}-{conta_bancaria_bb_in_db.agencia_dv}",
+                conta_corrente=f"{conta_bancaria_bb_in_db.numero_conta}-{conta_bancaria_bb_in_db.numero_conta_dv}",
+                tipo_endereco=tenant.type,
+                logradouro=f"{tenant.street}{f', {tenant.number}' if tenant.number else ''}",
+                bairro=tenant.neighborhood,
+                cidade=tenant.city,
+                uf=tenant.state,
+                cep=tenant.cep,
+            ).dict(),
         }
 
-        if pagador_bb:
-            boleto_bb_json["pagador"] = pagador_bb_in_db.dict()
-
-        # if beneficiario_bb_in_db:
-        boleto_bb_json["beneficiario"] = {
-            **beneficiario_bb_in_db.dict(),
-            # "nome": tenant.name,
-            # "cpf_cnpj": tenant.cpf_cnpj,
-        }
+        if parts["pagador"]["id"]:
+            boleto_bb_json["pagador"] = PagadorInDB(**parts["pagador"]).dict()
 
-        if qr_code_bb:
-            boleto_bb_json["qr_code"] = qr_code_bb_in_db.dict()
+        if parts["qr_code"]["id"]:
+            boleto_bb_json["qr_code"] = QrCodeInDB(**parts["qr_code"]).dict()
 
         return boleto_bb_json
 
     async def consultar_situacao_boleto_bb(
         self,
         *,
-        id: UUID4,
+        boleto_bb_req: BoletoBBRequestDetails,
         token_bb_redis_repo: TokenBBRedisRepository,
     ) -> BoletoBBResponseDetails:
-        boleto_bb_req_in_db = await self.db.fetch_one(query=GET_BOLETO_BB_REQUEST_DETAIL_BY_ID_QUERY, values={"id": id})
-        boleto_bb_req = BoletoBBRequestDetails(**boleto_bb_req_in_db)
-
+        await self.release_connection()
         boleto_bb_response = await self.boleto_bb_service.consultar_situacao_boleto_bb(
             boleto_bb_req=boleto_bb_req,
             token_bb_redis_repo=token_bb_redis_repo,
@@ -443,105 +1157,150 @@ class BoletosBBRepository(BaseRepository):
     async def update_vencimento_boleto_bb(
         self,
         *,
-        id: UUID4,
+        boleto_bb: BoletoBBInDB,
+        banking_profile: BankingProfile,
         new_vencimento: BoletoBBNewVencimento,
         boleto_bb_alteracao: BoletoBBAlteracao,
         token_bb_redis_repo: TokenBBRedisRepository,
     ) -> Any:
-        async with self.db.transaction():
-            boleto_bb_req_in_db = await self.db.fetch_one(
-                query=GET_BOLETO_BB_REQUEST_DETAIL_BY_ID_QUERY, values={"id": id}
-            )
-            # update_query = self.get_update_query_by_id(table_name="boletos_bb", obj=boleto_bb_alteracao)
-            # print(update_query)
+        id = boleto_bb.id
+        boleto_bb_datas = await self.db.fetch_one(
+            query=GET_BOLETO_BB_DATAS_BY_ID_QUERY, values={"tenant_id": boleto_bb.tenant_id, "id": id}
+        )
+        # update_query = self.get_update_query_by_id(table_name="boletos_bb", obj=boleto_bb_alteracao)
+        # print(update_query)
 
-            boleto_bb_req = BoletoBBRequestDetails(**boleto_bb_req_in_db)
+        boleto_bb_req = banking_profile.get_request_details(id=id, numero=boleto_bb.numero)
 
-            token = await self.boleto_bb_service.get_access_token_bb(
-                client_id=boleto_bb_req.client_id,
-                client_secret=boleto_bb_req.client_secret,
-                gw_dev_app_key=boleto_bb_req.developer_application_key,
+        # short local update committed before the BB call, undone if BB refuses the change
+        query_update = statements.get(
+            ("boletos_bb", "update_data_vencimento_by_id"), self.__get_update_data_vencimento_query_by_id
+        )
+        boleto_bb_in_db = await self.db.fetch_one(
+            query=query_update,
+            values={"id": id, "data_vencimento": new_vencimento.data_vencimento},
+        )
+
+        await self.release_connection()
+        try:
+            await self.boleto_bb_service.alterar_boleto_bb(
+                boleto_bb_req=boleto_bb_req,
+                boleto_bb_alteracao=boleto_bb_alteracao,
                 token_bb_redis_repo=token_bb_redis_repo,
             )
-
-            headers = {
-                "Authorization": f"Bearer {token.access_token}",
-                "Content-Type": "application/json",
-            }
-
-            params = {
-                "gw-dev-app-key": boleto_bb_req.developer_application_key,
-            }
-
-            query_update = self.__get_update_data_vencimento_query_by_id(id=id)
-            boleto_bb_in_db = await self.db.fetch_one(
-                query=query_update.get_sql(),
-                values={"id": id, "data_vencimento": new_vencimento.data_vencimento},
+        except Exception as e:
+            await self.__undo_or_mark_to_sync(
+                error=e,
+                tenant_id=boleto_bb.tenant_id,
+                id=id,
+                query_update=query_update,
+                values={"id": id, "data_vencimento": boleto_bb_datas["data_vencimento"]},
             )
+            raise
 
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.patch(
-                    url=f"{BB_API_URL}/boletos/{boleto_bb_req.numero}",
-                    params=params,
-                    ssl=ssl.SSLContext(),
-                    data=boleto_bb_alteracao.json(),
-                ) as response:
-                    result = await response.json()
-                    print(f"Status code: {response.status}")
-                    if response.status != status.HTTP_200_OK:
-                        raise HttpExceptionBB(status_code=response.status, content=result)
-
-                    return boleto_bb_in_db
+        return boleto_bb_in_db
 
     async def baixar_boleto_bb(
         self,
         *,
-        id: UUID4,
+        boleto_bb: BoletoBBInDB,
+        banking_profile: BankingProfile,
         boleto_bb_baixar: BoletoBBBaixar,
         token_bb_redis_repo: TokenBBRedisRepository,
     ) -> Any:
-        async with self.db.transaction():
-            boleto_bb_req_in_db = await self.db.fetch_one(
-                query=GET_BOLETO_BB_REQUEST_DETAIL_BY_ID_QUERY, values={"id": id}
-            )
+        id = boleto_bb.id
+        boleto_bb_datas = await self.db.fetch_one(
+            query=GET_BOLETO_BB_DATAS_BY_ID_QUERY, values={"tenant_id": boleto_bb.tenant_id, "id": id}
+        )
 
-            boleto_bb_req = BoletoBBRequestDetails(**boleto_bb_req_in_db)
+        boleto_bb_req = banking_profile.get_request_details(id=id, numero=boleto_bb.numero)
 
-            token = await self.boleto_bb_service.get_access_token_bb(
-                client_id=boleto_bb_req.client_id,
-                client_secret=boleto_bb_req.client_secret,
-                gw_dev_app_key=boleto_bb_req.developer_application_key,
+        # short local update committed before the BB call, undone if BB refuses the baixa
+        query_update = statements.get(
+            ("boletos_bb", "update_data_hora_baixa_by_id"), self.__get_update_data_hora_baixa_query_by_id
+        )
+        boleto_bb_in_db = await self.db.fetch_one(
+            query=query_update,
+            values={"id": id, "data_hora_baixa": datetime.datetime.now()},
+        )
+
+        await self.release_connection()
+        try:
+            await self.boleto_bb_service.baixar_boleto_bb(
+                boleto_bb_req=boleto_bb_req,
+                boleto_bb_baixar=boleto_bb_baixar,
                 token_bb_redis_repo=token_bb_redis_repo,
             )
+        except Exception as e:
+            await self.__undo_or_mark_to_sync(
+                error=e,
+                tenant_id=boleto_bb.tenant_id,
+                id=id,
+                query_update=query_update,
+                values={"id": id, "data_hora_baixa": boleto_bb_datas["data_hora_baixa"]},
+            )
+            raise
 
-            headers = {
-                "Authorization": f"Bearer {token.access_token}",
-                "Content-Type": "application/json",
-            }
-
-            params = {
-                "gw-dev-app-key": boleto_bb_req.developer_application_key,
-            }
+        return boleto_bb_in_db
 
-            query_update = self.__get_update_data_hora_baixa_query_by_id(id=id)
-            boleto_bb_in_db = await self.db.fetch_one(
-                query=query_update.get_sql(),
-                values={"id": id, "data_hora_baixa": datetime.datetime.now()},
-            )
+    async def get_convenios_with_open_boletos_bb(self, *, grace_days: int) -> List[UUID4]:
+        rows = await self.db.fetch_all(
+            query=GET_CONVENIOS_WITH_OPEN_BOLETOS_BB_QUERY, values={"grace_days": grace_days}
+        )
 
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.post(
-                    url=f"{BB_API_URL}/boletos/{boleto_bb_req.numero}/baixar",
-                    params=params,
-                    ssl=ssl.SSLContext(),
-                    data=boleto_bb_baixar.json(),
-                ) as response:
-                    result = await response.json()
+        return [row["convenio_bancario_id"] for row in rows]
+
+    async def get_open_boletos_bb_to_sync(
+        self, *, convenio_bancario_id: UUID4, grace_days: int, min_age: float, limit: int
+    ) -> List[BoletoBBRequestDetails]:
+        """
+        Open boletos of the convenio not synchronized in the last min_age seconds, nearest due date first.
+        """
+        rows = await self.db.fetch_all(
+            query=GET_OPEN_BOLETOS_BB_TO_SYNC_QUERY,
+            values={
+                "convenio_bancario_id": convenio_bancario_id,
+                "grace_days": grace_days,
+                "min_age": min_age,
+                "limit": limit,
+            },
+        )
 
-                    if response.status != status.HTTP_200_OK:
-                        return result
+        return [BoletoBBRequestDetails(**row) for row in rows]
+
+    async def update_boletos_bb_sync(self, *, boletos_sync: List[BoletoBBSync]) -> None:
+        """
+        Save the payment data returned by BB, one UPDATE ... FROM (VALUES ...) per chunk of BB_BATCH_INSERT_CHUNK.
+        """
+        for chunk in self.__chunks(boletos_sync, BB_BATCH_INSERT_CHUNK):
+            values = {}
+            for i, boleto_sync in enumerate(chunk):
+                values.update({f"{column}_{i}": value for column, value in boleto_sync.dict().items()})
+
+            await self.db.execute(
+                query=statements.get(
+                    ("boletos_bb", "update_sync_bulk", len(chunk)),
+                    lambda: self.__get_update_boletos_bb_sync_bulk_query(size=len(chunk)),
+                ),
+                values=values,
+            )
 
-                    return boleto_bb_in_db
+    async def complete_boleto_bb_registration_from_consulta(
+        self, *, boleto_in_bd: BoletoBBInDB, boleto_bb_response: dict
+    ) -> None:
+        """
+        Mark as registered a boleto found in BB whose registration answer was lost (timeout).
+        The consulta does not return the QR code, so it stays empty.
+        """
+        boleto_in_bd.linha_digitavel = boleto_bb_response.get("codigoLinhaDigitavel")
+        boleto_in_bd.codigo_barra_numerico = boleto_bb_response.get("textoCodigoBarrasTituloCobranca")
+        boleto_in_bd.numero_contrato_cobranca = boleto_bb_response.get("numeroContratoCobranca")
+        boleto_in_bd.registro_status = RegistroStatus.registered
+
+        await self.db.execute(
+            query=statements.get(("boletos_bb", "update"), self.__get_update_boleto_bb_query),
+            values=boleto_in_bd.dict(exclude={"pagador", "beneficiario", "qr_code", "created_at", "updated_at"}),
+        )
 
     async def delete_boleto_bb_by_id(self, *, tenant_id: UUID4, id: UUID4) -> UUID4:
         deleted_id = await self.db.execute(
@@ -550,7 +1309,7 @@ class BoletosBBRepository(BaseRepository):
 
         return deleted_id
 
-    def __get_update_data_vencimento_query_by_id(self, *, id: UUID4) -> str:
+    def __get_update_data_vencimento_query_by_id(self) -> Query:
         boletos_bb_table = Table(self.tablename)
         update_query = Query.update(boletos_bb_table)
         update_query = update_query.set(Field("data_vencimento"), Parameter(":data_vencimento"))
@@ -559,7 +1318,7 @@ class BoletosBBRepository(BaseRepository):
 
         return update_query
 
-    def __get_update_data_hora_baixa_query_by_id(self, *, id: UUID4) -> str:
+    def __get_update_data_hora_baixa_query_by_id(self) -> Query:
         boletos_bb_table = Table(self.tablename)
         update_query = Query.update(boletos_bb_table)
         update_query = update_query.set(Field("data_hora_baixa"), Parameter(":data_hora_baixa"))
@@ -568,79 +1327,6 @@ class BoletosBBRepository(BaseRepository):
 
         return update_query
 
-    def __get_create_boleto_bb_query(self):
-        # Constrói a consulta
-        query = (
-            Query.into(self.table_boletos_bb)
-            .columns(
-                self.table_boletos_bb.tenant_id,
-                self.table_boletos_bb.convenio_bancario_id,
-                self.table_boletos_bb.pagador_bb_id,
-                self.table_boletos_bb.numero_titulo_beneficiario,
-                self.table_boletos_bb.data_emissao,
-                self.table_boletos_bb.data_vencimento,
-                self.table_boletos_bb.data_baixa_automatico,
-                self.table_boletos_bb.valor_original,
-                self.table_boletos_bb.valor_desconto,
-                self.table_boletos_bb.descricao_tipo_titulo,
-                self.table_boletos_bb.numero,
-                self.table_boletos_bb.mensagem_beneficiario,
-                self.table_boletos_bb.codigo_cliente,
-                self.table_boletos_bb.linha_digitavel,
-                self.table_boletos_bb.codigo_barra_numerico,
-                self.table_boletos_bb.numero_contrato_cobranca,
-            )
-            .insert(
-                Parameter(":tenant_id"),
-                Parameter(":convenio_bancario_id"),
-                Parameter(":pagador_bb_id"),
-                Parameter(":numero_titulo_beneficiario"),
-                Parameter(":data_emissao"),
-                Parameter(":data_vencimento"),
-                Parameter(":data_baixa_automatico"),
-                Parameter(":valor_original"),
-                Parameter(":valor_desconto"),
-                Parameter(":descricao_tipo_titulo"),
-                Parameter(":numero"),
-                Parameter(":mensagem_beneficiario"),
-                Parameter(":codigo_cliente"),
-                Parameter(":linha_digitavel"),
-                Parameter(":codigo_barra_numerico"),
-                Parameter(":numero_contrato_cobranca"),
-            )
-            .returning(
-                self.table_boletos_bb.id,
-                self.table_boletos_bb.tenant_id,
-                self.table_boletos_bb.convenio_bancario_id,
-                self.table_boletos_bb.pagador_bb_id,
-                self.table_boletos_bb.numero_titulo_beneficiario,
-                self.table_boletos_bb.data_emissao,
-                self.table_boletos_bb.data_vencimento,
-                self.table_boletos_bb.data_recebimento,
-                self.table_boletos_bb.data_credito,
-                self.table_boletos_bb.data_baixa_automatico,
-                self.table_boletos_bb.valor_original,
-                self.table_boletos_bb.valor_desconto,
-                self.table_boletos_bb.valor_pago_sacado,
-                self.table_boletos_bb.valor_credito_cedente,
-                self.table_boletos_bb.valor_desconto_utilizado,
-                self.table_boletos_bb.valor_multa_recebido,
-                self.table_boletos_bb.valor_juros_recebido,
-                self.table_boletos_bb.descricao_tipo_titulo,
-                self.table_boletos_bb.numero,
-                self.table_boletos_bb.mensagem_beneficiario,
-                self.table_boletos_bb.codigo_cliente,
-                self.table_boletos_bb.linha_digitavel,
-                self.table_boletos_bb.codigo_barra_numerico,
-                self.table_boletos_bb.numero_contrato_cobranca,
-                self.table_boletos_bb.created_at,
-                self.table_boletos_bb.updated_at,
-            )
-        )
-
-        # return pypika query
-        return query
-
     def __get_update_boleto_bb_query(self):
         # Constrói a consulta
         query = (
@@ -667,6 +1353,7 @@ class BoletosBBRepository(BaseRepository):
             .set(self.table_boletos_bb.linha_digitavel, Parameter(":linha_digitavel"))
             .set(self.table_boletos_bb.codigo_barra_numerico, Parameter(":codigo_barra_numerico"))
             .set(self.table_boletos_bb.numero_contrato_cobranca, Parameter(":numero_contrato_cobranca"))
+            .set(self.table_boletos_bb.registro_status, Parameter(":registro_status"))
             .where(
                 (self.table_boletos_bb.tenant_id == Parameter(":tenant_id"))
                 & (self.table_boletos_bb.id == Parameter(":id"))
@@ -695,6 +1382,7 @@ class BoletosBBRepository(BaseRepository):
                 self.table_boletos_bb.linha_digitavel,
                 self.table_boletos_bb.codigo_barra_numerico,
                 self.table_boletos_bb.numero_contrato_cobranca,
+                self.table_boletos_bb.registro_status,
                 self.table_boletos_bb.created_at,
                 self.table_boletos_bb.updated_at,
             )
@@ -702,119 +1390,95 @@ class BoletosBBRepository(BaseRepository):
 
         return query
 
-    def __get_create_pagador_bb_query(self):
-        # Constrói a consulta
-        query = (
-            Query.into(self.table_pagadores_bb)
-            .columns(
-                self.table_pagadores_bb.tenant_id,
-                self.table_pagadores_bb.tipo_inscricao,
-                self.table_pagadores_bb.cpf_cnpj,
-                self.table_pagadores_bb.nome,
-                self.table_pagadores_bb.endereco,
-                self.table_pagadores_bb.cep,
-                self.table_pagadores_bb.cidade,
-                self.table_pagadores_bb.bairro,
-                self.table_pagadores_bb.uf,
-                self.table_pagadores_bb.telefone,
-            )
-            .insert(
-                Parameter(":tenant_id"),
-                Parameter(":tipo_inscricao"),
-                Parameter(":cpf_cnpj"),
-                Parameter(":nome"),
-                Parameter(":endereco"),
-                Parameter(":cep"),
-                Parameter(":cidade"),
-                Parameter(":bairro"),
-                Parameter(":uf"),
-                Parameter(":telefone"),
-            )
-            .returning(
-                self.table_pagadores_bb.id,
-                self.table_pagadores_bb.tenant_id,
-                self.table_pagadores_bb.tipo_inscricao,
-                self.table_pagadores_bb.cpf_cnpj,
-                self.table_pagadores_bb.nome,
-                self.table_pagadores_bb.endereco,
-                self.table_pagadores_bb.cep,
-                self.table_pagadores_bb.cidade,
-                self.table_pagadores_bb.bairro,
-                self.table_pagadores_bb.uf,
-                self.table_pagadores_bb.telefone,
-                self.table_pagadores_bb.created_at,
-                self.table_pagadores_bb.updated_at,
-            )
+    def __get_create_boletos_bb_bulk_query(self, *, size: int):
+        columns = [
+            "tenant_id",
+            "convenio_bancario_id",
+            "pagador_bb_id",
+            "numero_titulo_beneficiario",
+            "data_emissao",
+            "data_vencimento",
+            "data_baixa_automatico",
+            "valor_original",
+            "valor_desconto",
+            "descricao_tipo_titulo",
+            "numero",
+            "mensagem_beneficiario",
+            "codigo_cliente",
+            "linha_digitavel",
+            "codigo_barra_numerico",
+            "numero_contrato_cobranca",
+            "registro_status",
+        ]
+
+        query = Query.into(self.table_boletos_bb).columns(*columns)
+        for i in range(size):
+            query = query.insert(*[Parameter(f":{column}_{i}") for column in columns])
+
+        query = query.on_conflict(
+            self.table_boletos_bb.convenio_bancario_id, self.table_boletos_bb.numero_titulo_beneficiario
+        ).do_nothing()
+
+        return query.returning("*")
+
+    def __get_upsert_pagadores_bb_bulk_query(self, *, size: int):
+        columns = [
+            "tenant_id",
+            "tipo_inscricao",
+            "cpf_cnpj",
+            "nome",
+            "endereco",
+            "cep",
+            "cidade",
+            "bairro",
+            "uf",
+            "telefone",
+            "dedupe_key",
+        ]
+
+        query = Query.into(self.table_pagadores_bb).columns(*columns)
+        for i in range(size):
+            query = query.insert(*[Parameter(f":{column}_{i}") for column in columns])
+
+        query = query.on_conflict(self.table_pagadores_bb.tenant_id, self.table_pagadores_bb.dedupe_key).do_update(
+            self.table_pagadores_bb.dedupe_key
         )
 
-        # retorna query
-        return query
+        return query.returning("*")
 
-    def __get_select_pagadores_bb_query(self):
-        # Construir a consulta
-        query = (
-            Query()
-            .select(
-                self.table_pagadores_bb.id,
-                self.table_pagadores_bb.tenant_id,
-                self.table_pagadores_bb.tipo_inscricao,
-                self.table_pagadores_bb.cpf_cnpj,
-                self.table_pagadores_bb.nome,
-                self.table_pagadores_bb.endereco,
-                self.table_pagadores_bb.cep,
-                self.table_pagadores_bb.cidade,
-                self.table_pagadores_bb.bairro,
-                self.table_pagadores_bb.uf,
-                self.table_pagadores_bb.telefone,
-                self.table_pagadores_bb.created_at,
-                self.table_pagadores_bb.updated_at,
-            )
-            .from_(self.table_pagadores_bb)
-            .where(
-                (self.table_pagadores_bb.tenant_id == Parameter(":tenant_id"))
-                & (self.table_pagadores_bb.cpf_cnpj == Parameter(":cpf_cnpj"))
-                & (self.table_pagadores_bb.cep == Parameter(":cep"))
-                & (self.table_pagadores_bb.endereco == Parameter(":endereco"))
-                & (self.table_pagadores_bb.telefone == Parameter(":telefone"))
-            )
+    def __get_create_qr_codes_bb_bulk_query(self, *, size: int):
+        columns = ["tenant_id", "boleto_bb_id", "url", "tx_id", "emv"]
+
+        query = Query.into(Table("qr_codes_bb")).columns(*columns)
+        for i in range(size):
+            query = query.insert(*[Parameter(f":{column}_{i}") for column in columns])
+
+        return query.returning("*")
+
+    def __get_update_boletos_bb_sync_bulk_query(self, *, size: int) -> str:
+        # pypika does not build UPDATE ... FROM (VALUES ...), the casts type the parameters of the VALUES list
+        columns = {"id": "uuid", **SYNC_BOLETOS_BB_COLUMNS, "data_vencimento": "date"}
+        rows = ", ".join(
+            "(" + ", ".join(f"CAST(:{column}_{i} AS {type_})" for column, type_ in columns.items()) + ")"
+            for i in range(size)
         )
+        sets = ", ".join(f"{column} = v.{column}" for column in SYNC_BOLETOS_BB_COLUMNS)
+        names = ", ".join(columns)
 
-        return query
+        return f"""
+            UPDATE boletos_bb AS b
+            SET {sets}, {SYNC_BOLETOS_BB_UNCONFIRMED_SETS}, data_hora_sincronizacao = now()
+            FROM (VALUES {rows}) AS v({names})
+            WHERE b.id = v.id
+        """
 
-    def __get_boleto_bb_by_seu_numero_query(self):
+    def __get_delete_boletos_bb_by_ids_query(self, *, size: int):
         query = (
             Query.from_(self.table_boletos_bb)
-            .select(
-                self.table_boletos_bb.id,
-                self.table_boletos_bb.tenant_id,
-                self.table_boletos_bb.convenio_bancario_id,
-                self.table_boletos_bb.pagador_bb_id,
-                self.table_boletos_bb.numero_titulo_beneficiario,
-                self.table_boletos_bb.data_emissao,
-                self.table_boletos_bb.data_vencimento,
-                self.table_boletos_bb.data_recebimento,
-                self.table_boletos_bb.data_credito,
-                self.table_boletos_bb.data_baixa_automatico,
-                self.table_boletos_bb.valor_original,
-                self.table_boletos_bb.valor_desconto,
-                self.table_boletos_bb.valor_pago_sacado,
-                self.table_boletos_bb.valor_credito_cedente,
-                self.table_boletos_bb.valor_desconto_utilizado,
-                self.table_boletos_bb.valor_multa_recebido,
-                self.table_boletos_bb.valor_juros_recebido,
-                self.table_boletos_bb.descricao_tipo_titulo,
-                self.table_boletos_bb.numero,
-                self.table_boletos_bb.mensagem_beneficiario,
-                self.table_boletos_bb.codigo_cliente,
-                self.table_boletos_bb.linha_digitavel,
-                self.table_boletos_bb.codigo_barra_numerico,
-                self.table_boletos_bb.numero_contrato_cobranca,
-                self.table_boletos_bb.created_at,
-                self.table_boletos_bb.updated_at,
-            )
+            .delete()
             .where(
                 (self.table_boletos_bb.tenant_id == Parameter(":tenant_id"))
-                & (self.table_boletos_bb.numero_titulo_beneficiario == Parameter(":numero_titulo_beneficiario"))
+                & self.table_boletos_bb.id.isin([Parameter(f":id_{i}") for i in range(size)])
             )
         )
 
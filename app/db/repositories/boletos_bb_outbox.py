@@ -0,0 +1,99 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import UUID4
+
+from databases.core import Database
+from app.db.repositories.base import BaseRepository
+from app.schemas.bancos.boleto_bb_outbox import BoletoBBOutboxInDB
+
+
+# entries whose worker died while processing are taken again after :stale_after seconds
+CLAIM_BOLETOS_BB_OUTBOX_QUERY = """
+    UPDATE boletos_bb_outbox
+    SET status = 'processing', locked_at = now(), attempts = attempts + 1
+    WHERE id IN (
+        SELECT id
+        FROM boletos_bb_outbox
+        WHERE
+            (status = 'pending' AND next_attempt_at <= now())
+            OR (status = 'processing' AND locked_at < now() - make_interval(secs => :stale_after))
+        ORDER BY next_attempt_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING
+        id, tenant_id, boleto_bb_id, operation, status, attempts, next_attempt_at, locked_at, last_error, \
+            created_at, updated_at;
+"""
+
+
+# locked_at is the claim: an entry taken again by another worker (stale) is not refreshed
+REFRESH_CLAIM_BOLETO_BB_OUTBOX_QUERY = """
+    UPDATE boletos_bb_outbox
+    SET locked_at = now()
+    WHERE id = :id AND status = 'processing' AND locked_at = :locked_at
+    RETURNING locked_at;
+"""
+
+
+MARK_DONE_BOLETO_BB_OUTBOX_QUERY = """
+    UPDATE boletos_bb_outbox
+    SET status = 'done', locked_at = NULL, last_error = NULL
+    WHERE id = :id;
+"""
+
+
+SCHEDULE_RETRY_BOLETO_BB_OUTBOX_QUERY = """
+    UPDATE boletos_bb_outbox
+    SET status = 'pending', locked_at = NULL, last_error = :last_error, \
+        next_attempt_at = now() + make_interval(secs => :delay)
+    WHERE id = :id;
+"""
+
+
+MARK_DEAD_BOLETO_BB_OUTBOX_QUERY = """
+    UPDATE boletos_bb_outbox
+    SET status = 'dead', locked_at = NULL, last_error = :last_error
+    WHERE id = :id;
+"""
+
+
+class BoletosBBOutboxRepository(BaseRepository):
+    """
+    Outbox of the BB operations done in background.
+    An entry is written in the same transaction as its boleto and drained by the outbox workers.
+    """
+
+    def __init__(self, db: Database) -> None:
+        super().__init__(db)
+        self.tablename = "boletos_bb_outbox"
+
+    async def claim_entries(self, *, limit: int, stale_after: float) -> List[BoletoBBOutboxInDB]:
+        """
+        Take up to limit entries ready to run, concurrent workers never get the same entry (SKIP LOCKED).
+        """
+        entries = await self.db.fetch_all(
+            query=CLAIM_BOLETOS_BB_OUTBOX_QUERY, values={"limit": limit, "stale_after": stale_after}
+        )
+
+        return [BoletoBBOutboxInDB(**entry) for entry in entries]
+
+    async def refresh_claim(self, *, id: UUID4, locked_at: datetime) -> Optional[datetime]:
+        """
+        Renew the claim of an entry before processing it, so it doesn't go stale while the rest of the batch runs.
+        :return: the new locked_at, None when the claim was lost
+        """
+        return await self.db.fetch_val(
+            query=REFRESH_CLAIM_BOLETO_BB_OUTBOX_QUERY, values={"id": id, "locked_at": locked_at}
+        )
+
+    async def mark_done(self, *, id: UUID4) -> None:
+        await self.db.execute(query=MARK_DONE_BOLETO_BB_OUTBOX_QUERY, values={"id": id})
+
+    async def schedule_retry(self, *, id: UUID4, delay: float, last_error: str) -> None:
+        await self.db.execute(
+            query=SCHEDULE_RETRY_BOLETO_BB_OUTBOX_QUERY, values={"id": id, "delay": delay, "last_error": last_error}
+        )
+
+    async def mark_dead(self, *, id: UUID4, last_error: str) -> None:
+        await self.db.execute(query=MARK_DEAD_BOLETO_BB_OUTBOX_QUERY, values={"id": id, "last_error": last_error})
@@ -9,6 +9,8 @@ from app.schemas.bancos.conta_bancaria import (
 
 from databases.core import Database
 from app.db.repositories.base import BaseRepository
+from app.db.statements import statements
+from app.schemas.enums import CacheEntity, CountStrategy, PaginationMode
 from app.schemas.page import PageModel
 from app.schemas.token import Token
 
@@ -17,6 +19,9 @@ from app.services import auth_service
 from pypika import Query, Table, Parameter
 
 
+# sorts allowed in cursor pagination, each one backed by an index (tenant_id, field, id)
+CONTAS_BANCARIAS_CURSOR_FIELDS = {"created_at": Table("contas_bancarias").created_at}
+
 CREATE_BANK_ACCOUNT_QUERY = """
     INSERT INTO contas_bancarias (tenant_id, nome, banco_id, tipo, agencia, agencia_dv, numero_conta, numero_conta_dv, \
         client_id, client_secret, developer_application_key, is_active)
@@ -97,7 +102,34 @@ class ContasBancariasRepository(BaseRepository):
         per_page: int = 10,
         filters: List[str],
         sorts: Optional[str],
+        pagination: PaginationMode = PaginationMode.offset,
+        cursor: Optional[str] = None,
+        count_strategy: CountStrategy = CountStrategy.exact,
     ) -> PageModel:
+        contas_bancarias = Table("contas_bancarias")
+        select_query = statements.get_query(
+            ("contas_bancarias", "list_select"), self.__get_contas_bancarias_select_query
+        )
+        count_query = statements.get_query(("contas_bancarias", "list_count"), self.__get_contas_bancarias_count_query)
+
+        return await self.get_page_by_params(
+            table=contas_bancarias,
+            select_query=select_query,
+            count_query=count_query,
+            tenant_id=tenant_id,
+            filters=filters,
+            sorts=sorts,
+            current_page=current_page,
+            per_page=per_page,
+            type_schema=ContaBancariaForList,
+            pagination=pagination,
+            cursor=cursor,
+            cursor_fields=CONTAS_BANCARIAS_CURSOR_FIELDS,
+            count_strategy=count_strategy,
+            statement_key="contas_bancarias:list",
+        )
+
+    def __get_contas_bancarias_select_query(self) -> Query:
         contas_bancarias = Table("contas_bancarias")
         select_query = (
             Query.from_(contas_bancarias)
@@ -121,22 +153,16 @@ class ContasBancariasRepository(BaseRepository):
             .where(contas_bancarias.tenant_id == Parameter(":tenant_id"))
         )
 
+        return select_query
+
+    def __get_contas_bancarias_count_query(self) -> Query:
+        contas_bancarias = Table("contas_bancarias")
         count_query = Query.from_(contas_bancarias).where(contas_bancarias.tenant_id == Parameter(":tenant_id"))
 
-        return await self.get_page_by_params(
-            table=contas_bancarias,
-            select_query=select_query,
-            count_query=count_query,
-            tenant_id=tenant_id,
-            filters=filters,
-            sorts=sorts,
-            current_page=current_page,
-            per_page=per_page,
-            type_schema=ContaBancariaForList,
-        )
+        return count_query
 
     async def get_conta_bancaria_by_id(self, *, tenant_id: UUID4, id: UUID4):
-        conta_bancaria = await self.db.fetch_one(
+        conta_bancaria = await self.db_read.fetch_one(
             query=GET_BANK_ACCOUNT_BY_ID_QUERY, values={"tenant_id": tenant_id, "id": id}
         )
 
@@ -153,6 +179,7 @@ class ContasBancariasRepository(BaseRepository):
             query=UPDATE_CONTA_BANCARIA_BY_ID_QUERY,
             values=conta_bancaria_update_params.dict(exclude={"created_at", "updated_at"}),
         )
+        await self.publish_invalidation(CacheEntity.conta_bancaria, conta_bancaria.id, conta_bancaria.tenant_id)
 
         return conta_bancaria_updated
 
@@ -160,5 +187,6 @@ class ContasBancariasRepository(BaseRepository):
         deleted_id = await self.db.execute(
             query=DELETE_CONTA_BANCARIA_BY_ID_QUERY, values={"tenant_id": tenant_id, "id": id}
         )
+        await self.publish_invalidation(CacheEntity.conta_bancaria, id, tenant_id)
 
         return deleted_id
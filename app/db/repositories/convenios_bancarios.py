@@ -1,5 +1,7 @@
 from fastapi import HTTPException, status
 from pydantic.types import UUID4, List, Optional
+from app.schemas.bancos.banking_profile import BankingProfile
+from app.schemas.bancos.conta_bancaria import ContaBancariaInDB
 from app.schemas.bancos.convenio_bancario import (
     ConvenioBancarioCreate,
     ConvenioBancarioForList,
@@ -10,6 +12,8 @@ from app.schemas.bancos.convenio_bancario import (
 
 from databases.core import Database
 from app.db.repositories.base import BaseRepository
+from app.db.statements import statements
+from app.schemas.enums import CacheEntity, CountStrategy, PaginationMode
 from app.schemas.page import PageModel
 from app.schemas.token import Token
 
@@ -18,6 +22,57 @@ from app.services import auth_service
 from pypika import Query, Table, Tables, Parameter
 
 
+# sorts allowed in cursor pagination, each one backed by an index (tenant_id, field, id)
+CONVENIOS_BANCARIOS_CURSOR_FIELDS = {"created_at": Table("convenios_bancarios").created_at}
+
+# columns of the banking profile, the ones of the conta are prefixed ("conta__id")
+BANKING_PROFILE_COLUMNS = {
+    "convenio": [
+        "id",
+        "tenant_id",
+        "conta_bancaria_id",
+        "numero_convenio",
+        "numero_carteira",
+        "numero_variacao_carteira",
+        "numero_dias_limite_recebimento",
+        "descricao_tipo_titulo",
+        "percentual_multa",
+        "percentual_juros",
+        "is_active",
+        "created_at",
+        "updated_at",
+    ],
+    "conta": [
+        "id",
+        "nome",
+        "tenant_id",
+        "banco_id",
+        "tipo",
+        "agencia",
+        "agencia_dv",
+        "numero_conta",
+        "numero_conta_dv",
+        "client_id",
+        "client_secret",
+        "developer_application_key",
+        "is_active",
+        "created_at",
+        "updated_at",
+    ],
+}
+
+GET_BANKING_PROFILE_QUERY = f"""
+    SELECT
+        {", ".join(f"cv.{column}" for column in BANKING_PROFILE_COLUMNS["convenio"])},
+        {", ".join(f"cc.{column} AS conta__{column}" for column in BANKING_PROFILE_COLUMNS["conta"])}
+    FROM
+        convenios_bancarios cv
+        INNER JOIN contas_bancarias cc ON cc.tenant_id = cv.tenant_id AND cc.id = cv.conta_bancaria_id
+    WHERE
+        cv.tenant_id = :tenant_id
+        AND cv.id = :id;
+"""
+
 CREATE_CONVENIO_BANCARIO_QUERY = """
     INSERT INTO convenios_bancarios (tenant_id, conta_bancaria_id, numero_convenio, numero_carteira, \
         numero_variacao_carteira, numero_dias_limite_recebimento, descricao_tipo_titulo, percentual_multa, \
@@ -112,9 +167,12 @@ class ConveniosBancariosRepository(BaseRepository):
         per_page: int = 10,
         filters: List[str],
         sorts: Optional[str],
+        pagination: PaginationMode = PaginationMode.offset,
+        cursor: Optional[str] = None,
+        count_strategy: CountStrategy = CountStrategy.exact,
     ) -> PageModel:
-        select_query = await self.__get_orders_select_query()
-        count_query = await self.__get_orders_count_query()
+        select_query = statements.get_query(("convenios_bancarios", "list_select"), self.__get_orders_select_query)
+        count_query = statements.get_query(("convenios_bancarios", "list_count"), self.__get_orders_count_query)
 
         convenios_bancarios = Table("convenios_bancarios")
 
@@ -128,10 +186,15 @@ class ConveniosBancariosRepository(BaseRepository):
             current_page=current_page,
             per_page=per_page,
             type_schema=ConvenioBancarioForList,
+            pagination=pagination,
+            cursor=cursor,
+            cursor_fields=CONVENIOS_BANCARIOS_CURSOR_FIELDS,
+            count_strategy=count_strategy,
+            statement_key="convenios_bancarios:list",
         )
 
     async def get_convenio_bancario_by_id(self, *, tenant_id: UUID4, id: UUID4):
-        back_account = await self.db.fetch_one(
+        back_account = await self.db_read.fetch_one(
             query=GET_CONVENIO_BANCARIO_BY_ID_QUERY, values={"tenant_id": tenant_id, "id": id}
         )
 
@@ -142,6 +205,20 @@ class ConveniosBancariosRepository(BaseRepository):
             )
         return ConvenioBancarioInDB(**back_account)
 
+    async def get_banking_profile(self, *, tenant_id: UUID4, id: UUID4) -> Optional[BankingProfile]:
+        """
+        Convenio and its conta in one statement, for BankingProfileCache. Read from the primary: the profile is
+        kept until invalidated, a lagging replica could hand back the row just changed.
+        """
+        row = await self.db.fetch_one(query=GET_BANKING_PROFILE_QUERY, values={"tenant_id": tenant_id, "id": id})
+        if not row:
+            return None
+
+        return BankingProfile(
+            convenio=ConvenioBancarioInDB(**{column: row[column] for column in BANKING_PROFILE_COLUMNS["convenio"]}),
+            conta=ContaBancariaInDB(**{column: row[f"conta__{column}"] for column in BANKING_PROFILE_COLUMNS["conta"]}),
+        )
+
     async def update_convenio_bancario_by_id(
         self, *, convenio_bancario: ConvenioBancarioInDB, convenio_bancario_update: ConvenioBancarioUpdate
     ) -> ConvenioBancarioInDB:
@@ -152,6 +229,9 @@ class ConveniosBancariosRepository(BaseRepository):
             query=UPDATE_CONVENIO_BANCARIO_BY_ID_QUERY,
             values=convenio_bancario_update_params.dict(exclude={"created_at", "updated_at"}),
         )
+        await self.publish_invalidation(
+            CacheEntity.convenio_bancario, convenio_bancario.id, convenio_bancario.tenant_id
+        )
 
         return convenio_bancario_updated
 
@@ -159,10 +239,11 @@ class ConveniosBancariosRepository(BaseRepository):
         deleted_id = await self.db.execute(
             query=DELETE_CONVENIO_BANCARIO_BY_ID_QUERY, values={"tenant_id": tenant_id, "id": id}
         )
+        await self.publish_invalidation(CacheEntity.convenio_bancario, id, tenant_id)
 
         return deleted_id
 
-    async def __get_orders_count_query(self) -> Query:
+    def __get_orders_count_query(self) -> Query:
         convenios_bancarios, contas_bancarias = Tables(
             "convenios_bancarios",
             "contas_bancarias",
@@ -177,7 +258,7 @@ class ConveniosBancariosRepository(BaseRepository):
 
         return count_query
 
-    async def __get_orders_select_query(self) -> Query:
+    def __get_orders_select_query(self) -> Query:
         convenios_bancarios, contas_bancarias = Tables(
             "convenios_bancarios",
             "contas_bancarias",
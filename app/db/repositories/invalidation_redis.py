@@ -0,0 +1,42 @@
+from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+
+from app.core.config import REDIS_PREFIX
+from app.db.repositories.base_redis import BaseRedisRepository
+
+INVALIDATION_CHANNEL = f"{REDIS_PREFIX}:invalidation"
+INVALIDATION_SEQUENCE_KEY = f"{REDIS_PREFIX}:invalidation:seq"
+
+# the sequence and the message in one atomic step, so the subscribers receive the sequences in order
+# and a missing number means a lost message
+PUBLISH_SCRIPT = """
+local seq = redis.call("INCR", KEYS[1])
+redis.call("PUBLISH", ARGV[1], seq .. "|" .. ARGV[2])
+return seq
+"""
+
+
+class InvalidationRedisRepository(BaseRedisRepository):
+    def __init__(self, redis: Redis) -> None:
+        super().__init__(redis)
+        self._publish = redis.register_script(PUBLISH_SCRIPT)
+
+    async def publish(self, *, data: str) -> int:
+        """
+        Publish an invalidation to the workers subscribed to the channel.
+        :return: int: sequence of the message
+        """
+        seq = await self._publish(keys=[INVALIDATION_SEQUENCE_KEY], args=[INVALIDATION_CHANNEL, data])
+        return int(seq)
+
+    async def get_sequence(self) -> int:
+        """
+        Sequence of the last message published.
+        """
+        seq = await self._redis.get(INVALIDATION_SEQUENCE_KEY)
+        return int(seq or 0)
+
+    async def subscribe(self) -> PubSub:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        return pubsub
@@ -1,8 +1,13 @@
+from typing import Optional, Tuple
+from pydantic.types import UUID4
 from app.db.repositories.base_redis import BaseRedisRepository
 from redis.asyncio import Redis
 from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES_AUTH, REDIS_PREFIX
 from app.schemas.tenant import TenantInDB, TenantRedis
 
+# value of an api key cached as unknown (negative cache)
+TENANT_NOT_FOUND = "-"
+
 
 class TenantsRedisRepository(BaseRedisRepository):
     def __init__(self, redis: Redis) -> None:
@@ -88,14 +93,69 @@ class TenantsRedisRepository(BaseRedisRepository):
         tenant = await self.get_tenant_by_subdomain_and_domain(subdomain, domain)
 
         if tenant:
-            await self._redis.delete(f"{REDIS_PREFIX}:{key}")
+            await self._redis.delete(key)
 
     async def expire_tenant_by_subdomain_and_domain(self, subdomain: str, domain: str, seconds: int = 60):  # 1min
         key = self.__get_key_by_subdomain_and_domain(subdomain, domain)
-        await self._redis.expire(f"{REDIS_PREFIX}:{key}", seconds)
+        await self._redis.expire(key, seconds)
+
+    async def get_cached_tenant(self, api_key_hash: str) -> Tuple[bool, Optional[TenantInDB]]:
+        """
+        Get the full tenant of the X-API-Key authentication.
+        :param api_key_hash: sha256 of the api key, Redis never holds the credential
+        :return: tuple: (cached, tenant or None when the api key is cached as unknown).
+            The api_key of the tenant is not cached, the caller sets it from the request
+        """
+        data = await self._redis.get(self.__get_key_by_api_key_hash(api_key_hash))
+
+        if data is None:
+            return False, None
+
+        if data == TENANT_NOT_FOUND:
+            return True, None
+
+        return True, TenantInDB.parse_raw(data)
+
+    async def set_cached_tenant(self, *, api_key_hash: str, tenant: Optional[TenantInDB], expires_in: int) -> None:
+        """
+        Cache the tenant of the api key, or the api key as unknown when tenant is None.
+        The api key itself is left out of the cached tenant, only its hash is stored.
+        The id -> api key index lets the tenant be invalidated by its id.
+        :param expires_in: seconds
+        """
+        key = self.__get_key_by_api_key_hash(api_key_hash)
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            if tenant:
+                pipe.set(key, tenant.json(exclude={"api_key"}), ex=expires_in)
+                pipe.set(self.__get_key_by_tenant_id(tenant.id), api_key_hash, ex=expires_in)
+            else:
+                pipe.set(key, TENANT_NOT_FOUND, ex=expires_in)
+            await pipe.execute()
+
+    async def remove_cached_tenant(self, *, id: UUID4, api_key_hash: Optional[str] = None) -> None:
+        """
+        Remove the cached tenant by its id, and by the api key it had when given (the api key can change).
+        """
+        index_key = self.__get_key_by_tenant_id(id)
+        keys = {index_key}
+        if api_key_hash:
+            keys.add(self.__get_key_by_api_key_hash(api_key_hash))
+
+        cached_api_key_hash = await self._redis.get(index_key)
+        if cached_api_key_hash:
+            keys.add(self.__get_key_by_api_key_hash(cached_api_key_hash))
+
+        await self._redis.delete(*keys)
 
     def __get_key_by_subdomain_and_domain(senf, subdomain: str, domain: str):
         return f"{REDIS_PREFIX}:{subdomain}_{domain.replace('.', '_')}"
 
     def __get_key_by_api_key(senf, api_key: str):
         return f"{REDIS_PREFIX}:{api_key}"
+
+    def __get_key_by_api_key_hash(self, api_key_hash: str):
+        return f"{REDIS_PREFIX}:tenant:api_key:{api_key_hash}"
+
+    def __get_key_by_tenant_id(self, id: UUID4):
+        return f"{REDIS_PREFIX}:tenant:id:{id}"
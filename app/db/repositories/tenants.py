@@ -3,6 +3,7 @@ from typing import List
 from fastapi import HTTPException, UploadFile, status
 from pydantic.types import UUID4
 
+from app.schemas.enums import CacheEntity
 from app.schemas.tenant import TenantCreate, TenantInDB, TenantUpdate
 from .base import BaseRepository
 
@@ -166,6 +167,7 @@ class TenantsRepository(BaseRepository):
                 exclude={"email_verified", "api_key", "is_master", "created_at", "updated_at"}
             ),
         )
+        await self.publish_invalidation(CacheEntity.tenant, id)
         return TenantInDB(**updated_tenant)
 
     async def delete_tenant_by_id(self, *, id: UUID4) -> UUID4:
@@ -173,6 +175,7 @@ class TenantsRepository(BaseRepository):
         if not tenant:
             return None
         deleted_id = await self.db.execute(query=DELETE_TENANT_BY_ID_QUERY, values={"id": id})
+        await self.publish_invalidation(CacheEntity.tenant, id)
         return deleted_id
 
     async def update_logo(self, *, tenant_id: UUID4, file: UploadFile):
@@ -188,4 +191,6 @@ class TenantsRepository(BaseRepository):
         if not tenant:
             return None
 
+        await self.publish_invalidation(CacheEntity.tenant, id)
+
         return TenantInDB(**tenant)
@@ -1,6 +1,7 @@
-from typing import List
+from typing import List, Optional, Tuple
 from app.db.repositories.base_redis import BaseRedisRepository
 from redis.asyncio import Redis
+from redis.asyncio.lock import Lock
 from app.schemas.token_bb import TokenBB
 from app.core.config import REDIS_PREFIX
 
@@ -43,6 +44,41 @@ class TokenBBRedisRepository(BaseRedisRepository):
 
         return token
 
+    async def get_token_with_ttl(self, id: str) -> Tuple[Optional[TokenBB], int]:
+        """
+        Get the token and its remaining time to live in a single round trip.
+        :param id:
+        :return: tuple: (token or None, ttl in seconds)
+        """
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(f"{REDIS_PREFIX}:{id}")
+            pipe.ttl(f"{REDIS_PREFIX}:{id}")
+            data, ttl = await pipe.execute()
+
+        if not data:
+            return None, ttl
+
+        return TokenBB(**data), ttl
+
+    async def delete_token(self, id: str) -> None:
+        await self._redis.delete(f"{REDIS_PREFIX}:{id}")
+
+    async def get_ttl(self, id: str) -> int:
+        """
+        Get the remaining time to live of a token.
+        :param id:
+        :return: int: seconds, negative when the token does not exist
+        """
+        return await self._redis.ttl(f"{REDIS_PREFIX}:{id}")
+
+    def get_refresh_lock(self, id: str, timeout: int, blocking_timeout: int) -> Lock:
+        """
+        Lock shared by all workers so only one of them requests a new token for the key.
+        """
+        return self._redis.lock(
+            f"{REDIS_PREFIX}:lock:token_bb:{id}", timeout=timeout, blocking_timeout=blocking_timeout
+        )
+
     async def remove_token_by_key(self, key: str):
         await self._redis.delete(f"{REDIS_PREFIX}:{key}")
 
@@ -1,21 +1,110 @@
-from typing import List
+from typing import List, Optional
 from app.db.repositories.base_redis import BaseRedisRepository
 from redis.asyncio import Redis
 from app.schemas.token import Token
 from app.core.config import REDIS_PREFIX
 
+# the hash of the token and its entry in the index of the user in one atomic step, scored by the expiry (Redis clock)
+# the expired entries are pruned here and the index lives as long as its last token
+SET_TOKEN_SCRIPT = """
+local now = tonumber(redis.call("TIME")[1])
+local ttl = tonumber(ARGV[2])
+
+redis.call("HSET", KEYS[1], unpack(ARGV, 3))
+redis.call("EXPIRE", KEYS[1], ttl)
+redis.call("ZADD", KEYS[2], now + ttl, ARGV[1])
+redis.call("ZREMRANGEBYSCORE", KEYS[2], "-inf", now)
+if redis.call("TTL", KEYS[2]) < ttl then
+    redis.call("EXPIRE", KEYS[2], ttl)
+end
+return 1
+"""
+
+REMOVE_TOKEN_SCRIPT = """
+redis.call("ZREM", KEYS[2], ARGV[1])
+return redis.call("DEL", KEYS[1])
+"""
+
+# the token keys are built from the members of the index (ARGV[1] is the prefix), a login between a read of the
+# index and the removal would otherwise leave a session out of it
+REMOVE_USER_TOKENS_SCRIPT = """
+local ids = redis.call("ZRANGE", KEYS[1], 0, -1)
+for _, id in ipairs(ids) do
+    redis.call("DEL", ARGV[1] .. ":" .. id)
+end
+redis.call("DEL", KEYS[1])
+return #ids
+"""
+
+EXPIRE_USER_TOKENS_SCRIPT = """
+local now = tonumber(redis.call("TIME")[1])
+local seconds = tonumber(ARGV[2])
+local ids = redis.call("ZRANGE", KEYS[1], 0, -1)
+for _, id in ipairs(ids) do
+    if redis.call("EXPIRE", ARGV[1] .. ":" .. id, seconds) == 1 then
+        redis.call("ZADD", KEYS[1], "XX", now + seconds, id)
+    else
+        redis.call("ZREM", KEYS[1], id)
+    end
+end
+if #ids > 0 and redis.call("TTL", KEYS[1]) > seconds then
+    redis.call("EXPIRE", KEYS[1], seconds)
+end
+return #ids
+"""
+
+# tokens written before the indexes existed, added by index_tokens()
+INDEX_TOKEN_SCRIPT = """
+local ttl = redis.call("TTL", KEYS[1])
+if ttl <= 0 then
+    return 0
+end
+local now = tonumber(redis.call("TIME")[1])
+redis.call("ZADD", KEYS[2], now + ttl, ARGV[1])
+if redis.call("TTL", KEYS[2]) < ttl then
+    redis.call("EXPIRE", KEYS[2], ttl)
+end
+return 1
+"""
+
+# "running" while a worker builds the indexes (expires if it dies), then "done"
+USER_TOKENS_INDEXED_KEY = f"{REDIS_PREFIX}:user_tokens:indexed"
+USER_TOKENS_INDEXING_TIMEOUT = 3600  # seconds
+
+
+def get_user_tokens_key(user_id: str) -> str:
+    return f"{REDIS_PREFIX}:user_tokens:{user_id}"
+
 
 class TokenRedisRepository(BaseRedisRepository):
+    """
+    Session tokens of the users, one hash per token, plus a sorted set per user with the ids of its tokens
+    (get_user_tokens_key) scored by their expiry, so the sessions of a user are found without a SCAN of the keyspace.
+    Until index_tokens() is done, the tokens of the user written before the indexes are looked up by their key too.
+    """
+
+    # set once USER_TOKENS_INDEXED_KEY is "done", it never goes back
+    _indexed = False
+
     def __init__(self, redis: Redis) -> None:
         super().__init__(redis)
+        self._set_token = redis.register_script(SET_TOKEN_SCRIPT)
+        self._remove_token = redis.register_script(REMOVE_TOKEN_SCRIPT)
+        self._remove_user_tokens = redis.register_script(REMOVE_USER_TOKENS_SCRIPT)
+        self._expire_user_tokens = redis.register_script(EXPIRE_USER_TOKENS_SCRIPT)
+        self._index_token = redis.register_script(INDEX_TOKEN_SCRIPT)
 
     async def set_token(self, *, token: Token, expires_in: int):
         """
-        Set token hash fields to multiple values.
+        Set token hash fields to multiple values and add it to the index of the user.
         :param token:
+        :param expires_in: minutes
         """
-        await self._redis.hmset(f"{REDIS_PREFIX}:{token.id}", token.dict())
-        await self._redis.expire(f"{REDIS_PREFIX}:{token.id}", expires_in * 60)  # receive in minutes, need seconds
+        fields = [item for field, value in token.dict().items() for item in (field, value)]
+        await self._set_token(
+            keys=[f"{REDIS_PREFIX}:{token.id}", get_user_tokens_key(token.user_id)],
+            args=[token.id, expires_in * 60, *fields],  # receive in minutes, need seconds
+        )
 
     async def len(self, key: str):
         """
@@ -34,27 +123,111 @@ class TokenRedisRepository(BaseRedisRepository):
         return await self._redis.hgetall(f"{REDIS_PREFIX}:{key}")
 
     async def get_tokens_by_user_id(self, user_id: str) -> List[Token]:
-        cursor, keys = await self._redis.scan(match=f"{REDIS_PREFIX}:{user_id}*")
+        """
+        Tokens of the index of the user, read in one round trip. Ids whose hash is gone are removed from the index.
+        """
+        await self.__index_user_tokens(user_id)
+        user_tokens_key = get_user_tokens_key(user_id)
+        ids = await self._redis.zrange(user_tokens_key, 0, -1)
+        if not ids:
+            return []
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for id in ids:
+                pipe.hgetall(f"{REDIS_PREFIX}:{id}")
+            results = await pipe.execute()
+
         tokens: List[Token] = []
-        for key in keys:
-            data = await self._redis.hgetall(key)
-            token = Token(**data)
-            tokens.append(token)
+        expired: List[str] = []
+        for id, data in zip(ids, results):
+            if data:
+                tokens.append(Token(**data))
+            else:
+                expired.append(id)
+
+        if expired:
+            # token ids are never reused, the entries can't belong to a newer session
+            await self._redis.zrem(user_tokens_key, *expired)
 
         return tokens
 
-    async def remove_token_by_key(self, key: str):
-        await self._redis.delete(f"{REDIS_PREFIX}:{key}")
+    async def remove_token_by_key(self, key: str, user_id: Optional[str] = None):
+        if user_id is None:
+            user_id = await self._redis.hget(f"{REDIS_PREFIX}:{key}", "user_id")
+            if user_id is None:
+                return
+
+        await self._remove_token(keys=[f"{REDIS_PREFIX}:{key}", get_user_tokens_key(user_id)], args=[key])
 
     async def expire_token_by_key(self, key: str, seconds: int = 60):  # 1min
         await self._redis.expire(f"{REDIS_PREFIX}:{key}", seconds)
 
-    async def remove_tokens_by_user_id(self, user_id: str):
-        tokens: List[Token] = await self.get_tokens_by_user_id(user_id=user_id)
-        for token in tokens:
-            await self.remove_token_by_key(token.id)
+    async def remove_tokens_by_user_id(self, user_id: str) -> int:
+        await self.__index_user_tokens(user_id)
+        return await self._remove_user_tokens(keys=[get_user_tokens_key(user_id)], args=[REDIS_PREFIX])
+
+    async def expire_tokens_by_user_id(self, user_id: str, seconds: int = 60) -> int:  # 1min
+        await self.__index_user_tokens(user_id)
+        return await self._expire_user_tokens(keys=[get_user_tokens_key(user_id)], args=[REDIS_PREFIX, seconds])
+
+    async def index_tokens(self, *, count: int = 1000) -> int:
+        """
+        Add the tokens written before the indexes to them, in one SCAN of the keyspace. Only one worker of the cluster
+        does it, the others return at once.
+        :param count: keys per SCAN page and per pipeline
+        :return: int: tokens indexed
+        """
+        if not await self._redis.set(USER_TOKENS_INDEXED_KEY, "running", nx=True, ex=USER_TOKENS_INDEXING_TIMEOUT):
+            return 0
+
+        indexed = 0
+        keys: List[str] = []
+        async for key in self._redis.scan_iter(match=f"{REDIS_PREFIX}:*-*", count=count):
+            keys.append(key)
+            if len(keys) >= count:
+                indexed += await self.__index_keys(keys)
+                keys = []
+        if keys:
+            indexed += await self.__index_keys(keys)
+
+        await self._redis.set(USER_TOKENS_INDEXED_KEY, "done")
+        return indexed
+
+    async def __index_user_tokens(self, user_id: str, *, count: int = 1000) -> None:
+        """
+        While index_tokens() has not finished, add the tokens of the user written before the indexes to its index,
+        found by a SCAN of their keys, so the methods reading the index see every session of the user.
+        """
+        if TokenRedisRepository._indexed:
+            return
+        if await self._redis.get(USER_TOKENS_INDEXED_KEY) == "done":
+            TokenRedisRepository._indexed = True
+            return
+
+        keys = [key async for key in self._redis.scan_iter(match=f"{REDIS_PREFIX}:{user_id}-*", count=count)]
+        if not keys:
+            return
+
+        prefix_len = len(REDIS_PREFIX) + 1
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                await self._index_token(keys=[key, get_user_tokens_key(user_id)], args=[key[prefix_len:]], client=pipe)
+            await pipe.execute()
+
+    async def __index_keys(self, keys: List[str]) -> int:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hget(key, "user_id")
+            # other types of keys share the keyspace, their WRONGTYPE errors come back as results
+            user_ids = await pipe.execute(raise_on_error=False)
+
+        prefix_len = len(REDIS_PREFIX) + 1
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, user_id in zip(keys, user_ids):
+                if isinstance(user_id, str):
+                    await self._index_token(
+                        keys=[key, get_user_tokens_key(user_id)], args=[key[prefix_len:]], client=pipe
+                    )
+            results = await pipe.execute()
 
-    async def expire_tokens_by_user_id(self, user_id: str):
-        tokens: List[Token] = await self.get_tokens_by_user_id(user_id=user_id)
-        for token in tokens:
-            await self.expire_token_by_key(token.id)
+        return sum(int(result) for result in results)
@@ -2,6 +2,7 @@ import secrets
 import aiofiles
 import boto3
 
+from app.schemas.enums import CacheEntity, CountStrategy, PaginationMode
 from app.schemas.page import PageModel
 from app.schemas.token import Token
 from typing import List, Optional
@@ -11,6 +12,7 @@ from fastapi import HTTPException, status, UploadFile
 
 from app.core.config import S3_BUCKET, S3_EXPIRES_IN
 from app.db.repositories.base import BaseRepository
+from app.db.statements import statements
 from app.schemas.permission import Permission, PermissionUserInDB
 from app.schemas.role import Role, RoleUser
 from app.schemas.user import (
@@ -28,6 +30,9 @@ from pypika import Query, Table, Parameter
 s3 = boto3.client("s3")
 
 
+# sorts allowed in cursor pagination, each one backed by an index (tenant_id, field, id)
+USERS_CURSOR_FIELDS = {"created_at": Table("users").created_at}
+
 GET_USER_BY_EMAIL_QUERY = """
     SELECT id, tenant_id, full_name, username, email, hashed_password, email_verified, cell_phone, thumbnail, \
         is_active, created_at, updated_at
@@ -386,6 +391,7 @@ class UsersRepository(BaseRepository):
             query=UPDATE_USER_PASSWORD_QUERY,
             values={"tenant_id": tenant_id, "id": id, "hashed_password": hashed_password},
         )
+        await self.publish_invalidation(CacheEntity.user, id, tenant_id)
 
         return UserPublic(**user)
 
@@ -397,7 +403,32 @@ class UsersRepository(BaseRepository):
         per_page: int = 10,
         filters: List[str],
         sorts: Optional[str],
+        pagination: PaginationMode = PaginationMode.offset,
+        cursor: Optional[str] = None,
+        count_strategy: CountStrategy = CountStrategy.exact,
     ) -> PageModel:
+        users = Table("users")
+        select_query = statements.get_query(("users", "list_select"), self.__get_users_select_query)
+        count_query = statements.get_query(("users", "list_count"), self.__get_users_count_query)
+
+        return await self.get_page_by_params(
+            table=users,
+            select_query=select_query,
+            count_query=count_query,
+            tenant_id=tenant_id,
+            filters=filters,
+            sorts=sorts,
+            current_page=current_page,
+            per_page=per_page,
+            type_schema=UserSummary,
+            pagination=pagination,
+            cursor=cursor,
+            cursor_fields=USERS_CURSOR_FIELDS,
+            count_strategy=count_strategy,
+            statement_key="users:list",
+        )
+
+    def __get_users_select_query(self) -> Query:
         users = Table("users")
         select_query = (
             Query.from_(users)
@@ -418,19 +449,13 @@ class UsersRepository(BaseRepository):
             .where(users.tenant_id == Parameter(":tenant_id"))
         )
 
+        return select_query
+
+    def __get_users_count_query(self) -> Query:
+        users = Table("users")
         count_query = Query.from_(users).where(users.tenant_id == Parameter(":tenant_id"))
 
-        return await self.get_page_by_params(
-            table=users,
-            select_query=select_query,
-            count_query=count_query,
-            tenant_id=tenant_id,
-            filters=filters,
-            sorts=sorts,
-            current_page=current_page,
-            per_page=per_page,
-            type_schema=UserSummary,
-        )
+        return count_query
 
     async def update_user(self, *, user: UserInDB, user_update: UserUpdate) -> UserInDB:
         if user_update.email and user_update.email != user.email:
@@ -454,12 +479,17 @@ class UsersRepository(BaseRepository):
             query=UPDATE_USER_BY_ID_QUERY,
             values=user_update_params.dict(exclude={"email_verified", "hashed_password", "created_at", "updated_at"}),
         )
+        await self.publish_invalidation(CacheEntity.user, user.id, user.tenant_id)
 
         user_in_db = UserInDB(**updated_user)
         return await self.get_full_user_by_user(user=user_in_db)
 
     async def delete_user(self, *, tenant_id: UUID4, user: UserInDB) -> UUID4:
-        return await self.db.execute(query=DELETE_USERS_BY_ID_QUERY, values={"tenant_id": tenant_id, "id": user.id})
+        deleted_id = await self.db.execute(
+            query=DELETE_USERS_BY_ID_QUERY, values={"tenant_id": tenant_id, "id": user.id}
+        )
+        await self.publish_invalidation(CacheEntity.user, user.id, tenant_id)
+        return deleted_id
 
     async def get_roles_by_user_id(self, *, user_id: UUID4) -> List[RoleUser]:
         user_roles = await self.db.fetch_all(query=GET_ROLES_BY_USER_ID_QUERY, values={"user_id": user_id})
@@ -528,6 +558,7 @@ class UsersRepository(BaseRepository):
 
         roles_for_user = [{"role_id": str(r), "user_id": str(user.id)} for r in roles]
         await self.db.execute_many(query=REGISTER_ROLES_TO_USER_QUERY, values=roles_for_user)
+        await self.publish_invalidation(CacheEntity.user, user.id, user.tenant_id)
 
         return None
 
@@ -546,6 +577,7 @@ class UsersRepository(BaseRepository):
 
         permissions_for_user = [{"permission_id": str(r), "user_id": str(user.id)} for r in permissions]
         await self.db.execute_many(query=REGISTER_PERMISSIONS_TO_USER_QUERY, values=permissions_for_user)
+        await self.publish_invalidation(CacheEntity.user, user.id, user.tenant_id)
 
         return None
 
@@ -555,6 +587,7 @@ class UsersRepository(BaseRepository):
         await self.db.execute(
             query=DELETE_ROLES_BY_USER_ID_QUERY % ",".join(map("'{}'".format, roles)), values={"user_id": user.id}
         )
+        await self.publish_invalidation(CacheEntity.user, user.id, user.tenant_id)
 
         return await self.get_full_user_by_user(user=user)
 
@@ -563,6 +596,7 @@ class UsersRepository(BaseRepository):
             query=DELETE_PERMISSIONS_BY_USER_ID_QUERY % ",".join(map("'{}'".format, permissions)),
             values={"user_id": user.id},
         )
+        await self.publish_invalidation(CacheEntity.user, user.id, user.tenant_id)
 
         return await self.get_full_user_by_user(user=user)
 
@@ -593,6 +627,7 @@ class UsersRepository(BaseRepository):
                 query=UPDATE_USER_THUMBNAIL_QUERY,
                 values={"tenant_id": user.tenant_id, "id": user.id, "thumbnail": file_name},
             )
+            await self.publish_invalidation(CacheEntity.user, user["id"], user["tenant_id"])
 
             async with aiofiles.open(f"uploads/profiles/{file_name}", "wb") as out_file:
                 content = await file.read()  # async read
@@ -651,6 +686,7 @@ class UsersRepository(BaseRepository):
                 query=UPDATE_EMAIL_VERIFIED_BY_USER_ID_QUERY,
                 values={"tenant_id": user.tenant_id, "id": user.id},
             )
+            await self.publish_invalidation(CacheEntity.user, user.id, user.tenant_id)
 
             user_in_db = UserPublic(**updated_user)
             return user_in_db
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Union
+
+from pypika.queries import QueryBuilder
+
+from app.core.config import STATEMENTS_MAXSIZE
+from app.core.metrics import metrics
+
+
+class StatementRegistry:
+    """
+    SQL strings compiled once from pypika queries, by key: (table, statement) for the fixed ones, plus the schema,
+    the size of bulk statements or the filter signature of the dynamic listings.
+    The build function only runs on the first use of a key, so it must depend on nothing but the key.
+    LRU limited to maxsize, because the signatures of the listings come from the request (filters and sorts).
+    """
+
+    def __init__(self, *, maxsize: int = 2048) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._statements: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], Union[QueryBuilder, str]]) -> str:
+        """
+        SQL string of the statement, build may return the pypika query or the SQL.
+        """
+        return self.__get(("sql", key), lambda: self.__compile(build()))
+
+    def get_query(self, key: Hashable, build: Callable[[], QueryBuilder]) -> QueryBuilder:
+        """
+        The pypika query itself, for callers that still add clauses to it (the builder methods return copies).
+        """
+        return self.__get(("query", key), build)
+
+    def __get(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._statements:
+                self._statements.move_to_end(key)
+                self.hits += 1
+                return self._statements[key]
+
+        statement = build()
+
+        with self._lock:
+            self.misses += 1
+            self._statements[key] = statement
+            while len(self._statements) > self.maxsize:
+                self._statements.popitem(last=False)
+
+        return statement
+
+    def __compile(self, query: Union[QueryBuilder, str]) -> str:
+        return query if isinstance(query, str) else query.get_sql()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._statements.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._statements), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+statements = StatementRegistry(maxsize=STATEMENTS_MAXSIZE)
+metrics.register_collector("sql_statements", statements.stats)
@@ -0,0 +1,116 @@
+import asyncio
+import contextlib
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+
+from databases import Database
+from databases.core import Connection
+from fastapi import HTTPException, status
+
+from app.core.config import DATABASE_POOL_ACQUIRE_TIMEOUT
+from app.core.metrics import metrics
+
+
+class UnitOfWork:
+    """
+    Pooled connection of one request, shared by all its repositories (DatabaseSession.primary).
+    It is acquired on the first statement and kept until release: at the end of the request (get_database_session)
+    and before a BB call (BaseRepository.release_connection), so no connection waits on BB latency; the next statement
+    acquires it again. transaction() is the explicit boundary of the writes, nested blocks are savepoints of the same
+    connection.
+    """
+
+    # requests of the worker waiting for a connection of the pool
+    waiting = 0
+
+    def __init__(self, database: Database) -> None:
+        self._database = database
+        self._connection: Optional[Connection] = None
+        self._acquired_at = 0.0
+        self._transactions = 0
+        self._after_commit: List[Callable[[], Awaitable[None]]] = []
+        self.acquisitions = 0
+        self.acquire_seconds = 0.0
+        self.hold_seconds = 0.0
+
+    async def get_connection(self) -> Connection:
+        if self._connection is None:
+            started = time.perf_counter()
+            # the connection of the task in the databases package, statements sent to the Database of the same
+            # task (outside the repositories) reuse it while it is held
+            connection = self._database.connection()
+            UnitOfWork.waiting += 1
+            try:
+                await asyncio.wait_for(connection.__aenter__(), timeout=DATABASE_POOL_ACQUIRE_TIMEOUT or None)
+            except asyncio.TimeoutError:
+                metrics.inc("db_pool_acquire_timeouts")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="No database connection available, try again.",
+                )
+            finally:
+                UnitOfWork.waiting -= 1
+
+            self._acquired_at = time.perf_counter()
+            self._connection = connection
+
+            waited = self._acquired_at - started
+            self.acquisitions += 1
+            self.acquire_seconds += waited
+            metrics.observe("db_pool_acquire_seconds", waited)
+
+        return self._connection
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, **kwargs: Any) -> AsyncIterator[Connection]:
+        connection = await self.get_connection()
+        self._transactions += 1
+        try:
+            async with connection.transaction(**kwargs):
+                yield connection
+        except BaseException:
+            if self._transactions == 1:
+                self._after_commit.clear()
+            raise
+        finally:
+            self._transactions -= 1
+
+        if not self._transactions:
+            callbacks, self._after_commit = self._after_commit, []
+            for callback in callbacks:
+                await callback()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._transactions > 0
+
+    def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """
+        Run callback when the outermost transaction commits, it is dropped on rollback. The callbacks of a rolled
+        back savepoint still run when the transaction commits: they must be safe to run more than needed
+        (invalidations).
+        """
+        self._after_commit.append(callback)
+
+    async def release(self) -> None:
+        # the connection of an open transaction is only released by its block
+        if self._connection is None or self._transactions:
+            return
+
+        connection, self._connection = self._connection, None
+        self.hold_seconds += time.perf_counter() - self._acquired_at
+        await connection.__aexit__()
+
+    async def close(self) -> None:
+        await self.release()
+        if self.acquisitions:
+            metrics.observe("db_pool_acquisitions_per_request", self.acquisitions)
+            metrics.observe("db_connection_hold_seconds", self.hold_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "acquisitions": self.acquisitions,
+            "acquire_seconds": self.acquire_seconds,
+            "hold_seconds": self.hold_seconds,
+            "held": self._connection is not None,
+        }
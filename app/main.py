@@ -11,7 +11,13 @@ from app.core import tasks
 from app.core.config import API_PREFIX_V1, PROJECT_NAME, BACKEND_CORS_ORIGINS, VERSION, WORK_MODE
 
 from app.api.routes import router as api_router
-from app.core.exceptions.exceptions_customs import HttpExceptionBB, KeyHttpException, LoginHttpException
+from app.core.exceptions.exceptions_customs import (
+    CircuitOpenExceptionBB,
+    HttpExceptionBB,
+    KeyHttpException,
+    LoginHttpException,
+    RateLimitExceptionBB,
+)
 
 from app.core.log_config import LogConfig
 
@@ -46,6 +52,8 @@ def get_application():
     app.add_exception_handler(ValidationError, exp_tr.validation_error_exception_handler)
     app.add_exception_handler(HTTPException, exp_tr.httpException_error_handler)
     app.add_exception_handler(HttpExceptionBB, exp_tr.httpException_bb_error_handler)
+    app.add_exception_handler(CircuitOpenExceptionBB, exp_tr.circuit_open_bb_error_handler)
+    app.add_exception_handler(RateLimitExceptionBB, exp_tr.rate_limit_bb_error_handler)
     app.add_exception_handler(KeyHttpException, exp_tr.httpException_key_error_handler)
     app.add_exception_handler(LoginHttpException, exp_tr.httpException_login_error_handler)
     app.add_exception_handler(UniqueViolationError, exp_tr.asyncpg_unique_validation_exception_handler)
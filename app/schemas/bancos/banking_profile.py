@@ -0,0 +1,26 @@
+from pydantic import UUID4
+
+from app.schemas.bancos.boleto_bb import BoletoBBRequestDetails
+from app.schemas.bancos.conta_bancaria import ContaBancariaInDB
+from app.schemas.bancos.convenio_bancario import ConvenioBancarioInDB
+from app.schemas.base import BaseSchema
+
+
+class BankingProfile(BaseSchema):
+    """
+    Convenio and conta of a tenant: numero_convenio, carteira, variação, limits and the BB credentials
+    used by the registration and maintenance calls of its boletos.
+    """
+
+    convenio: ConvenioBancarioInDB
+    conta: ContaBancariaInDB
+
+    def get_request_details(self, *, id: UUID4, numero: str) -> BoletoBBRequestDetails:
+        return BoletoBBRequestDetails(
+            id=id,
+            numero=numero,
+            numero_convenio=self.convenio.numero_convenio,
+            client_id=self.conta.client_id,
+            client_secret=self.conta.client_secret,
+            developer_application_key=self.conta.developer_application_key,
+        )
@@ -1,13 +1,14 @@
-from typing import Optional
+from typing import Any, List, Optional
 from pydantic import UUID4, BaseModel, condecimal, constr, validator
 
 from pydantic.types import conint
-from datetime import date
+from datetime import date, datetime
 from app.schemas.bancos.beneficiario_bb import BeneficiarioBB, BeneficiarioFinalBB, BeneficiarioFull
 from app.schemas.bancos.convenio_bancario import ConvenioBancarioFull
 from app.schemas.bancos.pagador_bb import PagadorBB, PagadorFull
 from app.schemas.bancos.qr_code_bb import QrCodeBB, QrCodeFull
 from app.schemas.base import BaseSchema, DateTimeModelMixin, IDModelMixin, IDModelWithTenantMixin
+from app.schemas.enums import BatchItemStatus, RegistroStatus
 from app.util.utils import to_snake_case
 
 # from app.util.utils import get_date_print_format, get_valor_real_print_format
@@ -144,7 +145,8 @@ class BoletoBB(BaseSchema):
 
 class BoletoBBWithTenantCreate(BoletoBB):
     tenant_id: UUID4
-    pagador_bb_id: UUID4
+    pagador_bb_id: Optional[UUID4]  # None when the pagador is upserted by the same statement
+    registro_status: RegistroStatus = RegistroStatus.pending
 
 
 class BoletoBBUpdate(BaseSchema):
@@ -188,6 +190,7 @@ class BoletoBBNewVencimento(BaseSchema):
 
 class BoletoBBAllViewFields(BoletoBBUpdate):
     pagador_bb_id: UUID4
+    registro_status: Optional[RegistroStatus]
 
 
 class BoletoBBInDB(DateTimeModelMixin, BoletoBBAllViewFields, BoletoBB, IDModelWithTenantMixin):
@@ -195,12 +198,53 @@ class BoletoBBInDB(DateTimeModelMixin, BoletoBBAllViewFields, BoletoBB, IDModelW
 
 
 class BoletoBBFull(BoletoBBUpdate, BoletoBB, IDModelMixin):
+    registro_status: Optional[RegistroStatus]
     convenio: Optional[ConvenioBancarioFull]
     pagador: Optional[PagadorFull]
     beneficiario: Optional[BeneficiarioFull]
     qr_code: Optional[QrCodeFull]
 
 
+class BoletoBBRegistroStatus(IDModelMixin):
+    registro_status: RegistroStatus
+    attempts: Optional[int]  # tentativas de registro feitas pelo worker (modo assíncrono)
+    next_attempt_at: Optional[datetime]
+    last_error: Optional[str]
+    codigo_estado_titulo: Optional[int]  # situação no BB na última sincronização
+    data_recebimento: Optional[date]
+    data_credito: Optional[date]
+    valor_pago_sacado: Optional[condecimal()]
+    data_hora_sincronizacao: Optional[datetime]
+
+
+class BoletoBBSync(BaseSchema):
+    id: UUID4
+    codigo_estado_titulo: Optional[int]
+    data_vencimento: Optional[date]  # only applied to a boleto with an unconfirmed alteração/baixa
+    data_recebimento: Optional[date]
+    data_credito: Optional[date]
+    valor_pago_sacado: condecimal() = 0
+    valor_credito_cedente: condecimal() = 0
+    valor_desconto_utilizado: condecimal() = 0
+    valor_multa_recebido: condecimal() = 0
+    valor_juros_recebido: condecimal() = 0
+
+
+class BoletoBBBatchItem(BaseSchema):
+    index: int  # posição do boleto na lista enviada
+    numero_titulo_beneficiario: int
+    status: BatchItemStatus
+    boleto: Optional[BoletoBBFull]
+    error: Optional[Any]  # erro retornado pela API do BB
+
+
+class BoletoBBBatchResult(BaseSchema):
+    total: int
+    created: int
+    failed: int
+    items: List[BoletoBBBatchItem]
+
+
 class BoletoBBForList(IDModelMixin):
     tipo_pessoa: Optional[str]
     cpf_cnpj: Optional[str]
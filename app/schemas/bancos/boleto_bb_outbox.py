@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import UUID4
+
+from app.schemas.base import BaseSchema, DateTimeModelMixin, IDModelWithTenantMixin
+from app.schemas.enums import OutboxStatus
+
+
+class BoletoBBOutbox(BaseSchema):
+    boleto_bb_id: UUID4
+    operation: str  # operação a ser enviada ao BB, hoje apenas "registrar"
+    status: OutboxStatus
+    attempts: int
+    next_attempt_at: Optional[datetime]
+    locked_at: Optional[datetime]
+    last_error: Optional[str]
+
+
+class BoletoBBOutboxInDB(DateTimeModelMixin, BoletoBBOutbox, IDModelWithTenantMixin):
+    pass
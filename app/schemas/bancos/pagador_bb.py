@@ -1,5 +1,5 @@
 import re
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 from pydantic import UUID4, constr, validator
 
 from app.schemas.base import BaseSchema, DateTimeModelMixin, IDModelMixin
@@ -8,6 +8,7 @@ from app.util.validators import (
     validate_cpf_cnpj,
     validate_phone_number,
 )
+from app.util.utils_bb import get_pagador_dedupe_key
 
 
 class Pagador(BaseSchema):
@@ -67,6 +68,16 @@ class PagadorBB(BaseSchema):
 
 class PagadorWithTenantCreate(Pagador):
     tenant_id: Optional[UUID4]
+    dedupe_key: Optional[str]
+
+    @validator("dedupe_key", always=True)
+    def dedupe_key_from_pagador(cls, dedupe_key: Optional[str], values: Dict[str, Any]) -> str:
+        return get_pagador_dedupe_key(
+            cpf_cnpj=values.get("cpf_cnpj"),
+            cep=values.get("cep"),
+            endereco=values.get("endereco"),
+            telefone=values.get("telefone"),
+        )
 
 
 class PagadorFull(Pagador, IDModelMixin):
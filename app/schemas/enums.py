@@ -19,6 +19,78 @@ class PersonType(str, Enum):
         return list(map(lambda o: o.value, PersonType))
 
 
+class BatchItemStatus(str, Enum):
+    created = "created"
+    failed = "failed"
+
+    @classmethod
+    def values(cls):
+        return list(map(lambda o: o.value, BatchItemStatus))
+
+
+class RegistroStatus(str, Enum):
+    pending = "pending"
+    registered = "registered"
+    failed = "failed"
+
+    @classmethod
+    def values(cls):
+        return list(map(lambda o: o.value, RegistroStatus))
+
+
+class BBCallPriority(str, Enum):
+    interactive = "interactive"
+    bulk = "bulk"
+
+    @classmethod
+    def values(cls):
+        return list(map(lambda o: o.value, BBCallPriority))
+
+
+class PaginationMode(str, Enum):
+    offset = "offset"
+    cursor = "cursor"
+
+    @classmethod
+    def values(cls):
+        return list(map(lambda o: o.value, PaginationMode))
+
+
+class CountStrategy(str, Enum):
+    exact = "exact"
+    windowed = "windowed"
+    estimate = "estimate"
+    cached = "cached"
+    none = "none"
+
+    @classmethod
+    def values(cls):
+        return list(map(lambda o: o.value, CountStrategy))
+
+
+class OutboxStatus(str, Enum):
+    pending = "pending"
+    processing = "processing"
+    done = "done"
+    dead = "dead"
+
+    @classmethod
+    def values(cls):
+        return list(map(lambda o: o.value, OutboxStatus))
+
+
+class CacheEntity(str, Enum):
+    tenant = "tenant"
+    conta_bancaria = "conta_bancaria"
+    convenio_bancario = "convenio_bancario"
+    user = "user"
+    session = "session"
+
+    @classmethod
+    def values(cls):
+        return list(map(lambda o: o.value, CacheEntity))
+
+
 class UnitType(str, Enum):
     un = "Un"
     cx = "Cx"
@@ -0,0 +1,11 @@
+from typing import Optional
+from pydantic import BaseModel
+from pydantic.types import UUID4
+
+from app.schemas.enums import CacheEntity
+
+
+class InvalidationEvent(BaseModel):
+    entity: CacheEntity
+    id: UUID4
+    tenant_id: Optional[UUID4] = None
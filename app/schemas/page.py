@@ -1,23 +1,30 @@
 import math
-from typing import List, TypeVar
+from typing import List, Optional, TypeVar
 from pydantic.main import BaseModel
 
+from app.schemas.enums import CountStrategy
+
 
 DataT = TypeVar("DataT")
 
 
 class Page(BaseModel):
-    total: int = 0
+    total: Optional[int] = 0
     per_page: int = 10
     current_page: int = 1
     first_page: int = 1
     is_empty: bool = True
-    last_page: int = 1
+    last_page: Optional[int] = 1
     has_next_page: bool = False
     has_previous_page: bool = False
+    # how total was computed: estimate and cached may be approximate, none (and cursor pagination) has no total
+    count_strategy: CountStrategy = CountStrategy.exact
+    # only in cursor pagination, where total and last_page are None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
     @classmethod
-    def init(cls, current_page: int, total: int, per_page: int):
+    def init(cls, current_page: int, total: int, per_page: int, count_strategy: CountStrategy = CountStrategy.exact):
         total = total
         per_page = per_page
         current_page = current_page
@@ -32,6 +39,40 @@ class Page(BaseModel):
             last_page=last_page,
             has_next_page=True if current_page < last_page else False,
             has_previous_page=True if current_page > 1 else False,
+            count_strategy=count_strategy,
+        )
+
+    @classmethod
+    def init_without_total(cls, current_page: int, per_page: int, size: int, has_next_page: bool):
+        return cls(
+            total=None,
+            per_page=per_page,
+            current_page=current_page,
+            is_empty=size == 0,
+            last_page=None,
+            has_next_page=has_next_page,
+            has_previous_page=current_page > 1,
+            count_strategy=CountStrategy.none,
+        )
+
+    @classmethod
+    def init_cursor(
+        cls,
+        per_page: int,
+        size: int,
+        next_cursor: Optional[str] = None,
+        prev_cursor: Optional[str] = None,
+    ):
+        return cls(
+            total=None,
+            per_page=per_page,
+            is_empty=size == 0,
+            last_page=None,
+            count_strategy=CountStrategy.none,
+            has_next_page=next_cursor is not None,
+            has_previous_page=prev_cursor is not None,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
         )
 
 
@@ -1,7 +1,7 @@
 import secrets
 from datetime import datetime, timedelta
-from typing import Optional
-from pydantic import EmailStr
+from typing import FrozenSet, Optional
+from pydantic import EmailStr, validator
 from pydantic.main import BaseModel
 from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES, JWT_AUDIENCE_AUTH
 
@@ -62,3 +62,20 @@ class Token(BaseModel):
     permissions: Optional[str] = ""
     extra_permissions: Optional[str] = ""
     device: Optional[str] = "Other"
+
+
+class SessionToken(Token):
+    """
+    Token of an authenticated request, with the roles and permissions split once when it is read from Redis
+    """
+
+    role_slugs: FrozenSet[str] = frozenset()
+    permission_slugs: FrozenSet[str] = frozenset()
+
+    @validator("role_slugs", always=True)
+    def split_roles(cls, v, values):
+        return frozenset(s for s in (values.get("roles") or "").split(",") if s)
+
+    @validator("permission_slugs", always=True)
+    def split_permissions(cls, v, values):
+        return frozenset(s for s in (values.get("permissions") or "").split(",") if s)
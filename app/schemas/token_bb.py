@@ -10,3 +10,9 @@ class AccessTokenBB(BaseModel):
 
 class TokenBB(AccessTokenBB):
     pass
+
+
+class CredentialsBB(BaseModel):
+    client_id: str
+    client_secret: str
+    gw_dev_app_key: str
@@ -1,5 +1,12 @@
 from app.services.authentication import AuthService
+from app.services.bb_http_client import bb_http_client
+from app.services.bb_rate_limiter import bb_rate_limiter
+from app.services.bb_token_manager import bb_token_manager
 from app.services.boleto_bb_api import BoletoBBService
+from app.services.session_token_cache import session_token_cache
+from app.services.tenant_cache import tenant_cache
 
 auth_service = AuthService()
-boleto_bb_service = BoletoBBService()
+boleto_bb_service = BoletoBBService(
+    http_client=bb_http_client, token_manager=bb_token_manager, rate_limiter=bb_rate_limiter
+)
@@ -0,0 +1,78 @@
+import logging
+
+from fastapi import HTTPException, status
+from pydantic.types import UUID4
+
+from app.core.config import BANKING_PROFILE_CACHE_MAXSIZE, BANKING_PROFILE_CACHE_TTL
+from app.core.metrics import metrics
+from app.db.invalidation import invalidation_bus
+from app.db.repositories.convenios_bancarios import ConveniosBancariosRepository
+from app.schemas.bancos.banking_profile import BankingProfile
+from app.schemas.enums import CacheEntity
+from app.schemas.invalidation import InvalidationEvent
+from app.util.cache import TTLCache
+
+logger = logging.getLogger("app")
+
+
+class BankingProfileCache:
+    """
+    Snapshot per (tenant, convenio) of the convenio and its conta, shared by the registration (sync, async, batch,
+    outbox) and the maintenance calls (consulta, alteração, baixa) of the boletos.
+    The profiles hold the BB credentials, so they stay in the worker memory only, never in Redis. They are evicted
+    by the InvalidationEvent of ConveniosBancariosRepository and ContasBancariasRepository (app/db/invalidation.py).
+    """
+
+    def __init__(self) -> None:
+        self._profiles: TTLCache[BankingProfile] = TTLCache(
+            maxsize=BANKING_PROFILE_CACHE_MAXSIZE, default_ttl=BANKING_PROFILE_CACHE_TTL
+        )
+        # a profile read from the DB before an invalidation is not cached after it
+        self._generation = 0
+        metrics.register_collector("banking_profile_cache", self._profiles.stats)
+        invalidation_bus.subscribe(CacheEntity.convenio_bancario, self.__on_convenio_invalidation, self.clear)
+        invalidation_bus.subscribe(CacheEntity.conta_bancaria, self.__on_conta_invalidation, self.clear)
+
+    async def get_banking_profile(
+        self,
+        *,
+        tenant_id: UUID4,
+        convenio_bancario_id: UUID4,
+        convenios_bancarios_repo: ConveniosBancariosRepository,
+    ) -> BankingProfile:
+        key = (str(tenant_id), str(convenio_bancario_id))
+
+        profile = self._profiles.get(key)
+        if profile:
+            metrics.inc("banking_profile_lookups", level="l1")
+            return profile
+
+        metrics.inc("banking_profile_lookups", level="db")
+        generation = self._generation
+        profile = await convenios_bancarios_repo.get_banking_profile(tenant_id=tenant_id, id=convenio_bancario_id)
+
+        if not profile:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No convenio_bancario found with that id.",
+            )
+
+        if generation == self._generation:
+            self._profiles.set(key, profile)
+
+        return profile
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._profiles.clear()
+
+    def __on_convenio_invalidation(self, event: InvalidationEvent) -> None:
+        self._generation += 1
+        self._profiles.evict_where(lambda key, profile: profile.convenio.id == event.id)
+
+    def __on_conta_invalidation(self, event: InvalidationEvent) -> None:
+        self._generation += 1
+        self._profiles.evict_where(lambda key, profile: profile.conta.id == event.id)
+
+
+banking_profile_cache = BankingProfileCache()
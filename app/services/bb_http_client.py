@@ -0,0 +1,113 @@
+import json
+import logging
+import ssl
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+from fastapi import FastAPI
+
+from app.core.config import (
+    BB_HTTP_CONNECT_TIMEOUT,
+    BB_HTTP_DNS_CACHE_TTL,
+    BB_HTTP_KEEPALIVE_TIMEOUT,
+    BB_HTTP_POOL_SIZE,
+    BB_HTTP_POOL_SIZE_PER_HOST,
+    BB_HTTP_READ_TIMEOUT,
+    BB_HTTP_TOTAL_TIMEOUT,
+)
+
+logger = logging.getLogger("app")
+
+
+class BBHttpClient:
+    """
+    Long-lived HTTP client shared by all Banco do Brasil calls of a worker.
+    Keeps keep-alive connections pooled per host, caches DNS and reuses one TLS context,
+    so a boleto operation no longer pays a new TCP+TLS handshake.
+    """
+
+    def __init__(self) -> None:
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    async def connect(self) -> None:
+        if self._session and not self._session.closed:
+            return
+
+        # same TLS settings used before by each call site, now built only once
+        self._ssl_context = ssl.SSLContext()
+
+        connector = aiohttp.TCPConnector(
+            limit=BB_HTTP_POOL_SIZE,
+            limit_per_host=BB_HTTP_POOL_SIZE_PER_HOST,
+            keepalive_timeout=BB_HTTP_KEEPALIVE_TIMEOUT,
+            use_dns_cache=True,
+            ttl_dns_cache=BB_HTTP_DNS_CACHE_TTL,
+            ssl=self._ssl_context,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=BB_HTTP_TOTAL_TIMEOUT,
+            connect=BB_HTTP_CONNECT_TIMEOUT,
+            sock_read=BB_HTTP_READ_TIMEOUT,
+        )
+
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+        self._session = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        # lazy connect keeps scripts and tests without the app lifespan working
+        if not self._session or self._session.closed:
+            await self.connect()
+
+        return self._session
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Any] = None,
+    ) -> Tuple[int, Any]:
+        """
+        Send a request through the pooled session.
+        :return: tuple: (status code, decoded JSON body)
+        """
+        session = await self.get_session()
+
+        async with session.request(method, url, headers=headers, params=params, data=data) as response:
+            text = await response.text()
+            try:
+                result = json.loads(text) if text.strip() else None
+            except ValueError:
+                # an HTML error page of a proxy (502/503): same shape as the errors of the BB API
+                result = {"erros": [{"mensagem": f"BB answered {response.status} without JSON: {text[:200]}"}]}
+            return response.status, result
+
+
+bb_http_client = BBHttpClient()
+
+
+async def connect_to_bb_http_client(app: FastAPI) -> None:
+    try:
+        await bb_http_client.connect()
+        app.state._bb_http_client = bb_http_client
+    except Exception as e:
+        logger.warn("--- BB HTTP CLIENT CONNECTION ERROR ---")
+        logger.warn(e)
+        logger.warn("--- BB HTTP CLIENT CONNECTION ERROR ---")
+
+
+async def close_bb_http_client(app: FastAPI) -> None:
+    try:
+        await bb_http_client.close()
+    except Exception as e:
+        logger.warn("--- BB HTTP CLIENT DISCONNECT ERROR ---")
+        logger.warn(e)
+        logger.warn("--- BB HTTP CLIENT DISCONNECT ERROR ---")
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+from fastapi import FastAPI
+from redis.exceptions import RedisError
+
+from app.core.config import (
+    BB_RATE_LIMIT_BULK_MAX_WAIT,
+    BB_RATE_LIMIT_BULK_RESERVE,
+    BB_RATE_LIMIT_BURST,
+    BB_RATE_LIMIT_ENABLED,
+    BB_RATE_LIMIT_MAX_WAIT,
+    BB_RATE_LIMIT_RATE,
+)
+from app.core.exceptions.exceptions_customs import RateLimitExceptionBB
+from app.core.metrics import metrics
+from app.db.repositories.bb_rate_limit_redis import BBRateLimitRedisRepository
+from app.schemas.enums import BBCallPriority
+
+logger = logging.getLogger("app")
+
+
+class BBRateLimiter:
+    """
+    Token bucket per gw-dev-app-key kept in Redis, so the BB quota is shared by every gunicorn worker.
+    Priority lanes: bulk calls (batches, outbox, reconciliation) leave BB_RATE_LIMIT_BULK_RESERVE of the bucket
+    to interactive calls, which go ahead while a bulk job is draining the quota.
+    Without Redis the calls are not limited (fail open), the circuit breaker still protects BB.
+    """
+
+    def __init__(self) -> None:
+        self._repo: Optional[BBRateLimitRedisRepository] = None
+
+    def start(self, repo: BBRateLimitRedisRepository) -> None:
+        self._repo = repo
+
+    def stop(self) -> None:
+        self._repo = None
+
+    async def acquire(self, *, gw_dev_app_key: str, priority: BBCallPriority = BBCallPriority.interactive) -> None:
+        """
+        Wait for a call slot of the key.
+        :raise RateLimitExceptionBB: when the slot would come after the max wait of the priority
+        """
+        if not BB_RATE_LIMIT_ENABLED or self._repo is None:
+            return
+
+        bulk = priority == BBCallPriority.bulk
+        reserve = BB_RATE_LIMIT_BURST * BB_RATE_LIMIT_BULK_RESERVE if bulk else 0
+        max_wait = BB_RATE_LIMIT_BULK_MAX_WAIT if bulk else BB_RATE_LIMIT_MAX_WAIT
+        started = time.monotonic()
+
+        while True:
+            try:
+                wait = await self._repo.take_token(
+                    id=gw_dev_app_key, rate=BB_RATE_LIMIT_RATE, capacity=BB_RATE_LIMIT_BURST, reserve=reserve
+                )
+            except RedisError as e:
+                logger.warn(f"BB rate limit error: {e!r}")
+                metrics.inc("bb_rate_limit_errors")
+                return
+
+            waited = time.monotonic() - started
+            if wait <= 0:
+                metrics.observe("bb_rate_limit_wait", waited, priority=priority.value)
+                return
+
+            if waited + wait > max_wait:
+                metrics.inc("bb_rate_limited", priority=priority.value)
+                raise RateLimitExceptionBB(retry_after=wait)
+
+            # jitter, so the waiting calls do not all come back at the same moment
+            await asyncio.sleep(wait * random.uniform(1, 1.2))
+
+
+bb_rate_limiter = BBRateLimiter()
+
+
+async def start_bb_rate_limiter(app: FastAPI) -> None:
+    try:
+        bb_rate_limiter.start(BBRateLimitRedisRepository(app.state._redis))
+    except Exception as e:
+        logger.warn("--- BB RATE LIMITER START ERROR ---")
+        logger.warn(e)
+        logger.warn("--- BB RATE LIMITER START ERROR ---")
+
+
+async def stop_bb_rate_limiter(app: FastAPI) -> None:
+    bb_rate_limiter.stop()
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import FastAPI
+
+from app.core.config import (
+    BB_TOKEN_ACTIVE_WINDOW,
+    BB_TOKEN_L1_MAXSIZE,
+    BB_TOKEN_REFRESH_INTERVAL,
+    BB_TOKEN_REFRESH_MARGIN,
+)
+from app.core.metrics import metrics
+from app.db.repositories.token_bb_redis import TokenBBRedisRepository
+from app.schemas.token_bb import CredentialsBB, TokenBB
+from app.util.cache import TTLCache
+
+logger = logging.getLogger("app")
+
+RefreshTokenFunction = Callable[[CredentialsBB, TokenBBRedisRepository, int], Awaitable[TokenBB]]
+
+
+class BBTokenManager:
+    """
+    Coordinates the OAuth token requests to Banco do Brasil inside a worker:
+    - single-flight: concurrent misses for the same gw-dev-app-key share one refresh;
+    - background refresher: renews the tokens of the active keys before they expire;
+    - L1 cache: tokens kept in memory in front of Redis, each one only until its remaining lifetime.
+    The lock across gunicorn workers is taken by the refresh function (see BoletoBBService).
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # credentials live only in the worker memory, never in Redis
+        self._active: Dict[str, Tuple[CredentialsBB, float]] = {}
+        self._refresh_token: Optional[RefreshTokenFunction] = None
+        self._refresher_task: Optional[asyncio.Task] = None
+        self._tokens: TTLCache[TokenBB] = TTLCache(maxsize=BB_TOKEN_L1_MAXSIZE)
+        metrics.register_collector("bb_token_l1", self._tokens.stats)
+
+    def set_refresh_function(self, refresh_token: RefreshTokenFunction) -> None:
+        self._refresh_token = refresh_token
+
+    def touch(self, credentials: CredentialsBB) -> None:
+        self._active[credentials.gw_dev_app_key] = (credentials, time.monotonic())
+
+    def get_cached_token(self, gw_dev_app_key: str) -> Optional[TokenBB]:
+        return self._tokens.get(gw_dev_app_key)
+
+    def cache_token(self, token: TokenBB, ttl: float) -> None:
+        """
+        Keep the token in memory no longer than it lives in Redis.
+        :param ttl: remaining seconds of the token
+        """
+        self._tokens.set(token.id, token, ttl=ttl)
+
+    def evict_token(self, gw_dev_app_key: str) -> None:
+        self._tokens.evict(gw_dev_app_key)
+
+    async def single_flight(
+        self,
+        *,
+        credentials: CredentialsBB,
+        token_bb_redis_repo: TokenBBRedisRepository,
+        min_ttl: int = 1,
+    ) -> TokenBB:
+        key = credentials.gw_dev_app_key
+        task = self._inflight.get(key)
+
+        if not task:
+            task = asyncio.ensure_future(self._refresh_token(credentials, token_bb_redis_repo, min_ttl))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self.__done_refresh(key, t))
+
+        # shield: a cancelled request must not cancel the refresh shared with the others
+        return await asyncio.shield(task)
+
+    def __done_refresh(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+        if not task.cancelled() and task.exception():
+            logger.warn(f"BB token refresh failed for {key}: {task.exception()!r}")
+
+    async def refresh_active_tokens(self, token_bb_redis_repo: TokenBBRedisRepository) -> None:
+        now = time.monotonic()
+
+        for key, (credentials, last_used) in list(self._active.items()):
+            if now - last_used > BB_TOKEN_ACTIVE_WINDOW:
+                del self._active[key]
+                continue
+
+            ttl = await token_bb_redis_repo.get_ttl(id=key)
+            if ttl > BB_TOKEN_REFRESH_MARGIN:
+                continue
+
+            try:
+                await self.single_flight(
+                    credentials=credentials,
+                    token_bb_redis_repo=token_bb_redis_repo,
+                    min_ttl=BB_TOKEN_REFRESH_MARGIN + 1,
+                )
+            except Exception:
+                # already logged by the single-flight task; the hot path will retry on demand
+                pass
+
+    async def __run_refresher(self, token_bb_redis_repo: TokenBBRedisRepository) -> None:
+        while True:
+            await asyncio.sleep(BB_TOKEN_REFRESH_INTERVAL)
+            try:
+                await self.refresh_active_tokens(token_bb_redis_repo)
+            except Exception as e:
+                logger.warn(f"BB token refresher error: {e!r}")
+
+    def start(self, token_bb_redis_repo: TokenBBRedisRepository) -> None:
+        if self._refresher_task and not self._refresher_task.done():
+            return
+
+        self._refresher_task = asyncio.ensure_future(self.__run_refresher(token_bb_redis_repo))
+
+    async def stop(self) -> None:
+        if self._refresher_task:
+            self._refresher_task.cancel()
+            try:
+                await self._refresher_task
+            except asyncio.CancelledError:
+                pass
+
+        self._refresher_task = None
+
+
+bb_token_manager = BBTokenManager()
+
+
+async def start_bb_token_refresher(app: FastAPI) -> None:
+    try:
+        bb_token_manager.start(TokenBBRedisRepository(app.state._redis))
+    except Exception as e:
+        logger.warn("--- BB TOKEN REFRESHER START ERROR ---")
+        logger.warn(e)
+        logger.warn("--- BB TOKEN REFRESHER START ERROR ---")
+
+
+async def stop_bb_token_refresher(app: FastAPI) -> None:
+    try:
+        await bb_token_manager.stop()
+    except Exception as e:
+        logger.warn("--- BB TOKEN REFRESHER STOP ERROR ---")
+        logger.warn(e)
+        logger.warn("--- BB TOKEN REFRESHER STOP ERROR ---")
@@ -1,15 +1,33 @@
+import asyncio
 import base64
 import datetime
+import random
 import re
-import ssl
-import aiohttp
+from typing import Any, Dict, Optional, Tuple
 
+import aiohttp
 from fastapi import status
-from app.core.config import BB_API_URL, BB_OAUTH_URL
-from app.core.exceptions.exceptions_customs import HttpExceptionBB
+from redis.exceptions import LockError
+from app.core.config import (
+    BB_API_URL,
+    BB_CIRCUIT_FAILURE_RATE,
+    BB_CIRCUIT_HALF_OPEN_CALLS,
+    BB_CIRCUIT_MINIMUM_CALLS,
+    BB_CIRCUIT_OPEN_SECONDS,
+    BB_CIRCUIT_WINDOW_SIZE,
+    BB_OAUTH_URL,
+    BB_RETRY_ATTEMPTS,
+    BB_RETRY_BACKOFF_BASE,
+    BB_RETRY_BACKOFF_MAX,
+    BB_TOKEN_LOCK_TIMEOUT,
+)
+from app.core.metrics import metrics
+from app.core.exceptions.exceptions_customs import CircuitOpenExceptionBB, HttpExceptionBB
 from app.db.repositories.token_bb_redis import TokenBBRedisRepository
 from app.schemas.bancos.beneficiario_bb import BeneficiarioFinalBB
 from app.schemas.bancos.boleto_bb import (
+    BoletoBBAlteracao,
+    BoletoBBBaixar,
     BoletoBBCreate,
     BoletoBBInDB,
     BoletoBBRequestDetails,
@@ -22,12 +40,49 @@ from app.schemas.bancos.boleto_bb import (
 from app.schemas.bancos.conta_bancaria import ContaBancariaInDB
 from app.schemas.bancos.convenio_bancario import ConvenioBancarioInDB
 from app.schemas.bancos.pagador_bb import PagadorBB, PagadorInDB
+from app.schemas.enums import BBCallPriority
 from app.schemas.tenant import TenantInDB
-from app.schemas.token_bb import TokenBB
+from app.schemas.token_bb import CredentialsBB, TokenBB
+from app.services.bb_http_client import BBHttpClient
+from app.services.bb_rate_limiter import BBRateLimiter
+from app.services.bb_token_manager import BBTokenManager
+from app.util.circuit_breaker import CircuitBreaker
 from app.util.utils_bb import get_numero_titulo_cliente
 
+# one circuit per BB operation, a failing endpoint does not block the others
+BB_ENDPOINTS = ["registro", "consulta", "alteracao", "baixa", "oauth"]
+
+# endpoints safe to send again when the answer is lost or BB is overloaded
+BB_IDEMPOTENT_ENDPOINTS = ["consulta", "oauth"]
+
+# answers that say BB (not the request) is failing
+BB_FAILURE_STATUS_CODES = [
+    status.HTTP_408_REQUEST_TIMEOUT,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+]
+
 
 class BoletoBBService:
+    def __init__(self, http_client: BBHttpClient, token_manager: BBTokenManager, rate_limiter: BBRateLimiter) -> None:
+        self.http_client = http_client
+        self.token_manager = token_manager
+        self.rate_limiter = rate_limiter
+        self.token_manager.set_refresh_function(self.refresh_access_token_bb)
+        self.breakers: Dict[str, CircuitBreaker] = {
+            endpoint: CircuitBreaker(
+                endpoint,
+                failure_rate=BB_CIRCUIT_FAILURE_RATE,
+                window_size=BB_CIRCUIT_WINDOW_SIZE,
+                minimum_calls=BB_CIRCUIT_MINIMUM_CALLS,
+                open_seconds=BB_CIRCUIT_OPEN_SECONDS,
+                half_open_calls=BB_CIRCUIT_HALF_OPEN_CALLS,
+            )
+            for endpoint in BB_ENDPOINTS
+        }
+        metrics.register_collector(
+            "bb_circuits", lambda: {endpoint: breaker.stats() for endpoint, breaker in self.breakers.items()}
+        )
+
     async def registra_boleto_bb(
         self,
         *,
@@ -37,6 +92,7 @@ class BoletoBBService:
         pagador_bb_in_db: PagadorInDB,
         tenant_in_db: TenantInDB,
         token_bb_redis_repo: TokenBBRedisRepository,
+        priority: BBCallPriority = BBCallPriority.interactive,
     ) -> RegistroBoletoBB:
         boleto_bb_create = self.prepare_boleto_bb_to_create(
             convenio_bancario_in_db=convenio_bancario_in_db,
@@ -45,33 +101,32 @@ class BoletoBBService:
             tenant_in_db=tenant_in_db,
         )
 
-        token = await self.get_access_token_bb(
+        credentials = CredentialsBB(
             client_id=conta_bancaria_in_db.client_id,
             client_secret=conta_bancaria_in_db.client_secret,
             gw_dev_app_key=conta_bancaria_in_db.developer_application_key,
-            token_bb_redis_repo=token_bb_redis_repo,
         )
 
-        headers = {
-            "Authorization": f"Bearer {token.access_token}",
-            "Content-Type": "application/json",
-        }
-
         params = {
             "gw-dev-app-key": conta_bancaria_in_db.developer_application_key,
         }
 
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.post(
-                url=f"{BB_API_URL}/boletos", params=params, ssl=ssl.SSLContext(), data=boleto_bb_create.json()
-            ) as response:
-                result = await response.json()
+        response_status, result = await self.__request_bb(
+            "POST",
+            f"{BB_API_URL}/boletos",
+            endpoint="registro",
+            priority=priority,
+            credentials=credentials,
+            token_bb_redis_repo=token_bb_redis_repo,
+            params=params,
+            data=boleto_bb_create.json(),
+        )
 
-                if response.status in [status.HTTP_200_OK, status.HTTP_201_CREATED]:
-                    return RegistroBoletoBB(**result)
+        if response_status in [status.HTTP_200_OK, status.HTTP_201_CREATED]:
+            return RegistroBoletoBB(**result)
 
-                # Tratamento de erros (está retornando os erros da API do BB)
-                raise HttpExceptionBB(status_code=response.status, content=result)
+        # Tratamento de erros (está retornando os erros da API do BB)
+        raise HttpExceptionBB(status_code=response_status, content=result)
 
     def prepare_boleto_bb_to_create(
         self,
@@ -125,37 +180,103 @@ class BoletoBBService:
         *,
         boleto_bb_req: BoletoBBRequestDetails,
         token_bb_redis_repo: TokenBBRedisRepository,
+        priority: BBCallPriority = BBCallPriority.interactive,
     ) -> BoletoBBResponseDetails:
-        token = await self.get_access_token_bb(
+        credentials = CredentialsBB(
             client_id=boleto_bb_req.client_id,
             client_secret=boleto_bb_req.client_secret,
             gw_dev_app_key=boleto_bb_req.developer_application_key,
+        )
+
+        params = {
+            "gw-dev-app-key": boleto_bb_req.developer_application_key,
+            "numeroConvenio": boleto_bb_req.numero_convenio,
+        }
+
+        response_status, result = await self.__request_bb(
+            "GET",
+            f"{BB_API_URL}/boletos/{boleto_bb_req.numero}",
+            endpoint="consulta",
+            priority=priority,
+            credentials=credentials,
             token_bb_redis_repo=token_bb_redis_repo,
+            params=params,
         )
 
-        headers = {
-            "Authorization": f"Bearer {token.access_token}",
-            "Content-Type": "application/json",
+        if response_status != status.HTTP_200_OK:
+            raise HttpExceptionBB(status_code=response_status, content=result)
+
+        # boleto_bb_response = BoletoBBResponseDetails(**result)
+        # print(boleto_bb_response.dict())
+        return result
+
+    async def alterar_boleto_bb(
+        self,
+        *,
+        boleto_bb_req: BoletoBBRequestDetails,
+        boleto_bb_alteracao: BoletoBBAlteracao,
+        token_bb_redis_repo: TokenBBRedisRepository,
+        priority: BBCallPriority = BBCallPriority.interactive,
+    ) -> dict:
+        credentials = CredentialsBB(
+            client_id=boleto_bb_req.client_id,
+            client_secret=boleto_bb_req.client_secret,
+            gw_dev_app_key=boleto_bb_req.developer_application_key,
+        )
+
+        params = {
+            "gw-dev-app-key": boleto_bb_req.developer_application_key,
         }
 
+        response_status, result = await self.__request_bb(
+            "PATCH",
+            f"{BB_API_URL}/boletos/{boleto_bb_req.numero}",
+            endpoint="alteracao",
+            priority=priority,
+            credentials=credentials,
+            token_bb_redis_repo=token_bb_redis_repo,
+            params=params,
+            data=boleto_bb_alteracao.json(),
+        )
+
+        if response_status != status.HTTP_200_OK:
+            raise HttpExceptionBB(status_code=response_status, content=result)
+
+        return result
+
+    async def baixar_boleto_bb(
+        self,
+        *,
+        boleto_bb_req: BoletoBBRequestDetails,
+        boleto_bb_baixar: BoletoBBBaixar,
+        token_bb_redis_repo: TokenBBRedisRepository,
+        priority: BBCallPriority = BBCallPriority.interactive,
+    ) -> dict:
+        credentials = CredentialsBB(
+            client_id=boleto_bb_req.client_id,
+            client_secret=boleto_bb_req.client_secret,
+            gw_dev_app_key=boleto_bb_req.developer_application_key,
+        )
+
         params = {
             "gw-dev-app-key": boleto_bb_req.developer_application_key,
-            "numeroConvenio": boleto_bb_req.numero_convenio,
         }
 
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.get(
-                url=f"{BB_API_URL}/boletos/{boleto_bb_req.numero}",
-                params=params,
-                ssl=ssl.SSLContext(),
-            ) as response:
-                result = await response.json()
-                if response.status != status.HTTP_200_OK:
-                    raise HttpExceptionBB(status_code=response.status, content=result)
+        response_status, result = await self.__request_bb(
+            "POST",
+            f"{BB_API_URL}/boletos/{boleto_bb_req.numero}/baixar",
+            endpoint="baixa",
+            priority=priority,
+            credentials=credentials,
+            token_bb_redis_repo=token_bb_redis_repo,
+            params=params,
+            data=boleto_bb_baixar.json(),
+        )
 
-                # boleto_bb_response = BoletoBBResponseDetails(**result)
-                # print(boleto_bb_response.dict())
-                return result
+        if response_status != status.HTTP_200_OK:
+            raise HttpExceptionBB(status_code=response_status, content=result)
+
+        return result
 
     async def get_access_token_bb(
         self,
@@ -166,11 +287,82 @@ class BoletoBBService:
         gw_dev_app_key: str,
         token_bb_redis_repo: TokenBBRedisRepository,
     ) -> TokenBB:
-        token = await token_bb_redis_repo.get_token_by_id(id=gw_dev_app_key)
+        credentials = CredentialsBB(client_id=client_id, client_secret=client_secret, gw_dev_app_key=gw_dev_app_key)
+        self.token_manager.touch(credentials)
+
+        token = self.token_manager.get_cached_token(gw_dev_app_key)
+        if token:
+            return token
 
+        token, ttl = await token_bb_redis_repo.get_token_with_ttl(id=gw_dev_app_key)
         if token:
+            metrics.inc("bb_token_lookups", level="redis")
+            self.token_manager.cache_token(token, ttl)
             return token
 
+        # only one request per key goes to the OAuth endpoint, the others wait for its token
+        return await self.token_manager.single_flight(credentials=credentials, token_bb_redis_repo=token_bb_redis_repo)
+
+    async def invalidate_access_token_bb(
+        self,
+        *,
+        token: TokenBB,
+        token_bb_redis_repo: TokenBBRedisRepository,
+    ) -> None:
+        """
+        Drop a token rejected by BB from both cache levels.
+        Redis is only cleared when it still holds the same token, another worker may have renewed it already.
+        """
+        self.token_manager.evict_token(token.id)
+
+        cached = await token_bb_redis_repo.get_token_by_id(id=token.id)
+        if cached and cached.access_token == token.access_token:
+            await token_bb_redis_repo.delete_token(id=token.id)
+
+    async def refresh_access_token_bb(
+        self,
+        credentials: CredentialsBB,
+        token_bb_redis_repo: TokenBBRedisRepository,
+        min_ttl: int = 1,
+    ) -> TokenBB:
+        """
+        Request a new token holding a Redis lock shared by all workers.
+        After the lock is taken the cache is checked again, the token may have been renewed by another worker.
+        :param min_ttl: seconds that a cached token must still be valid to be reused
+        """
+        lock = token_bb_redis_repo.get_refresh_lock(
+            id=credentials.gw_dev_app_key, timeout=BB_TOKEN_LOCK_TIMEOUT, blocking_timeout=BB_TOKEN_LOCK_TIMEOUT
+        )
+        acquired = await lock.acquire()
+
+        try:
+            token, ttl = await token_bb_redis_repo.get_token_with_ttl(id=credentials.gw_dev_app_key)
+            if token and ttl >= min_ttl:
+                self.token_manager.cache_token(token, ttl)
+                return token
+
+            return await self.__request_access_token_bb(
+                credentials=credentials, token_bb_redis_repo=token_bb_redis_repo
+            )
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except LockError:
+                    # lock expired while waiting for BB, nothing to release
+                    pass
+
+    async def __request_access_token_bb(
+        self,
+        *,
+        grant_type: str = "client_credentials",
+        credentials: CredentialsBB,
+        token_bb_redis_repo: TokenBBRedisRepository,
+    ) -> TokenBB:
+        client_id = credentials.client_id
+        client_secret = credentials.client_secret
+        gw_dev_app_key = credentials.gw_dev_app_key
+
         # basic_encoded = base64.b64encode(bytes(f"{client_id}:{client_secret}", "utf-8"))
         basic_encoded = base64.b64encode(f"{client_id}:{client_secret}".encode("utf-8")).decode("utf-8")
         headers = {
@@ -184,12 +376,137 @@ class BoletoBBService:
 
         data = {"grant_type": grant_type, "client_id": client_id, "client_secret": client_secret}
 
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.post(
-                url=f"{BB_OAUTH_URL}/token", params=params, ssl=ssl.SSLContext(), data=data
-            ) as response:
-                if response.status in [status.HTTP_201_CREATED, status.HTTP_200_OK]:
-                    result = await response.json()
-                    token = TokenBB(id=gw_dev_app_key, **result)
-                    await token_bb_redis_repo.set_token(token=token, expires_in=token.expires_in - 60)
-                    return token
+        response_status, result = await self.__call_bb(
+            "oauth",
+            "POST",
+            f"{BB_OAUTH_URL}/token",
+            gw_dev_app_key=gw_dev_app_key,
+            headers=headers,
+            params=params,
+            data=data,
+        )
+
+        if response_status in [status.HTTP_201_CREATED, status.HTTP_200_OK]:
+            metrics.inc("bb_token_lookups", level="oauth")
+            token = TokenBB(id=gw_dev_app_key, **result)
+            await token_bb_redis_repo.set_token(token=token, expires_in=token.expires_in - 60)
+            self.token_manager.cache_token(token, token.expires_in - 60)
+            return token
+
+        raise HttpExceptionBB(status_code=response_status, content=result)
+
+    async def __request_bb(
+        self,
+        method: str,
+        url: str,
+        *,
+        endpoint: str,
+        credentials: CredentialsBB,
+        token_bb_redis_repo: TokenBBRedisRepository,
+        params: Optional[dict] = None,
+        data: Optional[Any] = None,
+        priority: BBCallPriority = BBCallPriority.interactive,
+    ) -> Tuple[int, Any]:
+        """
+        Call the BB API with the cached token.
+        When BB rejects the token (401) it is invalidated and the call is sent once more with a new one.
+        :return: tuple: (status code, decoded JSON body)
+        """
+        for attempt in range(2):
+            token = await self.get_access_token_bb(
+                client_id=credentials.client_id,
+                client_secret=credentials.client_secret,
+                gw_dev_app_key=credentials.gw_dev_app_key,
+                token_bb_redis_repo=token_bb_redis_repo,
+            )
+
+            response_status, result = await self.__call_bb(
+                endpoint,
+                method,
+                url,
+                gw_dev_app_key=credentials.gw_dev_app_key,
+                priority=priority,
+                headers=self.__get_bearer_headers(token=token),
+                params=params,
+                data=data,
+            )
+
+            if response_status != status.HTTP_401_UNAUTHORIZED or attempt:
+                return response_status, result
+
+            metrics.inc("bb_token_rejected")
+            await self.invalidate_access_token_bb(token=token, token_bb_redis_repo=token_bb_redis_repo)
+
+    async def __call_bb(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        *,
+        gw_dev_app_key: str,
+        headers: dict,
+        params: Optional[dict] = None,
+        data: Optional[Any] = None,
+        priority: BBCallPriority = BBCallPriority.interactive,
+    ) -> Tuple[int, Any]:
+        """
+        Send the call through the circuit breaker of the endpoint and the rate limiter of the key,
+        failing fast while the circuit is open: no rate limit token is taken for a call that is not sent.
+        Idempotent endpoints are sent again on network errors and BB failures, with jittered exponential backoff.
+        Business errors (4xx) count as successes for the breaker, BB answered.
+        :return: tuple: (status code, decoded JSON body)
+        """
+        breaker = self.breakers[endpoint]
+        attempts = BB_RETRY_ATTEMPTS if endpoint in BB_IDEMPOTENT_ENDPOINTS else 1
+
+        for attempt in range(1, attempts + 1):
+            if not breaker.allow():
+                raise CircuitOpenExceptionBB(endpoint=endpoint, retry_after=breaker.retry_after())
+
+            try:
+                await self.rate_limiter.acquire(gw_dev_app_key=gw_dev_app_key, priority=priority)
+            except BaseException:
+                # BB was not called (quota, cancelled while waiting), a half-open probe is given back
+                breaker.release()
+                raise
+
+            # every call let through by allow() reports an outcome, or a half-open circuit waits for it forever
+            succeeded = None
+            try:
+                response_status, result = await self.http_client.request(
+                    method, url, headers=headers, params=params, data=data
+                )
+                succeeded = not self.__is_bb_failure(response_status)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                succeeded = False
+                if attempt == attempts:
+                    raise
+            except Exception:
+                succeeded = False
+                raise
+            finally:
+                if succeeded is None:
+                    breaker.release()
+                elif succeeded:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+
+            if succeeded or attempt == attempts:
+                return response_status, result
+
+            metrics.inc("bb_retries", endpoint=endpoint)
+            await asyncio.sleep(self.__get_retry_backoff(attempt))
+
+    def __is_bb_failure(self, response_status: int) -> bool:
+        return response_status >= 500 or response_status in BB_FAILURE_STATUS_CODES
+
+    def __get_retry_backoff(self, attempt: int) -> float:
+        delay = min(BB_RETRY_BACKOFF_BASE * (2 ** (attempt - 1)), BB_RETRY_BACKOFF_MAX)
+        return random.uniform(0, delay)
+
+    def __get_bearer_headers(self, *, token: TokenBB) -> dict:
+        return {
+            "Authorization": f"Bearer {token.access_token}",
+            "Content-Type": "application/json",
+        }
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import random
+from typing import List, Optional
+
+from databases import Database
+from fastapi import FastAPI, HTTPException, status
+from redis.asyncio import Redis
+
+from app.core.config import (
+    BB_OUTBOX_BACKOFF_BASE,
+    BB_OUTBOX_BACKOFF_MAX,
+    BB_OUTBOX_BATCH_SIZE,
+    BB_OUTBOX_MAX_ATTEMPTS,
+    BB_OUTBOX_POLL_INTERVAL,
+    BB_OUTBOX_STALE_AFTER,
+    BB_OUTBOX_WORKERS,
+)
+from app.core.exceptions.exceptions_customs import (
+    CircuitOpenExceptionBB,
+    HttpExceptionBB,
+    RateLimitExceptionBB,
+)
+from app.core.metrics import metrics
+from app.db.repositories.boletos_bb import BoletosBBRepository
+from app.db.repositories.boletos_bb_outbox import BoletosBBOutboxRepository
+from app.db.repositories.convenios_bancarios import ConveniosBancariosRepository
+from app.db.repositories.tenants import TenantsRepository
+from app.db.repositories.token_bb_redis import TokenBBRedisRepository
+from app.schemas.bancos.banking_profile import BankingProfile
+from app.schemas.bancos.boleto_bb import BoletoBBInDB
+from app.schemas.bancos.boleto_bb_outbox import BoletoBBOutboxInDB
+from app.schemas.enums import BBCallPriority, RegistroStatus
+from app.services import boleto_bb_service
+from app.services.banking_profile_cache import banking_profile_cache
+
+logger = logging.getLogger("app")
+
+# BB answers that can succeed if sent again later
+RETRYABLE_STATUS_CODES = [
+    status.HTTP_401_UNAUTHORIZED,
+    status.HTTP_408_REQUEST_TIMEOUT,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+]
+
+
+class PermanentOutboxError(Exception):
+    pass
+
+
+class BoletoBBOutboxWorker:
+    """
+    Pool of tasks draining boletos_bb_outbox: registers the pending boletos in BB and fills in
+    linha_digitavel, codigo_barra_numerico and the QR code. Failures are retried with exponential backoff,
+    entries out of attempts go to the "dead" state and the boleto to "failed". A boleto rejected by BB is
+    removed, as in the synchronous and batch registrations, so its numero_titulo_beneficiario can be sent again.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: List[asyncio.Task] = []
+        self._db: Optional[Database] = None
+        self._redis: Optional[Redis] = None
+
+    def start(self, db: Database, redis: Redis, workers: int = BB_OUTBOX_WORKERS) -> None:
+        if self._tasks:
+            return
+
+        self._db = db
+        self._redis = redis
+        self._tasks = [asyncio.ensure_future(self.__run()) for _ in range(workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __run(self) -> None:
+        outbox_repo = BoletosBBOutboxRepository(self._db)
+
+        while True:
+            try:
+                entries = await outbox_repo.claim_entries(limit=BB_OUTBOX_BATCH_SIZE, stale_after=BB_OUTBOX_STALE_AFTER)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warn(f"Boleto BB outbox claim error: {e!r}")
+                entries = []
+
+            if not entries:
+                await asyncio.sleep(BB_OUTBOX_POLL_INTERVAL)
+                continue
+
+            await self.process_batch(entries=entries, outbox_repo=outbox_repo)
+
+    async def process_batch(self, *, entries: List[BoletoBBOutboxInDB], outbox_repo: BoletosBBOutboxRepository) -> None:
+        for entry in entries:
+            try:
+                # the batch runs one entry at a time, a slow BB could make the last ones stale and claimed again
+                locked_at = await outbox_repo.refresh_claim(id=entry.id, locked_at=entry.locked_at)
+                if not locked_at:
+                    metrics.inc("bb_outbox_entries", result="lost")
+                    continue
+
+                entry.locked_at = locked_at
+                await self.process_entry(entry=entry, outbox_repo=outbox_repo)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # the entry stays "processing" and is taken again after BB_OUTBOX_STALE_AFTER, the task goes on
+                logger.warn(f"Boleto BB outbox entry {entry.id} error: {e!r}")
+                metrics.inc("bb_outbox_errors")
+
+    async def process_entry(self, *, entry: BoletoBBOutboxInDB, outbox_repo: BoletosBBOutboxRepository) -> None:
+        boletos_bb_repo = BoletosBBRepository(self._db)
+
+        try:
+            await self.__registra_boleto_bb(entry=entry, boletos_bb_repo=boletos_bb_repo)
+            await outbox_repo.mark_done(id=entry.id)
+            metrics.inc("bb_outbox_entries", result="done")
+        except asyncio.CancelledError:
+            # the entry stays "processing" and is taken again after BB_OUTBOX_STALE_AFTER
+            raise
+        except Exception as e:
+            error = self.__get_error_message(e)
+
+            if self.__is_bb_rejection(e):
+                # the outbox entry goes with the boleto (ON DELETE CASCADE)
+                logger.warn(f"Boleto BB {entry.boleto_bb_id} registration refused by BB, boleto removed: {error}")
+                await boletos_bb_repo.delete_boleto_bb_by_id(tenant_id=entry.tenant_id, id=entry.boleto_bb_id)
+                metrics.inc("bb_outbox_entries", result="refused")
+                return
+
+            if isinstance(e, PermanentOutboxError) or entry.attempts >= BB_OUTBOX_MAX_ATTEMPTS:
+                logger.warn(f"Boleto BB {entry.boleto_bb_id} registration dead-lettered: {error}")
+                await outbox_repo.mark_dead(id=entry.id, last_error=error)
+                await boletos_bb_repo.update_registro_status(
+                    tenant_id=entry.tenant_id, id=entry.boleto_bb_id, registro_status=RegistroStatus.failed
+                )
+                metrics.inc("bb_outbox_entries", result="dead")
+                return
+
+            delay = self.get_backoff(entry.attempts)
+            if isinstance(e, (CircuitOpenExceptionBB, RateLimitExceptionBB)):
+                # BB was not called, come back when it can take the call
+                delay = max(delay, e.retry_after)
+
+            await outbox_repo.schedule_retry(id=entry.id, delay=delay, last_error=error)
+            metrics.inc("bb_outbox_entries", result="retry")
+
+    async def __registra_boleto_bb(self, *, entry: BoletoBBOutboxInDB, boletos_bb_repo: BoletosBBRepository) -> None:
+        tenant_in_db = await TenantsRepository(self._db).get_tenant_by_id(id=entry.tenant_id)
+        boleto_in_bd, pagador_bb_in_db = await boletos_bb_repo.get_boleto_bb_with_pagador_by_id(
+            tenant_id=entry.tenant_id, id=entry.boleto_bb_id
+        )
+
+        if not tenant_in_db or not boleto_in_bd or not pagador_bb_in_db:
+            raise PermanentOutboxError("Boleto, pagador or tenant not found.")
+
+        if boleto_in_bd.registro_status == RegistroStatus.registered:
+            return
+
+        try:
+            banking_profile = await banking_profile_cache.get_banking_profile(
+                tenant_id=entry.tenant_id,
+                convenio_bancario_id=boleto_in_bd.convenio_bancario_id,
+                convenios_bancarios_repo=ConveniosBancariosRepository(self._db),
+            )
+        except HTTPException as e:
+            raise PermanentOutboxError(e.detail)
+
+        # a previous attempt may have reached BB without getting the answer back
+        if entry.attempts > 1 and await self.__complete_from_consulta(
+            boleto_in_bd=boleto_in_bd, banking_profile=banking_profile, boletos_bb_repo=boletos_bb_repo
+        ):
+            return
+
+        registered_boleto_bb = await boleto_bb_service.registra_boleto_bb(
+            conta_bancaria_in_db=banking_profile.conta,
+            convenio_bancario_in_db=banking_profile.convenio,
+            boleto_in_bd=boleto_in_bd,
+            pagador_bb_in_db=pagador_bb_in_db,
+            tenant_in_db=tenant_in_db,
+            token_bb_redis_repo=TokenBBRedisRepository(self._redis),
+            priority=BBCallPriority.bulk,
+        )
+
+        await boletos_bb_repo.complete_boleto_bb_registration(
+            tenant_in_db=tenant_in_db, boleto_in_bd=boleto_in_bd, registered_boleto_bb=registered_boleto_bb
+        )
+
+    async def __complete_from_consulta(
+        self, *, boleto_in_bd: BoletoBBInDB, banking_profile: BankingProfile, boletos_bb_repo: BoletosBBRepository
+    ) -> bool:
+        boleto_bb_req = banking_profile.get_request_details(id=boleto_in_bd.id, numero=boleto_in_bd.numero)
+
+        try:
+            boleto_bb_response = await boleto_bb_service.consultar_situacao_boleto_bb(
+                boleto_bb_req=boleto_bb_req,
+                token_bb_redis_repo=TokenBBRedisRepository(self._redis),
+                priority=BBCallPriority.bulk,
+            )
+        except HttpExceptionBB as e:
+            if 400 <= e.status_code < 500 and e.status_code not in RETRYABLE_STATUS_CODES:
+                # not found in BB, it must be registered
+                return False
+            raise
+
+        await boletos_bb_repo.complete_boleto_bb_registration_from_consulta(
+            boleto_in_bd=boleto_in_bd, boleto_bb_response=boleto_bb_response
+        )
+        return True
+
+    def get_backoff(self, attempts: int) -> float:
+        """
+        Exponential backoff with full jitter, so entries that failed together do not come back together.
+        """
+        delay = min(BB_OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BB_OUTBOX_BACKOFF_MAX)
+        return random.uniform(delay / 2, delay)
+
+    def __is_bb_rejection(self, e: Exception) -> bool:
+        # BB validation errors will not change on a new attempt
+        return (
+            isinstance(e, HttpExceptionBB)
+            and 400 <= e.status_code < 500
+            and e.status_code not in RETRYABLE_STATUS_CODES
+        )
+
+    def __get_error_message(self, e: Exception) -> str:
+        if isinstance(e, HttpExceptionBB):
+            return f"{e.status_code}: {e.content or e.detail}"
+
+        return repr(e)
+
+
+boleto_bb_outbox_worker = BoletoBBOutboxWorker()
+
+
+async def start_boleto_bb_outbox_worker(app: FastAPI) -> None:
+    try:
+        boleto_bb_outbox_worker.start(app.state._db, app.state._redis)
+    except Exception as e:
+        logger.warn("--- BOLETO BB OUTBOX WORKER START ERROR ---")
+        logger.warn(e)
+        logger.warn("--- BOLETO BB OUTBOX WORKER START ERROR ---")
+
+
+async def stop_boleto_bb_outbox_worker(app: FastAPI) -> None:
+    try:
+        await boleto_bb_outbox_worker.stop()
+    except Exception as e:
+        logger.warn("--- BOLETO BB OUTBOX WORKER STOP ERROR ---")
+        logger.warn(e)
+        logger.warn("--- BOLETO BB OUTBOX WORKER STOP ERROR ---")
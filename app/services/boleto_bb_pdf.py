@@ -139,6 +139,10 @@ def __gen_pix_table(width, height, data_qr_code: str):
         RIGTH_MARGIN,  # right_margin
     ]
 
+    if not data_qr_code:
+        # boleto without Pix (e.g. completed from the BB consulta): the header stays blank
+        return Table([[None, None, None, None]], widths_list, height)
+
     titleStyle = ParagraphStyle("titleStyle")
     titleStyle.fontSize = 9
     titleStyle.fontName = "Times-Italic"
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Set
+
+from databases import Database
+from fastapi import FastAPI
+from pydantic import UUID4
+from redis.asyncio import Redis
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError, LockNotOwnedError
+
+from app.core.config import (
+    BB_RECONCILIATION_BATCH_SIZE,
+    BB_RECONCILIATION_CONCURRENCY,
+    BB_RECONCILIATION_GRACE_DAYS,
+    BB_RECONCILIATION_INTERVAL,
+    BB_RECONCILIATION_MIN_AGE,
+    REDIS_PREFIX,
+)
+from app.core.exceptions.exceptions_customs import HttpExceptionBB
+from app.core.metrics import metrics
+from app.db.repositories.boletos_bb import BoletosBBRepository
+from app.db.repositories.token_bb_redis import TokenBBRedisRepository
+from app.schemas.bancos.boleto_bb import BoletoBBRequestDetails, BoletoBBSync
+from app.schemas.enums import BBCallPriority
+from app.services import boleto_bb_service
+from app.util.utils_bb import get_date_bb
+
+logger = logging.getLogger("app")
+
+
+class BoletoBBReconciliationWorker:
+    """
+    Periodic task bringing the payment data of the open boletos from BB to boletos_bb
+    (codigo_estado_titulo, data_recebimento, data_credito, valores recebidos) and stamping data_hora_sincronizacao,
+    so the status of a boleto is read from Postgres instead of a live consulta. The same consulta settles an alteração
+    or a baixa BB did not answer (see BoletosBBRepository.update_boletos_bb_sync).
+    Each cycle runs in only one worker of the cluster (Redis lock), the consultas are bulk calls of the rate limiter.
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._db: Optional[Database] = None
+        self._redis: Optional[Redis] = None
+
+    def start(self, db: Database, redis: Redis) -> None:
+        if self._task:
+            return
+
+        self._db = db
+        self._redis = redis
+        self._task = asyncio.ensure_future(self.__run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def __run(self) -> None:
+        while True:
+            try:
+                await self.run_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warn(f"Boleto BB reconciliation error: {e!r}")
+
+            await asyncio.sleep(BB_RECONCILIATION_INTERVAL)
+
+    async def run_cycle(self) -> int:
+        """
+        Synchronize the open boletos of every convenio.
+        :return: int: boletos synchronized, 0 when another worker holds the cycle
+        """
+        lock = self._redis.lock(f"{REDIS_PREFIX}:lock:boletos_bb_reconciliation", timeout=BB_RECONCILIATION_INTERVAL)
+        if not await lock.acquire(blocking=False):
+            return 0
+
+        started = time.monotonic()
+        boletos_bb_repo = BoletosBBRepository(self._db)
+        synced = 0
+
+        try:
+            convenios_ids = await boletos_bb_repo.get_convenios_with_open_boletos_bb(
+                grace_days=BB_RECONCILIATION_GRACE_DAYS
+            )
+            for convenio_bancario_id in convenios_ids:
+                synced += await self.__sync_convenio(
+                    convenio_bancario_id=convenio_bancario_id, boletos_bb_repo=boletos_bb_repo, lock=lock
+                )
+        except LockNotOwnedError:
+            # the lock expired (a stalled batch) and another worker may be running the cycle, it is left to it
+            logger.warn("Boleto BB reconciliation lock lost, cycle stopped")
+            metrics.inc("bb_reconciliation_lock_lost")
+        finally:
+            try:
+                await lock.release()
+            except LockError:
+                pass
+
+        metrics.observe("bb_reconciliation_cycle_seconds", time.monotonic() - started)
+        return synced
+
+    async def __sync_convenio(
+        self, *, convenio_bancario_id: UUID4, boletos_bb_repo: BoletosBBRepository, lock: Lock
+    ) -> int:
+        synced = 0
+        # boletos whose consulta failed get no stamp and stay first in the order: they are skipped for the rest
+        # of the cycle, each batch reads that many more rows
+        failed_ids: Set[UUID4] = set()
+
+        while True:
+            limit = BB_RECONCILIATION_BATCH_SIZE + len(failed_ids)
+            open_boletos_bb = await boletos_bb_repo.get_open_boletos_bb_to_sync(
+                convenio_bancario_id=convenio_bancario_id,
+                grace_days=BB_RECONCILIATION_GRACE_DAYS,
+                min_age=BB_RECONCILIATION_MIN_AGE,
+                limit=limit,
+            )
+            boletos_bb_req = [boleto_bb_req for boleto_bb_req in open_boletos_bb if boleto_bb_req.id not in failed_ids]
+            if not boletos_bb_req:
+                return synced
+
+            boletos_sync = await self.__consultar_boletos_bb(boletos_bb_req=boletos_bb_req)
+            # a cycle takes longer than the lock timeout: each batch renews it, and is not saved when it was lost
+            await lock.reacquire()
+            if boletos_sync:
+                await boletos_bb_repo.update_boletos_bb_sync(boletos_sync=boletos_sync)
+            synced += len(boletos_sync)
+            failed_ids.update({boleto_bb_req.id for boleto_bb_req in boletos_bb_req})
+            failed_ids.difference_update({boleto_sync.id for boleto_sync in boletos_sync})
+
+            # a batch without any answer (circuit open, quota) is left to the next cycle
+            if len(open_boletos_bb) < limit or not boletos_sync:
+                return synced
+
+    async def __consultar_boletos_bb(self, *, boletos_bb_req: List[BoletoBBRequestDetails]) -> List[BoletoBBSync]:
+        semaphore = asyncio.Semaphore(BB_RECONCILIATION_CONCURRENCY)
+        token_bb_redis_repo = TokenBBRedisRepository(self._redis)
+
+        async def consultar(boleto_bb_req: BoletoBBRequestDetails) -> Optional[BoletoBBSync]:
+            async with semaphore:
+                try:
+                    boleto_bb_response = await boleto_bb_service.consultar_situacao_boleto_bb(
+                        boleto_bb_req=boleto_bb_req,
+                        token_bb_redis_repo=token_bb_redis_repo,
+                        priority=BBCallPriority.bulk,
+                    )
+                except Exception as e:
+                    if not isinstance(e, HttpExceptionBB):
+                        logger.warn(f"Boleto BB {boleto_bb_req.id} reconciliation error: {e!r}")
+                    metrics.inc("bb_reconciliation_boletos", result="error")
+                    return None
+
+            metrics.inc("bb_reconciliation_boletos", result="synced")
+            return self.__get_boleto_bb_sync(id=boleto_bb_req.id, boleto_bb_response=boleto_bb_response)
+
+        # only the BB calls run concurrently, the update is done by the caller
+        results = await asyncio.gather(*[consultar(boleto_bb_req) for boleto_bb_req in boletos_bb_req])
+
+        return [boleto_sync for boleto_sync in results if boleto_sync]
+
+    def __get_boleto_bb_sync(self, *, id: UUID4, boleto_bb_response: dict) -> BoletoBBSync:
+        return BoletoBBSync(
+            id=id,
+            codigo_estado_titulo=boleto_bb_response.get("codigoEstadoTituloCobranca"),
+            data_vencimento=get_date_bb(boleto_bb_response.get("dataVencimentoTituloCobranca")) or None,
+            data_recebimento=get_date_bb(boleto_bb_response.get("dataRecebimentoTitulo")) or None,
+            data_credito=get_date_bb(boleto_bb_response.get("dataCreditoLiquidacao")) or None,
+            valor_pago_sacado=boleto_bb_response.get("valorPagoSacado") or 0,
+            valor_credito_cedente=boleto_bb_response.get("valorCreditoCedente") or 0,
+            valor_desconto_utilizado=boleto_bb_response.get("valorDescontoUtilizado") or 0,
+            valor_multa_recebido=boleto_bb_response.get("valorMultaRecebido") or 0,
+            valor_juros_recebido=boleto_bb_response.get("valorJuroMoraRecebido") or 0,
+        )
+
+
+boleto_bb_reconciliation_worker = BoletoBBReconciliationWorker()
+
+
+async def start_boleto_bb_reconciliation_worker(app: FastAPI) -> None:
+    try:
+        boleto_bb_reconciliation_worker.start(app.state._db, app.state._redis)
+    except Exception as e:
+        logger.warn("--- BOLETO BB RECONCILIATION WORKER START ERROR ---")
+        logger.warn(e)
+        logger.warn("--- BOLETO BB RECONCILIATION WORKER START ERROR ---")
+
+
+async def stop_boleto_bb_reconciliation_worker(app: FastAPI) -> None:
+    try:
+        await boleto_bb_reconciliation_worker.stop()
+    except Exception as e:
+        logger.warn("--- BOLETO BB RECONCILIATION WORKER STOP ERROR ---")
+        logger.warn(e)
+        logger.warn("--- BOLETO BB RECONCILIATION WORKER STOP ERROR ---")
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import FastAPI
+from pydantic.types import UUID4
+
+from app.core.config import SESSION_TOKEN_CACHE_MAXSIZE, SESSION_TOKEN_CACHE_TTL
+from app.core.metrics import metrics
+from app.db.invalidation import invalidation_bus
+from app.db.repositories.token_redis import TokenRedisRepository
+from app.schemas.enums import CacheEntity
+from app.schemas.invalidation import InvalidationEvent
+from app.schemas.token import SessionToken, Token
+from app.util.cache import TTLCache
+
+logger = logging.getLogger("app")
+
+
+class SessionTokenCache:
+    """
+    Session tokens of the Bearer authentication (the JWT "sub"), kept in the worker memory after the first read from
+    Redis, with the roles and permissions already split for has_roles/has_permission.
+    A removal goes through revoke_token()/revoke_user(): the token is deleted from Redis and then the sessions of the
+    user are evicted from every worker by an InvalidationEvent (app/db/invalidation.py), so a logout is effective on
+    the next request. Only valid tokens are cached, an unknown one always reaches Redis.
+    """
+
+    def __init__(self) -> None:
+        self._tokens: TTLCache[SessionToken] = TTLCache(
+            maxsize=SESSION_TOKEN_CACHE_MAXSIZE, default_ttl=SESSION_TOKEN_CACHE_TTL
+        )
+        # a token read from Redis before a revocation is not cached after it
+        self._generation = 0
+        self._task: Optional[asyncio.Task] = None
+        metrics.register_collector("session_token_cache", self._tokens.stats)
+        invalidation_bus.subscribe(CacheEntity.session, self.__on_invalidation, self.clear)
+        # the routes that change a user remove its tokens too, this covers the writes made elsewhere
+        invalidation_bus.subscribe(CacheEntity.user, self.__on_invalidation, self.clear)
+
+    async def get_token(self, *, token_id: str, token_redis_repo: TokenRedisRepository) -> Optional[SessionToken]:
+        token = self._tokens.get(token_id)
+        if token:
+            metrics.inc("session_token_lookups", level="l1")
+            return token
+
+        metrics.inc("session_token_lookups", level="redis")
+        generation = self._generation
+        redis_token = await token_redis_repo.get_all(token_id)
+        if not redis_token:
+            return None
+
+        token = SessionToken(**redis_token)
+        if generation == self._generation:
+            self._tokens.set(token_id, token)
+
+        return token
+
+    async def revoke_token(self, *, token: Token, token_redis_repo: TokenRedisRepository) -> None:
+        """
+        Remove one session. The event evicts all the sessions of the user, the others are read again from Redis.
+        """
+        await token_redis_repo.remove_token_by_key(token.id, user_id=token.user_id)
+        self._tokens.evict(token.id)
+        await self.__publish(user_id=token.user_id, tenant_id=token.tenant_id)
+
+    async def revoke_user(self, *, user_id: UUID4, token_redis_repo: TokenRedisRepository) -> None:
+        """
+        Remove every session of the user (logout and force-logout).
+        """
+        await token_redis_repo.remove_tokens_by_user_id(user_id=user_id)
+        await self.__publish(user_id=user_id)
+
+    def start(self, token_redis_repo: TokenRedisRepository) -> None:
+        """
+        Index in the background the tokens written before the per-user indexes of TokenRedisRepository.
+        """
+        if self._task:
+            return
+
+        self._task = asyncio.ensure_future(self.__index_tokens(token_redis_repo))
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._tokens.clear()
+
+    async def __publish(self, *, user_id: UUID4, tenant_id: Optional[UUID4] = None) -> None:
+        # after Redis: a worker may have read the token between the eviction and the delete
+        await invalidation_bus.publish(CacheEntity.session, user_id, tenant_id)
+
+    async def __index_tokens(self, token_redis_repo: TokenRedisRepository) -> None:
+        try:
+            indexed = await token_redis_repo.index_tokens()
+            metrics.inc("session_tokens_indexed", indexed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warn(f"Session token indexing error: {e!r}")
+
+    def __on_invalidation(self, event: InvalidationEvent) -> None:
+        self._generation += 1
+        user_id = str(event.id)
+        self._tokens.evict_where(lambda key, token: token.user_id == user_id)
+
+
+session_token_cache = SessionTokenCache()
+
+
+async def start_session_token_indexer(app: FastAPI) -> None:
+    try:
+        session_token_cache.start(TokenRedisRepository(app.state._redis))
+    except Exception as e:
+        logger.warn("--- SESSION TOKEN INDEXER START ERROR ---")
+        logger.warn(e)
+        logger.warn("--- SESSION TOKEN INDEXER START ERROR ---")
+
+
+async def stop_session_token_indexer(app: FastAPI) -> None:
+    await session_token_cache.stop()
@@ -0,0 +1,130 @@
+import hashlib
+import logging
+from typing import Optional, Union
+
+from pydantic.types import UUID4
+
+from app.core.config import (
+    TENANT_CACHE_L1_MAXSIZE,
+    TENANT_CACHE_L1_TTL,
+    TENANT_CACHE_NEGATIVE_TTL,
+    TENANT_CACHE_TTL,
+)
+from app.core.metrics import metrics
+from app.db.invalidation import invalidation_bus
+from app.db.repositories.tenant_redis import TenantsRedisRepository
+from app.db.repositories.tenants import TenantsRepository
+from app.schemas.enums import CacheEntity
+from app.schemas.invalidation import InvalidationEvent
+from app.schemas.tenant import TenantInDB
+from app.util.cache import TTLCache
+
+logger = logging.getLogger("app")
+
+# api key cached as unknown in the worker memory (TTLCache.get returns None on a miss)
+NOT_FOUND = False
+
+
+def get_api_key_hash(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class TenantCache:
+    """
+    Tenant of the X-API-Key authentication, looked up in the worker memory, then in Redis and only then in Postgres,
+    so an authenticated call doesn't pay a DB round trip. Unknown api keys are cached for TENANT_CACHE_NEGATIVE_TTL,
+    a client retrying a bad key doesn't reach the DB either.
+    The memory of every worker is evicted by the InvalidationEvent of TenantsRepository (app/db/invalidation.py),
+    Redis by invalidate(), called by the routes that change a tenant.
+    """
+
+    def __init__(self) -> None:
+        self._tenants: TTLCache[Union[TenantInDB, bool]] = TTLCache(
+            maxsize=TENANT_CACHE_L1_MAXSIZE, default_ttl=TENANT_CACHE_L1_TTL
+        )
+        # a tenant loaded before an invalidation is not cached after it
+        self._generation = 0
+        metrics.register_collector("tenant_cache_l1", self._tenants.stats)
+        invalidation_bus.subscribe(CacheEntity.tenant, self.__on_invalidation, self.clear)
+
+    async def get_tenant_by_api_key(
+        self,
+        *,
+        api_key: str,
+        tenants_repo: TenantsRepository,
+        tenants_redis_repo: TenantsRedisRepository,
+    ) -> Optional[TenantInDB]:
+        api_key_hash = get_api_key_hash(api_key)
+
+        tenant = self._tenants.get(api_key_hash)
+        if tenant is not None:
+            metrics.inc("tenant_cache_lookups", level="l1")
+            return tenant or None
+
+        generation = self._generation
+        try:
+            cached, tenant = await tenants_redis_repo.get_cached_tenant(api_key_hash)
+        except Exception as e:
+            # Redis down: the authentication goes on with the DB
+            logger.warn(f"Tenant cache error: {e!r}")
+            metrics.inc("tenant_cache_errors")
+            cached, tenant = False, None
+
+        if cached:
+            metrics.inc("tenant_cache_lookups", level="redis")
+            if tenant:
+                # Redis keeps the tenant without its api key: it is the one of the request, the hash matched
+                tenant = tenant.copy(update={"api_key": api_key})
+            if generation == self._generation:
+                self.__cache_in_memory(api_key_hash, tenant)
+            return tenant
+
+        metrics.inc("tenant_cache_lookups", level="db")
+        tenant = await tenants_repo.get_tenant_by_api_key(api_key=api_key)
+        if generation != self._generation:
+            # changed while it was read: neither level keeps the row, the next lookup loads it again
+            return tenant
+
+        self.__cache_in_memory(api_key_hash, tenant)
+        try:
+            await tenants_redis_repo.set_cached_tenant(
+                api_key_hash=api_key_hash,
+                tenant=tenant,
+                expires_in=TENANT_CACHE_TTL if tenant else TENANT_CACHE_NEGATIVE_TTL,
+            )
+        except Exception as e:
+            logger.warn(f"Tenant cache error: {e!r}")
+            metrics.inc("tenant_cache_errors")
+
+        return tenant
+
+    async def invalidate(
+        self, *, id: UUID4, tenants_redis_repo: TenantsRedisRepository, api_key: Optional[str] = None
+    ) -> None:
+        """
+        Remove the tenant from both levels, after the change was written to the DB.
+        The event is published again after Redis: a worker may have refilled its memory from Redis in between.
+        """
+        self._generation += 1
+        api_key_hash = get_api_key_hash(api_key) if api_key else None
+        if api_key_hash:
+            self._tenants.evict(api_key_hash)
+        await tenants_redis_repo.remove_cached_tenant(id=id, api_key_hash=api_key_hash)
+        await invalidation_bus.publish(CacheEntity.tenant, id)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._tenants.clear()
+
+    def __on_invalidation(self, event: InvalidationEvent) -> None:
+        self._generation += 1
+        self._tenants.evict_where(lambda key, tenant: bool(tenant) and tenant.id == event.id)
+
+    def __cache_in_memory(self, api_key_hash: str, tenant: Optional[TenantInDB]) -> None:
+        if tenant:
+            self._tenants.set(api_key_hash, tenant)
+        else:
+            self._tenants.set(api_key_hash, NOT_FOUND, ttl=min(TENANT_CACHE_L1_TTL, TENANT_CACHE_NEGATIVE_TTL))
+
+
+tenant_cache = TenantCache()
@@ -0,0 +1,122 @@
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Dict
+
+from app.core.metrics import metrics
+
+
+class CircuitState(str, Enum):
+    closed = "closed"
+    half_open = "half_open"
+    open = "open"
+
+
+# gauge values, so a dashboard can plot the state
+CIRCUIT_STATE_VALUES = {CircuitState.closed: 0, CircuitState.half_open: 1, CircuitState.open: 2}
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker over the last window_size calls of one dependency.
+    - closed: calls pass, the circuit opens when at least minimum_calls were seen and the failure rate is reached;
+    - open: calls are refused (fail fast) for open_seconds;
+    - half_open: up to half_open_calls probes pass, all must succeed to close it, one failure opens it again.
+    It is local to the worker process and not thread-safe (one event loop per worker).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate: float = 0.5,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 3,
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CircuitState.closed
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probes_succeeded = 0
+        metrics.set_gauge("circuit_breaker_state", CIRCUIT_STATE_VALUES[self.state], endpoint=self.name)
+
+    def allow(self) -> bool:
+        """
+        Must be called before each call; when True, the outcome must be reported with record_success/record_failure,
+        or release() when the call ended without one.
+        """
+        if self.state == CircuitState.open:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                metrics.inc("circuit_breaker_rejected", endpoint=self.name)
+                return False
+            self.__transition(CircuitState.half_open)
+
+        if self.state == CircuitState.half_open:
+            if self._probes_in_flight + self._probes_succeeded >= self.half_open_calls:
+                metrics.inc("circuit_breaker_rejected", endpoint=self.name)
+                return False
+            self._probes_in_flight += 1
+
+        return True
+
+    def record_success(self) -> None:
+        if self.state == CircuitState.half_open:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            self._probes_succeeded += 1
+            if self._probes_succeeded >= self.half_open_calls:
+                self.__transition(CircuitState.closed)
+            return
+
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self.state == CircuitState.half_open:
+            self.__transition(CircuitState.open)
+            return
+
+        self._outcomes.append(False)
+        if self.state == CircuitState.closed and len(self._outcomes) >= self.minimum_calls:
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self.__transition(CircuitState.open)
+
+    def release(self) -> None:
+        """
+        The call was abandoned (cancelled) before an outcome: a half-open probe is given back.
+        """
+        if self.state == CircuitState.half_open:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def retry_after(self) -> float:
+        if self.state != CircuitState.open:
+            return 0.0
+
+        return max(self.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+    def __transition(self, state: CircuitState) -> None:
+        self.state = state
+        self._probes_in_flight = 0
+        self._probes_succeeded = 0
+
+        if state == CircuitState.open:
+            self._opened_at = time.monotonic()
+        if state == CircuitState.closed:
+            self._outcomes.clear()
+
+        metrics.set_gauge("circuit_breaker_state", CIRCUIT_STATE_VALUES[state], endpoint=self.name)
+        metrics.inc("circuit_breaker_transitions", endpoint=self.name, state=state.value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "calls": len(self._outcomes),
+            "failures": self._outcomes.count(False),
+            "retry_after": round(self.retry_after(), 1),
+        }
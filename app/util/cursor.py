@@ -0,0 +1,83 @@
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+from decimal import Decimal
+from typing import Any, Dict, List
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+from app.core.config import SECRET_KEY
+
+
+# the key is derived from SECRET_KEY, so a cursor can not be replayed as any other signed value of the API
+CURSOR_KEY = hmac.new(str(SECRET_KEY).encode(), b"pagination-cursor", hashlib.sha256).digest()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _encode_value(value: Any) -> List[Any]:
+    # asyncpg does not cast parameters, so the original type of each sort key must survive the round trip
+    if isinstance(value, datetime.datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, datetime.date):
+        return ["d", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["n", str(value)]
+    if isinstance(value, UUID):
+        return ["u", str(value)]
+
+    return ["", value]
+
+
+def _decode_value(value: List[Any]) -> Any:
+    kind, raw = value
+    if kind == "dt":
+        return datetime.datetime.fromisoformat(raw)
+    if kind == "d":
+        return datetime.date.fromisoformat(raw)
+    if kind == "n":
+        return Decimal(raw)
+    if kind == "u":
+        return UUID(raw)
+
+    return raw
+
+
+def encode_cursor(*, sorts: List[List[str]], values: List[Any], direction: str) -> str:
+    """
+    Opaque cursor with the sorts of the listing, the sort key values (plus id) of the edge row and the direction
+    ("next" or "prev"), signed with HMAC-SHA256.
+    """
+    payload = json.dumps(
+        {"s": sorts, "v": [_encode_value(value) for value in values], "d": direction}, separators=(",", ":")
+    ).encode()
+    signature = hmac.new(CURSOR_KEY, payload, hashlib.sha256).digest()
+
+    return f"{_b64encode(payload)}.{_b64encode(signature)}"
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        payload, signature = cursor.split(".")
+        payload = _b64decode(payload)
+        is_valid = hmac.compare_digest(hmac.new(CURSOR_KEY, payload, hashlib.sha256).digest(), _b64decode(signature))
+    except (ValueError, TypeError):
+        is_valid = False
+
+    if not is_valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor is not valid.",
+        )
+
+    data = json.loads(payload)
+    return {"sorts": data["s"], "values": [_decode_value(value) for value in data["v"]], "direction": data["d"]}
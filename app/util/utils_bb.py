@@ -1,5 +1,7 @@
 from datetime import date
+import hashlib
 import re
+from typing import Optional
 
 
 camel_pat = re.compile(r"([A-Z])")
@@ -25,3 +27,20 @@ def get_date_bb(data_str: str):
 
         assert isinstance(data, date), "Invalid date"
         return data_iso
+
+
+def get_pagador_dedupe_key(
+    *, cpf_cnpj: Optional[str], cep: Optional[str], endereco: Optional[str], telefone: Optional[str]
+) -> str:
+    """
+    sha256 of the fields that identify a pagador of the tenant, normalized so the same pagador written
+    with another mask, case or spacing has the same key (unique index (tenant_id, dedupe_key) of pagadores_bb).
+    """
+    normalized = [
+        re.sub(r"\D", "", cpf_cnpj or ""),
+        re.sub(r"\D", "", cep or ""),
+        " ".join((endereco or "").split()).upper(),
+        re.sub(r"\D", "", telefone or ""),
+    ]
+
+    return hashlib.sha256("|".join(normalized).encode()).hexdigest()
@@ -0,0 +1,371 @@
+"""
+Local stand-in for the Banco do Brasil OAuth and Cobrança (v2) APIs, for load tests without the sandbox.
+
+Serves the endpoints called by BoletoBBService:
+- POST  /oauth/token
+- POST  /cobrancas/v2/boletos                 (RegistroBoletoBB)
+- GET   /cobrancas/v2/boletos/{numero}        (BoletoBBResponseDetails)
+- PATCH /cobrancas/v2/boletos/{numero}
+- POST  /cobrancas/v2/boletos/{numero}/baixar
+- GET   /_stats                               (calls and injected errors per endpoint)
+
+Latency is log-normal around --latency-ms, with --slow-ratio answers taking --slow-ms. Errors are injected with
+--error-rate (500) and --rate-429 (429), --quota-rps answers 429 above a per gw-dev-app-key rate like BB does.
+
+    python benchmarks/bb_simulator.py --port 8090 --latency-ms 150 --error-rate 0.01 --rate-429 0.02
+
+Point the API to it:
+
+    BB_OAUTH_URL=http://localhost:8090/oauth BB_API_URL=http://localhost:8090/cobrancas/v2
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import secrets
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+
+def bb_date(date: Optional[datetime.date]) -> str:
+    return f"{date.day:02d}.{date.month:02d}.{date.year}" if date else ""
+
+
+def parse_bb_date(data_str: str) -> datetime.date:
+    day, month, year = data_str.split(".")
+    return datetime.date(int(year), int(month), int(day))
+
+
+def digits(size: int) -> str:
+    return "".join(random.choice("0123456789") for _ in range(size))
+
+
+def only_digits(value: Any) -> str:
+    return "".join(c for c in str(value or "") if c.isdigit())
+
+
+def erros(mensagem: str, codigo: str = "4874915") -> Dict[str, Any]:
+    return {"erros": [{"codigo": codigo, "versao": "1", "mensagem": mensagem, "ocorrencia": secrets.token_hex(8)}]}
+
+
+class TokenBucket:
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+
+class BBSimulator:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.tokens: Dict[str, float] = {}  # access_token -> expiration (monotonic)
+        self.boletos: Dict[str, Dict[str, Any]] = {}  # numero -> registration data
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.add_routes(
+            [
+                web.post("/oauth/token", self.token),
+                web.post("/cobrancas/v2/boletos", self.registra),
+                web.get("/cobrancas/v2/boletos/{numero}", self.consulta),
+                web.patch("/cobrancas/v2/boletos/{numero}", self.altera),
+                web.post("/cobrancas/v2/boletos/{numero}/baixar", self.baixa),
+                web.get("/_stats", self.get_stats),
+            ]
+        )
+        return app
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        if request.path == "/_stats":
+            return await handler(request)
+
+        resource = request.match_info.route.resource
+        endpoint = f"{request.method} {resource.canonical if resource else request.path}"
+        self.stats[endpoint]["calls"] += 1
+
+        await asyncio.sleep(self.latency())
+
+        key = request.query.get("gw-dev-app-key", "")
+        if self.args.quota_rps > 0:
+            bucket = self.buckets.setdefault(key, TokenBucket(self.args.quota_rps))
+            if not bucket.take():
+                self.stats[endpoint]["429_quota"] += 1
+                return web.json_response(erros("Quota exceeded", codigo="429"), status=429)
+
+        draw = random.random()
+        if draw < self.args.error_rate:
+            self.stats[endpoint]["500"] += 1
+            return web.json_response(erros("Erro interno simulado", codigo="500"), status=500)
+        if draw < self.args.error_rate + self.args.rate_429:
+            self.stats[endpoint]["429"] += 1
+            return web.json_response(erros("Too many requests", codigo="429"), status=429)
+
+        response = await handler(request)
+        self.stats[endpoint][str(response.status)] += 1
+        return response
+
+    def latency(self) -> float:
+        if random.random() < self.args.slow_ratio:
+            return self.args.slow_ms / 1000
+
+        return random.lognormvariate(0, self.args.latency_sigma) * self.args.latency_ms / 1000
+
+    def authorized(self, request: web.Request) -> bool:
+        access_token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        expires_at = self.tokens.get(access_token)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    async def token(self, request: web.Request) -> web.Response:
+        if not request.headers.get("Authorization", "").startswith("Basic "):
+            return web.json_response({"error": "invalid_client"}, status=401)
+
+        access_token = secrets.token_urlsafe(48)
+        self.tokens[access_token] = time.monotonic() + self.args.token_ttl
+        return web.json_response(
+            {"access_token": access_token, "token_type": "Bearer", "expires_in": self.args.token_ttl}, status=201
+        )
+
+    async def registra(self, request: web.Request) -> web.Response:
+        if not self.authorized(request):
+            return web.json_response(erros("Token inválido", codigo="401"), status=401)
+
+        body = json.loads(await request.text())
+        numero = body.get("numeroTituloCliente")
+        if not numero:
+            return web.json_response(erros("Campo numeroTituloCliente obrigatório"), status=400)
+        if numero in self.boletos:
+            return web.json_response(erros("Nosso Número já incluído anteriormente."), status=400)
+
+        registro = {
+            "numero": numero,
+            "numeroCarteira": body.get("numeroCarteira", 17),
+            "numeroVariacaoCarteira": body.get("numeroVariacaoCarteira", 35),
+            "codigoCliente": int(digits(9)),
+            "linhaDigitavel": "001" + digits(44),
+            "codigoBarraNumerico": "001" + digits(41),
+            "numeroContratoCobranca": int(digits(8)),
+            "beneficiario": {
+                "agencia": digits(4),
+                "contaCorrente": digits(6),
+                "tipoEndereco": "1",
+                "logradouro": "RUA SIMULADA",
+                "bairro": "CENTRO",
+                "cidade": "BRASILIA",
+                "codigoCidade": 5300108,
+                "uf": "DF",
+                "cep": 70000000,
+                "indicadorComprovacao": "S",
+            },
+            "qrCode": {
+                "url": f"qrcodepix.bb.com.br/pix/v2/{secrets.token_hex(16)}",
+                "txId": "BOLETO" + numero,
+                "emv": "00020101021226870014br.gov.bcb.pix2565qrcodepix.bb.com.br/pix/v2/" + secrets.token_hex(16),
+            },
+        }
+        self.boletos[numero] = {
+            **registro,
+            "request": body,
+            "dataVencimento": body.get("dataVencimento"),
+            "estado": 1,
+            "pago": random.random() < self.args.pay_ratio,
+        }
+        return web.json_response(registro, status=201)
+
+    async def consulta(self, request: web.Request) -> web.Response:
+        if not self.authorized(request):
+            return web.json_response(erros("Token inválido", codigo="401"), status=401)
+
+        boleto = self.boletos.get(request.match_info["numero"])
+        if not boleto:
+            return web.json_response(erros("Boleto não encontrado."), status=404)
+
+        return web.json_response(self.get_response_details(boleto), status=200)
+
+    async def altera(self, request: web.Request) -> web.Response:
+        if not self.authorized(request):
+            return web.json_response(erros("Token inválido", codigo="401"), status=401)
+
+        boleto = self.boletos.get(request.match_info["numero"])
+        if not boleto:
+            return web.json_response(erros("Boleto não encontrado."), status=404)
+        if self.get_estado(boleto) != 1:
+            return web.json_response(erros("Boleto não está em aberto."), status=400)
+
+        body = json.loads(await request.text())
+        nova_data = (body.get("alteracaoData") or {}).get("novaDataVencimento")
+        if nova_data:
+            boleto["dataVencimento"] = nova_data
+
+        return web.json_response(
+            {
+                "numeroContratoCobranca": str(boleto["numeroContratoCobranca"]),
+                "dataAtualizacao": bb_date(datetime.date.today()),
+                "horarioAtualizacao": datetime.datetime.now().strftime("%H:%M:%S"),
+            },
+            status=200,
+        )
+
+    async def baixa(self, request: web.Request) -> web.Response:
+        if not self.authorized(request):
+            return web.json_response(erros("Token inválido", codigo="401"), status=401)
+
+        boleto = self.boletos.get(request.match_info["numero"])
+        if not boleto:
+            return web.json_response(erros("Boleto não encontrado."), status=404)
+        if self.get_estado(boleto) != 1:
+            return web.json_response(erros("Boleto já baixado ou liquidado."), status=400)
+
+        boleto["estado"] = 7
+        return web.json_response(
+            {
+                "numeroContratoCobranca": str(boleto["numeroContratoCobranca"]),
+                "dataBaixa": bb_date(datetime.date.today()),
+                "horarioBaixa": datetime.datetime.now().strftime("%H:%M:%S"),
+            },
+            status=200,
+        )
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"boletos": len(self.boletos), "endpoints": self.stats})
+
+    def get_estado(self, boleto: Dict[str, Any]) -> int:
+        # codigoEstadoTituloCobranca: 1 normal, 6 liquidado, 7 baixado
+        return 6 if boleto["pago"] and boleto["estado"] == 1 else boleto["estado"]
+
+    def get_response_details(self, boleto: Dict[str, Any]) -> Dict[str, Any]:
+        body = boleto["request"]
+        valor = float(body.get("valorOriginal", 0))
+        pagador = body.get("pagador") or {}
+        inscricao = only_digits(pagador.get("numeroInscricao"))
+        vencimento = parse_bb_date(boleto["dataVencimento"])
+
+        # a paid boleto was received on its due date (today, when it is still in the future)
+        estado = self.get_estado(boleto)
+        recebimento = min(vencimento, datetime.date.today()) if estado == 6 else None
+
+        return {
+            "codigoLinhaDigitavel": boleto["linhaDigitavel"],
+            "textoEmailPagador": "",
+            "textoMensagemBloquetoTitulo": body.get("campoUtilizacaoBeneficiario") or "",
+            "codigoTipoMulta": 2,
+            "codigoCanalPagamento": 6 if recebimento else 0,
+            "numeroContratoCobranca": boleto["numeroContratoCobranca"],
+            "codigoTipoInscricaoSacado": 1 if len(inscricao) <= 11 else 2,
+            "numeroInscricaoSacadoCobranca": int(inscricao or 0),
+            "codigoEstadoTituloCobranca": estado,
+            "codigoTipoTituloCobranca": 2,
+            "codigoModalidadeTitulo": 1,
+            "codigoAceiteTituloCobranca": "N",
+            "codigoPrefixoDependenciaCobrador": 0,
+            "codigoIndicadorEconomico": 9,
+            "numeroTituloCedenteCobranca": str(body.get("numeroTituloBeneficiario", "")),
+            "codigoTipoJuroMora": 0,
+            "dataEmissaoTituloCobranca": body.get("dataEmissao", ""),
+            "dataRegistroTituloCobranca": bb_date(datetime.date.today()),
+            "dataVencimentoTituloCobranca": boleto["dataVencimento"],
+            "valorOriginalTituloCobranca": valor,
+            "valorAtualTituloCobranca": 0 if recebimento else valor,
+            "valorPagamentoParcialTitulo": 0,
+            "valorAbatimentoTituloCobranca": 0,
+            "percentualImpostoSobreOprFinanceirasTituloCobranca": 0,
+            "valorImpostoSobreOprFinanceirasTituloCobranca": 0,
+            "valorMoedaTituloCobranca": 0,
+            "percentualJuroMoraTitulo": 0,
+            "valorJuroMoraTitulo": 0,
+            "percentualMultaTitulo": 2,
+            "valorMultaTituloCobranca": 0,
+            "quantidadeParcelaTituloCobranca": 0,
+            "dataBaixaAutomaticoTitulo": bb_date(vencimento + datetime.timedelta(days=30)),
+            "textoCampoUtilizacaoCedente": "",
+            "indicadorCobrancaPartilhadoTitulo": "N",
+            "nomeSacadoCobranca": pagador.get("nome", ""),
+            "textoEnderecoSacadoCobranca": pagador.get("endereco", ""),
+            "nomeBairroSacadoCobranca": pagador.get("bairro", ""),
+            "nomeMunicipioSacadoCobranca": pagador.get("cidade", ""),
+            "siglaUnidadeFederacaoSacadoCobranca": pagador.get("uf", ""),
+            "numeroCepSacadoCobranca": int(only_digits(pagador.get("cep")) or 0),
+            "valorMoedaAbatimentoTitulo": 0,
+            "dataProtestoTituloCobranca": "",
+            "codigoTipoInscricaoSacador": 0,
+            "numeroInscricaoSacadorAvalista": 0,
+            "nomeSacadorAvalistaTitulo": "",
+            "percentualDescontoTitulo": 0,
+            "dataDescontoTitulo": "",
+            "valorDescontoTitulo": 0,
+            "codigoDescontoTitulo": 0,
+            "percentualSegundoDescontoTitulo": 0,
+            "dataSegundoDescontoTitulo": "",
+            "valorSegundoDescontoTitulo": 0,
+            "codigoSegundoDescontoTitulo": 0,
+            "percentualTerceiroDescontoTitulo": 0,
+            "dataTerceiroDescontoTitulo": "",
+            "valorTerceiroDescontoTitulo": 0,
+            "codigoTerceiroDescontoTitulo": 0,
+            "dataMultaTitulo": bb_date(vencimento + datetime.timedelta(days=1)),
+            "numeroCarteiraCobranca": boleto["numeroCarteira"],
+            "numeroVariacaoCarteiraCobranca": boleto["numeroVariacaoCarteira"],
+            "quantidadeDiaProtesto": 0,
+            "quantidadeDiaPrazoLimiteRecebimento": int(body.get("numeroDiasLimiteRecebimento") or 0),
+            "dataLimiteRecebimentoTitulo": "",
+            "indicadorPermissaoRecebimentoParcial": "N",
+            "textoCodigoBarrasTituloCobranca": boleto["codigoBarraNumerico"],
+            "codigoOcorrenciaCartorio": 0,
+            "valorImpostoSobreOprFinanceirasRecebidoTitulo": 0,
+            "valorAbatimentoTotal": 0,
+            "valorJuroMoraRecebido": 0,
+            "valorDescontoUtilizado": 0,
+            "valorPagoSacado": valor if recebimento else 0,
+            "valorCreditoCedente": round(valor - 1.5, 2) if recebimento else 0,
+            "codigoTipoLiquidacao": 1 if recebimento else 0,
+            "dataCreditoLiquidacao": bb_date(recebimento + datetime.timedelta(days=1)) if recebimento else "",
+            "dataRecebimentoTitulo": bb_date(recebimento),
+            "codigoPrefixoDependenciaRecebedor": 0,
+            "codigoNaturezaRecebimento": 0,
+            "numeroIdentidadeSacadoTituloCobranca": "",
+            "codigoResponsavelAtualizacao": "",
+            "codigoTipoBaixaTitulo": 0,
+            "valorMultaRecebido": 0,
+            "valorReajuste": 0,
+            "valorOutroRecebido": 0,
+            "codigoIndicadorEconomicoUtilizadoInadimplencia": 0,
+        }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="median latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal sigma (spread of the latency)")
+    parser.add_argument("--slow-ratio", type=float, default=0.0, help="fraction of slow answers")
+    parser.add_argument("--slow-ms", type=float, default=5000.0, help="latency of a slow answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 answers")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of 429 answers")
+    parser.add_argument("--quota-rps", type=float, default=0.0, help="calls per second per gw-dev-app-key, 0 = off")
+    parser.add_argument("--token-ttl", type=int, default=600, help="expires_in of the access tokens")
+    parser.add_argument("--pay-ratio", type=float, default=0.3, help="fraction of boletos returned as liquidado")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(args.seed)
+    web.run_app(BBSimulator(args).app(), host=args.host, port=args.port)
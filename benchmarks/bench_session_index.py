@@ -0,0 +1,460 @@
+"""
+Lookup and removal of the sessions of a user (login, logout, force-logout) in a keyspace with millions of keys shared
+with the tenant, BB token and rate limit keys: the per-user index of app/db/repositories/token_redis.py against
+the SCAN of MATCH "{prefix}:{user_id}*" it replaced.
+
+Strategies:
+- scan-page:  one SCAN call, then one HGETALL per key found (the previous get_tokens_by_user_id);
+- scan-full:  SCAN (COUNT --scan-count) until the cursor is back to 0, then one HGETALL per key found (what a SCAN
+              needs to be complete);
+- index:      TokenRedisRepository.get_tokens_by_user_id / remove_tokens_by_user_id.
+
+For each one: sessions found out of the sessions of the user, round trips, keys examined by Redis and latency.
+
+By default Redis is simulated in memory (--rtt-ms per round trip, the scripts of the repository emulated in Python),
+the keys examined by SCAN are really walked, so the cost grows with --keys as on a server. With --redis-url the same
+runs on a Redis (use a scratch database): the keys are written under --prefix and removed at the end.
+
+    python benchmarks/bench_session_index.py --keys 2000000 --users 1000 --sessions 3
+    python benchmarks/bench_session_index.py --redis-url redis://localhost:6379/15 --keys 5000000 --lookups 20
+"""
+import argparse
+import asyncio
+import fnmatch
+import os
+import random
+import re
+import secrets
+import statistics
+import sys
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# SCAN COUNT of the previous get_tokens_by_user_id (the Redis default)
+SCAN_PAGE_COUNT = 10
+FILLER_BATCH = 10000
+
+
+class Counters:
+    def __init__(self) -> None:
+        self.round_trips = 0
+        self.examined = 0
+
+
+class SimulatedPipeline:
+    def __init__(self, redis: "SimulatedRedis") -> None:
+        self._redis = redis
+        self._calls: List[Tuple[Callable, tuple, dict]] = []
+
+    def __getattr__(self, name: str) -> Callable:
+        method = getattr(self._redis, f"_{name}")
+
+        def queue(*args: Any, **kwargs: Any) -> "SimulatedPipeline":
+            self._calls.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        await self._redis.round_trip()
+        return [method(*args, **kwargs) for method, args, kwargs in self._calls]
+
+    async def __aenter__(self) -> "SimulatedPipeline":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        pass
+
+
+class SimulatedScript:
+    def __init__(self, redis: "SimulatedRedis", emulation: Callable) -> None:
+        self._redis = redis
+        self._emulation = emulation
+
+    async def __call__(self, keys: List[str], args: List[Any], client: Any = None) -> Any:
+        await self._redis.round_trip()
+        return self._emulation(keys, [str(arg) for arg in args])
+
+
+class SimulatedRedis:
+    """
+    Keys in a dict, SCAN over a shuffled list of them (the order of the hash table of Redis), expiry ignored.
+    """
+
+    def __init__(self, rtt_ms: float, counters: Counters) -> None:
+        self._rtt = rtt_ms / 1000
+        self._data: Dict[str, Any] = {}
+        self._order: Optional[List[str]] = None
+        self.counters = counters
+
+    async def round_trip(self) -> None:
+        self.counters.round_trips += 1
+        if self._rtt:
+            await asyncio.sleep(self._rtt)
+
+    def register_script(self, script: str) -> SimulatedScript:
+        from app.db.repositories import token_redis
+
+        emulations = {
+            token_redis.SET_TOKEN_SCRIPT: self.__set_token,
+            token_redis.REMOVE_TOKEN_SCRIPT: self.__remove_token,
+            token_redis.REMOVE_USER_TOKENS_SCRIPT: self.__remove_user_tokens,
+        }
+        return SimulatedScript(self, emulations.get(script, self.__not_emulated))
+
+    def pipeline(self, transaction: bool = True) -> SimulatedPipeline:
+        return SimulatedPipeline(self)
+
+    def fill(self, keys: List[str]) -> None:
+        for key in keys:
+            self._data[key] = "x"
+        self._order = None
+
+    def shuffle(self) -> None:
+        """
+        Order of SCAN, set once the keyspace is written so that it isn't timed.
+        """
+        self._order = list(self._data)
+        random.shuffle(self._order)
+
+    async def scan(self, cursor: int = 0, match: Optional[str] = None, count: int = SCAN_PAGE_COUNT):
+        await self.round_trip()
+        if self._order is None:
+            self.shuffle()
+
+        page = self._order[cursor : cursor + count]
+        self.counters.examined += len(page)
+        regex = re.compile(fnmatch.translate(match)) if match else None
+        keys = [key for key in page if key in self._data and (regex is None or regex.match(key))]
+        cursor += count
+        return (cursor if cursor < len(self._order) else 0), keys
+
+    async def get(self, key: str) -> Optional[str]:
+        await self.round_trip()
+        value = self._data.get(key)
+        return value if isinstance(value, str) else None
+
+    async def set(self, key: str, value: str) -> bool:
+        await self.round_trip()
+        self._data[key] = value
+        self._order = None
+        return True
+
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        await self.round_trip()
+        return self._hgetall(key)
+
+    async def zrange(self, key: str, start: int, end: int) -> List[str]:
+        await self.round_trip()
+        return self._zrange(key, start, end)
+
+    async def zrem(self, key: str, *members: str) -> int:
+        await self.round_trip()
+        index = self._data.get(key, {})
+        return sum(index.pop(member, None) is not None for member in members)
+
+    async def delete(self, *keys: str) -> int:
+        await self.round_trip()
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def _hgetall(self, key: str) -> Dict[str, str]:
+        self.counters.examined += 1
+        value = self._data.get(key)
+        return dict(value) if isinstance(value, dict) else {}
+
+    def _zrange(self, key: str, start: int, end: int) -> List[str]:
+        index = self._data.get(key) or {}
+        self.counters.examined += 1
+        return sorted(index, key=index.get)
+
+    def _delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def __set_token(self, keys: List[str], args: List[str]) -> int:
+        now = int(time.time())
+        ttl = int(args[1])
+        self._data[keys[0]] = dict(zip(args[2::2], args[3::2]))
+        index = self._data.setdefault(keys[1], {})
+        index[args[0]] = now + ttl
+        for member in [member for member, score in index.items() if score <= now]:
+            del index[member]
+        self._order = None
+        return 1
+
+    def __remove_token(self, keys: List[str], args: List[str]) -> int:
+        self._data.get(keys[1], {}).pop(args[0], None)
+        return int(self._data.pop(keys[0], None) is not None)
+
+    def __remove_user_tokens(self, keys: List[str], args: List[str]) -> int:
+        ids = list(self._data.pop(keys[0], None) or {})
+        self.counters.examined += len(ids) + 1
+        for id in ids:
+            self._data.pop(f"{args[0]}:{id}", None)
+        return len(ids)
+
+    def __not_emulated(self, keys: List[str], args: List[str]) -> Any:
+        raise NotImplementedError("script not emulated by the benchmark")
+
+
+class CountingRedis:
+    """
+    Wraps a redis.asyncio client to count the round trips. The keys examined are the COUNT of each SCAN call plus
+    the keys passed to the other commands, the members read by the scripts are not known from the client.
+    """
+
+    def __init__(self, redis: Any, counters: Counters) -> None:
+        self._redis = redis
+        self.counters = counters
+
+    def register_script(self, script: str) -> Callable:
+        inner = self._redis.register_script(script)
+
+        async def call(keys: List[str], args: List[Any], client: Any = None) -> Any:
+            self.counters.round_trips += 1
+            self.counters.examined += len(keys)
+            return await inner(keys=keys, args=args, client=client)
+
+        return call
+
+    def pipeline(self, transaction: bool = True) -> "CountingPipeline":
+        return CountingPipeline(self._redis.pipeline(transaction=transaction), self.counters)
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._redis, name)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            self.counters.round_trips += 1
+            self.counters.examined += (kwargs.get("count") or SCAN_PAGE_COUNT) if name == "scan" else 1
+            return await attribute(*args, **kwargs)
+
+        return call
+
+
+class CountingPipeline:
+    def __init__(self, pipeline: Any, counters: Counters) -> None:
+        self._pipeline = pipeline
+        self.counters = counters
+
+    def __getattr__(self, name: str) -> Callable:
+        method = getattr(self._pipeline, name)
+
+        def queue(*args: Any, **kwargs: Any) -> "CountingPipeline":
+            self.counters.examined += 1
+            method(*args, **kwargs)
+            return self
+
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        self.counters.round_trips += 1
+        return await self._pipeline.execute(raise_on_error=raise_on_error)
+
+    async def __aenter__(self) -> "CountingPipeline":
+        await self._pipeline.__aenter__()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self._pipeline.__aexit__(*args)
+
+
+def filler_keys(prefix: str, number: int) -> List[str]:
+    """
+    Keys of the other repositories sharing the keyspace: tenants, BB OAuth tokens, rate limit buckets, boletos.
+    """
+    shapes = [
+        lambda: f"{prefix}:tenant:api_key:{secrets.token_hex(32)}",
+        lambda: f"{prefix}:tenant:id:{uuid.uuid4()}",
+        lambda: f"{prefix}:{secrets.token_urlsafe(24)}",
+        lambda: f"{prefix}:bb_rate_limit:{secrets.token_hex(16)}",
+        lambda: f"{prefix}:boleto_bb:{random.randint(10 ** 16, 10 ** 17)}",
+    ]
+    return [random.choice(shapes)() for _ in range(number)]
+
+
+async def scan_tokens(redis: Any, prefix: str, user_id: str, full: bool, count: int) -> List[Dict[str, str]]:
+    tokens = []
+    cursor = 0
+    while True:
+        cursor, keys = await redis.scan(cursor=cursor, match=f"{prefix}:{user_id}*", count=count)
+        for key in keys:
+            tokens.append(await redis.hgetall(key))
+        if not full or cursor == 0:
+            return tokens
+
+
+async def scan_full_remove(redis: Any, prefix: str, user_id: str, count: int) -> int:
+    tokens = await scan_tokens(redis, prefix, user_id, full=True, count=count)
+    for token in tokens:
+        await redis.delete(f"{prefix}:{token['id']}")
+    return len(tokens)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def measure(
+    name: str, counters: Counters, user_ids: List[str], expected: int, call: Callable
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    found = 0
+    counters.round_trips = counters.examined = 0
+    for user_id in user_ids:
+        started = time.perf_counter()
+        found += await call(user_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    lookups = len(user_ids)
+    result = {
+        "found": found / (expected * lookups),
+        "round_trips": counters.round_trips / lookups,
+        "examined": counters.examined / lookups,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+    }
+    print(
+        f"  {name:<22} {result['found']:>8.1%} {result['round_trips']:>12.1f} {result['examined']:>14.1f} "
+        f"{result['p50']:>10.2f} {result['p95']:>10.2f}"
+    )
+    return result
+
+
+def print_header(title: str) -> None:
+    print(f"\n{title}")
+    print(f"  {'strategy':<22} {'found':>8} {'round trips':>12} {'keys examined':>14} {'p50 ms':>10} {'p95 ms':>10}")
+
+
+async def fill_redis(redis: Any, prefix: str, number: int) -> None:
+    written = 0
+    while written < number:
+        keys = filler_keys(prefix, min(FILLER_BATCH, number - written))
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, "x", ex=3600)
+            await pipe.execute()
+        written += len(keys)
+
+
+async def clean_redis(redis: Any, prefix: str) -> None:
+    keys: List[str] = []
+    async for key in redis.scan_iter(match=f"{prefix}:*", count=FILLER_BATCH):
+        keys.append(key)
+        if len(keys) >= FILLER_BATCH:
+            await redis.unlink(*keys)
+            keys = []
+    if keys:
+        await redis.unlink(*keys)
+
+
+async def main(args: argparse.Namespace) -> None:
+    # the repository reads the prefix from app/core/config.py, the keys of the API are never touched
+    os.environ["REDIS_PREFIX"] = args.prefix
+    from app.db.repositories.token_redis import USER_TOKENS_INDEXED_KEY, TokenRedisRepository
+    from app.schemas.token import Token
+
+    random.seed(args.seed)
+    counters = Counters()
+    client = None
+    if args.redis_url:
+        from redis.asyncio import Redis
+
+        client = Redis.from_url(args.redis_url, decode_responses=True)
+        redis = CountingRedis(client, counters)
+        print(f"writing {args.keys} keys to {args.redis_url} ...")
+        await fill_redis(client, args.prefix, args.keys)
+    else:
+        redis = SimulatedRedis(args.rtt_ms, counters)
+        redis.fill(filler_keys(args.prefix, args.keys))
+
+    try:
+        repository = TokenRedisRepository(redis)
+        user_ids = [str(uuid.uuid4()) for _ in range(args.users)]
+        for user_id in user_ids:
+            for _ in range(args.sessions):
+                token = Token(
+                    id=f"{user_id}-{secrets.token_hex(6)}", tenant_id=str(uuid.uuid4()), user_id=user_id, roles="x"
+                )
+                await repository.set_token(token=token, expires_in=60)
+        # the tokens written before the indexes were indexed, no SCAN fallback in the lookups
+        await redis.set(USER_TOKENS_INDEXED_KEY, "done")
+
+        if isinstance(redis, SimulatedRedis):
+            redis.shuffle()
+
+        lookups = random.sample(user_ids, min(args.lookups, len(user_ids)))
+        print(
+            f"keyspace: {args.keys} other keys, {args.users} users x {args.sessions} sessions, "
+            f"{len(lookups)} lookups, rtt {args.rtt_ms if not args.redis_url else 'real'}ms"
+        )
+
+        print_header("lookup (login: sessions of the user)")
+        await measure(
+            "scan-page",
+            counters,
+            lookups,
+            args.sessions,
+            lambda user_id: count(scan_tokens(redis, args.prefix, user_id, full=False, count=SCAN_PAGE_COUNT)),
+        )
+        await measure(
+            "scan-full",
+            counters,
+            lookups,
+            args.sessions,
+            lambda user_id: count(scan_tokens(redis, args.prefix, user_id, full=True, count=args.scan_count)),
+        )
+        await measure(
+            "index", counters, lookups, args.sessions, lambda user_id: count(repository.get_tokens_by_user_id(user_id))
+        )
+
+        half = len(lookups) // 2
+        print_header("removal (logout / force-logout)")
+        await measure(
+            "scan-full",
+            counters,
+            lookups[:half],
+            args.sessions,
+            lambda user_id: scan_full_remove(redis, args.prefix, user_id, args.scan_count),
+        )
+        await measure(
+            "index",
+            counters,
+            lookups[half:],
+            args.sessions,
+            lambda user_id: repository.remove_tokens_by_user_id(user_id),
+        )
+    finally:
+        if client is not None:
+            if not args.keep:
+                await clean_redis(client, args.prefix)
+            await client.close()
+
+
+async def count(tokens: Any) -> int:
+    return len(await tokens)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1000000, help="keys of the other repositories in the keyspace")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--sessions", type=int, default=3, help="sessions per user (MAXIMUN_ACTIVE_TOKENS)")
+    parser.add_argument("--lookups", type=int, default=10, help="users looked up, and then half of them removed")
+    parser.add_argument("--scan-count", type=int, default=1000, help="SCAN COUNT of the scan-full strategy")
+    parser.add_argument("--rtt-ms", type=float, default=0.2, help="simulated time of one round trip")
+    parser.add_argument("--prefix", default="bench_session_index", help="REDIS_PREFIX of the keys written")
+    parser.add_argument("--redis-url", default=None, help="run against a Redis, e.g. redis://localhost:6379/15")
+    parser.add_argument("--keep", action="store_true", help="don't remove the keys written to --redis-url")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.lookups < 2:
+        parser.error("--lookups must be at least 2")
+
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
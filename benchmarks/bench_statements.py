@@ -0,0 +1,133 @@
+"""
+CPU per request of the SQL statements: pypika query rebuilt and compiled on every call (previous implementation)
+against the compiled SQL of the registry (app/db/statements.py).
+
+Statements:
+- update_boleto_bb: fixed statement of BoletosBBRepository;
+- create_boletos_bb_bulk, upsert_pagadores_bb_bulk: multi-row statements of 100 rows (batch registration);
+- base_select_query: BaseRepository.get_base_select_query (schema_json and json.loads);
+- list_boletos_bb: GET /boletos-bb with 3 filters and sorts (select and count).
+
+Run from the repository root with the API environment (the repositories read app/core/config.py):
+
+    python benchmarks/bench_statements.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.repositories.base import BaseRepository  # noqa: E402
+from app.db.repositories.boletos_bb import BoletosBBRepository  # noqa: E402
+from app.db.statements import statements  # noqa: E402
+from app.schemas.bancos.boleto_bb import BoletoBBForList  # noqa: E402
+from app.schemas.filter import FilterModel  # noqa: E402
+from pypika import Field, Order  # noqa: E402
+
+FILTERS = [
+    FilterModel(
+        table="boletos_bb", field="data_vencimento", alias_field="data_vencimento_gte", operator="gte", value=1
+    ),
+    FilterModel(
+        table="boletos_bb", field="data_vencimento", alias_field="data_vencimento_lte", operator="lte", value=1
+    ),
+    FilterModel(table="pagadores_bb", field="nome", alias_field="nome", operator="ilike", value="%a%"),
+]
+
+
+def get_cases(repo: BoletosBBRepository) -> Dict[str, Dict[str, Callable[[], str]]]:
+    private = {
+        name: getattr(repo, f"_BoletosBBRepository__{name}")
+        for name in [
+            "get_update_boleto_bb_query",
+            "get_upsert_pagadores_bb_bulk_query",
+            "get_create_boletos_bb_bulk_query",
+            "get_boletos_bb_select_query",
+            "get_boletos_bb_count_query",
+        ]
+    }
+    filtered = getattr(BaseRepository, "_BaseRepository__get_filtered_query")
+
+    def list_select_query():
+        select_query = filtered(repo, query=private["get_boletos_bb_select_query"](), filters=FILTERS)
+        return select_query.orderby(Field("data_vencimento"), order=Order.desc)
+
+    def list_count_query():
+        return filtered(repo, query=private["get_boletos_bb_count_query"](), filters=FILTERS)
+
+    def list_boletos_bb_rebuilt() -> str:
+        return list_select_query().limit(10).offset(20).get_sql() + list_count_query().get_sql()
+
+    def list_boletos_bb_registry() -> str:
+        # same keys as BaseRepository.get_page_by_params
+        signature = ("boletos_bb:list", tuple((c.table, c.field, c.alias_field, c.operator, False) for c in FILTERS))
+        select_sql = statements.get((signature, "select", "data_vencimento:desc"), list_select_query)
+        count_sql = statements.get((signature, "count"), list_count_query)
+        return f"{select_sql} LIMIT 10 OFFSET 20" + count_sql
+
+    def base_select_query_rebuilt() -> str:
+        statements.clear()
+        return repo.get_base_select_query(table_name="boletos_bb", type_schema=BoletoBBForList).get_sql()
+
+    return {
+        "update_boleto_bb": {
+            "rebuilt": lambda: private["get_update_boleto_bb_query"]().get_sql(),
+            "registry": lambda: statements.get(("boletos_bb", "update"), private["get_update_boleto_bb_query"]),
+        },
+        "create_boletos_bb_bulk": {
+            "rebuilt": lambda: private["get_create_boletos_bb_bulk_query"](size=100).get_sql(),
+            "registry": lambda: statements.get(
+                ("boletos_bb", "create_bulk", 100), lambda: private["get_create_boletos_bb_bulk_query"](size=100)
+            ),
+        },
+        "upsert_pagadores_bb_bulk": {
+            "rebuilt": lambda: private["get_upsert_pagadores_bb_bulk_query"](size=100).get_sql(),
+            "registry": lambda: statements.get(
+                ("pagadores_bb", "upsert_bulk", 100), lambda: private["get_upsert_pagadores_bb_bulk_query"](size=100)
+            ),
+        },
+        "base_select_query": {
+            # the registry is cleared before each call, so this is the cost without it
+            "rebuilt": base_select_query_rebuilt,
+            "registry": lambda: repo.get_base_select_query(
+                table_name="boletos_bb", type_schema=BoletoBBForList
+            ).get_sql(),
+        },
+        "list_boletos_bb": {
+            "rebuilt": list_boletos_bb_rebuilt,
+            "registry": list_boletos_bb_registry,
+        },
+    }
+
+
+def run(function: Callable[[], str], iterations: int, repeat: int) -> float:
+    function()  # warm up (and first compile of the registry)
+    timings: List[float] = timeit.repeat(function, number=iterations, repeat=repeat)
+    return min(timings) / iterations * 1_000_000
+
+
+def main(args: argparse.Namespace) -> None:
+    repo = BoletosBBRepository(db=None)
+    print(f"iterations={args.iterations} repeat={args.repeat} (best of, microseconds per call)\n")
+    print(f"  {'statement':<24} {'rebuilt_us':>12} {'registry_us':>12} {'saved_us':>12} {'speedup':>8}")
+
+    for name, case in get_cases(repo).items():
+        rebuilt = run(case["rebuilt"], args.iterations, args.repeat)
+        registry = run(case["registry"], args.iterations, args.repeat)
+        print(f"  {name:<24} {rebuilt:12.1f} {registry:12.2f} {rebuilt - registry:12.1f} {rebuilt / registry:7.0f}x")
+
+    print(f"\nregistry {statements.stats()}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per timing")
+    parser.add_argument("--repeat", type=int, default=5, help="timings, the best one is reported")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,173 @@
+"""
+End-to-end load test of the boleto endpoints, reporting throughput and p50/p95/p99 per endpoint.
+
+Runs one phase per endpoint, each over the boletos registered in the first one:
+- register: POST  /boletos-bb
+- consulta: GET   /boletos-bb/{id}/consulta
+- alterar:  PATCH /boletos-bb/{id}
+- baixar:   POST  /boletos-bb/{id}/baixar
+
+Start the BB simulator, local Postgres and Redis, and the API pointed to the simulator:
+
+    python benchmarks/bb_simulator.py --port 8090 &
+    BB_OAUTH_URL=http://localhost:8090/oauth BB_API_URL=http://localhost:8090/cobrancas/v2 \\
+        gunicorn app.main:app -k uvicorn.workers.UvicornWorker -w 5 -b 127.0.0.1:8000 &
+    python benchmarks/load_test.py --api-key <tenant api key> --convenio-id <convenio bancario id> \\
+        --requests 1000 --concurrency 50
+
+The tenant needs a conta bancaria and convenio bancario (any client_id, client_secret and
+developer_application_key, the simulator accepts them all).
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+PHASES = ["register", "consulta", "alterar", "baixar"]
+
+
+def cpf() -> str:
+    numbers = [random.randint(0, 9) for _ in range(9)]
+    for size in [9, 10]:
+        total = sum(number * (size + 1 - i) for i, number in enumerate(numbers[:size]))
+        numbers.append((total * 10 % 11) % 10)
+
+    return "".join(map(str, numbers))
+
+
+def new_boleto(args: argparse.Namespace, numero_titulo_beneficiario: int) -> Dict[str, Any]:
+    vencimento = datetime.date.today() + datetime.timedelta(days=random.randint(1, 60))
+    return {
+        "convenio_bancario_id": args.convenio_id,
+        "numero_titulo_beneficiario": numero_titulo_beneficiario,
+        "data_vencimento": vencimento.isoformat(),
+        "valor_original": round(random.uniform(10, 2000), 2),
+        "mensagem_beneficiario": "Load test",
+        "pagador": {
+            "tipo_inscricao": "Física",
+            "cpf_cnpj": cpf(),
+            "nome": "Pagador Load Test",
+            "endereco": "Rua Teste 100",
+            "cep": "70000-000",
+            "cidade": "Brasilia",
+            "bairro": "Centro",
+            "uf": "DF",
+            "telefone": "61999999999",
+        },
+    }
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(int(p * len(values)), len(values) - 1)]
+
+
+class Phase:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.elapsed = 0.0
+
+    def report(self) -> None:
+        ok = sum(count for status, count in self.statuses.items() if isinstance(status, int) and status < 400)
+        total = sum(self.statuses.values())
+        print(f"\n{self.name}")
+        print(f"  {'requests':<16} {total:10d}")
+        print(f"  {'ok':<16} {ok:10d}")
+        print(f"  {'throughput_rps':<16} {total / self.elapsed if self.elapsed else 0:10.1f}")
+        for p in [0.50, 0.95, 0.99]:
+            print(f"  {f'p{int(p * 100)}_ms':<16} {percentile(self.latencies, p) * 1000:10.1f}")
+        print(f"  {'statuses':<16} {dict(self.statuses)}")
+
+
+async def run_phase(
+    name: str, session: aiohttp.ClientSession, args: argparse.Namespace, ids: List[str], registered: List[str]
+) -> Phase:
+    phase = Phase(name)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    base = args.numero_base or int(time.time()) % 1_000_000 * 1000
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            if name == "register":
+                method, url, body = "POST", "/boletos-bb", new_boleto(args, base + index)
+            elif name == "consulta":
+                method, url, body = "GET", f"/boletos-bb/{ids[index]}/consulta", None
+            elif name == "alterar":
+                vencimento = datetime.date.today() + datetime.timedelta(days=random.randint(61, 90))
+                method, url, body = "PATCH", f"/boletos-bb/{ids[index]}", {"data_vencimento": vencimento.isoformat()}
+            else:
+                method, url, body = "POST", f"/boletos-bb/{ids[index]}/baixar", None
+
+            started = time.perf_counter()
+            try:
+                async with session.request(method, f"{args.api_url}{url}", json=body) as response:
+                    result: Optional[Any] = await response.json(content_type=None)
+                    phase.statuses[response.status] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                phase.statuses[type(e).__name__] += 1
+                return
+            finally:
+                phase.latencies.append(time.perf_counter() - started)
+
+            if name == "register" and response.status == 201 and isinstance(result, dict) and result.get("id"):
+                registered.append(result["id"])
+
+    count = args.requests if name == "register" else len(ids)
+    started = time.perf_counter()
+    await asyncio.gather(*[one(index) for index in range(count)])
+    phase.elapsed = time.perf_counter() - started
+
+    return phase
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"api={args.api_url} requests={args.requests} concurrency={args.concurrency} phases={','.join(args.phases)}")
+
+    headers = {"X-API-Key": args.api_key}
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    ids: List[str] = list(args.ids or [])
+
+    async with aiohttp.ClientSession(headers=headers, timeout=timeout, connector=connector) as session:
+        for name in args.phases:
+            if name != "register" and not ids:
+                print(f"\n{name}: no boletos to use, run the register phase or pass --ids")
+                continue
+
+            registered: List[str] = []
+            phase = await run_phase(name, session, args, ids, registered)
+            phase.report()
+
+            if name == "register":
+                ids = registered
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-url", default="http://127.0.0.1:8000/api/v1")
+    parser.add_argument("--api-key", required=True, help="X-API-Key of the tenant")
+    parser.add_argument("--convenio-id", required=True, help="convenio_bancario_id of the new boletos")
+    parser.add_argument("--requests", type=int, default=500, help="boletos registered")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight")
+    parser.add_argument("--phases", type=lambda v: v.split(","), default=PHASES, help=",".join(PHASES))
+    parser.add_argument("--ids", type=lambda v: v.split(","), default=None, help="boletos to use without registering")
+    parser.add_argument("--numero-base", type=int, default=None, help="first numero_titulo_beneficiario")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds per request")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(args.seed)
+    asyncio.run(main(args))
@@ -3,6 +3,7 @@ import random
 import string
 import warnings
 import os
+from collections import defaultdict
 from asgi_lifespan import LifespanManager
 from fastapi import FastAPI
 from httpx import AsyncClient
@@ -23,6 +24,7 @@ from app.db.repositories.tenants import TenantsRepository
 from app.db.repositories.users import UsersRepository
 from app.db.repositories.roles import RolesRepository
 from app.services import auth_service
+from app.db.invalidation import invalidation_bus
 
 from starlette.status import (
     HTTP_200_OK,
@@ -46,6 +48,37 @@ def event_loop():
     loop.close()
 
 
+# The caches subscribe to the module invalidation_bus when created: the handlers registered by a test are dropped
+# after it, so the caches of a test are not evicted or flushed by the events of the next ones
+@pytest_asyncio.fixture
+def invalidation_bus_handlers(monkeypatch):
+    monkeypatch.setattr(
+        invalidation_bus,
+        "_handlers",
+        defaultdict(list, {entity: list(handlers) for entity, handlers in invalidation_bus._handlers.items()}),
+    )
+    monkeypatch.setattr(invalidation_bus, "_flush_handlers", list(invalidation_bus._flush_handlers))
+    yield invalidation_bus
+
+
+class FakeLoadingRepository:
+    """
+    Repository of the cache tests: counts the loads and runs during_load while a load is in flight,
+    e.g. to invalidate the cache before the loaded value is stored.
+    """
+
+    def __init__(self, value, during_load=None) -> None:
+        self.value = value
+        self.during_load = during_load
+        self.loads = 0
+
+    async def load(self):
+        self.loads += 1
+        if self.during_load:
+            self.during_load()
+        return self.value
+
+
 # Apply migrations at beginning and end of testing session
 @pytest_asyncio.fixture(scope="session")
 def apply_migrations():
@@ -0,0 +1,76 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.invalidation import invalidation_bus
+from app.schemas.enums import CacheEntity
+from app.schemas.invalidation import InvalidationEvent
+from app.services.banking_profile_cache import BankingProfileCache
+from tests.conftest import FakeLoadingRepository
+
+pytestmark = pytest.mark.usefixtures("invalidation_bus_handlers")
+
+
+def new_profile() -> SimpleNamespace:
+    return SimpleNamespace(convenio=SimpleNamespace(id=uuid.uuid4()), conta=SimpleNamespace(id=uuid.uuid4()))
+
+
+class FakeConveniosBancariosRepository(FakeLoadingRepository):
+    async def get_banking_profile(self, *, tenant_id, id):
+        return await self.load()
+
+
+async def get_profile(cache: BankingProfileCache, repo: FakeConveniosBancariosRepository, convenio_bancario_id=None):
+    return await cache.get_banking_profile(
+        tenant_id=uuid.UUID(int=1),
+        convenio_bancario_id=convenio_bancario_id or uuid.UUID(int=2),
+        convenios_bancarios_repo=repo,
+    )
+
+
+@pytest.mark.asyncio
+async def test_profile_is_read_once() -> None:
+    cache = BankingProfileCache()
+    profile = new_profile()
+    repo = FakeConveniosBancariosRepository(profile)
+
+    assert await get_profile(cache, repo) is profile
+    assert await get_profile(cache, repo) is profile
+    assert repo.loads == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("entity", [CacheEntity.convenio_bancario, CacheEntity.conta_bancaria])
+async def test_change_of_the_convenio_or_conta_evicts_the_profile(entity: CacheEntity) -> None:
+    cache = BankingProfileCache()
+    profile = new_profile()
+    repo = FakeConveniosBancariosRepository(profile)
+    await get_profile(cache, repo)
+
+    id = profile.convenio.id if entity == CacheEntity.convenio_bancario else profile.conta.id
+    invalidation_bus.dispatch(InvalidationEvent(entity=entity, id=id))
+    await get_profile(cache, repo)
+
+    assert repo.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_profile_invalidated_while_loaded_is_not_cached() -> None:
+    cache = BankingProfileCache()
+    repo = FakeConveniosBancariosRepository(new_profile(), during_load=cache.clear)
+
+    await get_profile(cache, repo)
+    repo.during_load = None
+    await get_profile(cache, repo)
+
+    assert repo.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_convenio_is_not_found() -> None:
+    with pytest.raises(HTTPException) as error:
+        await get_profile(BankingProfileCache(), FakeConveniosBancariosRepository(None))
+
+    assert error.value.status_code == 404
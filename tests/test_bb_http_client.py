@@ -0,0 +1,62 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.bb_http_client import BBHttpClient
+
+
+async def json_body(request):
+    return web.json_response({"numero": "000312855700000001"})
+
+
+async def empty_body(request):
+    return web.Response(status=204)
+
+
+async def html_body(request):
+    return web.Response(status=502, text="<html>Bad Gateway</html>", content_type="text/html")
+
+
+@pytest_asyncio.fixture
+async def server():
+    app = web.Application()
+    app.router.add_get("/json", json_body)
+    app.router.add_get("/empty", empty_body)
+    app.router.add_get("/html", html_body)
+    async with TestServer(app) as server:
+        yield server
+
+
+@pytest_asyncio.fixture
+async def client():
+    client = BBHttpClient()
+    yield client
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_json_body_is_decoded(server, client) -> None:
+    assert await client.request("GET", str(server.make_url("/json"))) == (200, {"numero": "000312855700000001"})
+
+
+@pytest.mark.asyncio
+async def test_empty_body_is_none(server, client) -> None:
+    assert await client.request("GET", str(server.make_url("/empty"))) == (204, None)
+
+
+@pytest.mark.asyncio
+async def test_body_without_json_has_the_shape_of_a_bb_error(server, client) -> None:
+    status, result = await client.request("GET", str(server.make_url("/html")))
+
+    assert status == 502
+    assert "Bad Gateway" in result["erros"][0]["mensagem"]
+
+
+@pytest.mark.asyncio
+async def test_session_is_shared_by_the_calls(server, client) -> None:
+    await client.request("GET", str(server.make_url("/json")))
+    session = await client.get_session()
+    await client.request("GET", str(server.make_url("/json")))
+
+    assert await client.get_session() is session
@@ -0,0 +1,68 @@
+import sys
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.core.exceptions.exceptions_customs import RateLimitExceptionBB
+from app.schemas.enums import BBCallPriority
+from app.services.bb_rate_limiter import BBRateLimiter
+
+# app.services exports the bb_rate_limiter instance under the name of the module
+rate_limiter_module = sys.modules["app.services.bb_rate_limiter"]
+
+
+class FakeRateLimitRepository:
+    def __init__(self, *waits) -> None:
+        self.waits = list(waits)
+        self.reserves = []
+
+    async def take_token(self, *, id, rate, capacity, reserve):
+        self.reserves.append(reserve)
+        wait = self.waits.pop(0)
+        if isinstance(wait, Exception):
+            raise wait
+        return wait
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch) -> None:
+    monkeypatch.setattr(rate_limiter_module, "BB_RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limiter_module, "BB_RATE_LIMIT_MAX_WAIT", 1)
+    monkeypatch.setattr(rate_limiter_module, "BB_RATE_LIMIT_BULK_MAX_WAIT", 10)
+
+
+def new_limiter(repo: FakeRateLimitRepository) -> BBRateLimiter:
+    limiter = BBRateLimiter()
+    limiter.start(repo)
+    return limiter
+
+
+@pytest.mark.asyncio
+async def test_call_waits_for_its_slot() -> None:
+    repo = FakeRateLimitRepository(0.01, 0)
+
+    await new_limiter(repo).acquire(gw_dev_app_key="key")
+
+    assert len(repo.reserves) == 2
+
+
+@pytest.mark.asyncio
+async def test_slot_after_the_max_wait_is_refused() -> None:
+    with pytest.raises(RateLimitExceptionBB):
+        await new_limiter(FakeRateLimitRepository(5)).acquire(gw_dev_app_key="key")
+
+
+@pytest.mark.asyncio
+async def test_bulk_calls_leave_the_reserve_to_interactive_calls() -> None:
+    repo = FakeRateLimitRepository(0, 0)
+    limiter = new_limiter(repo)
+
+    await limiter.acquire(gw_dev_app_key="key", priority=BBCallPriority.interactive)
+    await limiter.acquire(gw_dev_app_key="key", priority=BBCallPriority.bulk)
+
+    assert repo.reserves[0] == 0 and repo.reserves[1] > 0
+
+
+@pytest.mark.asyncio
+async def test_redis_error_lets_the_call_through() -> None:
+    await new_limiter(FakeRateLimitRepository(ConnectionError())).acquire(gw_dev_app_key="key")
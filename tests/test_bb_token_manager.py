@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.schemas.token_bb import CredentialsBB, TokenBB
+from app.services.bb_token_manager import BBTokenManager
+
+CREDENTIALS = CredentialsBB(client_id="id", client_secret="secret", gw_dev_app_key="key")
+
+
+def new_token() -> TokenBB:
+    return TokenBB(id="key", access_token="token", token_type="Bearer", expires_in=600)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_refresh() -> None:
+    manager = BBTokenManager()
+    refreshes = []
+
+    async def refresh_token(credentials, token_bb_redis_repo, min_ttl):
+        refreshes.append(credentials.gw_dev_app_key)
+        await asyncio.sleep(0.01)
+        return new_token()
+
+    manager.set_refresh_function(refresh_token)
+    tokens = await asyncio.gather(
+        *[manager.single_flight(credentials=CREDENTIALS, token_bb_redis_repo=None) for _ in range(10)]
+    )
+
+    assert refreshes == ["key"]
+    assert {token.access_token for token in tokens} == {"token"}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_refresh() -> None:
+    manager = BBTokenManager()
+
+    async def refresh_token(credentials, token_bb_redis_repo, min_ttl):
+        await asyncio.sleep(0.01)
+        return new_token()
+
+    manager.set_refresh_function(refresh_token)
+    cancelled = asyncio.ensure_future(manager.single_flight(credentials=CREDENTIALS, token_bb_redis_repo=None))
+    waiting = asyncio.ensure_future(manager.single_flight(credentials=CREDENTIALS, token_bb_redis_repo=None))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert (await waiting).access_token == "token"
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_is_not_kept_for_the_next_miss() -> None:
+    manager = BBTokenManager()
+    outcomes = [ConnectionError("BB is down"), new_token()]
+
+    async def refresh_token(credentials, token_bb_redis_repo, min_ttl):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    manager.set_refresh_function(refresh_token)
+    with pytest.raises(ConnectionError):
+        await manager.single_flight(credentials=CREDENTIALS, token_bb_redis_repo=None)
+
+    assert (await manager.single_flight(credentials=CREDENTIALS, token_bb_redis_repo=None)).access_token == "token"
@@ -0,0 +1,155 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+
+from app.core.exceptions.exceptions_customs import CircuitOpenExceptionBB, HttpExceptionBB
+from app.schemas.bancos.boleto_bb_outbox import BoletoBBOutboxInDB
+from app.schemas.enums import OutboxStatus, RegistroStatus
+from app.services import boleto_bb_outbox_worker as worker_module
+from app.services.boleto_bb_outbox_worker import BoletoBBOutboxWorker
+
+
+class FakeOutboxRepository:
+    def __init__(self, lost: List[uuid.UUID] = None, failing: str = None) -> None:
+        self.lost = lost or []
+        self.failing = failing
+        self.calls = []
+
+    async def refresh_claim(self, *, id, locked_at):
+        self.calls.append(("refresh_claim", id))
+        return None if id in self.lost else locked_at + timedelta(seconds=1)
+
+    async def mark_done(self, *, id):
+        await self.__call("mark_done", id)
+
+    async def schedule_retry(self, *, id, delay, last_error):
+        await self.__call("schedule_retry", id, delay)
+
+    async def mark_dead(self, *, id, last_error):
+        await self.__call("mark_dead", id)
+
+    async def __call(self, name, *args):
+        if name == self.failing:
+            raise ConnectionError("connection lost")
+        self.calls.append((name, *args))
+
+
+class FakeBoletosBBRepository:
+    statuses = []
+    deleted = []
+
+    def __init__(self, db) -> None:
+        pass
+
+    async def update_registro_status(self, *, tenant_id, id, registro_status):
+        self.statuses.append(registro_status)
+
+    async def delete_boleto_bb_by_id(self, *, tenant_id, id):
+        self.deleted.append(id)
+
+
+def new_entry(attempts: int = 1) -> BoletoBBOutboxInDB:
+    return BoletoBBOutboxInDB(
+        id=uuid.uuid4(),
+        tenant_id=uuid.uuid4(),
+        boleto_bb_id=uuid.uuid4(),
+        operation="registrar",
+        status=OutboxStatus.processing,
+        attempts=attempts,
+        locked_at=datetime.now(timezone.utc),
+    )
+
+
+@pytest.fixture
+def worker(monkeypatch) -> BoletoBBOutboxWorker:
+    FakeBoletosBBRepository.statuses = []
+    FakeBoletosBBRepository.deleted = []
+    monkeypatch.setattr(worker_module, "BoletosBBRepository", FakeBoletosBBRepository)
+    return BoletoBBOutboxWorker()
+
+
+def registra_raising(worker: BoletoBBOutboxWorker, monkeypatch, error: Exception) -> None:
+    async def registra_boleto_bb(**kwargs):
+        raise error
+
+    monkeypatch.setattr(worker, "_BoletoBBOutboxWorker__registra_boleto_bb", registra_boleto_bb)
+
+
+@pytest.mark.asyncio
+async def test_registered_entry_is_done(worker, monkeypatch) -> None:
+    async def registra_boleto_bb(**kwargs):
+        pass
+
+    monkeypatch.setattr(worker, "_BoletoBBOutboxWorker__registra_boleto_bb", registra_boleto_bb)
+    outbox_repo = FakeOutboxRepository()
+    entry = new_entry()
+
+    await worker.process_batch(entries=[entry], outbox_repo=outbox_repo)
+
+    assert ("mark_done", entry.id) in outbox_repo.calls
+
+
+@pytest.mark.asyncio
+async def test_boleto_rejected_by_bb_is_removed(worker, monkeypatch) -> None:
+    registra_raising(worker, monkeypatch, HttpExceptionBB(status_code=400, content={"erros": []}))
+    outbox_repo = FakeOutboxRepository()
+    entry = new_entry()
+
+    await worker.process_entry(entry=entry, outbox_repo=outbox_repo)
+
+    assert FakeBoletosBBRepository.deleted == [entry.boleto_bb_id]
+    assert outbox_repo.calls == []
+
+
+@pytest.mark.asyncio
+async def test_entry_out_of_attempts_is_dead_lettered(worker, monkeypatch) -> None:
+    registra_raising(worker, monkeypatch, TimeoutError())
+    outbox_repo = FakeOutboxRepository()
+    entry = new_entry(attempts=worker_module.BB_OUTBOX_MAX_ATTEMPTS)
+
+    await worker.process_entry(entry=entry, outbox_repo=outbox_repo)
+
+    assert ("mark_dead", entry.id) in outbox_repo.calls
+    assert FakeBoletosBBRepository.statuses == [RegistroStatus.failed]
+    assert FakeBoletosBBRepository.deleted == []
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_is_retried_after_it(worker, monkeypatch) -> None:
+    registra_raising(worker, monkeypatch, CircuitOpenExceptionBB(endpoint="registro", retry_after=10000))
+    outbox_repo = FakeOutboxRepository()
+    entry = new_entry()
+
+    await worker.process_entry(entry=entry, outbox_repo=outbox_repo)
+
+    [(name, id, delay)] = outbox_repo.calls
+    assert name == "schedule_retry" and delay >= 10000
+
+
+@pytest.mark.asyncio
+async def test_lost_claim_is_skipped(worker, monkeypatch) -> None:
+    registra_raising(worker, monkeypatch, AssertionError("must not be registered"))
+    entry = new_entry()
+    outbox_repo = FakeOutboxRepository(lost=[entry.id])
+
+    await worker.process_batch(entries=[entry], outbox_repo=outbox_repo)
+
+    assert outbox_repo.calls == [("refresh_claim", entry.id)]
+
+
+@pytest.mark.asyncio
+async def test_db_error_while_handling_a_failure_does_not_stop_the_batch(worker, monkeypatch) -> None:
+    registra_raising(worker, monkeypatch, TimeoutError())
+    outbox_repo = FakeOutboxRepository(failing="schedule_retry")
+    first, second = new_entry(), new_entry()
+
+    await worker.process_batch(entries=[first, second], outbox_repo=outbox_repo)
+
+    assert ("refresh_claim", second.id) in outbox_repo.calls
+
+
+def test_backoff_grows_and_is_capped(worker) -> None:
+    assert worker_module.BB_OUTBOX_BACKOFF_BASE / 2 <= worker.get_backoff(1) <= worker_module.BB_OUTBOX_BACKOFF_BASE
+    assert worker.get_backoff(100) <= worker_module.BB_OUTBOX_BACKOFF_MAX
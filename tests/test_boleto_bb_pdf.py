@@ -0,0 +1,43 @@
+from datetime import date
+
+import pytest
+
+from app.schemas.bancos.boleto_pdf import BeneficiarioBoleto, DadosBoletoBB, PagadorBoleto
+from app.services import boleto_bb_pdf
+
+
+@pytest.fixture(autouse=True)
+def no_locale(monkeypatch) -> None:
+    # the pt_BR locale of the servers may not be installed where the tests run
+    monkeypatch.setattr(boleto_bb_pdf.locale, "setlocale", lambda *args: None)
+
+
+def new_boleto(qr_code=None) -> DadosBoletoBB:
+    return DadosBoletoBB(
+        carteira="17",
+        data_documento=date(2023, 1, 2),
+        data_processamento=date(2023, 1, 2),
+        data_vencimento=date(2023, 2, 2),
+        numero_documento="123",
+        nosso_numero="00031285570000000123",
+        valor_original=100,
+        valor_desconto=0,
+        linha_digitavel="00190000090312855700000001237173192580000010000",
+        codigo_barras="00191925800000100000000003128557000000012317",
+        qr_code=qr_code,
+        taxa_juros_mes=1,
+        taxa_multa=2,
+        mensagem_beneficiario=None,
+        beneficiario=BeneficiarioBoleto(agencia="1234-5", conta="12345-6", nome="Beneficiario", cpf_cnpj="1"),
+        pagador=PagadorBoleto(nome="Maria Bonita", cpf_cnpj="2"),
+    )
+
+
+def test_pdf_with_pix_qr_code() -> None:
+    pdf = boleto_bb_pdf.create_boleto_bb_pdf(boleto=new_boleto(qr_code="00020101021226870014br.gov.bcb.pix"))
+    assert pdf.read(5) == b"%PDF-"
+
+
+def test_pdf_without_qr_code() -> None:
+    pdf = boleto_bb_pdf.create_boleto_bb_pdf(boleto=new_boleto(qr_code=None))
+    assert pdf.read(5) == b"%PDF-"
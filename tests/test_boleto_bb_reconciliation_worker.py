@@ -0,0 +1,120 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from redis.exceptions import LockNotOwnedError
+
+from app.schemas.bancos.boleto_bb import BoletoBBSync
+from app.services import boleto_bb_reconciliation_worker as worker_module
+from app.services.boleto_bb_reconciliation_worker import BoletoBBReconciliationWorker
+
+
+class FakeLock:
+    def __init__(self, owned_batches: int) -> None:
+        self.owned_batches = owned_batches
+        self.reacquired = 0
+        self.released = False
+
+    async def acquire(self, blocking: bool) -> bool:
+        return True
+
+    async def reacquire(self) -> None:
+        if self.reacquired == self.owned_batches:
+            raise LockNotOwnedError("lock expired")
+        self.reacquired += 1
+
+    async def release(self) -> None:
+        self.released = True
+
+
+class FakeRedis:
+    def __init__(self, lock: FakeLock) -> None:
+        self._lock = lock
+
+    def lock(self, name, timeout):
+        return self._lock
+
+
+class FakeBoletosBBRepository:
+    saved = []
+
+    def __init__(self, db) -> None:
+        pass
+
+    async def get_convenios_with_open_boletos_bb(self, *, grace_days):
+        return [uuid.uuid4()]
+
+    async def get_open_boletos_bb_to_sync(self, *, convenio_bancario_id, grace_days, min_age, limit):
+        return [SimpleNamespace(id=uuid.uuid4()) for _ in range(limit)]
+
+    async def update_boletos_bb_sync(self, *, boletos_sync):
+        self.saved.append(boletos_sync)
+
+
+class FakeConsultas:
+    def __init__(self) -> None:
+        self.failing = set()
+        self.sent = []
+
+    async def __call__(self, *, boletos_bb_req):
+        self.sent += [boleto_bb_req.id for boleto_bb_req in boletos_bb_req]
+        return [
+            BoletoBBSync(id=boleto_bb_req.id, codigo_estado_titulo=1)
+            for boleto_bb_req in boletos_bb_req
+            if boleto_bb_req.id not in self.failing
+        ]
+
+
+@pytest.fixture
+def consultas() -> FakeConsultas:
+    return FakeConsultas()
+
+
+@pytest.fixture
+def worker(monkeypatch, consultas: FakeConsultas) -> BoletoBBReconciliationWorker:
+    FakeBoletosBBRepository.saved = []
+    monkeypatch.setattr(worker_module, "BoletosBBRepository", FakeBoletosBBRepository)
+    monkeypatch.setattr(worker_module, "BB_RECONCILIATION_BATCH_SIZE", 2)
+
+    worker = BoletoBBReconciliationWorker()
+    monkeypatch.setattr(worker, "_BoletoBBReconciliationWorker__consultar_boletos_bb", consultas)
+    return worker
+
+
+@pytest.mark.asyncio
+async def test_lock_is_renewed_after_each_batch_and_the_cycle_stops_when_lost(worker) -> None:
+    lock = FakeLock(owned_batches=3)
+    worker._redis = FakeRedis(lock)
+
+    await worker.run_cycle()
+
+    assert lock.reacquired == 3
+    # the batch consulted after the lock expired is not saved
+    assert len(FakeBoletosBBRepository.saved) == 3
+    assert lock.released
+
+
+class FakeConvenioBoletosBBRepository(FakeBoletosBBRepository):
+    boletos = []
+
+    async def get_open_boletos_bb_to_sync(self, *, convenio_bancario_id, grace_days, min_age, limit):
+        return [boleto for boleto in self.boletos if not boleto.synced][:limit]
+
+    async def update_boletos_bb_sync(self, *, boletos_sync):
+        await super().update_boletos_bb_sync(boletos_sync=boletos_sync)
+        ids = {boleto_sync.id for boleto_sync in boletos_sync}
+        for boleto in self.boletos:
+            boleto.synced = boleto.synced or boleto.id in ids
+
+
+@pytest.mark.asyncio
+async def test_failed_consultas_are_not_sent_again_in_the_cycle(worker, consultas, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "BoletosBBRepository", FakeConvenioBoletosBBRepository)
+    FakeConvenioBoletosBBRepository.boletos = [SimpleNamespace(id=uuid.uuid4(), synced=False) for _ in range(5)]
+    consultas.failing.add(FakeConvenioBoletosBBRepository.boletos[0].id)
+    worker._redis = FakeRedis(FakeLock(owned_batches=10))
+
+    assert await worker.run_cycle() == 4
+
+    # the failed boleto stays first in the order, but is consulted only once
+    assert len(consultas.sent) == len(set(consultas.sent)) == 5
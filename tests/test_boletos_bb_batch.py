@@ -0,0 +1,152 @@
+import contextlib
+import re
+import uuid
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from validate_docbr import CPF
+
+from app.core.exceptions.exceptions_customs import HttpExceptionBB
+from app.db.repositories.boletos_bb import (
+    CREATE_BOLETO_BB_OUTBOX_QUERY,
+    MARK_DONE_BOLETO_BB_OUTBOX_BY_BOLETO_QUERY,
+    SCHEDULE_BOLETO_BB_OUTBOX_QUERY,
+    BoletosBBRepository,
+)
+from app.schemas.bancos.boleto import BoletoCreate
+from app.schemas.bancos.conta_bancaria import ContaBancariaInDB
+from app.schemas.bancos.convenio_bancario import ConvenioBancarioInDB
+from app.schemas.enums import BatchItemStatus, PersonType
+
+CONVENIO = ConvenioBancarioInDB(
+    id=uuid.uuid4(),
+    tenant_id=uuid.uuid4(),
+    conta_bancaria_id=uuid.uuid4(),
+    numero_convenio=3128557,
+    numero_carteira=17,
+    numero_variacao_carteira=35,
+    descricao_tipo_titulo="DM",
+    numero_dias_limite_recebimento=30,
+)
+
+
+def rows_of(values: dict) -> list:
+    # the multi-row statements number their parameters by row: <column>_<row>
+    rows = {}
+    for name, value in values.items():
+        column, i = re.match(r"(.+)_(\d+)$", name).groups()
+        rows.setdefault(int(i), {})[column] = value
+    return [rows[i] for i in sorted(rows)]
+
+
+class FakeDatabase:
+    def __init__(self, existing=()) -> None:
+        self.existing = set(existing)
+        self.executed = []
+
+    async def fetch_all(self, *, query, values):
+        if query.startswith("SELECT"):
+            return []
+        rows = [{**row, "id": uuid.uuid4()} for row in rows_of(values)]
+        if 'INSERT INTO "boletos_bb"' in query:
+            rows = [row for row in rows if row["numero_titulo_beneficiario"] not in self.existing]
+        return rows
+
+    async def execute(self, *, query, values):
+        self.executed.append((query, values))
+
+    async def execute_many(self, *, query, values):
+        self.executed.append((query, values))
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        yield self
+
+
+class FakeBoletoBBService:
+    def __init__(self, errors: dict) -> None:
+        self.errors = errors
+
+    async def registra_boleto_bb(self, *, boleto_in_bd, **kwargs):
+        error = self.errors.get(boleto_in_bd.numero_titulo_beneficiario)
+        if error:
+            raise error
+        return SimpleNamespace(
+            codigoCliente=1,
+            linhaDigitavel="0" * 47,
+            codigoBarraNumerico="0" * 44,
+            numeroContratoCobranca=1,
+            qrCode=SimpleNamespace(dict=lambda: {"url": None, "tx_id": None, "emv": "000201"}),
+        )
+
+
+def new_boleto(numero_titulo_beneficiario: int) -> BoletoCreate:
+    return BoletoCreate(
+        convenio_bancario_id=CONVENIO.id,
+        numero_titulo_beneficiario=numero_titulo_beneficiario,
+        data_vencimento=date(2030, 1, 2),
+        valor_original=100,
+        pagador={
+            "tipo_inscricao": PersonType.fisica,
+            "cpf_cnpj": CPF().generate(),
+            "nome": "Maria Bonita",
+            "endereco": "Rua XV de Novembro, 100",
+            "cep": "89010000",
+            "cidade": "Blumenau",
+            "bairro": "Centro",
+            "uf": "SC",
+            "telefone": "(47) 3333-4444",
+        },
+    )
+
+
+async def register_batch(db: FakeDatabase, errors: dict, numeros: list):
+    repo = BoletosBBRepository(db)
+    repo.boleto_bb_service = FakeBoletoBBService(errors)
+    return await repo.register_new_boletos_bb_batch(
+        tenant_in_db=SimpleNamespace(id=CONVENIO.tenant_id),
+        convenios_contas={CONVENIO.id: (CONVENIO, ContaBancariaInDB.construct())},
+        new_boletos=[new_boleto(numero) for numero in numeros],
+        token_bb_redis_repo=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_failed_boletos_do_not_fail_the_batch() -> None:
+    db = FakeDatabase(existing=[4])
+    errors = {2: HttpExceptionBB(status_code=400, content={"erros": []}), 3: TimeoutError()}
+
+    result = await register_batch(db, errors, [1, 2, 3, 4, 1])
+
+    assert [item.status for item in result.items] == [
+        BatchItemStatus.created,
+        BatchItemStatus.failed,
+        BatchItemStatus.failed,
+        BatchItemStatus.failed,
+        BatchItemStatus.failed,
+    ]
+    assert result.created == 1 and result.failed == 4
+    assert result.items[0].boleto.qr_code.emv == "000201"
+    assert result.items[3].error == {"detail": "Boleto already exists."}
+    assert result.items[4].error == {"detail": "Duplicated numero_titulo_beneficiario."}
+
+
+@pytest.mark.asyncio
+async def test_refused_boleto_is_removed_and_unconfirmed_one_goes_to_the_outbox() -> None:
+    db = FakeDatabase()
+    errors = {2: HttpExceptionBB(status_code=400, content={"erros": []}), 3: TimeoutError()}
+
+    result = await register_batch(db, errors, [1, 2, 3])
+
+    # every boleto gets its outbox entry with the insert, before BB is called
+    [created] = [values for query, values in db.executed if query == CREATE_BOLETO_BB_OUTBOX_QUERY]
+    assert len(created) == 3
+    [done] = [values for query, values in db.executed if query == MARK_DONE_BOLETO_BB_OUTBOX_BY_BOLETO_QUERY]
+    assert [entry["boleto_bb_id"] for entry in done] == [result.items[0].boleto.id]
+
+    assert result.items[1].error == {"erros": []}
+    [deleted] = [values for query, values in db.executed if query.startswith("DELETE")]
+    assert list(deleted) == ["tenant_id", "id_0"]
+    [scheduled] = [values for query, values in db.executed if query == SCHEDULE_BOLETO_BB_OUTBOX_QUERY]
+    assert [entry["boleto_bb_id"] for entry in scheduled] == [uuid.UUID(result.items[2].error["id"])]
@@ -0,0 +1,76 @@
+import uuid
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.exceptions.exceptions_customs import CircuitOpenExceptionBB, HttpExceptionBB
+from app.db.repositories.boletos_bb import MARK_BOLETO_BB_TO_SYNC_QUERY, BoletosBBRepository
+
+
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.executed = []
+
+    async def fetch_one(self, *, query, values):
+        return {"data_vencimento": date(2023, 2, 2), "data_hora_baixa": None, **values}
+
+    async def execute(self, *, query, values):
+        self.executed.append((str(query), values))
+
+
+class FakeBoletoBBService:
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+
+    async def alterar_boleto_bb(self, **kwargs):
+        raise self.error
+
+
+class FakeBankingProfile:
+    def get_request_details(self, *, id, numero):
+        return SimpleNamespace(id=id, numero=numero)
+
+
+async def alterar_vencimento(error: Exception) -> FakeDatabase:
+    db = FakeDatabase()
+    repo = BoletosBBRepository(db)
+    repo.boleto_bb_service = FakeBoletoBBService(error)
+    boleto_bb = SimpleNamespace(id=uuid.uuid4(), tenant_id=uuid.uuid4(), numero="00031285570000000123")
+
+    with pytest.raises(type(error)):
+        await repo.update_vencimento_boleto_bb(
+            boleto_bb=boleto_bb,
+            banking_profile=FakeBankingProfile(),
+            new_vencimento=SimpleNamespace(data_vencimento=date(2023, 3, 3)),
+            boleto_bb_alteracao=None,
+            token_bb_redis_repo=None,
+        )
+
+    return db
+
+
+@pytest.mark.asyncio
+async def test_vencimento_refused_by_bb_is_restored() -> None:
+    db = await alterar_vencimento(HttpExceptionBB(status_code=400, content={"erros": []}))
+
+    [(query, values)] = db.executed
+    assert values["data_vencimento"] == date(2023, 2, 2)
+
+
+@pytest.mark.asyncio
+async def test_vencimento_not_sent_is_restored() -> None:
+    db = await alterar_vencimento(CircuitOpenExceptionBB(endpoint="alteracao", retry_after=10))
+
+    [(query, values)] = db.executed
+    assert values["data_vencimento"] == date(2023, 2, 2)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [TimeoutError(), HttpExceptionBB(status_code=503, content={"erros": []})])
+async def test_vencimento_without_answer_is_left_to_the_reconciliation(error) -> None:
+    db = await alterar_vencimento(error)
+
+    [(query, values)] = db.executed
+    assert query == MARK_BOLETO_BB_TO_SYNC_QUERY
+    assert "data_vencimento" not in values
@@ -0,0 +1,111 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from asyncpg.exceptions import NotNullViolationError
+from fastapi import HTTPException
+
+from app.core.config import BB_OUTBOX_SYNC_DELAY
+from app.core.exceptions.exceptions_customs import HttpExceptionBB
+from app.db.repositories.boletos_bb import (
+    DELETE_BOLETO_BB_BY_ID_QUERY,
+    FULL_BOLETO_BB_COLUMNS,
+    SCHEDULE_BOLETO_BB_OUTBOX_QUERY,
+    BoletosBBRepository,
+)
+from app.schemas.bancos.conta_bancaria import ContaBancariaInDB
+from tests.test_boletos_bb_batch import CONVENIO, new_boleto
+
+
+class FakeDatabase:
+    def __init__(self, *errors: Exception) -> None:
+        self.errors = list(errors)
+        self.created = None
+        self.inserts = 0
+        self.executed = []
+
+    async def fetch_one(self, *, query, values):
+        self.inserts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        self.created = values
+        row = {column: values.get(column) for column in FULL_BOLETO_BB_COLUMNS["b"]}
+        row.update(
+            {f"pagador__{column}": values.get(f"pagador_{column}") for column in FULL_BOLETO_BB_COLUMNS["pagador"]}
+        )
+        return {
+            **row,
+            "id": uuid.uuid4(),
+            "pagador_bb_id": uuid.uuid4(),
+            "outbox__attempts": values["outbox_attempts"],
+            "outbox__next_attempt_at": None,
+        }
+
+    async def execute(self, *, query, values):
+        self.executed.append((query, values))
+
+
+class FakeBoletoBBService:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+    async def registra_boleto_bb(self, **kwargs):
+        raise self.error
+
+
+async def register(db: FakeDatabase, error: BaseException) -> None:
+    repo = BoletosBBRepository(db)
+    repo.boleto_bb_service = FakeBoletoBBService(error)
+    await repo.register_new_boleto_bb(
+        tenant_in_db=SimpleNamespace(id=CONVENIO.tenant_id),
+        convenio_bancario_in_db=CONVENIO,
+        conta_bancaria_in_db=ContaBancariaInDB.construct(),
+        new_boleto=new_boleto(1),
+        token_bb_redis_repo=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_registration_cut_short_is_left_to_the_outbox() -> None:
+    db = FakeDatabase()
+
+    with pytest.raises(asyncio.CancelledError):
+        await register(db, asyncio.CancelledError())
+
+    # the delayed outbox entry is written by the insert of the boleto, nothing else is needed
+    assert db.created["outbox_attempts"] == 1 and db.created["outbox_delay"] == BB_OUTBOX_SYNC_DELAY
+    assert db.executed == []
+
+
+@pytest.mark.asyncio
+async def test_boleto_refused_by_bb_is_removed() -> None:
+    db = FakeDatabase()
+
+    with pytest.raises(HttpExceptionBB):
+        await register(db, HttpExceptionBB(status_code=400, content={"erros": []}))
+
+    [(query, values)] = db.executed
+    assert query == DELETE_BOLETO_BB_BY_ID_QUERY
+
+
+@pytest.mark.asyncio
+async def test_unconfirmed_registration_is_taken_sooner_by_the_outbox() -> None:
+    db = FakeDatabase()
+
+    with pytest.raises(HTTPException) as e:
+        await register(db, TimeoutError())
+
+    assert e.value.status_code == 503
+    [(query, values)] = db.executed
+    assert query == SCHEDULE_BOLETO_BB_OUTBOX_QUERY
+
+
+@pytest.mark.asyncio
+async def test_pagador_committed_by_a_concurrent_request_is_read_again() -> None:
+    db = FakeDatabase(NotNullViolationError("pagador_bb_id"))
+
+    with pytest.raises(asyncio.CancelledError):
+        await register(db, asyncio.CancelledError())
+
+    assert db.inserts == 2 and db.created
@@ -0,0 +1,68 @@
+import pytest
+
+from app.util import cache as cache_module
+from app.util.cache import TTLCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_entry_expires_after_its_ttl(clock: Clock) -> None:
+    cache = TTLCache(default_ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=20)
+
+    clock.now += 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.ttl("b") == pytest.approx(10)
+
+
+def test_least_recently_used_is_evicted(clock: Clock) -> None:
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_set_without_ttl_removes_the_entry(clock: Clock) -> None:
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("a", 2, ttl=0)
+
+    assert cache.get("a") is None
+
+
+def test_evict_where(clock: Clock) -> None:
+    cache = TTLCache()
+    for key in range(4):
+        cache.set(key, key % 2)
+
+    assert cache.evict_where(lambda key, value: value == 1) == 2
+    assert len(cache) == 2
+
+
+def test_stats(clock: Clock) -> None:
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    assert cache.stats()["hit_ratio"] == 0.5
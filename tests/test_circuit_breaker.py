@@ -0,0 +1,197 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+import pytest
+
+from app.core.exceptions.exceptions_customs import CircuitOpenExceptionBB, RateLimitExceptionBB
+from app.services.boleto_bb_api import BoletoBBService
+from app.util import circuit_breaker as circuit_breaker_module
+from app.util.circuit_breaker import CircuitBreaker, CircuitState
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker_module.time, "monotonic", clock)
+    return clock
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.minimum_calls):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+class TestCircuitBreaker:
+    def test_opens_at_failure_rate_after_minimum_calls(self, clock: Clock) -> None:
+        breaker = CircuitBreaker("test", failure_rate=0.5, window_size=10, minimum_calls=4)
+
+        for outcome in [True, False, False]:
+            assert breaker.allow()
+            breaker.record_success() if outcome else breaker.record_failure()
+        assert breaker.state == CircuitState.closed
+
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitState.open
+        assert not breaker.allow()
+        assert breaker.retry_after() == pytest.approx(breaker.open_seconds)
+
+    def test_half_open_closes_after_successful_probes(self, clock: Clock) -> None:
+        breaker = CircuitBreaker("test", minimum_calls=2, open_seconds=10, half_open_calls=2)
+        open_breaker(breaker)
+
+        clock.now += 10
+        assert breaker.allow()
+        assert breaker.state == CircuitState.half_open
+        assert breaker.allow()
+        # only half_open_calls probes at a time
+        assert not breaker.allow()
+
+        breaker.record_success()
+        breaker.record_success()
+        assert breaker.state == CircuitState.closed
+
+    def test_half_open_failure_opens_again(self, clock: Clock) -> None:
+        breaker = CircuitBreaker("test", minimum_calls=2, open_seconds=10, half_open_calls=2)
+        open_breaker(breaker)
+
+        clock.now += 10
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitState.open
+        assert not breaker.allow()
+
+    def test_release_gives_the_probe_back(self, clock: Clock) -> None:
+        breaker = CircuitBreaker("test", minimum_calls=2, open_seconds=10, half_open_calls=1)
+        open_breaker(breaker)
+
+        clock.now += 10
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+
+class FakeHttpClient:
+    def __init__(self, *outcomes) -> None:
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+class FakeTokenManager:
+    def set_refresh_function(self, refresh_token) -> None:
+        pass
+
+
+class FakeRateLimiter:
+    def __init__(self, error: Optional[BaseException] = None) -> None:
+        self.error = error
+        self.calls = 0
+
+    async def acquire(self, **kwargs) -> None:
+        self.calls += 1
+        if self.error:
+            raise self.error
+
+
+def make_service(
+    http_client: FakeHttpClient, endpoint: str, rate_limiter: Optional[FakeRateLimiter] = None
+) -> BoletoBBService:
+    service = BoletoBBService(
+        http_client=http_client, token_manager=FakeTokenManager(), rate_limiter=rate_limiter or FakeRateLimiter()
+    )
+    # a half-open circuit with a single probe
+    breaker = CircuitBreaker(endpoint, minimum_calls=1, open_seconds=0, half_open_calls=1)
+    open_breaker(breaker)
+    service.breakers[endpoint] = breaker
+    return service
+
+
+async def call_bb(service: BoletoBBService, endpoint: str):
+    return await service._BoletoBBService__call_bb(endpoint, "GET", "http://bb.test", gw_dev_app_key="key", headers={})
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_of_a_probe_opens_the_circuit_again() -> None:
+    service = make_service(FakeHttpClient(ValueError("not JSON")), "registro")
+
+    with pytest.raises(ValueError):
+        await call_bb(service, "registro")
+
+    # not stuck in half-open with the probe in flight
+    assert service.breakers["registro"].state == CircuitState.open
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_is_released() -> None:
+    service = make_service(FakeHttpClient(asyncio.CancelledError()), "registro")
+
+    with pytest.raises(asyncio.CancelledError):
+        await call_bb(service, "registro")
+
+    breaker = service.breakers["registro"]
+    assert breaker.state == CircuitState.half_open
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_idempotent_endpoint_is_retried_after_network_error(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.boleto_bb_api.BB_RETRY_BACKOFF_BASE", 0)
+    http_client = FakeHttpClient(aiohttp.ClientConnectionError(), (200, {"ok": True}))
+    service = BoletoBBService(http_client=http_client, token_manager=FakeTokenManager(), rate_limiter=FakeRateLimiter())
+
+    assert await call_bb(service, "consulta") == (200, {"ok": True})
+    assert http_client.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_registro_is_not_retried() -> None:
+    http_client = FakeHttpClient((503, {"erros": []}), (200, {}))
+    service = BoletoBBService(http_client=http_client, token_manager=FakeTokenManager(), rate_limiter=FakeRateLimiter())
+
+    assert await call_bb(service, "registro") == (503, {"erros": []})
+    assert http_client.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_takes_no_rate_limit_token() -> None:
+    rate_limiter = FakeRateLimiter()
+    service = BoletoBBService(http_client=FakeHttpClient(), token_manager=FakeTokenManager(), rate_limiter=rate_limiter)
+    breaker = CircuitBreaker("registro", minimum_calls=1, open_seconds=60)
+    open_breaker(breaker)
+    service.breakers["registro"] = breaker
+
+    with pytest.raises(CircuitOpenExceptionBB):
+        await call_bb(service, "registro")
+
+    assert rate_limiter.calls == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [RateLimitExceptionBB(retry_after=1), asyncio.CancelledError()])
+async def test_probe_without_rate_limit_token_is_released(error) -> None:
+    service = make_service(FakeHttpClient(), "registro", FakeRateLimiter(error))
+
+    with pytest.raises(type(error)):
+        await call_bb(service, "registro")
+
+    breaker = service.breakers["registro"]
+    assert breaker.state == CircuitState.half_open
+    assert breaker.allow()
@@ -0,0 +1,102 @@
+import uuid
+
+import pytest
+from pypika import PostgreSQLQuery as Query, Table
+
+from app.db.repositories import base as base_module
+from app.db.repositories.base import BaseRepository
+from app.schemas.enums import CountStrategy
+
+
+class FakeDatabase:
+    def __init__(self, *, rows, total=None, estimate=None) -> None:
+        self.rows = rows
+        self.total = total
+        self.estimate = estimate
+        self.queries = []
+
+    async def fetch_all(self, *, query, values):
+        self.queries.append(query)
+        limit = int(query.rsplit("LIMIT ", 1)[1].split()[0])
+        return self.rows[:limit]
+
+    async def fetch_one(self, *, query, values):
+        self.queries.append(query)
+        if query.startswith("EXPLAIN"):
+            return {"QUERY PLAN": [{"Plan": {"Plan Rows": self.estimate}}]}
+        return {"total": self.total}
+
+
+table = Table("items")
+TENANT_ID = uuid.uuid4()
+
+
+async def get_page(db: FakeDatabase, count_strategy: CountStrategy, current_page: int = 1):
+    return await BaseRepository(db).get_page_by_params(
+        table=table,
+        select_query=Query.from_(table).select("*"),
+        count_query=Query.from_(table),
+        tenant_id=TENANT_ID,
+        filters=[],
+        sorts=None,
+        current_page=current_page,
+        per_page=2,
+        type_schema=dict,
+        count_strategy=count_strategy,
+    )
+
+
+@pytest.fixture(autouse=True)
+def empty_count_cache() -> None:
+    base_module.COUNT_CACHE.clear()
+
+
+@pytest.mark.asyncio
+async def test_exact_counts_in_its_own_query() -> None:
+    db = FakeDatabase(rows=[{"id": 1}, {"id": 2}], total=5)
+
+    page = await get_page(db, CountStrategy.exact)
+
+    assert len(db.queries) == 2
+    assert page.page.total == 5 and page.page.last_page == 3
+
+
+@pytest.mark.asyncio
+async def test_windowed_takes_the_total_from_the_rows() -> None:
+    db = FakeDatabase(rows=[{"id": 1, "total_count": 5}, {"id": 2, "total_count": 5}])
+
+    page = await get_page(db, CountStrategy.windowed)
+
+    assert len(db.queries) == 1 and "OVER()" in db.queries[0]
+    assert page.page.total == 5 and page.page.has_next_page
+
+
+@pytest.mark.asyncio
+async def test_none_reads_one_extra_row_for_the_next_page() -> None:
+    db = FakeDatabase(rows=[{"id": 1}, {"id": 2}, {"id": 3}])
+
+    page = await get_page(db, CountStrategy.none)
+
+    assert "LIMIT 3" in db.queries[0]
+    assert len(page.rows) == 2
+    assert page.page.total is None and page.page.has_next_page
+
+
+@pytest.mark.asyncio
+async def test_cached_counts_once_per_query_and_tenant() -> None:
+    db = FakeDatabase(rows=[{"id": 1}, {"id": 2}], total=5)
+
+    await get_page(db, CountStrategy.cached)
+    await get_page(db, CountStrategy.cached, current_page=2)
+
+    assert len([query for query in db.queries if "COUNT" in query]) == 1
+
+
+@pytest.mark.asyncio
+async def test_small_estimate_falls_back_to_exact(monkeypatch) -> None:
+    monkeypatch.setattr(base_module, "PAGINATION_ESTIMATE_THRESHOLD", 1000)
+    db = FakeDatabase(rows=[{"id": 1}, {"id": 2}], total=5, estimate=10)
+
+    page = await get_page(db, CountStrategy.estimate)
+
+    assert page.page.total == 5 and page.page.count_strategy == CountStrategy.exact
@@ -0,0 +1,93 @@
+import datetime
+import uuid
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from pypika import PostgreSQLQuery as Query, Table
+
+from app.db.repositories.base import BaseRepository
+from app.schemas.enums import PaginationMode
+from app.util.cursor import decode_cursor, encode_cursor
+
+
+def test_cursor_keeps_the_type_of_the_sort_keys() -> None:
+    values = [datetime.datetime(2023, 1, 2, 3, 4, 5), datetime.date(2023, 1, 2), Decimal("10.50"), uuid.uuid4(), "a", 1]
+
+    cursor = encode_cursor(sorts=[["created_at", "DESC"]], values=values, direction="next")
+
+    assert decode_cursor(cursor) == {"sorts": [["created_at", "DESC"]], "values": values, "direction": "next"}
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "a.b.c"])
+def test_malformed_cursor_is_a_bad_request(cursor: str) -> None:
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+
+    assert error.value.status_code == 400
+
+
+def test_tampered_cursor_is_a_bad_request() -> None:
+    payload, signature = encode_cursor(sorts=[], values=[1], direction="next").split(".")
+    other_payload, _ = encode_cursor(sorts=[], values=[2], direction="next").split(".")
+
+    with pytest.raises(HTTPException):
+        decode_cursor(f"{other_payload}.{signature}")
+
+
+class FakeDatabase:
+    def __init__(self, rows) -> None:
+        self.rows = rows
+        self.queries = []
+
+    async def fetch_all(self, *, query, values):
+        self.queries.append((query, values))
+        return self.rows
+
+
+table = Table("items")
+
+
+async def get_page(db: FakeDatabase, cursor=None, sorts=None):
+    return await BaseRepository(db).get_page_by_params(
+        table=table,
+        select_query=Query.from_(table).select("*"),
+        count_query=Query.from_(table),
+        tenant_id=uuid.uuid4(),
+        filters=[],
+        sorts=sorts,
+        per_page=2,
+        type_schema=dict,
+        pagination=PaginationMode.cursor,
+        cursor=cursor,
+        cursor_fields={"name": table.name},
+    )
+
+
+@pytest.mark.asyncio
+async def test_cursor_page_seeks_after_the_last_row() -> None:
+    rows = [{"id": uuid.uuid4(), "name": name} for name in ["a", "b", "c"]]
+    db = FakeDatabase(rows)
+
+    first = await get_page(db, sorts="name:asc")
+    assert [row["name"] for row in first.rows] == ["a", "b"]
+    assert first.page.has_next_page and not first.page.has_previous_page
+    assert first.page.total is None
+
+    db.rows = rows[2:]
+    second = await get_page(db, cursor=first.page.next_cursor, sorts="name:asc")
+    query, values = db.queries[-1]
+    assert '("name","id")>(' in query.replace(" ", "")
+    assert values["cursor_0"] == "b" and values["cursor_1"] == rows[1]["id"]
+    assert not second.page.has_next_page and second.page.has_previous_page
+
+
+@pytest.mark.asyncio
+async def test_sorts_can_not_change_while_paginating() -> None:
+    db = FakeDatabase([{"id": uuid.uuid4(), "name": name} for name in ["a", "b", "c"]])
+    first = await get_page(db, sorts="name:asc")
+
+    with pytest.raises(HTTPException) as error:
+        await get_page(db, cursor=first.page.next_cursor, sorts="name:desc")
+
+    assert error.value.status_code == 400
@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+
+from app.db.invalidation import InvalidationBus
+from app.schemas.enums import CacheEntity
+from app.schemas.invalidation import InvalidationEvent
+
+
+class Cache:
+    def __init__(self, bus: InvalidationBus) -> None:
+        self.evicted = []
+        self.flushes = 0
+        bus.subscribe(CacheEntity.tenant, self.on_event, self.on_flush)
+
+    def on_event(self, event: InvalidationEvent) -> None:
+        self.evicted.append(event.id)
+
+    def on_flush(self) -> None:
+        self.flushes += 1
+
+
+def message(seq: int, origin: str, id: uuid.UUID) -> str:
+    return f"{seq}|{origin}|{InvalidationEvent(entity=CacheEntity.tenant, id=id).json()}"
+
+
+def test_event_of_another_worker_is_applied() -> None:
+    bus = InvalidationBus()
+    cache = Cache(bus)
+    id = uuid.uuid4()
+
+    bus.handle_message(message(1, "other", id))
+
+    assert cache.evicted == [id]
+    assert cache.flushes == 0
+
+
+def test_own_event_is_not_applied_twice() -> None:
+    bus = InvalidationBus()
+    cache = Cache(bus)
+
+    bus.handle_message(message(1, bus.origin, uuid.uuid4()))
+
+    assert cache.evicted == []
+
+
+def test_sequence_gap_flushes_the_caches() -> None:
+    bus = InvalidationBus()
+    cache = Cache(bus)
+
+    bus.handle_message(message(1, "other", uuid.uuid4()))
+    bus.handle_message(message(3, "other", uuid.uuid4()))
+
+    assert cache.flushes == 1 and bus.gaps == 1
+    assert len(cache.evicted) == 2
+
+
+def test_failing_handler_does_not_stop_the_others() -> None:
+    bus = InvalidationBus()
+
+    def failing(event: InvalidationEvent) -> None:
+        raise RuntimeError("handler bug")
+
+    bus.subscribe(CacheEntity.tenant, failing, lambda: None)
+    cache = Cache(bus)
+    bus.handle_message(message(1, "other", uuid.uuid4()))
+
+    assert len(cache.evicted) == 1
+
+
+@pytest.mark.asyncio
+async def test_publish_without_redis_reaches_this_worker() -> None:
+    bus = InvalidationBus()
+    cache = Cache(bus)
+    id = uuid.uuid4()
+
+    await bus.publish(CacheEntity.tenant, id)
+
+    assert cache.evicted == [id]
@@ -0,0 +1,128 @@
+import pytest
+
+from app.db import replica as replica_module
+from app.db.replica import DatabaseSession, ReplicaRouter, is_read_only
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.queries = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def fetch_all(self, *, query, values):
+        self.queries.append(query)
+        return []
+
+    async def execute(self, *, query, values):
+        self.queries.append(query)
+
+
+class FakeDatabase:
+    def __init__(self, lag=0.0) -> None:
+        self.lag = lag
+        self._connection = FakeConnection()
+
+    def connection(self):
+        return self._connection
+
+    async def fetch_all(self, *, query, values):
+        return await self._connection.fetch_all(query=query, values=values)
+
+    async def execute(self, *, query, values):
+        await self._connection.execute(query=query, values=values)
+
+    async def fetch_val(self, *, query):
+        if isinstance(self.lag, Exception):
+            raise self.lag
+        return self.lag
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(replica_module.time, "monotonic", clock)
+    monkeypatch.setattr("app.util.cache.time.monotonic", clock)
+    return clock
+
+
+def new_router(replica: FakeDatabase) -> ReplicaRouter:
+    return ReplicaRouter(
+        primary=FakeDatabase(), replica=replica, max_lag=1, check_interval=1, pin_seconds=5, pin_maxsize=10
+    )
+
+
+@pytest.mark.parametrize(
+    "query, read_only",
+    [
+        ("SELECT * FROM boletos_bb", True),
+        ("EXPLAIN (FORMAT JSON) SELECT id FROM boletos_bb", True),
+        ("SELECT * FROM boletos_bb FOR UPDATE", False),
+        ("WITH new AS (INSERT INTO pagadores_bb VALUES (1) RETURNING id) SELECT id FROM new", False),
+        ("UPDATE boletos_bb SET numero = 1", False),
+    ],
+)
+def test_is_read_only(query: str, read_only: bool) -> None:
+    assert is_read_only(query) == read_only
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_a_replica_within_the_lag(clock: Clock) -> None:
+    replica = FakeDatabase(lag=0.5)
+    router = new_router(replica)
+    assert router.get_replica(key="client", written=False) is None
+
+    await router.check_lag()
+    assert router.get_replica(key="client", written=False) is replica
+
+    replica.lag = 2
+    await router.check_lag()
+    assert router.get_replica(key="client", written=False) is None
+
+
+@pytest.mark.asyncio
+async def test_stale_or_failed_lag_routes_to_the_primary(clock: Clock) -> None:
+    replica = FakeDatabase(lag=0)
+    router = new_router(replica)
+    await router.check_lag()
+
+    clock.now += 10
+    assert not router.healthy
+
+    replica.lag = ConnectionError("replica down")
+    await router.check_lag()
+    assert router.lag is None
+
+
+@pytest.mark.asyncio
+async def test_a_write_pins_the_client_to_the_primary(clock: Clock) -> None:
+    replica = FakeDatabase(lag=0)
+    router = new_router(replica)
+    await router.check_lag()
+    session = DatabaseSession(primary=FakeDatabase(), router=router, key="client")
+
+    await session.primary.fetch_all("SELECT * FROM boletos_bb")
+    assert session.get_read_database() is replica
+
+    await session.primary.execute("UPDATE boletos_bb SET numero = 1")
+    assert session.get_read_database() is session.primary
+
+    # the next request of the same client reads its write
+    other_session = DatabaseSession(primary=FakeDatabase(), router=router, key="client")
+    assert other_session.get_read_database() is other_session.primary
+
+    clock.now += router.pin_seconds
+    await router.check_lag()
+    assert other_session.get_read_database() is replica
@@ -0,0 +1,101 @@
+import uuid
+
+import pytest
+
+from app.schemas.token import SessionToken, Token
+from app.services.session_token_cache import SessionTokenCache
+
+
+def new_token_data(user_id: str) -> dict:
+    return {
+        "id": f"{user_id}-{uuid.uuid4().hex[:12]}",
+        "tenant_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "roles": "admin,,user",
+        "permissions": "boletos:read",
+    }
+
+
+class FakeTokenRedisRepository:
+    def __init__(self, *tokens: dict, during_read=None) -> None:
+        self.tokens = {token["id"]: token for token in tokens}
+        self.during_read = during_read
+        self.reads = 0
+
+    async def get_all(self, key):
+        self.reads += 1
+        if self.during_read:
+            self.during_read()
+        return self.tokens.get(key, {})
+
+    async def remove_token_by_key(self, key, user_id=None):
+        self.tokens.pop(key, None)
+
+    async def remove_tokens_by_user_id(self, user_id):
+        self.tokens = {id: token for id, token in self.tokens.items() if token["user_id"] != str(user_id)}
+
+
+def test_roles_and_permissions_are_split_once() -> None:
+    token = SessionToken(**new_token_data(str(uuid.uuid4())))
+
+    assert token.role_slugs == {"admin", "user"}
+    assert token.permission_slugs == {"boletos:read"}
+    assert SessionToken(id="a", tenant_id="t", user_id="u").role_slugs == frozenset()
+
+
+@pytest.mark.asyncio
+async def test_token_is_read_from_redis_once() -> None:
+    data = new_token_data(str(uuid.uuid4()))
+    cache, repo = SessionTokenCache(), FakeTokenRedisRepository(data)
+
+    assert (await cache.get_token(token_id=data["id"], token_redis_repo=repo)).id == data["id"]
+    assert (await cache.get_token(token_id=data["id"], token_redis_repo=repo)).id == data["id"]
+    assert repo.reads == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_token_is_not_cached() -> None:
+    cache, repo = SessionTokenCache(), FakeTokenRedisRepository()
+
+    assert await cache.get_token(token_id="unknown", token_redis_repo=repo) is None
+    assert await cache.get_token(token_id="unknown", token_redis_repo=repo) is None
+    assert repo.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_revoked_user_is_logged_out_at_once() -> None:
+    user_id = str(uuid.uuid4())
+    first, second = new_token_data(user_id), new_token_data(user_id)
+    cache, repo = SessionTokenCache(), FakeTokenRedisRepository(first, second)
+    for data in [first, second]:
+        await cache.get_token(token_id=data["id"], token_redis_repo=repo)
+
+    await cache.revoke_user(user_id=uuid.UUID(user_id), token_redis_repo=repo)
+
+    assert len(cache._tokens) == 0
+    assert await cache.get_token(token_id=first["id"], token_redis_repo=repo) is None
+    assert await cache.get_token(token_id=second["id"], token_redis_repo=repo) is None
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_evicted() -> None:
+    data = new_token_data(str(uuid.uuid4()))
+    cache, repo = SessionTokenCache(), FakeTokenRedisRepository(data)
+    await cache.get_token(token_id=data["id"], token_redis_repo=repo)
+
+    await cache.revoke_token(token=Token(**data), token_redis_repo=repo)
+
+    assert await cache.get_token(token_id=data["id"], token_redis_repo=repo) is None
+
+
+@pytest.mark.asyncio
+async def test_token_read_during_a_revocation_is_not_cached() -> None:
+    data = new_token_data(str(uuid.uuid4()))
+    cache = SessionTokenCache()
+    repo = FakeTokenRedisRepository(data, during_read=cache.clear)
+
+    await cache.get_token(token_id=data["id"], token_redis_repo=repo)
+    repo.during_read = None
+    await cache.get_token(token_id=data["id"], token_redis_repo=repo)
+
+    assert repo.reads == 2
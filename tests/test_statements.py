@@ -0,0 +1,38 @@
+from pypika import PostgreSQLQuery as Query, Table
+
+from app.db.statements import StatementRegistry
+
+
+def test_statement_is_built_once_per_key() -> None:
+    registry = StatementRegistry()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return Query.from_(Table("items")).select("*")
+
+    first = registry.get(("items", "select"), build)
+    second = registry.get(("items", "select"), build)
+
+    assert first == second == 'SELECT * FROM "items"'
+    assert len(builds) == 1
+    assert registry.stats()["hits"] == 1 and registry.stats()["misses"] == 1
+
+
+def test_sql_and_query_of_a_key_are_kept_apart() -> None:
+    registry = StatementRegistry()
+    query = Query.from_(Table("items")).select("*")
+
+    assert registry.get_query(("items", "select"), lambda: query) is query
+    assert registry.get(("items", "select"), lambda: query) == 'SELECT * FROM "items"'
+
+
+def test_least_recently_used_statement_is_dropped() -> None:
+    registry = StatementRegistry(maxsize=2)
+    registry.get("a", lambda: "SELECT 1")
+    registry.get("b", lambda: "SELECT 2")
+    registry.get("a", lambda: "SELECT 1")
+    registry.get("c", lambda: "SELECT 3")
+
+    assert registry.get("b", lambda: "rebuilt") == "rebuilt"
+    assert registry.get("c", lambda: "rebuilt") == "SELECT 3"
@@ -0,0 +1,95 @@
+import uuid
+
+import pytest
+
+from app.schemas.tenant import TenantInDB
+from app.services.tenant_cache import TenantCache
+from tests.conftest import FakeLoadingRepository
+
+pytestmark = pytest.mark.usefixtures("invalidation_bus_handlers")
+
+
+class FakeTenantsRepository(FakeLoadingRepository):
+    async def get_tenant_by_api_key(self, *, api_key):
+        return await self.load()
+
+
+class FakeTenantsRedisRepository:
+    def __init__(self) -> None:
+        self.cached = {}
+
+    async def get_cached_tenant(self, api_key_hash):
+        if api_key_hash in self.cached:
+            return True, self.cached[api_key_hash]
+        return False, None
+
+    async def set_cached_tenant(self, *, api_key_hash, tenant, expires_in):
+        # like Redis, keeps the tenant without its api key
+        self.cached[api_key_hash] = tenant.copy(update={"api_key": None}) if tenant else tenant
+
+    async def remove_cached_tenant(self, *, id, api_key_hash):
+        self.cached.pop(api_key_hash, None)
+
+
+def new_tenant() -> TenantInDB:
+    return TenantInDB.construct(id=uuid.uuid4(), api_key="key")
+
+
+async def get_tenant(cache: TenantCache, tenants_repo, tenants_redis_repo):
+    return await cache.get_tenant_by_api_key(
+        api_key="key", tenants_repo=tenants_repo, tenants_redis_repo=tenants_redis_repo
+    )
+
+
+@pytest.mark.asyncio
+async def test_tenant_loaded_from_the_db_is_cached_in_both_levels() -> None:
+    cache = TenantCache()
+    tenant = new_tenant()
+    tenants_repo, tenants_redis_repo = FakeTenantsRepository(tenant), FakeTenantsRedisRepository()
+
+    assert await get_tenant(cache, tenants_repo, tenants_redis_repo) is tenant
+    assert await get_tenant(cache, tenants_repo, tenants_redis_repo) is tenant
+
+    assert tenants_repo.loads == 1
+    [cached] = tenants_redis_repo.cached.values()
+    assert cached.id == tenant.id and cached.api_key is None
+
+
+@pytest.mark.asyncio
+async def test_tenant_read_from_redis_gets_the_api_key_of_the_request() -> None:
+    tenant = new_tenant()
+    tenants_repo, tenants_redis_repo = FakeTenantsRepository(tenant), FakeTenantsRedisRepository()
+    await get_tenant(TenantCache(), tenants_repo, tenants_redis_repo)
+
+    # another worker, its memory is empty
+    cached = await get_tenant(TenantCache(), tenants_repo, tenants_redis_repo)
+
+    assert tenants_repo.loads == 1
+    assert cached.id == tenant.id and cached.api_key == "key"
+
+
+@pytest.mark.asyncio
+async def test_tenant_invalidated_while_loaded_is_not_cached() -> None:
+    cache = TenantCache()
+    tenant = new_tenant()
+    tenants_repo, tenants_redis_repo = (
+        FakeTenantsRepository(tenant, during_load=cache.clear),
+        FakeTenantsRedisRepository(),
+    )
+
+    assert await get_tenant(cache, tenants_repo, tenants_redis_repo) is tenant
+    assert tenants_redis_repo.cached == {}
+
+    tenants_repo.during_load = None
+    await get_tenant(cache, tenants_repo, tenants_redis_repo)
+    assert tenants_repo.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_api_key_is_cached_as_not_found() -> None:
+    cache = TenantCache()
+    tenants_repo, tenants_redis_repo = FakeTenantsRepository(None), FakeTenantsRedisRepository()
+
+    assert await get_tenant(cache, tenants_repo, tenants_redis_repo) is None
+    assert await get_tenant(cache, tenants_repo, tenants_redis_repo) is None
+    assert tenants_repo.loads == 1
@@ -0,0 +1,132 @@
+import fnmatch
+import uuid
+
+import pytest
+
+from app.db.repositories import token_redis
+from app.db.repositories.token_redis import USER_TOKENS_INDEXED_KEY, TokenRedisRepository, get_user_tokens_key
+from app.core.config import REDIS_PREFIX
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self._redis = redis
+        self._results = []
+
+    def hgetall(self, key):
+        self._results.append(self._redis.hashes.get(key, {}))
+
+    async def execute(self):
+        return self._results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class FakeRedis:
+    """
+    Hashes and sorted sets in dicts, the Lua scripts of the repository emulated in Python.
+    """
+
+    def __init__(self) -> None:
+        self.strings = {}
+        self.hashes = {}
+        self.indexes = {}
+
+    def register_script(self, script):
+        emulations = {
+            token_redis.SET_TOKEN_SCRIPT: self.__set_token,
+            token_redis.REMOVE_USER_TOKENS_SCRIPT: self.__remove_user_tokens,
+            token_redis.INDEX_TOKEN_SCRIPT: self.__index_token,
+        }
+        emulation = emulations.get(script)
+
+        async def call(keys, args, client=None):
+            return emulation(keys, args)
+
+        return call
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def scan_iter(self, match, count):
+        for key in list(self.hashes):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    async def zrange(self, key, start, end):
+        return list(self.indexes.get(key, {}))
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.indexes.get(key, {}).pop(member, None)
+
+    def __set_token(self, keys, args):
+        self.hashes[keys[0]] = dict(zip(args[2::2], args[3::2]))
+        self.indexes.setdefault(keys[1], {})[args[0]] = args[1]
+        return 1
+
+    def __remove_user_tokens(self, keys, args):
+        ids = list(self.indexes.pop(keys[0], {}))
+        for id in ids:
+            self.hashes.pop(f"{args[0]}:{id}", None)
+        return len(ids)
+
+    def __index_token(self, keys, args):
+        if keys[0] not in self.hashes:
+            return 0
+        self.indexes.setdefault(keys[1], {})[args[0]] = 0
+        return 1
+
+
+def write_old_token(redis: FakeRedis, user_id: str) -> str:
+    # a session written before the indexes: only its hash exists
+    id = f"{user_id}-{uuid.uuid4().hex[:12]}"
+    redis.hashes[f"{REDIS_PREFIX}:{id}"] = {"id": id, "tenant_id": str(uuid.uuid4()), "user_id": user_id}
+    return id
+
+
+@pytest.fixture(autouse=True)
+def not_indexed(monkeypatch) -> None:
+    monkeypatch.setattr(TokenRedisRepository, "_indexed", False)
+
+
+@pytest.mark.asyncio
+async def test_tokens_written_before_the_indexes_are_removed() -> None:
+    redis = FakeRedis()
+    user_id, other_user_id = str(uuid.uuid4()), str(uuid.uuid4())
+    write_old_token(redis, user_id)
+    other_id = write_old_token(redis, other_user_id)
+
+    assert await TokenRedisRepository(redis).remove_tokens_by_user_id(user_id) == 1
+
+    assert list(redis.hashes) == [f"{REDIS_PREFIX}:{other_id}"]
+
+
+@pytest.mark.asyncio
+async def test_tokens_written_before_the_indexes_are_listed() -> None:
+    redis = FakeRedis()
+    user_id = str(uuid.uuid4())
+    id = write_old_token(redis, user_id)
+
+    [token] = await TokenRedisRepository(redis).get_tokens_by_user_id(user_id)
+
+    assert token.id == id
+    assert id in redis.indexes[get_user_tokens_key(user_id)]
+
+
+@pytest.mark.asyncio
+async def test_no_scan_once_the_tokens_are_indexed() -> None:
+    redis = FakeRedis()
+    redis.strings[USER_TOKENS_INDEXED_KEY] = "done"
+    user_id = str(uuid.uuid4())
+    write_old_token(redis, user_id)
+
+    assert await TokenRedisRepository(redis).remove_tokens_by_user_id(user_id) == 0
+    assert TokenRedisRepository._indexed
@@ -0,0 +1,92 @@
+import contextlib
+
+import pytest
+
+from app.db.unit_of_work import UnitOfWork
+
+
+class FakeConnection:
+    def __init__(self, database: "FakeDatabase") -> None:
+        self._database = database
+
+    async def __aenter__(self):
+        self._database.acquired += 1
+        return self
+
+    async def __aexit__(self, *args):
+        self._database.released += 1
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, **kwargs):
+        yield self
+
+
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.acquired = 0
+        self.released = 0
+
+    def connection(self):
+        return FakeConnection(self)
+
+
+@pytest.mark.asyncio
+async def test_connection_is_acquired_once_until_released() -> None:
+    database = FakeDatabase()
+    uow = UnitOfWork(database)
+
+    assert await uow.get_connection() is await uow.get_connection()
+    await uow.release()
+    await uow.get_connection()
+    await uow.close()
+
+    assert database.acquired == 2 and database.released == 2
+    assert uow.stats()["acquisitions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_connection_of_an_open_transaction_is_not_released() -> None:
+    database = FakeDatabase()
+    uow = UnitOfWork(database)
+
+    async with uow.transaction():
+        await uow.release()
+        assert uow.stats()["held"]
+
+    await uow.release()
+    assert database.released == 1
+
+
+@pytest.mark.asyncio
+async def test_after_commit_runs_when_the_outermost_transaction_commits() -> None:
+    uow = UnitOfWork(FakeDatabase())
+    called = []
+
+    async def callback():
+        called.append(1)
+
+    async with uow.transaction():
+        async with uow.transaction():
+            uow.after_commit(callback)
+        assert called == []
+
+    assert called == [1]
+
+
+@pytest.mark.asyncio
+async def test_after_commit_is_dropped_on_rollback() -> None:
+    uow = UnitOfWork(FakeDatabase())
+    called = []
+
+    async def callback():
+        called.append(1)
+
+    with pytest.raises(ValueError):
+        async with uow.transaction():
+            uow.after_commit(callback)
+            raise ValueError()
+
+    async with uow.transaction():
+        pass
+
+    assert called == []
@@ -0,0 +1,26 @@
+from app.util.utils_bb import get_pagador_dedupe_key
+
+
+def test_same_pagador_written_differently_has_the_same_key() -> None:
+    key = get_pagador_dedupe_key(
+        cpf_cnpj="123.456.789-09", cep="89.010-000", endereco="Rua XV de Novembro,  100", telefone="(47) 3333-4444"
+    )
+
+    assert key == get_pagador_dedupe_key(
+        cpf_cnpj="12345678909", cep="89010000", endereco=" rua xv de novembro, 100 ", telefone="4733334444"
+    )
+    assert len(key) == 64
+
+
+def test_other_address_has_another_key() -> None:
+    fields = {"cpf_cnpj": "12345678909", "cep": "89010000", "telefone": None}
+
+    assert get_pagador_dedupe_key(endereco="Rua A, 1", **fields) != get_pagador_dedupe_key(
+        endereco="Rua A, 2", **fields
+    )
+
+
+def test_missing_fields_are_empty() -> None:
+    assert get_pagador_dedupe_key(cpf_cnpj="12345678909", cep=None, endereco=None, telefone=None) == (
+        get_pagador_dedupe_key(cpf_cnpj="12345678909", cep="", endereco="", telefone="")
+    )